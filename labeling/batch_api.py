@@ -0,0 +1,155 @@
+"""
+OpenAI-style Batch API Client
+
+Used by `pipeline.py --transport batch` for large backfills where interactive
+latency does not matter: requests are written to a JSONL file, uploaded,
+processed asynchronously by the provider, and the results downloaded.
+
+  POST /files                (multipart, purpose=batch)  → {"id": file_id}
+  POST /batches              {"input_file_id", "endpoint", "completion_window"}
+  GET  /batches/{id}         → status, output_file_id, error_file_id, request_counts
+  GET  /files/{id}/content   → result JSONL
+
+BatchState persists every submitted batch (file/batch ids, status, local result
+path) in <run_dir>/batch_state.json, so an interrupted run resumes polling the
+batches it already submitted instead of paying for them again.
+
+tools/batch_server.py is a local file-based stand-in implementing the same API.
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from config import LITELLM_BASE, LITELLM_KEY, BATCH_BASE, BATCH_COMPLETION_WINDOW, BATCH_POLL_INTERVAL
+
+CHAT_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def request_line(custom_id, model, messages, temperature, max_tokens):
+    """One line of a batch input file."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": CHAT_ENDPOINT,
+        "body": {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+    }
+
+
+def read_result_lines(path):
+    """Parse a downloaded output/error file → {custom_id: (content_or_None, usage, error_or_None, status_code)}."""
+    results = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            custom_id = record.get("custom_id")
+            response = record.get("response") or {}
+            status_code = response.get("status_code", 0)
+            body = response.get("body") or {}
+            error = record.get("error")
+            content, usage = None, body.get("usage") or {}
+            if status_code == 200 and not error:
+                try:
+                    content = body["choices"][0]["message"]["content"].strip()
+                except (KeyError, IndexError, TypeError, AttributeError):
+                    error = {"message": "malformed response body"}
+            else:
+                error = error or body.get("error") or {"message": f"HTTP {status_code}"}
+            results[custom_id] = (
+                content,
+                {"prompt_tokens": usage.get("prompt_tokens", 0), "completion_tokens": usage.get("completion_tokens", 0)},
+                None if content is not None else (error.get("message") if isinstance(error, dict) else str(error)),
+                status_code,
+            )
+    return results
+
+
+class BatchClient:
+    """Thin async client for the /files + /batches endpoints."""
+
+    def __init__(self, http_client, base_url=None, api_key=None):
+        self.http = http_client
+        self.base = (base_url or BATCH_BASE or LITELLM_BASE).rstrip("/")
+        self.headers = {"Authorization": f"Bearer {api_key if api_key is not None else LITELLM_KEY}"}
+
+    async def upload(self, path):
+        with open(path, "rb") as f:
+            resp = await self.http.post(
+                f"{self.base}/files", headers=self.headers,
+                data={"purpose": "batch"}, files={"file": (Path(path).name, f, "application/jsonl")})
+        resp.raise_for_status()
+        return resp.json()["id"]
+
+    async def create(self, input_file_id, metadata=None):
+        payload = {"input_file_id": input_file_id, "endpoint": CHAT_ENDPOINT,
+                   "completion_window": BATCH_COMPLETION_WINDOW}
+        if metadata:
+            payload["metadata"] = metadata
+        resp = await self.http.post(f"{self.base}/batches", headers=self.headers, json=payload)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def retrieve(self, batch_id):
+        resp = await self.http.get(f"{self.base}/batches/{batch_id}", headers=self.headers)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def download(self, file_id, dest):
+        resp = await self.http.get(f"{self.base}/files/{file_id}/content", headers=self.headers)
+        resp.raise_for_status()
+        tmp = Path(f"{dest}.tmp")
+        tmp.write_bytes(resp.content)
+        os.replace(tmp, dest)
+
+    async def wait(self, batch_id, poll_interval=BATCH_POLL_INTERVAL, on_poll=None):
+        """Poll until the batch reaches a terminal status. Returns the batch object."""
+        while True:
+            try:
+                batch = await self.retrieve(batch_id)
+            except (httpx.TransportError, httpx.HTTPStatusError):
+                await asyncio.sleep(poll_interval)
+                continue
+            if on_poll is not None:
+                on_poll(batch)
+            if batch.get("status") in TERMINAL_STATUSES:
+                return batch
+            await asyncio.sleep(poll_interval)
+
+
+class BatchState:
+    """Per-run record of submitted batches (<run_dir>/batch_state.json).
+
+    {"config": {...run settings...},
+     "batches": {"<phase>-r<round>-<chunk>": {"input", "file_id", "batch_id", "status",
+                                              "output", "errors", "counts", "updated"}}}
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            data = {}
+        self.config = data.get("config", {})
+        self.batches = data.get("batches", {})
+
+    def update(self, key, **fields):
+        entry = self.batches.setdefault(key, {})
+        entry.update(fields)
+        entry["updated"] = datetime.now().isoformat()
+        self.save()
+        return entry
+
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"config": self.config, "batches": self.batches}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
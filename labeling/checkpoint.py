@@ -0,0 +1,132 @@
+"""
+Run Checkpoint
+
+File-level progress of a directory (or single-file) run, for --resume. It
+used to be one checkpoint.json, reloaded and rewritten in full with indent=2
+each time a file finished, with a list for the completed files: quadratic
+I/O and membership checks on the event loop over tens of thousands of shards.
+
+Now checkpoint.json is a snapshot and checkpoint.log an append-only event log
+next to it, one JSON line per file outcome:
+
+  {"file": "<rel path>", "event": "completed"}
+  {"file": "<rel path>", "event": "failed", "error": "..."}
+
+mark() appends an event and applies it to the in-memory state (a set of
+completed files, a dict of failed ones). Every CHECKPOINT_COMPACT_EVERY events,
+and when the run is done, the state is compacted: written to a temporary
+snapshot, renamed over checkpoint.json, then the log is emptied. Replaying an
+event twice is harmless, so a crash between the two steps loses nothing.
+Loading reads the snapshot and replays the log once, in linear time; a torn
+last line of an interrupted append is cut off. The snapshot keeps the old
+checkpoint.json layout, so older run directories still resume.
+"""
+
+import json
+import os
+from pathlib import Path
+
+from config import CHECKPOINT_COMPACT_EVERY
+
+
+class Checkpoint:
+    """checkpoint.json snapshot + checkpoint.log events of one run directory.
+
+    completed: set of relative paths of written files; failed: {rel path: error};
+    settings: run settings --resume recovers (input_path, model, call_mode).
+    """
+
+    def __init__(self, path, total_files=0, settings=None):
+        self.path = Path(path)
+        self.log_path = self.path.with_suffix(".log")
+        self.total_files = total_files
+        self.settings = dict(settings or {})
+        self.completed = set()
+        self.failed = {}
+        self._order = []    # completed files in completion order, for the snapshot
+        self._events = 0    # events appended since the last compaction
+        self._log = None
+
+    @classmethod
+    def create(cls, path, files, settings=None):
+        """Start a fresh checkpoint for the given input files."""
+        ckpt = cls(path, total_files=len(files), settings=settings)
+        ckpt.compact()
+        return ckpt
+
+    @classmethod
+    def load(cls, path):
+        """Snapshot + replayed log, or None without a checkpoint."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        ckpt = cls(path, total_files=data.pop("total_files", 0))
+        for rel in data.pop("completed", []):
+            ckpt._apply({"file": rel, "event": "completed"})
+        for rel, error in data.pop("failed", {}).items():
+            ckpt._apply({"file": rel, "event": "failed", "error": error})
+        data.pop("status", None)
+        ckpt.settings = data
+        if ckpt.log_path.exists():
+            with open(ckpt.log_path, "rb+") as f:
+                good = 0
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Torn last line of an interrupted append: cut it so new events start clean
+                        f.truncate(good)
+                        break
+                    ckpt._apply(event)
+                    ckpt._events += 1
+                    good += len(line)
+        return ckpt
+
+    @property
+    def status(self):
+        return "done" if len(self.completed) + len(self.failed) >= self.total_files else "in_progress"
+
+    def mark(self, rel_path_str, success=True, error_msg=None):
+        """Record a file as completed or failed."""
+        event = {"file": rel_path_str, "event": "completed" if success else "failed"}
+        if not success:
+            event["error"] = error_msg or "unknown"
+        self._apply(event)
+        if self._log is None:
+            self._log = open(self.log_path, "a", encoding="utf-8")
+        self._log.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._log.flush()
+        self._events += 1
+        if self._events >= CHECKPOINT_COMPACT_EVERY or self.status == "done":
+            self.compact()
+
+    def _apply(self, event):
+        rel = event["file"]
+        if event["event"] == "completed":
+            if rel not in self.completed:
+                self.completed.add(rel)
+                self._order.append(rel)
+            self.failed.pop(rel, None)
+        else:
+            self.failed[rel] = event.get("error", "unknown")
+
+    def compact(self):
+        """Write the state as the checkpoint.json snapshot and empty the event log."""
+        snapshot = {
+            "status": self.status,
+            "completed": self._order,
+            "failed": self.failed,
+            "total_files": self.total_files,
+            **self.settings,
+        }
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        open(self.log_path, "w").close()
+        self._events = 0
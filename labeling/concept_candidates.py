@@ -0,0 +1,110 @@
+"""
+Concept Candidates
+
+(language, domain) → candidate concept map (openspec/specs/tag-mapping-tables)
+that narrows the Call 2 concept pool once Call 1 has labeled a sample's
+language and domain: the Concept section of the prompt then lists only the
+candidates (prompts.call_prompt).
+
+The map is derived from labeled runs rather than written by hand
+(tools/build_concept_candidates.py). A pair enters it once it occurs in at
+least CONCEPT_CANDIDATE_MIN_SUPPORT labeled samples; its candidates are every
+concept seen with the pair, with its language (any domain) or with its domain
+(any language). Samples without a language or domain count as "none".
+
+Stored as {"language:domain": [concept, ...]} in CONCEPT_CANDIDATES_PATH.
+
+Call 2 keeps the full pool when:
+  - Call 1's language or domain confidence is below CONCEPT_NARROW_MIN_CONFIDENCE
+  - any (language, domain) pair of the sample is not in the map
+  - the union of its pairs' candidates exceeds CONCEPT_NARROW_MAX_SHARE of the pool
+
+tools/evaluate_concept_candidates.py measures the prompt-token savings and the
+recall loss (reference concepts outside the narrowed pool) on the baselines.
+The shipped map was built from those same baselines, so narrowing is opt-in
+(pipeline.py --concept-narrowing) until it is measured on held-out data.
+"""
+
+import json
+from collections import Counter, defaultdict
+
+from config import (
+    CONCEPT_CANDIDATES_PATH, CONCEPT_CANDIDATE_MIN_SUPPORT,
+    CONCEPT_NARROW_MIN_CONFIDENCE, CONCEPT_NARROW_MAX_SHARE,
+)
+from prompts import TAG_POOLS
+
+NO_TAG = "none"
+
+
+def pair_keys(labels):
+    """"language:domain" keys of a label dict (every language × every domain)."""
+    languages = labels.get("language") or [NO_TAG]
+    domains = labels.get("domain") or [NO_TAG]
+    return [f"{lang}:{domain}" for lang in languages for domain in domains]
+
+
+def build_candidates(label_sets, min_support=CONCEPT_CANDIDATE_MIN_SUPPORT):
+    """Candidate map from labeled samples' label dicts → {"language:domain": sorted concepts}."""
+    support = Counter()
+    by_pair, by_language, by_domain = defaultdict(set), defaultdict(set), defaultdict(set)
+    for labels in label_sets:
+        concepts = [c for c in labels.get("concept") or [] if c in TAG_POOLS["concept"]]
+        for key in pair_keys(labels):
+            language, domain = key.split(":", 1)
+            support[key] += 1
+            by_pair[key].update(concepts)
+            by_language[language].update(concepts)
+            by_domain[domain].update(concepts)
+    candidates = {}
+    for key, n in support.items():
+        if n < min_support:
+            continue
+        language, domain = key.split(":", 1)
+        candidates[key] = sorted(by_pair[key] | by_language[language] | by_domain[domain])
+    return dict(sorted(candidates.items()))
+
+
+def load_candidates(path=CONCEPT_CANDIDATES_PATH):
+    """{"language:domain": frozenset(concepts)} from a stored map ({} if there is none)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {key: frozenset(concepts) for key, concepts in stored.items()}
+
+
+_CANDIDATES = None
+
+
+def candidates():
+    """Shared map from CONCEPT_CANDIDATES_PATH (loaded on first use)."""
+    global _CANDIDATES
+    if _CANDIDATES is None:
+        _CANDIDATES = load_candidates()
+    return _CANDIDATES
+
+
+def candidate_pool(call1, mapping=None, min_confidence=CONCEPT_NARROW_MIN_CONFIDENCE,
+                   max_share=CONCEPT_NARROW_MAX_SHARE):
+    """Concepts Call 2 should list for a Call 1 result → (frozenset or None, reason).
+
+    None means the full pool; reason is "narrowed", "low_confidence",
+    "unseen_pair" or "wide".
+    """
+    mapping = candidates() if mapping is None else mapping
+    confidence = call1.get("confidence")
+    confidence = confidence if isinstance(confidence, dict) else {}
+    for dim in ("language", "domain"):
+        score = confidence.get(dim)
+        if not isinstance(score, (int, float)) or score < min_confidence:
+            return None, "low_confidence"
+    pool = set()
+    for key in pair_keys(call1):
+        if key not in mapping:
+            return None, "unseen_pair"
+        pool |= mapping[key]
+    if len(pool) > max_share * len(TAG_POOLS["concept"]):
+        return None, "wide"
+    return frozenset(pool), "narrowed"
@@ -0,0 +1,206 @@
+"""
+Adaptive Concurrency Controller
+
+AIMD (additive-increase / multiplicative-decrease) replacement for the fixed
+asyncio.Semaphore that bounds in-flight samples.
+
+  - Every LLM HTTP attempt reports (latency, congested) via record().
+    Congested = HTTP 429 / 5xx or a transport timeout.
+  - Congestion cuts the limit multiplicatively (at most once per window, so a
+    burst of 429s from the same moment counts as a single signal).
+  - At the end of each observation window (~limit/2 calls, i.e. roughly one
+    round trip of the in-flight set), the window p95 latency is compared to a
+    slow-moving baseline. Inflation beyond AIMD_LATENCY_INFLATION cuts the
+    limit; a healthy window in which the limit was actually saturated raises it
+    additively.
+
+Used as an async context manager exactly like a semaphore:
+
+    limiter = AdaptiveConcurrency(initial=100, min_limit=4, max_limit=400)
+    async with limiter:
+        ...
+"""
+
+import asyncio
+from collections import deque
+
+from config import (
+    CONCURRENCY_MIN, CONCURRENCY_MAX,
+    AIMD_INCREASE, AIMD_DECREASE, AIMD_LATENCY_INFLATION,
+    AIMD_MAX_ERROR_RATE, AIMD_MIN_WINDOW,
+)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty sequence."""
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[k]
+
+
+class AdaptiveConcurrency:
+    """Semaphore-like permit pool whose size follows an AIMD control law.
+
+    adaptive=False turns it into a plain fixed-size semaphore (record() is a no-op),
+    which keeps the --fixed-concurrency path on the same code.
+    """
+
+    def __init__(self, initial, min_limit=CONCURRENCY_MIN, max_limit=CONCURRENCY_MAX, adaptive=True):
+        self.adaptive = adaptive
+        self.min_limit = max(1, min(min_limit, initial))
+        self.max_limit = max(max_limit, initial)
+        self.initial = initial
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._waiters = deque()
+
+        # Observation window
+        self._window_latencies = []
+        self._window_n = 0
+        self._window_congested = 0
+        self._window_peak = 0
+        self._since_decrease = None   # calls since last cut (None = never cut)
+        self._baseline_p95 = None
+
+        # Counters for stats
+        self.increases = 0
+        self.decreases = 0
+        self.congestion_events = 0
+        self.calls = 0
+        self.min_seen = initial
+        self.max_seen = initial
+        self._recent_latencies = deque(maxlen=1000)
+
+    # ── Permit handling ──
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    async def acquire(self):
+        if self._in_flight < self.limit and not self._waiters:
+            self._take()
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()   # permit was granted just before cancellation
+            else:
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self):
+        self._in_flight -= 1
+        self._wake()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def _take(self):
+        self._in_flight += 1
+        self._window_peak = max(self._window_peak, self._in_flight)
+
+    def _wake(self):
+        while self._waiters and self._in_flight < self.limit:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self._take()
+                fut.set_result(True)
+
+    # ── Feedback ──
+
+    def _window_size(self):
+        return max(AIMD_MIN_WINDOW, self.limit // 2)
+
+    def record(self, latency, congested=False):
+        """Report one LLM HTTP attempt. latency in seconds."""
+        self.calls += 1
+        if not congested:
+            self._recent_latencies.append(latency)
+        if not self.adaptive:
+            if congested:
+                self.congestion_events += 1
+            return
+
+        self._window_n += 1
+        if self._since_decrease is not None:
+            self._since_decrease += 1
+        if congested:
+            self.congestion_events += 1
+            self._window_congested += 1
+            if self._since_decrease is None or self._since_decrease >= self._window_size():
+                self._decrease()
+                return
+        else:
+            self._window_latencies.append(latency)
+
+        if self._window_n >= self._window_size():
+            self._evaluate_window()
+
+    def _evaluate_window(self):
+        error_rate = self._window_congested / max(self._window_n, 1)
+        p95 = percentile(self._window_latencies, 95) if self._window_latencies else None
+
+        if p95 is not None and self._baseline_p95 is None:
+            self._baseline_p95 = p95
+
+        if p95 is not None and p95 > self._baseline_p95 * AIMD_LATENCY_INFLATION:
+            self._decrease()
+            # Adapt slowly so a permanent slowdown eventually becomes the new normal
+            self._baseline_p95 += 0.05 * (p95 - self._baseline_p95)
+            return
+
+        if error_rate <= AIMD_MAX_ERROR_RATE and self._window_peak >= self.limit:
+            self._set_limit(self._limit + AIMD_INCREASE)
+            self.increases += 1
+        if p95 is not None:
+            self._baseline_p95 += 0.1 * (p95 - self._baseline_p95)
+        self._reset_window()
+
+    def _decrease(self):
+        self._set_limit(self._limit * AIMD_DECREASE)
+        self.decreases += 1
+        self._since_decrease = 0
+        self._reset_window()
+
+    def _set_limit(self, value):
+        self._limit = min(max(value, self.min_limit), self.max_limit)
+        self.min_seen = min(self.min_seen, self.limit)
+        self.max_seen = max(self.max_seen, self.limit)
+        self._wake()
+
+    def _reset_window(self):
+        self._window_latencies = []
+        self._window_n = 0
+        self._window_congested = 0
+        self._window_peak = self._in_flight
+
+    def stats(self):
+        lat = list(self._recent_latencies)
+        return {
+            "mode": "aimd" if self.adaptive else "fixed",
+            "initial_limit": self.initial,
+            "final_limit": self.limit,
+            "min_limit": self.min_seen,
+            "max_limit": self.max_seen,
+            "bounds": [self.min_limit, self.max_limit],
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "llm_attempts": self.calls,
+            "congestion_events": self.congestion_events,
+            "p95_latency": round(percentile(lat, 95), 2) if lat else None,
+        }
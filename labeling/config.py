@@ -18,6 +18,15 @@ DEFAULT_OUTPUT = DATA_DIR / "labeled_samples.json"
 LITELLM_BASE = os.environ.get("LITELLM_BASE", "http://localhost:4000/v1")
 LITELLM_KEY = os.environ.get("LITELLM_KEY", "")
 
+# ─── Endpoint Pool (see endpoints.py) ──────────────────
+# Several proxies serving the same models: "url[|weight[|max_in_flight]],..."
+# e.g. LITELLM_BASES="http://10.0.0.1:4000/v1|2|300,http://10.0.0.2:4000/v1"
+# Empty = single LITELLM_BASE, no pool.
+LITELLM_BASES = os.environ.get("LITELLM_BASES", "")
+ENDPOINT_MAX_IN_FLIGHT = 200       # default per-endpoint concurrency cap
+BREAKER_FAILURES = 5               # consecutive 5xx/timeouts before an endpoint is ejected
+BREAKER_COOLDOWN = 30              # seconds ejected before a half-open probe request
+
 # ─── Pipeline Defaults ──────────────────────────────────
 DEFAULT_MODEL = "gpt-4o-mini"
 DEFAULT_CONCURRENCY = 100
@@ -28,37 +37,153 @@ REQUEST_TIMEOUT = 60           # seconds per LLM call (gpt-4o-mini is fast)
 HTTP_CLIENT_TIMEOUT = 60       # httpx client timeout
 SAMPLE_TIMEOUT = 300           # seconds total per sample (including all retries)
 
+# ─── Arbitration ────────────────────────────────────────
+ARBITRATION_SCOPE = "dimension"    # "dimension": narrow prompt per low-confidence dim; "call": re-run the full call
+ARBITRATION_TEMPERATURE = 0.3
+ARBITRATION_MAX_TOKENS = 300       # per single-dimension arbitration call
+
+# ─── Rule Engine (see rules.py; enable with --rules) ───
+# Dimensions a deterministic rule may label on its own. When a rule's confidence
+# reaches the threshold, the dimension is dropped from the LLM prompt and schema.
+RULE_DIMENSIONS = ["language", "agentic"]
+RULE_CONFIDENCE_THRESHOLD = 0.95
+
+# ─── Concept Candidates (see concept_candidates.py; enable with --concept-narrowing) ───
+# Call 2 lists only the concepts seen with the sample's (language, domain) pairs
+# in labeled runs, built by tools/build_concept_candidates.py.
+CONCEPT_CANDIDATES_PATH = BASE_DIR.parent / "taxonomy" / "mappings" / "concept_candidates.json"
+CONCEPT_CANDIDATE_MIN_SUPPORT = 3        # labeled samples a pair needs to enter the map
+CONCEPT_NARROW_MIN_CONFIDENCE = 0.8      # Call 1 language and domain confidence needed to narrow
+CONCEPT_NARROW_MAX_SHARE = 0.8           # narrowed pools above this share of the full pool are not worth it
+
+# ─── Triage Model (opt-in via --triage-model, see triage.py; needs numpy) ───
+# Local classifier trained on past runs (tools/train_triage.py). Dimensions it
+# predicts above their calibrated threshold are labeled without the LLM.
+TRIAGE_MODEL_PATH = DATA_DIR / "triage_model.npz"
+TRIAGE_DIMENSIONS = ["intent", "difficulty"]
+TRIAGE_HASH_BITS = 18              # 2^18 hashed n-gram buckets
+TRIAGE_TARGET_PRECISION = 0.95     # held-out precision a pre-label threshold must reach
+TRIAGE_CALIBRATION_SHARE = 0.2     # samples held out for temperature + threshold calibration
+TRIAGE_MIN_CALIBRATION = 30        # held-out predictions needed above a threshold
+TRIAGE_EPOCHS = 10
+TRIAGE_BATCH_SIZE = 2048
+TRIAGE_LEARNING_RATE = 0.05
+TRIAGE_L2 = 1e-5
+
+# ─── Adaptive Concurrency (AIMD, see concurrency.py) ────
+ADAPTIVE_CONCURRENCY = True        # False = fixed semaphore at DEFAULT_CONCURRENCY
+CONCURRENCY_MIN = 4                # floor for multiplicative cuts
+CONCURRENCY_MAX = 400              # hard ceiling for additive growth (the pipeline grows only up to --max-concurrency)
+AIMD_INCREASE = 2                  # permits added per healthy, saturated window
+AIMD_DECREASE = 0.7                # limit multiplier on 429/5xx/timeout or latency inflation
+AIMD_LATENCY_INFLATION = 2.0       # window p95 > baseline p95 × this → cut
+AIMD_MAX_ERROR_RATE = 0.02         # max congested fraction of a window to allow growth
+AIMD_MIN_WINDOW = 20               # min LLM attempts per evaluation window
+
+# ─── Hedged Requests (opt-in via --hedge, see hedging.py) ───
+HEDGE_PERCENTILE = 95              # hedge when a call exceeds this latency percentile
+HEDGE_MIN_DELAY = 2.0              # never hedge earlier than this (seconds)
+HEDGE_MIN_SAMPLES = 20             # latencies needed before hedging starts
+HEDGE_WINDOW = 500                 # recent latencies used for the percentile
+HEDGE_MAX_SHARE = 0.05             # hedges ≤ this fraction of all calls
+
+# ─── Speculative Call 2 (opt-in via --speculative-call2) ───
+# Call 2 starts together with Call 1 using a provisional Call 1 context guessed
+# from preprocess() signals; it is re-issued when the real Call 1 disagrees.
+SPECULATION_DIMS = ["intent", "language"]   # Call 1 dims in the provisional context
+SPECULATION_MIN_JACCARD = 0.5               # multi-select overlap that still counts as a hit
+# Last-query keywords → intent (first match wins, default "build")
+INTENT_HINT_KEYWORDS = [
+    ("debug", ["error", "bug", "fix", "traceback", "exception", "doesn't work", "not working",
+               "fails", "failing", "crash", "wrong", "报错", "错误", "修复", "问题"]),
+    ("review", ["review", "审查", "评审", "feedback on", "improve this", "any issues"]),
+    ("decide", [" vs ", "versus", "which should", "should i use", "compare", "trade-off", "tradeoff",
+                "choose", "选择", "对比", "哪个"]),
+    ("learn", ["explain", "what is", "what's the difference", "how does", "why does", "why is",
+               "difference between", "解释", "什么是", "为什么", "原理", "区别"]),
+]
+
+# ─── Request Packing (opt-in via --pack, see packing.py) ───
+PACK_SIZE = 8                      # max samples per packed request
+PACK_MAX_SAMPLE_TOKENS = 1500      # only samples with est_tokens ≤ this are packed
+PACK_MAX_TOKENS = 8000             # max summed est_tokens of one pack
+PACK_LINGER = 0.05                 # seconds to wait for a pack to fill before sending
+PACK_COMPLETION_TOKENS = 400       # max_tokens budget per packed sample
+
+# ─── Batch Transport (--transport batch, see batch_api.py) ───
+BATCH_BASE = os.environ.get("BATCH_BASE", "")   # /files + /batches API root (empty = LITELLM_BASE)
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_INTERVAL = 30           # seconds between batch status polls
+BATCH_MAX_REQUESTS = 50_000        # requests per batch file (provider limit)
+
 # ─── Conversation Truncation ──────────────────────────
 MAX_CONVERSATION_CHARS = 20000   # total budget (~5K tokens); aggressive for fast labeling
 TRUNCATION_HEAD_RATIO = 0.30     # fraction of budget for first human turn (task context)
 TRUNCATION_LAST_RESPONSE_RATIO = 0.40  # fraction of budget for last gpt turn (labeling target)
 TRUNCATION_PER_TURN_RATIO = 0.30 # max fraction of budget for any single turn
 
+# ─── Preprocessing ─────────────────────────────────────
+# Per-turn scans cached by text (see preprocessing.scan_turn), so the pyramid
+# slices of a long trajectory scan each turn once. Bounded by cached turn text.
+TURN_SCAN_CACHE_CHARS = 16_000_000
+
 # ─── Directory Pipeline ────────────────────────────────
 DIR_PIPELINE_WATERMARK = 2.0   # load next file when in-flight < concurrency * watermark
 DIR_PIPELINE_MAX_FILES = 5     # max files loaded in memory simultaneously
 
+# ─── Checkpoint (see checkpoint.py) ────────────────────
+CHECKPOINT_COMPACT_EVERY = 1000   # file events appended to checkpoint.log between snapshots
+
+# ─── Input Streaming (see json_stream.py) ─────────────
+# .json arrays are parsed one element at a time from reads of this many characters
+JSON_STREAM_CHUNK_CHARS = 1 << 20
+
+# ─── Result Writer (see result_writer.py) ─────────────
+RESULT_LOG_SYNC_RECORDS = 256    # fsync outputs + append the completion log every N written samples
+RESULT_LOG_SYNC_SECONDS = 5.0    # ... or on the first write this long after the last sync
+
+# ─── Duplicate Collapse (see dedup.py; enable with --dedup) ───
+# Run-scoped conversation-hash index, in the run directory
+DEDUP_STORE_NAME = "dedup.sqlite"
+
+# ─── Near-Duplicate Propagation (opt-in via --near-dup, see near_dup.py; needs numpy) ───
+NEAR_DUP_THRESHOLD = 0.9       # estimated Jaccard a sample needs to take a representative's labels
+NEAR_DUP_SHINGLE = 3           # tokens per shingle
+NEAR_DUP_BANDS = 16            # LSH bands × rows = MinHash permutations (candidate S-curve ~0.7)
+NEAR_DUP_ROWS = 8
+NEAR_DUP_MAX_CHARS = 4000      # head of the first human / last gpt turn that is shingled
+NEAR_DUP_MAX_INDEX = 200_000   # representatives indexed per run (memory bound)
+
+# ─── LLM Response Cache ────────────────────────────────
+# Content-addressed SQLite cache shared by all runs (see llm_cache.py)
+LLM_CACHE_PATH = Path(os.environ.get("LLM_CACHE_PATH", DATA_DIR / "cache" / "llm_responses.sqlite"))
+DEFAULT_CACHE_MODE = "off"     # off | read | readwrite | refresh (replay is opt-in)
+LLM_CACHE_MAX_TEMPERATURE = 0.1    # calls sampled hotter (arbitration reruns) are never cached
+
 # ─── Model Tiers ────────────────────────────────────────
+# Each entry maps model ID → proxy quota used by the rate limiter (rate_limit.py):
+#   {"rpm": requests/minute, "tpm": tokens/minute}; omit a key (or use {}) for no limit.
+#   e.g. "gpt-4o-mini": {"rpm": 5_000, "tpm": 4_000_000}
 MODELS = {
-    "strong": [
-        "claude-opus-4-5-20251101-thinking",
-        "gpt-5",
-        "gemini-2.5-pro-thinking",
-    ],
-    "mid": [
-        "claude-sonnet-4-6",
-        "deepseek-v3.2",
-        "qwen3-235b-a22b",
-        "gemini-2.5-flash-thinking",
-        "glm-5",
-    ],
-    "light": [
-        "gpt-4o-mini",
-        "qwen3-30b-a3b-instruct-2507",
-        "gemini-3-flash-preview",
-        "deepseek-v3.1",
-        "glm-4.7-flashx",
-    ],
+    "strong": {
+        "claude-opus-4-5-20251101-thinking": {},
+        "gpt-5": {},
+        "gemini-2.5-pro-thinking": {},
+    },
+    "mid": {
+        "claude-sonnet-4-6": {},
+        "deepseek-v3.2": {},
+        "qwen3-235b-a22b": {},
+        "gemini-2.5-flash-thinking": {},
+        "glm-5": {},
+    },
+    "light": {
+        "gpt-4o-mini": {},
+        "qwen3-30b-a3b-instruct-2507": {},
+        "gemini-3-flash-preview": {},
+        "deepseek-v3.1": {},
+        "glm-4.7-flashx": {},
+    },
 }
 
 PIPELINE_DEFAULTS = {
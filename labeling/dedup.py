@@ -0,0 +1,111 @@
+"""
+Duplicate Collapse
+
+Opt-in (pipeline.py --dedup). SFT dumps repeat conversations, exactly or with
+only line endings and trailing whitespace changed, within and across files.
+Every sample to label is keyed by a hash of what the LLM would see: its
+conversation after truncate_conversations_for_labeling, with line endings
+unified and trailing whitespace dropped. Line breaks and indentation are part
+of the key, so code that differs only in indentation is not a duplicate.
+Only the first sample of each key (the
+representative) is labeled. The others get a copy of its labels marked
+"duplicate_of" (see pipeline.collapse_duplicates / fan_out).
+
+The key index is run-scoped and on disk (DEDUP_STORE_NAME in the run
+directory), so directory mode collapses across files and a resumed run still
+finds the representatives of files it has already written. Claims whose
+representative never finished (an interrupted run) are dropped on open, a
+sample that finds its own claim (written by an interrupted run, but not in
+its file's completion log) is labeled again, and a
+representative that fails releases its key, so a later duplicate is labeled
+on its own. Near duplicates (near_dup.py, --near-dup) reuse the same fan-out.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from config import MAX_CONVERSATION_CHARS
+from preprocessing import truncate_conversations_for_labeling
+
+
+def _canonical_text(value):
+    """value with line endings unified, trailing whitespace and surrounding blank lines dropped."""
+    lines = str(value).replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def conversation_key(conversations):
+    """SHA-256 of the truncated conversation sent to the LLM (see _canonical_text)."""
+    truncated, _ = truncate_conversations_for_labeling(conversations, max_total_chars=MAX_CONVERSATION_CHARS)
+    canonical = [[t.get("from", ""), _canonical_text(t.get("value", ""))] for t in truncated]
+    blob = json.dumps(canonical, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class DedupStore:
+    """SQLite index of conversation key → representative sample and, once labeled, its labels."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " key TEXT PRIMARY KEY, rep_id TEXT, rep_file TEXT, labels TEXT, created REAL)"
+        )
+        # Representatives of an interrupted run were never labeled: let them be claimed again
+        self._conn.execute("DELETE FROM conversations WHERE labels IS NULL")
+
+    def claim(self, entries):
+        """Claim [(key, sample_id, file)] in order, in one transaction.
+
+        Returns one result per entry: None when the sample becomes the representative
+        of its key, else (rep_id, rep_file, labels) of the existing representative,
+        labels None while it is still being labeled. A sample that finds its own claim
+        (a resumed file it did not get written in) becomes the representative again.
+        """
+        results = []
+        self._conn.execute("BEGIN")
+        try:
+            for key, sample_id, file in entries:
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO conversations (key, rep_id, rep_file, created) VALUES (?, ?, ?, ?)",
+                    (key, sample_id, file, time.time()))
+                if cur.rowcount:
+                    results.append(None)
+                    continue
+                rep_id, rep_file, labels = self._conn.execute(
+                    "SELECT rep_id, rep_file, labels FROM conversations WHERE key = ?", (key,)).fetchone()
+                if (rep_id, rep_file) == (sample_id, file):
+                    self._conn.execute("UPDATE conversations SET labels = NULL WHERE key = ?", (key,))
+                    results.append(None)
+                    continue
+                results.append((rep_id, rep_file, json.loads(labels) if labels else None))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return results
+
+    def labels(self, key):
+        """Labels stored for a key, None while its representative is being labeled."""
+        row = self._conn.execute("SELECT labels FROM conversations WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def resolve(self, key, labels):
+        """Record the representative's labels; None (failed) releases the key."""
+        if labels is None:
+            self._conn.execute("DELETE FROM conversations WHERE key = ?", (key,))
+        else:
+            self._conn.execute("UPDATE conversations SET labels = ? WHERE key = ?",
+                               (json.dumps(labels, ensure_ascii=False), key))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,272 @@
+"""
+LiteLLM Endpoint Pool
+
+Spreads chat completion requests over several LiteLLM proxies that serve the
+same models (LITELLM_BASES / --endpoints), so one proxy neither caps
+throughput nor stalls the run when it misbehaves.
+
+  - Routing: weighted least-outstanding-requests. The next request goes to the
+    healthy endpoint with the lowest (in_flight + 1) / weight that is below its
+    own max_in_flight cap; callers wait when every endpoint is at its cap.
+  - Circuit breaker per endpoint: BREAKER_FAILURES consecutive 5xx / timeout /
+    connection errors eject it (open). After BREAKER_COOLDOWN seconds a single
+    live request is let through as a half-open probe: success closes the
+    breaker, failure re-opens it for another cooldown.
+  - 429s and 4xx are not health failures (the proxy is up, the quota is not).
+    Neither is a PoolTimeout: it means our own connection pool is exhausted,
+    so it is recorded as "local" and never reaches the breaker.
+
+Routing happens in an httpx transport (EndpointPool.transport()), so
+async_llm_call keeps building requests against LITELLM_BASE and its retry
+loop naturally lands on another endpoint. Only .../chat/completions requests
+are routed; anything else (e.g. the Batch API) goes to the URL as given.
+An endpoint stays in flight until its response body is read and closed, so
+long responses count toward least-outstanding routing for their full length.
+Per-endpoint counters are written to <run_dir>/endpoints.json.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+
+import httpx
+
+from config import (
+    LITELLM_BASE, LITELLM_BASES, ENDPOINT_MAX_IN_FLIGHT,
+    BREAKER_FAILURES, BREAKER_COOLDOWN,
+)
+from concurrency import percentile
+
+HEALTH_FAILURES = ("server_error", "timeout", "network")
+NEUTRAL_OUTCOMES = ("cancelled", "local")     # say nothing about the endpoint's health
+
+
+def parse_endpoints(spec):
+    """"url[|weight[|max_in_flight]],..." → list of (url, weight, max_in_flight)."""
+    endpoints = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        parts = item.split("|")
+        url = parts[0].rstrip("/")
+        weight = float(parts[1]) if len(parts) > 1 and parts[1] else 1.0
+        max_in_flight = int(parts[2]) if len(parts) > 2 and parts[2] else ENDPOINT_MAX_IN_FLIGHT
+        if weight <= 0 or max_in_flight <= 0:
+            raise ValueError(f"endpoint weight and max_in_flight must be positive: {item}")
+        endpoints.append((url, weight, max_in_flight))
+    return endpoints
+
+
+class Endpoint:
+    def __init__(self, url, weight=1.0, max_in_flight=ENDPOINT_MAX_IN_FLIGHT):
+        self.url = url
+        self.weight = weight
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        # breaker
+        self.state = "closed"          # closed → open → half_open → closed | open
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.ejections = 0
+        self.open_seconds = 0.0
+        # counters
+        self.requests = 0
+        self.outcomes = {}
+        self.latencies = deque(maxlen=2000)
+
+    def available(self, now, cooldown):
+        if self.state == "open" and now - self.opened_at >= cooldown:
+            self.state = "half_open"
+            self.open_seconds += now - self.opened_at
+            self.probing = False
+        if self.state == "open" or (self.state == "half_open" and self.probing):
+            return False
+        return self.in_flight < self.max_in_flight
+
+    def stats(self, now):
+        ok = self.outcomes.get("ok", 0)
+        lat = list(self.latencies)
+        open_seconds = self.open_seconds + (now - self.opened_at if self.state == "open" else 0)
+        return {
+            "url": self.url,
+            "weight": self.weight,
+            "max_in_flight": self.max_in_flight,
+            "state": self.state,
+            "requests": self.requests,
+            "outcomes": dict(sorted(self.outcomes.items())),
+            "error_rate": round(1 - ok / self.requests, 4) if self.requests else 0,
+            "latency_p50": round(percentile(lat, 50), 3) if lat else None,
+            "latency_p95": round(percentile(lat, 95), 3) if lat else None,
+            "peak_in_flight": self.peak_in_flight,
+            "ejections": self.ejections,
+            "open_seconds": round(open_seconds, 1),
+        }
+
+
+class EndpointPool:
+    """Run-wide pool of LiteLLM base URLs with least-outstanding routing + breakers."""
+
+    def __init__(self, endpoints, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        if not endpoints:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        self.endpoints = [Endpoint(*e) for e in endpoints]
+        self.failures = failures
+        self.cooldown = cooldown
+        self.wait_seconds = 0.0
+        self._changed = asyncio.Event()
+
+    @classmethod
+    def from_spec(cls, spec=None):
+        """Pool from an explicit spec, else LITELLM_BASES; None when neither is set."""
+        spec = spec or LITELLM_BASES
+        return cls(parse_endpoints(spec)) if spec else None
+
+    async def acquire(self):
+        """Reserve a slot on the best available endpoint (waits while none is)."""
+        t0 = time.monotonic()
+        while True:
+            now = time.monotonic()
+            best = min((ep for ep in self.endpoints if ep.available(now, self.cooldown)),
+                       key=lambda ep: (ep.in_flight + 1) / ep.weight, default=None)
+            if best is not None:
+                if best.state == "half_open":
+                    best.probing = True
+                best.in_flight += 1
+                best.peak_in_flight = max(best.peak_in_flight, best.in_flight)
+                best.requests += 1
+                self.wait_seconds += now - t0
+                return best
+            # Wake on the next release, or when the earliest ejection cools down
+            reopen = [ep.opened_at + self.cooldown - now for ep in self.endpoints if ep.state == "open"]
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=max(min(reopen), 0.01) if reopen else None)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self, ep, latency, outcome):
+        """outcome: ok | throttled | client_error | server_error | timeout | network | cancelled | local."""
+        ep.in_flight -= 1
+        ep.outcomes[outcome] = ep.outcomes.get(outcome, 0) + 1
+        probe = ep.state == "half_open" and ep.probing
+        if outcome in HEALTH_FAILURES:
+            ep.consecutive_failures += 1
+            if probe or (ep.state == "closed" and ep.consecutive_failures >= self.failures):
+                if ep.state == "closed":
+                    ep.ejections += 1
+                ep.state = "open"
+                ep.opened_at = time.monotonic()
+        elif outcome not in NEUTRAL_OUTCOMES:
+            ep.latencies.append(latency)
+            ep.consecutive_failures = 0
+            if probe:
+                ep.state = "closed"
+        if probe:
+            ep.probing = False
+        self._changed.set()
+
+    def transport(self, **kwargs):
+        """httpx transport routing LITELLM_BASE chat completions through this pool."""
+        return PooledTransport(self, **kwargs)
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "breaker_failures": self.failures,
+            "breaker_cooldown": self.cooldown,
+            "wait_seconds": round(self.wait_seconds, 1),
+            "endpoints": [ep.stats(now) for ep in self.endpoints],
+        }
+
+    def write(self, run_dir):
+        with open(run_dir / "endpoints.json", "w", encoding="utf-8") as f:
+            json.dump(self.stats(), f, ensure_ascii=False, indent=2)
+
+
+def classify(status_code):
+    if status_code == 429:
+        return "throttled"
+    if status_code >= 500:
+        return "server_error"
+    if status_code >= 400:
+        return "client_error"
+    return "ok"
+
+
+class ReleasingStream(httpx.AsyncByteStream):
+    """Response body that releases its endpoint once it is closed (read or abandoned).
+
+    outcome is the status-code class; an error while reading the body replaces it.
+    """
+
+    def __init__(self, stream, release, outcome):
+        self._stream = stream
+        self._release = release
+        self.outcome = outcome
+        self._released = False
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        except httpx.TimeoutException:
+            self.outcome = "timeout"
+            raise
+        except httpx.TransportError:
+            self.outcome = "network"
+            raise
+        except BaseException:
+            self.outcome = "cancelled"
+            raise
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release(self.outcome)
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """Rewrites LITELLM_BASE/.../chat/completions requests onto a pool endpoint."""
+
+    def __init__(self, pool, base_url=LITELLM_BASE, **transport_kwargs):
+        self.pool = pool
+        self.prefix = str(httpx.URL(base_url.rstrip("/")))   # same normalization as request URLs
+        self._inner = httpx.AsyncHTTPTransport(**transport_kwargs)
+
+    async def handle_async_request(self, request):
+        url = str(request.url)
+        if not (url.startswith(self.prefix) and request.url.path.endswith("/chat/completions")):
+            return await self._inner.handle_async_request(request)
+
+        ep = await self.pool.acquire()
+        request.url = httpx.URL(ep.url + url[len(self.prefix):])
+        request.headers["Host"] = request.url.netloc.decode("ascii")
+        t0 = time.monotonic()
+        try:
+            response = await self._inner.handle_async_request(request)
+        except httpx.PoolTimeout:
+            self.pool.release(ep, time.monotonic() - t0, "local")
+            raise
+        except httpx.TimeoutException:
+            self.pool.release(ep, time.monotonic() - t0, "timeout")
+            raise
+        except httpx.TransportError:
+            self.pool.release(ep, time.monotonic() - t0, "network")
+            raise
+        except BaseException:
+            self.pool.release(ep, time.monotonic() - t0, "cancelled")
+            raise
+        response.stream = ReleasingStream(
+            response.stream, lambda outcome: self.pool.release(ep, time.monotonic() - t0, outcome),
+            classify(response.status_code))
+        return response
+
+    async def aclose(self):
+        await self._inner.aclose()
@@ -0,0 +1,159 @@
+"""
+Hedged LLM Requests
+
+Cuts the latency tail of label_one: when an HTTP attempt has not returned by
+an adaptive latency percentile of recent attempts, a duplicate request is
+fired (optionally to a fallback model), the first successful response wins
+and the loser is cancelled.
+
+Hedging wraps one HTTP attempt inside async_llm_call's retry loop, after the
+attempt's rate-limit reservation. Rate-limiter waits and the backoff sleeps
+after 429/5xx responses are outside it: a throttled call never looks slow
+and never fires a duplicate, and only attempt latencies feed the percentile.
+
+  - Delay = HEDGE_PERCENTILE of the last HEDGE_WINDOW successful attempt
+    latencies, floored at HEDGE_MIN_DELAY; no hedging until HEDGE_MIN_SAMPLES
+    latencies are known.
+  - Budget: hedges never exceed HEDGE_MAX_SHARE of all attempts that went
+    through the hedger, and a hedge fires only if the rate limiter admits it
+    without waiting (RateLimiter.try_acquire).
+  - Extra cost of a hedged attempt = tokens of the request that did not win
+    (actual usage if it finished, prompt estimate if it was cancelled).
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from config import (
+    HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES, HEDGE_MIN_DELAY,
+    HEDGE_MAX_SHARE, HEDGE_WINDOW,
+)
+from concurrency import percentile
+from rate_limit import estimate_prompt_tokens
+
+
+def _ok(task):
+    return not task.cancelled() and task.exception() is None and task.result().status_code == 200
+
+
+def _usage(resp):
+    """The usage block of a successful response, or None."""
+    if resp.status_code != 200:
+        return None
+    try:
+        return resp.json().get("usage") or {}
+    except (ValueError, AttributeError):
+        return None
+
+
+class Hedger:
+    """Run-wide hedging policy + accounting shared by all label_one calls."""
+
+    def __init__(self, hedge_model=None, max_share=HEDGE_MAX_SHARE, pct=HEDGE_PERCENTILE):
+        self.hedge_model = hedge_model
+        self.max_share = max_share
+        self.pct = pct
+        self._latencies = deque(maxlen=HEDGE_WINDOW)
+        self.calls = 0
+        self.hedges = 0
+        self.wins = 0
+        self.extra_tokens = 0
+
+    def delay(self):
+        """Seconds to wait before hedging, or None while still warming up."""
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, percentile(self._latencies, self.pct))
+
+    def _budget_allows(self):
+        return self.hedges + 1 <= self.max_share * self.calls
+
+    async def attempt(self, send, model, messages, max_tokens, reservation=None, rate_limiter=None):
+        """Run one HTTP attempt, send(model) → httpx response, with hedging.
+
+        reservation: the rate-limit reservation the primary was sent under. The
+        hedge reserves its own with rate_limiter.try_acquire; the loser's is
+        settled (finished with usage), refunded (rejected) or kept (cancelled) here.
+
+        Returns (response, reservation, hedge): the response to use and the
+        reservation it was sent under; hedge is None when no hedge fired, else
+        {"won": bool, "model": hedge model, "extra_tokens": int}. Raises like
+        send() when the primary raised and no hedge succeeded.
+        """
+        self.calls += 1
+        start = time.monotonic()
+        primary = asyncio.ensure_future(send(model))
+        delay = self.delay()
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        hedge_model = self.hedge_model or model
+        hedge_reservation = None
+        if not done and self._budget_allows() and rate_limiter is not None:
+            hedge_reservation = rate_limiter.try_acquire(hedge_model, messages, max_tokens)
+            if hedge_reservation is None:
+                done = True     # the limiter has no room now: no extra load
+        if done or not self._budget_allows():
+            resp = await primary
+            self._observe(time.monotonic() - start, resp)
+            return resp, reservation, None
+
+        self.hedges += 1
+        hedge = asyncio.ensure_future(send(hedge_model))
+        pending = {primary, hedge}
+        winner = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in (primary, hedge) if task in done and _ok(task)), None)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if winner is primary:
+            self._observe(time.monotonic() - start, primary.result())
+        elif winner is hedge:
+            self._latencies.append(time.monotonic() - start)   # censored primary latency
+
+        # Extra cost = the request that did not win (the hedge, when neither succeeded)
+        hedge_won = winner is hedge
+        loser, loser_reservation = (primary, reservation) if hedge_won else (hedge, hedge_reservation)
+        usage = None
+        if loser.done() and not loser.cancelled() and loser.exception() is None:
+            resp = loser.result()
+            usage = _usage(resp)
+            if loser_reservation is not None:
+                if usage is not None:
+                    rate_limiter.settle(loser_reservation, usage)
+                else:
+                    rate_limiter.refund(loser_reservation, throttled=resp.status_code == 429)
+        if usage is not None:
+            extra = usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+        else:
+            extra = estimate_prompt_tokens(messages)
+        self.extra_tokens += extra
+        if hedge_won:
+            self.wins += 1
+
+        chosen, chosen_reservation = (hedge, hedge_reservation) if hedge_won else (primary, reservation)
+        info = {"won": hedge_won, "model": hedge_model, "extra_tokens": extra}
+        return chosen.result(), chosen_reservation, info
+
+    def _observe(self, latency, resp):
+        if resp.status_code == 200:
+            self._latencies.append(latency)
+
+    def stats(self):
+        return {
+            "hedge_model": self.hedge_model,
+            "max_share": self.max_share,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_rate": round(self.hedges / max(self.calls, 1), 4),
+            "hedge_wins": self.wins,
+            "extra_tokens": self.extra_tokens,
+            "current_delay": round(self.delay(), 2) if self.delay() is not None else None,
+        }
@@ -0,0 +1,117 @@
+"""
+Streaming JSON Input
+
+json.load on a multi-gigabyte ShareGPT array holds the text and every parsed
+sample at once, several times the file size, before normalize_and_slice runs.
+iter_json_values parses the top-level array one element at a time from a
+buffered text handle instead:
+
+  - the handle is read in JSON_STREAM_CHUNK_CHARS pieces into a buffer
+  - each element is decoded in place with json.JSONDecoder.raw_decode; an
+    element cut off by the end of the buffer is retried after reading more,
+    with the read size doubling so a huge element is decoded a bounded number
+    of times
+  - consumed text is dropped from the buffer on every read
+
+Memory is bounded by the largest element plus one chunk, whatever the file
+size. A top-level value that is not an array (a single sample) is yielded as
+is, like the `[data]` fallback of the loaders that used json.load.
+"""
+
+import json
+import re
+
+from config import JSON_STREAM_CHUNK_CHARS
+
+_WHITESPACE = " \t\n\r"
+_DELIMITER = re.compile(r"[\s,\]}]")
+
+
+class _Reader:
+    """Buffer over a text handle; `pos` indexes buf, `offset` is buf's position in the stream."""
+
+    def __init__(self, fp, chunk_chars):
+        self.fp = fp
+        self.chunk_chars = chunk_chars
+        self.buf = ""
+        self.pos = 0
+        self.offset = 0
+        self.eof = False
+
+    def fill(self, n=None):
+        """Drop consumed text and append up to n characters; False at end of input."""
+        if self.eof:
+            return False
+        data = self.fp.read(n or self.chunk_chars)
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        if not data:
+            self.eof = True
+        return bool(data)
+
+    def peek(self):
+        """Next non-whitespace character (not consumed), or "" at end of input."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def error(self, message):
+        return ValueError(f"{message} at character {self.offset + self.pos}")
+
+
+def _decode_value(reader, decoder):
+    """Decode the value at reader.pos, reading more input until it is complete."""
+    need = reader.chunk_chars
+    if reader.buf[reader.pos] not in '{["':
+        # A number or literal cut by the buffer end still decodes (as a prefix):
+        # read on until a delimiter follows it
+        while not _DELIMITER.search(reader.buf, reader.pos) and reader.fill():
+            pass
+    while True:
+        try:
+            value, end = decoder.raw_decode(reader.buf, reader.pos)
+        except json.JSONDecodeError as e:
+            if reader.eof:
+                raise reader.error(f"invalid JSON: {e.msg}") from None
+            reader.fill(need)
+            need *= 2
+            continue
+        reader.pos = end
+        return value
+
+
+def iter_json_values(fp, chunk_chars=JSON_STREAM_CHUNK_CHARS):
+    """Yield the elements of the top-level JSON array in `fp` one at a time.
+
+    A top-level value that is not an array is yielded as the only element.
+    Raises ValueError on malformed input or trailing data.
+    """
+    reader = _Reader(fp, chunk_chars)
+    decoder = json.JSONDecoder()
+    first = reader.peek()
+    if first == "":
+        raise reader.error("empty JSON input")
+    if first != "[":
+        yield _decode_value(reader, decoder)
+    else:
+        reader.pos += 1
+        if reader.peek() == "]":
+            reader.pos += 1
+        else:
+            while True:
+                if reader.peek() == "":
+                    raise reader.error("unterminated JSON array")
+                yield _decode_value(reader, decoder)
+                sep = reader.peek()
+                if sep not in (",", "]"):
+                    raise reader.error(f"expected ',' or ']' in JSON array, got {sep or 'end of input'!r}")
+                reader.pos += 1
+                if sep == "]":
+                    break
+    if reader.peek() != "":
+        raise reader.error("extra data after JSON value")
@@ -0,0 +1,220 @@
+"""
+Keyword Matcher
+
+Multi-pattern matcher for the preprocessing dictionaries (frameworks, keyword
+groups, tool names, taxonomy aliases). Testing the text once per dictionary
+entry costs O(patterns × text), and agentic trajectories run to hundreds of KB.
+
+Matching works on words: the ASCII letter/digit runs of the text, lowercased
+(snake_case identifiers split into words). They come from one C-level pass,
+bytes.translate with a 256-entry table that maps everything else to a space,
+followed by split(). Set intersections of the text's words with two word
+indexes then yield:
+
+  - one-word patterns      indexed by the word and its plurals ("models",
+                           "queries") when longer than 4 chars
+  - multi-word patterns    indexed by their longest word; when all their words
+                           occur, confirmed against the text's word sequence
+                           ("ruby on rails", "error handling" /
+                           "error-handling", "ci/cd" / "ci-cd", "read_file")
+  - symbol-edged patterns  ("c++") literal search with a word-boundary check,
+                           skipped when the words inside them do not occur
+
+So every pattern obeys word boundaries ("gin" no longer fires inside "engine",
+nor "echo" inside "echoed"), overlapping patterns are all reported ("react
+native" and "react"), and the cost is one pass over the text plus set
+operations, nearly independent of the number of patterns.
+
+Hits are returned per group: {group: {pattern: value}}.
+
+A pure-Python Aho-Corasick automaton and a trie compiled into one regex were
+both measured slower than the old C substring scans; see
+tools/benchmark_keyword_matcher.py.
+"""
+
+import re
+from pathlib import Path
+
+import yaml
+
+TAGS_DIR = Path(__file__).parent.parent / "taxonomy" / "tags"
+
+PHRASE_WINDOW = 2048   # words per window when confirming multi-word patterns
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_WORDS_PATTERN_RE = re.compile(r"[a-z0-9]+(?:[^a-z0-9]+[a-z0-9]+)*")
+
+# UTF-8 byte → itself for [a-z0-9], lowercase for [A-Z], space otherwise
+_WORD_BYTES = bytearray(b" " * 256)
+for _c in b"abcdefghijklmnopqrstuvwxyz0123456789":
+    _WORD_BYTES[_c] = _c
+for _c in b"ABCDEFGHIJKLMNOPQRSTUVWXYZ":
+    _WORD_BYTES[_c] = _c + 32
+_WORD_BYTES = bytes(_WORD_BYTES)
+
+# The only non-ASCII characters whose lower() contains ASCII letters: "İ", "K" (Kelvin)
+_ASCII_LOWERING = ("\u0130", "\u212a")
+
+
+def word_bytes(text):
+    """UTF-8 of text with [A-Z] lowercased and every byte outside [a-z0-9] a space."""
+    return text.encode("utf-8", "surrogatepass").translate(_WORD_BYTES)
+
+
+def _words(text):
+    """Lowercased [a-z0-9]+ runs of text, as bytes."""
+    return word_bytes(text).split()
+
+
+def _singulars(words):
+    """Singular forms of the plural-looking words (b"queries" → b"query", b"models" → b"model")."""
+    out = set()
+    for w in words:
+        if len(w) > 4 and w[-1] == 115 and w[-2] != 115:   # ends in "s", not "ss"
+            out.add(w[:-3] + b"y" if w.endswith(b"ies") else w[:-1])
+            if w.endswith(b"es"):
+                out.add(w[:-2])
+    return out
+
+
+def _is_word_char(ch):
+    return ch.isascii() and ch.isalnum()
+
+
+def _find_bounded(text, pattern):
+    """True if pattern occurs in text with no word char glued to a word-char edge."""
+    n = len(pattern)
+    check_start, check_end = _is_word_char(pattern[0]), _is_word_char(pattern[-1])
+    i = text.find(pattern)
+    while i != -1:
+        if ((not check_start or i == 0 or not _is_word_char(text[i - 1]))
+                and (not check_end or i + n == len(text) or not _is_word_char(text[i + n]))):
+            return True
+        i = text.find(pattern, i + 1)
+    return False
+
+
+class KeywordMatcher:
+    """Patterns of several named groups, matched together in one pass.
+
+    groups: {group: {pattern: value}}. A pattern may appear in several groups.
+    """
+
+    def __init__(self, groups):
+        self._targets = {}   # pattern → [(group, value)]
+        for group, patterns in groups.items():
+            for pattern, value in patterns.items():
+                self._targets.setdefault(pattern.lower(), []).append((group, value))
+        self._single = {}    # word → one-word patterns of it or of its singular
+        self._phrases = {}   # word → [(other words, b" w1 w2 … ", [pattern])] keyed by it
+        self._literal = []   # symbol-edged patterns → [(pattern, words inside it)]
+        self.max_words = 1   # words in the longest pattern
+        single, multi = {}, {}
+        for pattern in self._targets:
+            words = tuple(w.encode() for w in _WORD_RE.findall(pattern))
+            if not _WORDS_PATTERN_RE.fullmatch(pattern):
+                self._literal.append((pattern, frozenset(words)))
+                continue
+            self.max_words = max(self.max_words, len(words))
+            if len(words) == 1:
+                single.setdefault(words[0], []).append(pattern)
+            else:
+                multi.setdefault(words, []).append(pattern)
+        for word, patterns in single.items():
+            plurals = [word + b"s", word + b"es"] + ([word[:-1] + b"ies"] if word.endswith(b"y") else [])
+            for form in [word] + [p for p in plurals if word in _singulars([p])]:
+                self._single.setdefault(form, []).extend(patterns)
+        for words, patterns in multi.items():
+            key = max(words, key=len)   # longer words are rarer: fewer entries to confirm
+            others = frozenset(words) - {key}
+            joined = b" " + b" ".join(words) + b" "
+            self._phrases.setdefault(key, []).append((others, joined, patterns))
+        self._single_keys = frozenset(self._single)
+        self._phrase_keys = frozenset(self._phrases)
+        self._phrase_starts = frozenset(words[0] for words in multi)
+        self._phrase_ends = frozenset(words[-1] for words in multi)
+        # Symbol-edged patterns that contain a space: the only ones that can
+        # straddle two texts joined with a space
+        self.spaced_literals = [p for p, _ in self._literal if any(c.isspace() for c in p)]
+
+    def __len__(self):
+        return len(self._targets)
+
+    def scan(self, text, lowered=False):
+        """All pattern hits in text → {group: {pattern: value}}."""
+        if not text:
+            return {}
+        return self.hits(self.match(_words(text), text, lowered))
+
+    def match(self, words, text, lowered=False):
+        """Patterns found in text, given its words (word_bytes(text).split()) → set."""
+        unique = set(words)
+        found = set()
+        found.update(*map(self._single.__getitem__, unique & self._single_keys))
+        found.update(self.match_phrases(words, unique))
+        if self._literal:
+            # Unless lower() can produce letters the word split never saw
+            prefilter = text.isascii() or not any(c in text for c in _ASCII_LOWERING)
+            for pattern, inner in self._literal:
+                if prefilter and not inner <= unique:
+                    continue
+                if not lowered:
+                    text, lowered = text.lower(), True
+                if pattern in text and _find_bounded(text, pattern):
+                    found.add(pattern)
+        return found
+
+    def may_join_phrase(self, before, after):
+        """False if no multi-word pattern can start in words `before` and end in `after`."""
+        return not (self._phrase_starts.isdisjoint(before) or self._phrase_ends.isdisjoint(after))
+
+    def match_phrases(self, words, unique=None):
+        """Multi-word patterns in a word sequence → list.
+
+        Long sequences are matched in overlapping windows: in one huge text
+        nearly every pattern has all its words somewhere, and confirming each
+        against the whole sequence would cost a pass per pattern.
+        """
+        if len(words) > PHRASE_WINDOW + self.max_words:
+            found = []
+            for start in range(0, len(words), PHRASE_WINDOW):
+                found.extend(self.match_phrases(words[start:start + PHRASE_WINDOW + self.max_words - 1]))
+            return found
+        if unique is None:
+            unique = set(words)
+        found = []
+        sequence = None
+        for word in unique & self._phrase_keys:
+            for others, joined, patterns in self._phrases[word]:
+                if not others <= unique:
+                    continue
+                if sequence is None:
+                    sequence = b" " + b" ".join(words) + b" "
+                if joined in sequence:
+                    found.extend(patterns)
+        return found
+
+    def find_literals(self, lowered, patterns):
+        """The given symbol-edged patterns found in an already lowercased text."""
+        return [p for p in patterns if p in lowered and _find_bounded(lowered, p)]
+
+    def hits(self, patterns):
+        """Matched patterns → {group: {pattern: value}}."""
+        hits = {}
+        for pattern in patterns:
+            for group, value in self._targets[pattern]:
+                hits.setdefault(group, {})[pattern] = value
+        return hits
+
+
+def load_taxonomy_aliases(tags_dir=TAGS_DIR):
+    """{dimension: {alias: tag id}} from taxonomy/tags/*.yaml (the tag id counts as an alias)."""
+    aliases = {}
+    for path in sorted(Path(tags_dir).glob("*.yaml")):
+        with open(path, "r", encoding="utf-8") as f:
+            tags = yaml.safe_load(f) or []
+        dim = aliases.setdefault(path.stem, {})
+        for tag in tags:
+            for alias in [tag["id"], *(tag.get("aliases") or [])]:
+                dim.setdefault(str(alias).lower(), tag["id"])
+    return aliases
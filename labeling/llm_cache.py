@@ -0,0 +1,162 @@
+"""
+LLM Response Cache
+
+Content-addressed on-disk cache for chat completion responses, shared by all
+runs. The key is a SHA-256 of (model, temperature, max_tokens, messages), so a
+response is reused only when the exact same request would have been sent.
+
+Only successfully parsed responses of deterministic calls are stored: calls
+sampled above LLM_CACHE_MAX_TEMPERATURE (arbitration reruns) are independent
+draws, so they are never looked up or stored (see cacheable). Backed by a
+single SQLite file (WAL mode) so concurrent runs can share it safely.
+
+The pipeline goes through lookup()/store() and their *_many forms: they run
+get()/put() on one cache thread, which owns the connection, so the event loop
+never waits on SQLite while hundreds of samples are in flight.
+
+Cache modes:
+  off        — no lookups, no writes (default)
+  read       — lookups only (replay a run without growing the cache)
+  readwrite  — lookups + store new responses
+  refresh    — skip lookups, overwrite entries with fresh responses
+"""
+
+import asyncio
+import json
+import hashlib
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from config import LLM_CACHE_MAX_TEMPERATURE
+
+CACHE_MODES = ("off", "read", "readwrite", "refresh")
+
+
+def cache_key(model, messages, temperature, max_tokens):
+    """Stable hash of everything that determines an LLM response."""
+    blob = json.dumps(
+        {"model": model, "temperature": temperature, "max_tokens": max_tokens, "messages": messages},
+        ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response cache with hit/miss/bytes counters."""
+
+    def __init__(self, path, mode="off"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"unknown cache mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.hit_bytes = 0
+        self.written = 0
+        self.written_bytes = 0
+        self._conn = None
+        self._executor = None
+        if mode != "off":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Used from the cache thread only, after this setup
+            self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, content TEXT, usage TEXT, created REAL)"
+            )
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+
+    @property
+    def readable(self):
+        return self.mode in ("read", "readwrite")
+
+    @property
+    def writable(self):
+        return self.mode in ("readwrite", "refresh")
+
+    def cacheable(self, temperature):
+        """Whether calls at this temperature use the cache: off for sampled calls."""
+        return self.mode != "off" and temperature <= LLM_CACHE_MAX_TEMPERATURE
+
+    def get(self, key):
+        """Return (content, usage_dict) or None. Counts a miss when lookups are enabled."""
+        if not self.readable:
+            return None
+        row = self._conn.execute(
+            "SELECT content, usage FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        content, usage = row
+        self.hits += 1
+        self.hit_bytes += len(content.encode("utf-8"))
+        return content, json.loads(usage)
+
+    def put(self, key, model, content, usage):
+        if not self.writable:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, content, usage, created) VALUES (?, ?, ?, ?, ?)",
+            (key, model, content, json.dumps(usage), time.time()),
+        )
+        self.written += 1
+        self.written_bytes += len(content.encode("utf-8"))
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def lookup(self, key):
+        """get() on the cache thread."""
+        if not self.readable:
+            return None
+        return await self._run(self.get, key)
+
+    async def store(self, key, model, content, usage):
+        """put() on the cache thread."""
+        if self.writable:
+            await self._run(self.put, key, model, content, usage)
+
+    async def lookup_many(self, keys):
+        """get() of each key, in one trip to the cache thread. Returns a list aligned with keys."""
+        if not self.readable:
+            return [None] * len(keys)
+        return await self._run(lambda: [self.get(k) for k in keys])
+
+    async def store_many(self, rows):
+        """put() of each (key, model, content, usage) row, in one transaction on the cache thread."""
+        if not self.writable or not rows:
+            return
+
+        def put_all():
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    self.put(*row)
+            finally:
+                self._conn.execute("COMMIT")
+        await self._run(put_all)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "path": str(self.path),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "hit_bytes": self.hit_bytes,
+            "written": self.written,
+            "written_bytes": self.written_bytes,
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,169 @@
+"""
+Near-Duplicate Propagation
+
+Templated data repeats the same task with variable names or numbers changed.
+Exact duplicate collapse (dedup.py) misses these. This module finds them
+with MinHash + LSH banding over word shingles of the first human turn and the
+last gpt turn.
+
+  - shingles: NEAR_DUP_SHINGLE consecutive tokens (lowercased words, single CJK
+    characters, digit runs folded to "0") of the first NEAR_DUP_MAX_CHARS of
+    each of the two turns, prefixed by the turn so a query never matches a response
+  - signature: NEAR_DUP_BANDS × NEAR_DUP_ROWS min-hashes of the shingle set
+    (universal hashing mod 2^61 − 1). The share of equal min-hashes estimates the
+    Jaccard similarity of two shingle sets.
+  - index: each band of rows is hashed into a bucket. Samples sharing a bucket in
+    any band are candidates. A candidate matches when its estimated Jaccard
+    reaches the threshold (NEAR_DUP_THRESHOLD). Pyramid slices of the same
+    conversation (one source_id) share their first turn and never match each
+    other; sparse sampling (inherit_map) already covers them.
+
+In the pipeline (--near-dup), a sample whose conversation key is new looks up
+the index of this run's representatives before it is submitted. On a match it
+takes that representative's labels, marked "propagated_from", the same way exact
+duplicates are fanned out. Otherwise it is indexed as a representative itself.
+The index lives in memory for one run; NEAR_DUP_MAX_INDEX bounds it.
+
+tools/analyze_near_duplicates.py validates thresholds against labeled
+baselines before the propagation is enabled.
+
+Needs numpy (the optional "numpy" extra), like the triage model (triage.py).
+"""
+
+import re
+import zlib
+
+try:
+    import numpy as np
+except ImportError:   # only needed for --near-dup and the analysis tool
+    np = None
+
+from config import (
+    NEAR_DUP_THRESHOLD, NEAR_DUP_SHINGLE, NEAR_DUP_BANDS, NEAR_DUP_ROWS, NEAR_DUP_MAX_CHARS,
+    NEAR_DUP_MAX_INDEX,
+)
+
+_TOKEN_RE = re.compile(r"[0-9]+|[a-z_][a-z0-9_]*|[^\x00-\x7f\W]")
+_PRIME = (1 << 61) - 1
+_SEED = 20240611
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("near-duplicate propagation needs numpy: pip install 'build-user-query[numpy]'")
+
+
+def _tokens(text):
+    return ["0" if t[0].isdigit() else t for t in _TOKEN_RE.findall(text[:NEAR_DUP_MAX_CHARS].lower())]
+
+
+def shingles(sample, k=NEAR_DUP_SHINGLE):
+    """Set of token shingles of the first human turn and the last gpt turn."""
+    conversations = sample.get("conversations", [])
+    first_query = next((t.get("value", "") for t in conversations if t.get("from") == "human"), "")
+    last_response = next((t.get("value", "") for t in reversed(conversations) if t.get("from") == "gpt"), "")
+    out = set()
+    for field, text in (("q", first_query), ("r", last_response)):
+        tokens = _tokens(text)
+        if len(tokens) < k:
+            if tokens:
+                out.add(f"{field}:{' '.join(tokens)}")
+            continue
+        out.update(f"{field}:{' '.join(tokens[i:i + k])}" for i in range(len(tokens) - k + 1))
+    return out
+
+
+def group_of(sample):
+    """Slices of one conversation form a group that does not match itself."""
+    return (sample.get("metadata") or {}).get("source_id") or sample.get("id")
+
+
+def jaccard(a, b):
+    """Exact Jaccard similarity of two shingle sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """bands × rows min-hashes of a shingle set, as a uint32 array."""
+
+    def __init__(self, bands=NEAR_DUP_BANDS, rows=NEAR_DUP_ROWS, seed=_SEED):
+        _require_numpy()
+        self.bands, self.rows = bands, rows
+        rng = np.random.default_rng(seed)
+        n = bands * rows
+        self.a = rng.integers(1, _PRIME, size=n, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=n, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return np.full(self.bands * self.rows, 0xFFFFFFFF, dtype=np.uint32)
+        h = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingle_set),
+                        dtype=np.uint64, count=len(shingle_set))
+        # uint64 products wrap around; still a valid hash family (as in datasketch)
+        hashed = (h[:, None] * self.a + self.b) % np.uint64(_PRIME)
+        return (hashed & np.uint64(0xFFFFFFFF)).min(axis=0).astype(np.uint32)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity: share of equal min-hashes."""
+    return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+
+class NearDupIndex:
+    """LSH index of representatives: entry id → (signature, group, payload)."""
+
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD, bands=NEAR_DUP_BANDS, rows=NEAR_DUP_ROWS,
+                 max_entries=NEAR_DUP_MAX_INDEX):
+        self.hasher = MinHasher(bands, rows)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._buckets = [{} for _ in range(bands)]
+        self._entries = {}      # entry id → (signature, group, payload); payload None = removed
+        self.queries = 0
+        self.matches = 0
+
+    def signature(self, sample):
+        return self.hasher.signature(shingles(sample))
+
+    def _band_keys(self, sig):
+        rows = self.hasher.rows
+        return [sig[i * rows:(i + 1) * rows].tobytes() for i in range(self.hasher.bands)]
+
+    def add(self, entry_id, sig, payload, group=None):
+        """Index a representative; a full index stops growing (returns False)."""
+        if len(self._entries) >= self.max_entries:
+            return False
+        self._entries[entry_id] = (sig, group, payload)
+        for bucket, key in zip(self._buckets, self._band_keys(sig)):
+            bucket.setdefault(key, []).append(entry_id)
+        return True
+
+    def remove(self, entry_id):
+        """Stop matching an entry (e.g. its representative failed); its buckets keep the id."""
+        if entry_id in self._entries:
+            self._entries[entry_id] = (None, None, None)
+
+    def query(self, sig, group=None):
+        """Best (entry_id, payload, similarity) at or above the threshold outside `group`, or None."""
+        self.queries += 1
+        seen, best = set(), None
+        for bucket, key in zip(self._buckets, self._band_keys(sig)):
+            for entry_id in bucket.get(key, ()):
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                other, other_group, payload = self._entries[entry_id]
+                if payload is None or (group is not None and other_group == group):
+                    continue
+                sim = similarity(sig, other)
+                if sim >= self.threshold and (best is None or sim > best[2]):
+                    best = (entry_id, payload, sim)
+        if best is not None:
+            self.matches += 1
+        return best
+
+    def stats(self):
+        return {"threshold": self.threshold, "indexed": len(self._entries),
+                "queries": self.queries, "matches": self.matches}
@@ -0,0 +1,153 @@
+"""
+Multi-sample Request Packing
+
+Short single-turn samples each pay for the full system prompt + few-shot
+prefix. The packer groups up to PACK_SIZE of them (by preprocess() est_tokens)
+into one request whose response is {"items": [{"id": ..., ...labels}]}, so the
+prefix is paid once per pack.
+
+  - label_one submits a sample's user content for a call ("call1", "call2",
+    "fused") and awaits its own entry of the packed response. Samples whose
+    rule-resolved dimensions differ go to different packs (different prompts).
+  - A pack is sent when it reaches PACK_SIZE samples or PACK_MAX_TOKENS, or
+    PACK_LINGER seconds after its first sample arrived.
+  - Each item is returned to its sample unvalidated; a missing/unparseable item
+    (or a failed request) comes back as parsed=None and the caller falls back to
+    a normal per-sample call. A pack that ends up with a single sample is not
+    sent at all (submit returns None).
+  - Usage is split across members: an equal share of the prefix plus each
+    member's own content. Members with a usable item also get the prefix tokens
+    they saved; fallback members are charged their share with no saving.
+"""
+
+import asyncio
+
+from config import (
+    PACK_SIZE, PACK_MAX_SAMPLE_TOKENS, PACK_MAX_TOKENS, PACK_LINGER, PACK_COMPLETION_TOKENS,
+)
+from prompts import packed_prompt, pack_user_content
+from rate_limit import estimate_prompt_tokens
+from preprocessing import estimate_tokens
+
+
+class RequestPacker:
+    """Run-wide packing scheduler shared by all label_one tasks.
+
+    send: async (messages, max_tokens) -> (parsed, raw, usage), i.e. async_llm_call
+          with the run's client/model/cache/limiters bound.
+    """
+
+    def __init__(self, send, pack_size=PACK_SIZE, max_tokens=PACK_MAX_TOKENS, linger=PACK_LINGER):
+        self._send = send
+        self.pack_size = pack_size
+        self.max_tokens = max_tokens
+        self.linger = linger
+        self._pending = {}   # (call name, dropped dims) → list of entries
+        self._timers = {}
+        self._prefix_tokens = {}
+        # stats
+        self.requests = 0
+        self.packed_samples = 0
+        self.fallbacks = 0
+        self.singles = 0
+
+    @staticmethod
+    def eligible(signals, truncated=False):
+        """Only short, single-turn, non-agentic samples are packed."""
+        return (not truncated
+                and signals["total_turns"] <= 2
+                and not signals["has_tool_roles"]
+                and signals["est_tokens"] <= PACK_MAX_SAMPLE_TOKENS)
+
+    async def submit(self, call_name, sample_id, user_content, est_tokens, drop=()):
+        """Queue one sample for a packed call (without the rule-resolved `drop` dimensions).
+
+        Returns (parsed_item_or_None, raw, usage_share), or None if the pack was never sent.
+        """
+        fut = asyncio.get_running_loop().create_future()
+        entry = {"id": str(sample_id), "content": user_content, "tokens": est_tokens, "future": fut}
+        key = (call_name, tuple(sorted(drop)))
+        batch = self._pending.get(key)
+        if batch and sum(e["tokens"] for e in batch) + est_tokens > self.max_tokens:
+            self._flush(key)
+        batch = self._pending.setdefault(key, [])
+        batch.append(entry)
+        if len(batch) >= self.pack_size:
+            self._flush(key)
+        elif len(batch) == 1:
+            self._timers[key] = asyncio.get_running_loop().call_later(
+                self.linger, self._flush, key)
+        return await fut
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = [e for e in self._pending.pop(key, []) if not e["future"].done()]
+        if len(batch) == 1:
+            self.singles += 1
+            batch[0]["future"].set_result(None)
+        elif batch:
+            asyncio.ensure_future(self._run(key, batch))
+
+    async def _run(self, key, batch):
+        # Sample ids must be unique within the pack
+        seen = {}
+        for e in batch:
+            n = seen.get(e["id"], 0)
+            seen[e["id"]] = n + 1
+            if n:
+                e["id"] = f"{e['id']}#{n}"
+
+        system, fewshot = packed_prompt(*key)
+        messages = [{"role": "system", "content": system}, *fewshot,
+                    {"role": "user", "content": pack_user_content([(e["id"], e["content"]) for e in batch])}]
+        self.requests += 1
+        try:
+            parsed, raw, usage = await self._send(messages, max_tokens=PACK_COMPLETION_TOKENS * len(batch))
+        except Exception:
+            parsed, raw, usage = None, "", {}
+
+        items = {}
+        if isinstance(parsed, dict) and isinstance(parsed.get("items"), list):
+            for item in parsed["items"]:
+                if isinstance(item, dict) and "id" in item:
+                    items[str(item["id"])] = {k: v for k, v in item.items() if k != "id"}
+
+        # Split usage: equal share of the prefix + each member's own content
+        n = len(batch)
+        if key not in self._prefix_tokens:
+            self._prefix_tokens[key] = estimate_prompt_tokens([{"content": system}] + fewshot)
+        prefix = self._prefix_tokens[key]
+        est_total = estimate_prompt_tokens(messages)
+        scale = usage.get("prompt_tokens", 0) / est_total if est_total else 0
+        content_tokens = {e["id"]: estimate_tokens(e["content"]) for e in batch}
+        completion_weights = {e["id"]: len(str(items.get(e["id"], ""))) for e in batch}
+        completion_total = sum(completion_weights.values()) or 1
+
+        for e in batch:
+            item = items.get(e["id"])
+            if item is None:
+                self.fallbacks += 1
+            else:
+                self.packed_samples += 1
+            if e["future"].done():
+                continue
+            share = {
+                "prompt_tokens": round((prefix / n + content_tokens[e["id"]]) * scale),
+                "completion_tokens": round(usage.get("completion_tokens", 0)
+                                           * completion_weights[e["id"]] / completion_total),
+                "pack_size": n,
+                "pack_saved_prompt_tokens": round(prefix * scale * (n - 1) / n) if item is not None else 0,
+            }
+            e["future"].set_result((item, raw, share))
+
+    def stats(self):
+        return {
+            "pack_size": self.pack_size,
+            "requests": self.requests,
+            "packed_samples": self.packed_samples,
+            "avg_pack_size": round((self.packed_samples + self.fallbacks) / max(self.requests, 1), 2),
+            "fallbacks": self.fallbacks,
+            "unpacked_singles": self.singles,
+        }
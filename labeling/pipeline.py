@@ -5,15 +5,25 @@ Processes SFT data through the labeling pipeline with high concurrency:
   1. Preprocessing (structural signal extraction) — local, instant
   2. Call 1 — Intent, Language, Domain, Task, Difficulty — concurrent LLM
   3. Call 2 — Concept, Agentic, Constraint, Context — concurrent LLM (depends on Call 1)
+     (concept pool narrowed to the candidates of Call 1's language/domain, see concept_candidates.py)
   4. Validation — local, instant
   5. Optional arbitration for low-confidence labels — concurrent LLM
 
+With --speculative-call2, Call 2 starts alongside Call 1 on a provisional context.
+With --pack, short single-turn samples share one request per call (see packing.py).
+
+With --call-mode fused, steps 2+3 are a single call covering all 9 dimensions.
+
+With --transport batch, each step runs as Batch API jobs over all pending samples
+(Call 1 batch → Call 2 batch → arbitration batch), checkpointed per batch.
+
 Supports single file or directory input. Directory mode processes files serially
 (samples within each file run concurrently) with checkpoint-based resume.
 
 Usage:
   python3 labeling/pipeline.py [--input FILE_OR_DIR] [--model MODEL] [--concurrency N]
   python3 labeling/pipeline.py --resume labeling/data/runs/<run_dir>/
+  python3 labeling/pipeline.py --input FILE --transport batch
 """
 
 import json
@@ -34,7 +44,7 @@ from rich.progress import (
 
 sys.path.insert(0, str(Path(__file__).parent))
 from prompts import (
-    CALL1_SYSTEM, CALL1_FEWSHOT, CALL2_SYSTEM, CALL2_FEWSHOT,
+    ARBITRATION_SYSTEMS, call_prompt,
     TAG_POOLS, SINGLE_SELECT, MULTI_SELECT
 )
 from preprocessing import preprocess, format_signals_for_prompt, normalize_and_slice, truncate_conversations_for_labeling, apply_sparse_sampling
@@ -45,13 +55,43 @@ from config import (
     REQUEST_TIMEOUT, SAMPLE_TIMEOUT,
     MAX_CONVERSATION_CHARS,
     DIR_PIPELINE_WATERMARK, DIR_PIPELINE_MAX_FILES,
+    LLM_CACHE_PATH, DEFAULT_CACHE_MODE,
+    ADAPTIVE_CONCURRENCY,
+    PIPELINE_DEFAULTS, HEDGE_MAX_SHARE,
+    SPECULATION_DIMS, SPECULATION_MIN_JACCARD, INTENT_HINT_KEYWORDS,
+    PACK_SIZE, BATCH_POLL_INTERVAL, BATCH_MAX_REQUESTS,
+    ARBITRATION_SCOPE, ARBITRATION_TEMPERATURE, ARBITRATION_MAX_TOKENS,
+    RULE_DIMENSIONS, RULE_CONFIDENCE_THRESHOLD, TRIAGE_MODEL_PATH, DEDUP_STORE_NAME, NEAR_DUP_THRESHOLD,
 )
+from llm_cache import ResponseCache, CACHE_MODES
+from request_body import TEMPLATES
+from rules import resolve as resolve_rules, apply_rule_labels
+from concept_candidates import candidate_pool, candidates as concept_candidates
+from triage import TriageModel, np   # np is None without the optional numpy extra
+from dedup import DedupStore, conversation_key
+from near_dup import NearDupIndex, group_of
+from json_stream import iter_json_values
+from result_writer import ResultWriter
+from checkpoint import Checkpoint
+from concurrency import AdaptiveConcurrency
+from rate_limit import RateLimiter, estimate_prompt_tokens
+from hedging import Hedger
+from packing import RequestPacker
+from batch_api import BatchClient, BatchState, request_line, read_result_lines
+from endpoints import EndpointPool
 
 
 # ─────────────────────────────────────────────────────────
 # Progress bar
 # ─────────────────────────────────────────────────────────
 
+def limit_info(sem):
+    """Progress-bar suffix showing the adaptive concurrency limit."""
+    if isinstance(sem, AdaptiveConcurrency) and sem.adaptive:
+        return f" [c={sem.limit}]"
+    return ""
+
+
 def create_progress():
     """Create a Rich progress bar display for labeling."""
     return Progress(
@@ -68,7 +108,7 @@ def create_progress():
 
 
 # ─────────────────────────────────────────────────────────
-# Directory discovery & checkpoint
+# Directory discovery
 # ─────────────────────────────────────────────────────────
 
 def discover_input_files(input_path):
@@ -91,47 +131,6 @@ def discover_input_files(input_path):
     return [(f, f.relative_to(base)) for f in files]
 
 
-def load_checkpoint(checkpoint_path):
-    """Load existing checkpoint or return None."""
-    if checkpoint_path.exists():
-        with open(checkpoint_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return None
-
-
-def create_checkpoint(checkpoint_path, files):
-    """Create a fresh checkpoint for a batch run."""
-    ckpt = {
-        "status": "in_progress",
-        "completed": [],
-        "failed": {},
-        "total_files": len(files),
-    }
-    _write_checkpoint(checkpoint_path, ckpt)
-    return ckpt
-
-
-def update_checkpoint(checkpoint_path, rel_path_str, success=True, error_msg=None):
-    """Mark a file as completed or failed in the checkpoint."""
-    ckpt = load_checkpoint(checkpoint_path) or {}
-    if success:
-        if rel_path_str not in ckpt.get("completed", []):
-            ckpt.setdefault("completed", []).append(rel_path_str)
-        ckpt.get("failed", {}).pop(rel_path_str, None)
-    else:
-        ckpt.setdefault("failed", {})[rel_path_str] = error_msg or "unknown"
-    done = len(ckpt.get("completed", [])) + len(ckpt.get("failed", {}))
-    if done >= ckpt.get("total_files", 0):
-        ckpt["status"] = "done"
-    _write_checkpoint(checkpoint_path, ckpt)
-    return ckpt
-
-
-def _write_checkpoint(checkpoint_path, ckpt):
-    with open(checkpoint_path, "w", encoding="utf-8") as f:
-        json.dump(ckpt, f, ensure_ascii=False, indent=2)
-
-
 def merge_stats(all_file_stats):
     """Merge per-file stats into a global summary."""
     merged = {
@@ -139,6 +138,16 @@ def merge_stats(all_file_stats):
         "total_llm_calls": 0, "total_prompt_tokens": 0,
         "total_completion_tokens": 0, "total_tokens": 0,
         "arbitrated_count": 0,
+        "arbitration_calls": 0, "arbitration_prompt_tokens": 0, "arbitration_completion_tokens": 0,
+        "arbitration_seconds": 0,
+        "hedged_calls": 0, "hedge_wins": 0, "hedge_extra_tokens": 0,
+        "speculation_hits": 0, "speculation_misses": 0,
+        "speculation_saved_seconds": 0, "speculation_wasted_tokens": 0,
+        "packed_calls": 0, "pack_saved_requests": 0, "pack_saved_prompt_tokens": 0, "pack_fallbacks": 0,
+        "rule_resolved_dims": 0,
+        "concept_narrowed": 0, "concept_full_pool": 0, "concept_saved_prompt_tokens": 0,
+        "local_model_dims": 0,
+        "duplicate_collapsed": 0, "near_dup_propagated": 0,
         "validation_issue_count": 0, "consistency_warning_count": 0,
         "unmapped_unique_count": 0,
         "total_elapsed_seconds": 0,
@@ -153,7 +162,16 @@ def merge_stats(all_file_stats):
         for k in ("total_samples", "success", "failed", "total_llm_calls",
                    "total_prompt_tokens", "total_completion_tokens", "total_tokens",
                    "arbitrated_count", "validation_issue_count", "consistency_warning_count",
-                   "sparse_labeled", "sparse_inherited"):
+                   "arbitration_calls", "arbitration_prompt_tokens", "arbitration_completion_tokens",
+                   "arbitration_seconds",
+                   "sparse_labeled", "sparse_inherited",
+                   "hedged_calls", "hedge_wins", "hedge_extra_tokens",
+                   "speculation_hits", "speculation_misses",
+                   "speculation_saved_seconds", "speculation_wasted_tokens",
+                   "packed_calls", "pack_saved_requests", "pack_saved_prompt_tokens", "pack_fallbacks",
+                   "rule_resolved_dims",
+                   "concept_narrowed", "concept_full_pool", "concept_saved_prompt_tokens",
+                   "local_model_dims", "duplicate_collapsed", "near_dup_propagated"):
             merged[k] += st.get(k, 0)
         merged["total_elapsed_seconds"] += st.get("total_elapsed_seconds", 0)
         # Merge tag distributions
@@ -204,6 +222,23 @@ def merge_stats(all_file_stats):
     merged["success_rate"] = round(merged["success"] / max(total, 1), 4)
     merged["avg_calls_per_sample"] = round(merged["total_llm_calls"] / max(total, 1), 2)
     merged["arbitrated_rate"] = round(merged["arbitrated_count"] / max(total, 1), 4)
+    merged["arbitration_tokens_per_sample"] = round(
+        (merged["arbitration_prompt_tokens"] + merged["arbitration_completion_tokens"])
+        / max(merged["arbitrated_count"], 1))
+    merged["arbitration_seconds"] = round(merged["arbitration_seconds"], 1)
+    merged["hedge_rate"] = round(merged["hedged_calls"] / max(merged["total_llm_calls"], 1), 4)
+    speculated = merged["speculation_hits"] + merged["speculation_misses"]
+    merged["speculation_hit_rate"] = round(merged["speculation_hits"] / max(speculated, 1), 4)
+    merged["speculation_saved_seconds"] = round(merged["speculation_saved_seconds"], 1)
+    merged["pack_saved_requests"] = round(merged["pack_saved_requests"])
+    merged["pack_token_savings_rate"] = round(
+        merged["pack_saved_prompt_tokens"] / max(merged["total_prompt_tokens"] + merged["pack_saved_prompt_tokens"], 1), 4)
+    merged["rule_resolved_rate"] = round(
+        merged["rule_resolved_dims"] / max(total * len(CALL1_DIMS + CALL2_DIMS), 1), 4)
+    merged["local_model_rate"] = round(
+        merged["local_model_dims"] / max(total * len(CALL1_DIMS + CALL2_DIMS), 1), 4)
+    merged["concept_narrowed_rate"] = round(
+        merged["concept_narrowed"] / max(merged["concept_narrowed"] + merged["concept_full_pool"], 1), 4)
 
     return merged
 
@@ -237,21 +272,94 @@ def resolve_run_dir(args, input_path):
 # Async LLM calls
 # ─────────────────────────────────────────────────────────
 
-async def async_llm_call(http_client, messages, model, temperature=0.1, max_tokens=1000, max_retries=MAX_RETRIES):
-    """Async LLM call with retry + jitter. Returns (parsed_json, raw_content, usage)."""
+def parse_llm_json(content):
+    """Parse a model response as JSON, unwrapping a ```json fenced block if present."""
+    json_str = content
+    if json_str.startswith("```"):
+        lines = json_str.split("\n")
+        json_lines = []
+        in_block = False
+        for line in lines:
+            if line.startswith("```") and not in_block:
+                in_block = True
+                continue
+            elif line.startswith("```") and in_block:
+                break
+            elif in_block:
+                json_lines.append(line)
+        json_str = "\n".join(json_lines)
+    return json.loads(json_str)
+
+
+async def async_llm_call(http_client, messages, model, temperature=0.1, max_tokens=1000, max_retries=MAX_RETRIES,
+                         cache=None, limiter=None, rate_limiter=None, hedger=None):
+    """Async LLM call with retry + jitter. Returns (parsed_json, raw_content, usage).
+
+    The request body is encoded once (request_body.TEMPLATES reuses the encoded
+    system + few-shot prefix) and the same bytes are sent on every retry.
+
+    cache: optional ResponseCache — served responses skip the network entirely and
+    carry usage["cached"] = True; successful parses are stored for later runs.
+    Lookups and stores run on the cache thread; sampled calls (temperature above
+    LLM_CACHE_MAX_TEMPERATURE) bypass the cache.
+    limiter: optional AdaptiveConcurrency — every HTTP attempt reports its latency
+    and whether it hit congestion (429/5xx/timeout).
+    rate_limiter: optional RateLimiter — each attempt first reserves RPM/TPM budget
+    for the model; the reservation is settled with the real usage afterwards.
+    hedger: optional Hedger — each HTTP attempt, once its budget is reserved, gets a
+    duplicate request if it is slow; usage then carries "hedged", "hedge_won",
+    "hedge_extra_tokens" (summed over attempts) and "model" when the hedge answered.
+    """
+    key = None
+    if cache is not None and cache.cacheable(temperature):
+        key = TEMPLATES.cache_key(model, messages, temperature, max_tokens)
+        hit = await cache.lookup(key)
+        if hit is not None:
+            content, usage_dict = hit
+            try:
+                return parse_llm_json(content), content, {**usage_dict, "cached": True}
+            except json.JSONDecodeError:
+                pass  # corrupt entry — fall through and refetch
+
     url = f"{LITELLM_BASE}/chat/completions"
     headers = {"Authorization": f"Bearer {LITELLM_KEY}", "Content-Type": "application/json"}
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": temperature,
-        "max_tokens": max_tokens,
-    }
+    bodies = {model: TEMPLATES.body(model, messages, temperature, max_tokens)}
     last_error = None
+    hedge_usage = {}
+
+    def send(call_model):
+        if call_model not in bodies:
+            bodies[call_model] = TEMPLATES.body(call_model, messages, temperature, max_tokens)
+        return http_client.post(url, content=bodies[call_model], headers=headers, timeout=REQUEST_TIMEOUT)
+
+    def finish(parsed, raw, usage):
+        if hedge_usage:
+            usage = {**usage, **hedge_usage}
+        return parsed, raw, usage
 
     for attempt in range(max_retries + 1):
+        reservation = None
+        if rate_limiter is not None:
+            reservation = await rate_limiter.acquire(model, messages, max_tokens)
+        t0 = time.monotonic()
         try:
-            resp = await http_client.post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
+            if hedger is None:
+                resp = await send(model)
+            else:
+                resp, reservation, hedge = await hedger.attempt(send, model, messages, max_tokens,
+                                                                reservation=reservation, rate_limiter=rate_limiter)
+                if hedge is not None:
+                    hedge_usage["hedged"] = True
+                    hedge_usage["hedge_extra_tokens"] = hedge_usage.get("hedge_extra_tokens", 0) + hedge["extra_tokens"]
+                if hedge_usage:
+                    hedge_usage["hedge_won"] = bool(hedge and hedge["won"])
+                    hedge_usage.pop("model", None)
+                    if hedge_usage["hedge_won"]:
+                        hedge_usage["model"] = hedge["model"]
+            if limiter is not None:
+                limiter.record(time.monotonic() - t0, congested=resp.status_code == 429 or resp.status_code >= 500)
+            if reservation is not None and resp.status_code != 200:
+                rate_limiter.refund(reservation, throttled=resp.status_code == 429)
             if resp.status_code in (403, 429, 502, 503, 504):
                 # Rate limited or server/gateway error — exponential backoff with jitter
                 base_wait = min(2 ** attempt * 3 + 2, 60)
@@ -263,7 +371,7 @@ async def async_llm_call(http_client, messages, model, temperature=0.1, max_toke
             if resp.status_code == 400:
                 # Client error (context_length_exceeded, invalid request) — not retryable
                 error_text = resp.text[:300]
-                return None, f"HTTP 400: {error_text}", {"prompt_tokens": 0, "completion_tokens": 0, "error": f"HTTP 400: {error_text}", "non_retryable": True}
+                return finish(None, f"HTTP 400: {error_text}", {"prompt_tokens": 0, "completion_tokens": 0, "error": f"HTTP 400: {error_text}", "non_retryable": True})
             resp.raise_for_status()
             data = resp.json()
 
@@ -273,49 +381,39 @@ async def async_llm_call(http_client, messages, model, temperature=0.1, max_toke
                 "prompt_tokens": usage.get("prompt_tokens", 0),
                 "completion_tokens": usage.get("completion_tokens", 0),
             }
+            if reservation is not None:
+                rate_limiter.settle(reservation, usage_dict)
 
-            # Parse JSON
-            json_str = content
-            if json_str.startswith("```"):
-                lines = json_str.split("\n")
-                json_lines = []
-                in_block = False
-                for line in lines:
-                    if line.startswith("```") and not in_block:
-                        in_block = True
-                        continue
-                    elif line.startswith("```") and in_block:
-                        break
-                    elif in_block:
-                        json_lines.append(line)
-                json_str = "\n".join(json_lines)
-
-            parsed = json.loads(json_str)
-            return parsed, content, usage_dict
+            parsed = parse_llm_json(content)
+            if key is not None and hedge_usage.get("model", model) == model:
+                await cache.store(key, model, content, usage_dict)
+            return finish(parsed, content, usage_dict)
 
         except (json.JSONDecodeError, KeyError) as e:
             last_error = f"ParseError: {e}"
             if attempt < max_retries:
                 await asyncio.sleep(2 + random.uniform(0, 2))
                 continue
-            return None, content if 'content' in dir() else "", {"prompt_tokens": 0, "completion_tokens": 0, "error": last_error}
+            return finish(None, content if 'content' in dir() else "", {"prompt_tokens": 0, "completion_tokens": 0, "error": last_error})
         except Exception as e:
             last_error = f"{type(e).__name__}: {e}"
+            if limiter is not None and isinstance(e, (httpx.TimeoutException, httpx.NetworkError)):
+                limiter.record(time.monotonic() - t0, congested=True)
             if attempt < max_retries:
                 base_wait = min(2 ** attempt * 3 + 2, 60)
                 wait = base_wait + random.uniform(0, base_wait * 0.5)
                 await asyncio.sleep(wait)
                 continue
-            return None, str(e), {"prompt_tokens": 0, "completion_tokens": 0, "error": last_error}
+            return finish(None, str(e), {"prompt_tokens": 0, "completion_tokens": 0, "error": last_error})
 
-    return None, f"max retries exceeded: {last_error}", {"prompt_tokens": 0, "completion_tokens": 0, "error": last_error or "max_retries"}
+    return finish(None, f"max retries exceeded: {last_error}", {"prompt_tokens": 0, "completion_tokens": 0, "error": last_error or "max_retries"})
 
 
 # ─────────────────────────────────────────────────────────
 # Prompt builders (inline to avoid cross-import issues with async)
 # ─────────────────────────────────────────────────────────
 
-def build_call1_messages(conversation_json, preprocessed_signals):
+def build_call1_messages(conversation_json, preprocessed_signals, drop=()):
     user_content = f"""<conversation>
 {conversation_json}
 </conversation>
@@ -323,13 +421,14 @@ def build_call1_messages(conversation_json, preprocessed_signals):
 <preprocessed_signals>
 {preprocessed_signals}
 </preprocessed_signals>"""
-    messages = [{"role": "system", "content": CALL1_SYSTEM}]
-    messages.extend(CALL1_FEWSHOT)
+    system, fewshot = call_prompt("call1", drop)
+    messages = [{"role": "system", "content": system}]
+    messages.extend(fewshot)
     messages.append({"role": "user", "content": user_content})
     return messages
 
 
-def build_call2_messages(conversation_json, preprocessed_signals, call1_result):
+def build_call2_messages(conversation_json, preprocessed_signals, call1_result, drop=(), concepts=None):
     call1_str = json.dumps(call1_result, ensure_ascii=False) if isinstance(call1_result, dict) else str(call1_result)
     user_content = f"""<conversation>
 {conversation_json}
@@ -342,16 +441,58 @@ def build_call2_messages(conversation_json, preprocessed_signals, call1_result):
 <preprocessed_signals>
 {preprocessed_signals}
 </preprocessed_signals>"""
-    messages = [{"role": "system", "content": CALL2_SYSTEM}]
-    messages.extend(CALL2_FEWSHOT)
+    system, fewshot = call_prompt("call2", drop, concepts)
+    messages = [{"role": "system", "content": system}]
+    messages.extend(fewshot)
+    messages.append({"role": "user", "content": user_content})
+    return messages
+
+
+def build_fused_messages(conversation_json, preprocessed_signals, drop=()):
+    user_content = f"""<conversation>
+{conversation_json}
+</conversation>
+
+<preprocessed_signals>
+{preprocessed_signals}
+</preprocessed_signals>"""
+    system, fewshot = call_prompt("fused", drop)
+    messages = [{"role": "system", "content": system}]
+    messages.extend(fewshot)
     messages.append({"role": "user", "content": user_content})
     return messages
 
 
+def build_arbitration_messages(dim, conversation_json, preprocessed_signals, labels):
+    """Narrow re-label of one low-confidence dimension: its own pool only, no few-shot."""
+    other = {d: v for d, v in labels.items() if d in ARBITRATION_SYSTEMS and d != dim}
+    user_content = f"""<conversation>
+{conversation_json}
+</conversation>
+
+<other_labels>
+{json.dumps(other, ensure_ascii=False)}
+</other_labels>
+
+<preprocessed_signals>
+{preprocessed_signals}
+</preprocessed_signals>"""
+    return [
+        {"role": "system", "content": ARBITRATION_SYSTEMS[dim]},
+        {"role": "user", "content": user_content},
+    ]
+
+
 # ─────────────────────────────────────────────────────────
 # Validation
 # ─────────────────────────────────────────────────────────
 
+CALL1_DIMS = ["intent", "language", "domain", "task", "difficulty"]
+CALL2_DIMS = ["concept", "agentic", "constraint", "context"]
+CALL_MODES = ("two-call", "fused")
+ARBITRATION_SCOPES = ("dimension", "call")
+
+
 def validate_tags(result, call_name="call1"):
     issues = []
     unmapped = result.get("unmapped", [])
@@ -359,8 +500,8 @@ def validate_tags(result, call_name="call1"):
         unmapped = []
     cleaned = dict(result)
 
-    dims = (["intent", "language", "domain", "task", "difficulty"] if call_name == "call1"
-            else ["concept", "agentic", "constraint", "context"])
+    # call name, or a single dimension for narrow arbitration results
+    dims = {"call1": CALL1_DIMS, "call2": CALL2_DIMS, "fused": CALL1_DIMS + CALL2_DIMS}.get(call_name, [call_name])
 
     for dim in dims:
         if dim not in result:
@@ -421,13 +562,338 @@ def find_low_confidence_dims(labels, threshold=CONFIDENCE_THRESHOLD):
     return low
 
 
+def merge_call_labels(call1_cleaned, call2_cleaned):
+    """Combine validated Call 1 + Call 2 results into one label dict."""
+    labels = {}
+    for d in CALL1_DIMS:
+        labels[d] = call1_cleaned.get(d, [] if d in MULTI_SELECT else "")
+    for d in CALL2_DIMS:
+        labels[d] = call2_cleaned.get(d, [] if d in MULTI_SELECT else "")
+    labels["confidence"] = {**call1_cleaned.get("confidence", {}), **call2_cleaned.get("confidence", {})}
+    labels["unmapped"] = call1_cleaned.get("unmapped", []) + call2_cleaned.get("unmapped", [])
+    return labels
+
+
+def call1_only_labels(call1_cleaned):
+    """Partial labels when Call 2 ultimately failed."""
+    labels = {d: call1_cleaned.get(d) for d in CALL1_DIMS}
+    labels["confidence"] = call1_cleaned.get("confidence", {})
+    labels["unmapped"] = call1_cleaned.get("unmapped", [])
+    return labels
+
+
+def fused_labels(fused_cleaned):
+    labels = {d: fused_cleaned.get(d, [] if d in MULTI_SELECT else "") for d in CALL1_DIMS + CALL2_DIMS}
+    confidence = fused_cleaned.get("confidence", {})
+    labels["confidence"] = dict(confidence) if isinstance(confidence, dict) else {}
+    labels["unmapped"] = fused_cleaned.get("unmapped", [])
+    return labels
+
+
+def apply_rerun(labels, low_conf, rerun_clean, call_dims):
+    """Replace low-confidence dimensions with the values from an arbitration re-run."""
+    for d, _ in low_conf:
+        if d in call_dims and d in rerun_clean:
+            labels[d] = rerun_clean[d]
+            labels["confidence"][d] = rerun_clean.get("confidence", {}).get(d, 0)
+
+
+def record_arbitration(monitor, usage):
+    """Count one arbitration call (on top of the regular llm_calls / token totals)."""
+    monitor["arbitration_calls"] = monitor.get("arbitration_calls", 0) + 1
+    monitor["arbitration_prompt_tokens"] = monitor.get("arbitration_prompt_tokens", 0) + usage.get("prompt_tokens", 0)
+    monitor["arbitration_completion_tokens"] = (
+        monitor.get("arbitration_completion_tokens", 0) + usage.get("completion_tokens", 0))
+
+
+# ─────────────────────────────────────────────────────────
+# Speculative Call 2
+# ─────────────────────────────────────────────────────────
+
+def guess_intent(query):
+    """Keyword guess of the intent of the last user query (INTENT_HINT_KEYWORDS)."""
+    query = query.lower()
+    for intent, keywords in INTENT_HINT_KEYWORDS:
+        if any(kw in query for kw in keywords):
+            return intent
+    return "build"
+
+
+def provisional_call1_context(signals):
+    """Guess the Call 1 dimensions Call 2 conditions on, from preprocess() signals only."""
+    languages = signals["fence_languages"] or signals["framework_languages"]
+    guesses = {
+        "intent": guess_intent(signals.get("last_query_preview", "")),
+        "language": [l for l in languages if l in TAG_POOLS["language"]],
+    }
+    return {d: guesses[d] for d in SPECULATION_DIMS if d in guesses}
+
+
+def speculation_holds(provisional, call1_context):
+    """True if the real Call 1 result agrees with the provisional context Call 2 was run on."""
+    for dim, guess in provisional.items():
+        actual = call1_context.get(dim, [] if dim in MULTI_SELECT else "")
+        if dim in MULTI_SELECT:
+            a, b = set(guess), set(actual if isinstance(actual, list) else [actual])
+            if (a or b) and len(a & b) / len(a | b) < SPECULATION_MIN_JACCARD:
+                return False
+        elif guess != actual:
+            return False
+    return True
+
+
+# ─────────────────────────────────────────────────────────
+# Concept narrowing
+# ─────────────────────────────────────────────────────────
+
+_PREFIX_TOKENS = {}
+
+
+def _prefix_tokens(drop, concepts):
+    key = (tuple(sorted(drop)), concepts)
+    if key not in _PREFIX_TOKENS:
+        system, fewshot = call_prompt("call2", drop, concepts)
+        _PREFIX_TOKENS[key] = estimate_prompt_tokens([{"content": system}] + fewshot)
+    return _PREFIX_TOKENS[key]
+
+
+def narrow_concepts(monitor, call1_cleaned, drop=()):
+    """Candidate concepts for Call 2 from the Call 1 result (None = full pool).
+
+    Records the outcome in the monitor: concept_narrowing ("narrowed" or why the
+    full pool was kept) and, when narrowed, the estimated prompt tokens saved.
+    """
+    concepts, reason = candidate_pool(call1_cleaned)
+    monitor["concept_narrowing"] = reason
+    if concepts is not None:
+        monitor["concept_pool"] = len(concepts)
+        monitor["concept_saved_prompt_tokens"] = _prefix_tokens(drop, None) - _prefix_tokens(drop, concepts)
+    return concepts
+
+
+# ─────────────────────────────────────────────────────────
+# Triage model
+# ─────────────────────────────────────────────────────────
+
+def load_triage(path):
+    """TriageModel saved at `path` (train with tools/train_triage.py), or None without a path."""
+    return TriageModel.load(path) if path else None
+
+
+def triage_labels(triage, sample, signals, monitor, resolved):
+    """Dimensions the triage model pre-labels (triage.py), other than the rule-resolved ones."""
+    if triage is None:
+        return {}
+    local = triage.resolve(sample, signals, skip=resolved)
+    if local:
+        monitor["local_model_dims"] = {d: r["confidence"] for d, r in local.items()}
+    return local
+
+
+def mark_local_labels(labels, local, rerun_dims=()):
+    """Record pre-labeled dimensions in the output labels as "source": {dim: "local_model"}.
+
+    rerun_dims: dimensions arbitration re-labeled, which are no longer the model's.
+    """
+    dims = [d for d in local if d not in rerun_dims]
+    if labels is not None and dims:
+        labels["source"] = {d: "local_model" for d in dims}
+
+
+# ─────────────────────────────────────────────────────────
+# Duplicate collapse (see dedup.py)
+# ─────────────────────────────────────────────────────────
+
+COPY_MARKERS = ("duplicate_of", "duplicate_file", "propagated_from", "propagated_file", "similarity")
+
+
+def copy_labels(labels, markers):
+    """Fan-out copy of a representative's labels with a duplicate_map entry's markers."""
+    if labels is None:
+        return None
+    out = {k: v for k, v in labels.items() if k not in COPY_MARKERS}
+    out.update(markers)
+    return out
+
+
+def collapse_duplicates(dedup, collector, indices, waiting, near=None):
+    """Claim the samples to label in the run's dedup store; return the ones to submit.
+
+    The others become collector.duplicate_map entries ({label marker: value}):
+    exact duplicates ("duplicate_of") and, with a NearDupIndex, near duplicates of a
+    representative with another conversation key ("propagated_from"). Their labels are
+    copied now when the representative is already labeled, else they wait in
+    waiting[key] until fan_out. A near duplicate keeps its own key, so exact
+    duplicates of it are resolved with the labels it receives.
+    """
+    indices = sorted(indices)
+    if dedup is None:
+        return indices
+    rel = str(collector.rel_path)
+    keys = [conversation_key(collector.samples[i].get("conversations", [])) for i in indices]
+    claimed = dedup.claim([(k, collector.samples[i].get("id"), rel) for i, k in zip(indices, keys)])
+    submit = []
+    for idx, key, rep in zip(indices, keys, claimed):
+        sample = collector.samples[idx]
+        if rep is None:
+            collector.rep_keys[idx] = key
+            match = None
+            if near is not None:
+                sig, group = near.signature(sample), group_of(sample)
+                match = near.query(sig, group)
+                if match is None:
+                    near.add(key, sig, (sample.get("id"), rel), group)
+            if match is None:
+                submit.append(idx)
+                continue
+            rep_key, (rep_id, rep_file), sim = match
+            markers = {"propagated_from": rep_id, "similarity": round(sim, 3)}
+            if rep_file != rel:
+                markers["propagated_file"] = rep_file
+            labels = dedup.labels(rep_key)
+        else:
+            rep_key, (rep_id, rep_file, labels) = key, rep
+            markers = {"duplicate_of": rep_id}
+            if rep_file != rel:
+                markers["duplicate_file"] = rep_file
+        collector.duplicate_map[idx] = markers
+        if labels is not None:
+            collector.labels[idx] = copy_labels(labels, markers)
+            if idx in collector.rep_keys:
+                dedup.resolve(key, collector.labels[idx])
+            if collector.stream:
+                write_finished(collector, idx)
+        else:
+            waiting.setdefault(rep_key, []).append((collector, idx))
+            collector.pending_duplicates += 1
+    return submit
+
+
+def fan_out(dedup, collector, idx, labels, waiting, near=None):
+    """Store a representative's outcome and copy its labels to the duplicates waiting on it.
+
+    Returns the collectors that were waiting (their files may now be complete).
+    Duplicates in a streaming collector are written right away (write_finished).
+    """
+    key = collector.rep_keys.get(idx)
+    if key is None:
+        return []
+    dedup.resolve(key, labels)
+    if labels is None and near is not None:
+        near.remove(key)
+    touched = []
+    for c, i in waiting.pop(key, []):
+        c.labels[i] = copy_labels(labels, c.duplicate_map[i])
+        c.pending_duplicates -= 1
+        touched.append(c)
+        # A near duplicate passes its labels on to the exact duplicates of its own key
+        touched.extend(fan_out(dedup, c, i, c.labels[i], waiting, near))
+        if c.stream:
+            write_finished(c, i)
+    return touched
+
+
+def duplicate_info(collector):
+    """", N duplicates, M near-duplicates" for the per-file load line."""
+    propagated = sum(1 for m in collector.duplicate_map.values() if "propagated_from" in m)
+    exact = len(collector.duplicate_map) - propagated
+    return (f", {exact} duplicates" if exact else "") + (f", {propagated} near-duplicates" if propagated else "")
+
+
+def missing_monitor_failure(duplicate):
+    """(status, error) of a failed sample without a monitor."""
+    if duplicate is not None:
+        rep_id = duplicate.get("duplicate_of") or duplicate.get("propagated_from")
+        return "duplicate_failed", f"representative {rep_id} failed"
+    return "timeout", f"exceeded {SAMPLE_TIMEOUT}s"
+
+
 # ─────────────────────────────────────────────────────────
 # Per-sample pipeline (async)
 # ─────────────────────────────────────────────────────────
 
-async def label_one(http_client, sample, model, sample_idx, total, sem, enable_arbitration=True):
-    """Label a single sample with sample-level retry on failure."""
+def new_monitor(sample, sample_idx, sample_attempt=0):
+    return {
+        "sample_id": sample.get("id", f"sample-{sample_idx}"),
+        "index": sample_idx,
+        "llm_calls": 0,
+        "total_prompt_tokens": 0,
+        "total_completion_tokens": 0,
+        "validation_issues": [],
+        "consistency_warnings": [],
+        "low_confidence_dims": [],
+        "arbitrated": False,
+        "sample_attempt": sample_attempt,
+        "status": "success",
+    }
+
+
+def request_share(usage):
+    """HTTP requests one call cost: 1, or a packed sample's 1/n share of its packed request."""
+    return 1 / usage["pack_size"] if "pack_size" in usage else 1
+
+
+async def label_one(http_client, sample, model, sample_idx, total, sem, enable_arbitration=True, cache=None,
+                    rate_limiter=None, hedger=None, call_mode="two-call", speculative_call2=False,
+                    packer=None, arbitration_scope=ARBITRATION_SCOPE, rules=False, concept_narrowing=False,
+                    triage=None):
+    """Label a single sample with sample-level retry on failure.
+
+    sem bounds in-flight samples; when it is an AdaptiveConcurrency, every LLM call
+    also feeds back latency/congestion so the limit can adapt.
+    hedger: optional Hedger — slow HTTP attempts get a duplicate request, first successful response wins.
+    call_mode: "two-call" (Call 1 → Call 2) or "fused" (all 9 dimensions in one call).
+    speculative_call2: two-call only — start Call 2 concurrently with Call 1 on a provisional
+        context from preprocess() signals; re-issue it if the real Call 1 disagrees.
+    packer: optional RequestPacker — short single-turn samples share packed requests and
+        fall back to a normal call when their packed entry is unusable.
+    arbitration_scope: "dimension" re-labels each low-confidence dimension with its own narrow
+        prompt (concurrently); "call" re-runs the whole call(s) that produced them.
+    rules: (--rules) dimensions a deterministic rule labels with enough confidence (rules.py) are
+        dropped from the prompts and filled in from the rule.
+    concept_narrowing: (--concept-narrowing) two-call only — Call 2 lists only the candidate concepts of the
+        (language, domain) pairs Call 1 labeled (concept_candidates.py). Packed and
+        speculative Call 2 requests (unless re-issued after a miss) keep the full pool.
+    triage: optional TriageModel — dimensions it predicts above their calibrated threshold
+        are handled like rule labels and marked "source": "local_model" in the labels.
+    """
     start = time.time()
+    limiter = sem if isinstance(sem, AdaptiveConcurrency) else None
+
+    async def llm(messages, **kwargs):
+        result = await async_llm_call(http_client, messages, model, cache=cache, limiter=limiter,
+                                      rate_limiter=rate_limiter, hedger=hedger, **kwargs)
+        usage = result[2]
+        if usage.get("hedged"):
+            monitor["hedged_calls"] = monitor.get("hedged_calls", 0) + 1
+            monitor["hedge_wins"] = monitor.get("hedge_wins", 0) + int(usage["hedge_won"])
+            monitor["hedge_extra_tokens"] = monitor.get("hedge_extra_tokens", 0) + usage["hedge_extra_tokens"]
+        return result
+
+    async def llm_packable(call_name, messages, drop=()):
+        if packable:
+            packed = await packer.submit(call_name, monitor["sample_id"], messages[-1]["content"],
+                                         signals["est_tokens"], drop=drop)
+            if packed is not None:
+                usage = packed[2]
+                share = 1 / usage["pack_size"]
+                if packed[0] is not None:
+                    monitor["packed_calls"] = monitor.get("packed_calls", 0) + 1
+                    monitor["pack_saved_requests"] = round(
+                        monitor.get("pack_saved_requests", 0) + 1 - share, 3)
+                    monitor["pack_saved_prompt_tokens"] = (
+                        monitor.get("pack_saved_prompt_tokens", 0) + usage["pack_saved_prompt_tokens"])
+                    return packed
+                # Unusable packed entry: pay its share, then fall back to a normal call
+                monitor["pack_fallbacks"] = monitor.get("pack_fallbacks", 0) + 1
+                monitor["llm_calls"] = round(monitor["llm_calls"] + share, 3)
+                monitor["total_prompt_tokens"] += usage["prompt_tokens"]
+                monitor["total_completion_tokens"] += usage["completion_tokens"]
+        return await llm(messages)
+
+    async def timed(coro):
+        result = await coro
+        return result, time.monotonic()
 
     # Truncate oversized conversations before sending to LLM
     conversations = sample.get("conversations", [])
@@ -441,19 +907,8 @@ async def label_one(http_client, sample, model, sample_idx, total, sem, enable_a
             await asyncio.sleep(base_wait + random.uniform(0, base_wait))
 
         async with sem:
-            monitor = {
-                "sample_id": sample.get("id", f"sample-{sample_idx}"),
-                "index": sample_idx,
-                "llm_calls": 0,
-                "total_prompt_tokens": 0,
-                "total_completion_tokens": 0,
-                "validation_issues": [],
-                "consistency_warnings": [],
-                "low_confidence_dims": [],
-                "arbitrated": False,
-                "sample_attempt": sample_attempt,
-                "status": "success",
-            }
+            monitor = new_monitor(sample, sample_idx, sample_attempt)
+            spec_task = None
 
             try:
                 # Preprocess (uses original conversations for signal extraction)
@@ -463,64 +918,133 @@ async def label_one(http_client, sample, model, sample_idx, total, sem, enable_a
                 conversations_json = json.dumps(truncated_convs, ensure_ascii=False)
                 if was_truncated:
                     monitor["truncated"] = True
+                packable = packer is not None and packer.eligible(signals, was_truncated)
+                resolved = resolve_rules(signals) if rules else {}
+                if resolved:
+                    monitor["rule_dims"] = {d: r["rule"] for d, r in resolved.items()}
+                local = triage_labels(triage, sample, signals, monitor, resolved)
+                resolved = {**resolved, **local}
+                drop1 = [d for d in resolved if d in CALL1_DIMS]
+                drop2 = [d for d in resolved if d in CALL2_DIMS]
+
+                if call_mode == "fused":
+                    monitor["call_mode"] = "fused"
+                    msgs_f = build_fused_messages(conversations_json, signals_str, drop=list(resolved))
+                    fused_result, fused_raw, usage_f = await llm_packable("fused", msgs_f, drop=list(resolved))
+                    monitor["llm_calls"] = round(monitor["llm_calls"] + request_share(usage_f), 3)
+                    monitor["total_prompt_tokens"] += usage_f["prompt_tokens"]
+                    monitor["total_completion_tokens"] += usage_f["completion_tokens"]
+
+                    if fused_result is None:
+                        monitor["status"] = "fused_failed"
+                        monitor["error"] = usage_f.get("error", "unknown")
+                        monitor["error_response"] = fused_raw[:500] if fused_raw else ""
+                        if usage_f.get("non_retryable"):
+                            return sample_idx, None, monitor
+                        if sample_attempt < SAMPLE_MAX_RETRIES:
+                            continue
+                        return sample_idx, None, monitor
 
-                # Call 1
-                msgs1 = build_call1_messages(conversations_json, signals_str)
-                call1_result, call1_raw, usage1 = await async_llm_call(http_client, msgs1, model)
-                monitor["llm_calls"] += 1
-                monitor["total_prompt_tokens"] += usage1["prompt_tokens"]
-                monitor["total_completion_tokens"] += usage1["completion_tokens"]
-
-                if call1_result is None:
-                    monitor["status"] = "call1_failed"
-                    monitor["error"] = usage1.get("error", "unknown")
-                    monitor["error_response"] = call1_raw[:500] if call1_raw else ""
-                    if usage1.get("non_retryable"):
+                    fused_result = apply_rule_labels(fused_result, resolved)
+                    fused_cleaned, fused_issues = validate_tags(fused_result, "fused")
+                    monitor["validation_issues"].extend(fused_issues)
+                    labels = fused_labels(fused_cleaned)
+                    rerun_groups = [(msgs_f, "fused", set(CALL1_DIMS + CALL2_DIMS))]
+                else:
+                    # Call 1 (+ speculative Call 2 on a provisional context)
+                    msgs1 = build_call1_messages(conversations_json, signals_str, drop=drop1)
+                    t_calls = time.monotonic()
+                    if speculative_call2:
+                        spec_context = provisional_call1_context(signals)
+                        for dim in spec_context:
+                            if dim in resolved:
+                                spec_context[dim] = resolved[dim]["value"]
+                        spec_task = asyncio.ensure_future(timed(
+                            llm(build_call2_messages(conversations_json, signals_str, spec_context, drop=drop2))))
+                    call1_result, call1_raw, usage1 = await llm_packable("call1", msgs1, drop=drop1)
+                    t_call1_done = time.monotonic()
+                    monitor["llm_calls"] = round(monitor["llm_calls"] + request_share(usage1), 3)
+                    monitor["total_prompt_tokens"] += usage1["prompt_tokens"]
+                    monitor["total_completion_tokens"] += usage1["completion_tokens"]
+
+                    if call1_result is None:
+                        if spec_task is not None:
+                            spec_task.cancel()
+                        monitor["status"] = "call1_failed"
+                        monitor["error"] = usage1.get("error", "unknown")
+                        monitor["error_response"] = call1_raw[:500] if call1_raw else ""
+                        if usage1.get("non_retryable"):
+                            return sample_idx, None, monitor
+                        if sample_attempt < SAMPLE_MAX_RETRIES:
+                            continue
                         return sample_idx, None, monitor
-                    if sample_attempt < SAMPLE_MAX_RETRIES:
-                        continue
-                    return sample_idx, None, monitor
-
-                call1_cleaned, call1_issues = validate_tags(call1_result, "call1")
-                monitor["validation_issues"].extend(call1_issues)
-
-                # Call 2 (depends on Call 1)
-                call1_context = {d: call1_cleaned[d] for d in ["intent", "language", "domain", "task", "difficulty"] if d in call1_cleaned}
-                msgs2 = build_call2_messages(conversations_json, signals_str, call1_context)
-                call2_result, call2_raw, usage2 = await async_llm_call(http_client, msgs2, model)
-                monitor["llm_calls"] += 1
-                monitor["total_prompt_tokens"] += usage2["prompt_tokens"]
-                monitor["total_completion_tokens"] += usage2["completion_tokens"]
-
-                if call2_result is None:
-                    monitor["status"] = "call2_failed"
-                    monitor["error"] = usage2.get("error", "unknown")
-                    monitor["error_response"] = call2_raw[:500] if call2_raw else ""
-                    if usage2.get("non_retryable"):
-                        # Return partial results from Call 1
-                        labels = {d: call1_cleaned.get(d) for d in ["intent", "language", "domain", "task", "difficulty"]}
-                        labels["confidence"] = call1_cleaned.get("confidence", {})
-                        labels["unmapped"] = call1_cleaned.get("unmapped", [])
-                        return sample_idx, labels, monitor
-                    if sample_attempt < SAMPLE_MAX_RETRIES:
-                        continue
-                    # Final attempt: return partial results from Call 1
-                    labels = {d: call1_cleaned.get(d) for d in ["intent", "language", "domain", "task", "difficulty"]}
-                    labels["confidence"] = call1_cleaned.get("confidence", {})
-                    labels["unmapped"] = call1_cleaned.get("unmapped", [])
-                    return sample_idx, labels, monitor
-
-                call2_cleaned, call2_issues = validate_tags(call2_result, "call2")
-                monitor["validation_issues"].extend(call2_issues)
-
-                # Merge
-                labels = {}
-                for d in ["intent", "language", "domain", "task", "difficulty"]:
-                    labels[d] = call1_cleaned.get(d, [] if d in MULTI_SELECT else "")
-                for d in ["concept", "agentic", "constraint", "context"]:
-                    labels[d] = call2_cleaned.get(d, [] if d in MULTI_SELECT else "")
-                labels["confidence"] = {**call1_cleaned.get("confidence", {}), **call2_cleaned.get("confidence", {})}
-                labels["unmapped"] = call1_cleaned.get("unmapped", []) + call2_cleaned.get("unmapped", [])
+
+                    call1_result = apply_rule_labels(call1_result, resolved, CALL1_DIMS)
+                    call1_cleaned, call1_issues = validate_tags(call1_result, "call1")
+                    monitor["validation_issues"].extend(call1_issues)
+
+                    # Call 2 (depends on Call 1)
+                    call1_context = {d: call1_cleaned[d] for d in CALL1_DIMS if d in call1_cleaned}
+                    concepts = None
+                    if concept_narrowing and not packable and (
+                            spec_task is None or not speculation_holds(spec_context, call1_context)):
+                        concepts = narrow_concepts(monitor, call1_cleaned, drop2)
+                    msgs2 = build_call2_messages(conversations_json, signals_str, call1_context, drop=drop2,
+                                                 concepts=concepts)
+                    speculated = None
+                    if spec_task is not None:
+                        if speculation_holds(spec_context, call1_context):
+                            speculated, t_spec_done = await spec_task
+                            if speculated[0] is not None:
+                                monitor["speculation"] = "hit"
+                                # Sequential would be call1 + call2; overlapped wall time is the max
+                                monitor["speculation_saved_seconds"] = round(
+                                    min(t_call1_done, t_spec_done) - t_calls, 2)
+                            else:
+                                monitor["speculation"] = "failed"
+                                monitor["llm_calls"] += 1
+                                monitor["total_prompt_tokens"] += speculated[2]["prompt_tokens"]
+                                monitor["total_completion_tokens"] += speculated[2]["completion_tokens"]
+                                speculated = None
+                        else:
+                            monitor["speculation"] = "miss"
+                            if spec_task.done() and not spec_task.cancelled():
+                                (_, _, spec_usage), _ = spec_task.result()
+                                monitor["llm_calls"] += 1
+                                monitor["total_prompt_tokens"] += spec_usage["prompt_tokens"]
+                                monitor["total_completion_tokens"] += spec_usage["completion_tokens"]
+                                monitor["speculation_wasted_tokens"] = (
+                                    spec_usage["prompt_tokens"] + spec_usage["completion_tokens"])
+                            else:
+                                spec_task.cancel()
+                        spec_task = None
+                    if speculated is not None:
+                        call2_result, call2_raw, usage2 = speculated
+                    else:
+                        call2_result, call2_raw, usage2 = await llm_packable("call2", msgs2, drop=drop2)
+                    monitor["llm_calls"] = round(monitor["llm_calls"] + request_share(usage2), 3)
+                    monitor["total_prompt_tokens"] += usage2["prompt_tokens"]
+                    monitor["total_completion_tokens"] += usage2["completion_tokens"]
+
+                    if call2_result is None:
+                        monitor["status"] = "call2_failed"
+                        monitor["error"] = usage2.get("error", "unknown")
+                        monitor["error_response"] = call2_raw[:500] if call2_raw else ""
+                        if usage2.get("non_retryable"):
+                            # Return partial results from Call 1
+                            return sample_idx, call1_only_labels(call1_cleaned), monitor
+                        if sample_attempt < SAMPLE_MAX_RETRIES:
+                            continue
+                        # Final attempt: return partial results from Call 1
+                        return sample_idx, call1_only_labels(call1_cleaned), monitor
+
+                    call2_result = apply_rule_labels(call2_result, resolved, CALL2_DIMS)
+                    call2_cleaned, call2_issues = validate_tags(call2_result, "call2")
+                    monitor["validation_issues"].extend(call2_issues)
+
+                    # Merge
+                    labels = merge_call_labels(call1_cleaned, call2_cleaned)
+                    rerun_groups = [(msgs1, "call1", set(CALL1_DIMS)), (msgs2, "call2", set(CALL2_DIMS))]
 
                 # Consistency
                 warnings = check_consistency(labels)
@@ -532,35 +1056,36 @@ async def label_one(http_client, sample, model, sample_idx, total, sem, enable_a
 
                 if low_conf and enable_arbitration:
                     monitor["arbitrated"] = True
-                    # Re-run relevant call(s)
-                    call1_dims = {"intent", "language", "domain", "task", "difficulty"}
-                    call2_dims = {"concept", "agentic", "constraint", "context"}
-
-                    if any(d in call1_dims for d, _ in low_conf):
-                        re1, _, u1 = await async_llm_call(http_client, msgs1, model, temperature=0.3)
-                        monitor["llm_calls"] += 1
-                        monitor["total_prompt_tokens"] += u1["prompt_tokens"]
-                        monitor["total_completion_tokens"] += u1["completion_tokens"]
-                        if re1:
-                            re1_clean, _ = validate_tags(re1, "call1")
-                            for d, _ in low_conf:
-                                if d in call1_dims and d in re1_clean:
-                                    labels[d] = re1_clean[d]
-                                    labels["confidence"][d] = re1_clean.get("confidence", {}).get(d, 0)
-
-                    if any(d in call2_dims for d, _ in low_conf):
-                        re2, _, u2 = await async_llm_call(http_client, msgs2, model, temperature=0.3)
+                    t_arb = time.monotonic()
+                    if arbitration_scope == "dimension":
+                        # One narrow prompt per low-confidence dimension, all in flight at once
+                        arb_dims = [d for d, _ in low_conf if d in ARBITRATION_SYSTEMS]
+                        results = await asyncio.gather(*(
+                            llm(build_arbitration_messages(d, conversations_json, signals_str, labels),
+                                temperature=ARBITRATION_TEMPERATURE, max_tokens=ARBITRATION_MAX_TOKENS)
+                            for d in arb_dims))
+                        reruns = [(result, d, {d}) for d, result in zip(arb_dims, results)]
+                    else:
+                        # Re-run the call(s) that produced the low-confidence dimensions
+                        reruns = []
+                        for msgs, call_name, call_dims in rerun_groups:
+                            if any(d in call_dims for d, _ in low_conf):
+                                result = await llm(msgs, temperature=ARBITRATION_TEMPERATURE)
+                                reruns.append((result, call_name, call_dims))
+                    for (rerun, _, u), call_name, call_dims in reruns:
                         monitor["llm_calls"] += 1
-                        monitor["total_prompt_tokens"] += u2["prompt_tokens"]
-                        monitor["total_completion_tokens"] += u2["completion_tokens"]
-                        if re2:
-                            re2_clean, _ = validate_tags(re2, "call2")
-                            for d, _ in low_conf:
-                                if d in call2_dims and d in re2_clean:
-                                    labels[d] = re2_clean[d]
-                                    labels["confidence"][d] = re2_clean.get("confidence", {}).get(d, 0)
+                        monitor["total_prompt_tokens"] += u["prompt_tokens"]
+                        monitor["total_completion_tokens"] += u["completion_tokens"]
+                        record_arbitration(monitor, u)
+                        if rerun:
+                            rerun_clean, _ = validate_tags(rerun, call_name)
+                            apply_rerun(labels, low_conf, rerun_clean, call_dims)
+                    monitor["arbitration_seconds"] = round(time.monotonic() - t_arb, 2)
+                mark_local_labels(labels, local, [d for d, _ in low_conf] if monitor["arbitrated"] else ())
 
             except Exception as e:
+                if spec_task is not None:
+                    spec_task.cancel()
                 monitor["status"] = f"error: {str(e)[:100]}"
                 if sample_attempt < SAMPLE_MAX_RETRIES:
                     continue
@@ -574,94 +1099,199 @@ async def label_one(http_client, sample, model, sample_idx, total, sem, enable_a
         return sample_idx, None, monitor
 
 
-def compute_stats(all_monitors, all_labels):
-    """Compute aggregate statistics."""
-    total = len(all_monitors)
-    success = sum(1 for m in all_monitors if m["status"] == "success")
-    total_calls = sum(m["llm_calls"] for m in all_monitors)
-    total_pt = sum(m["total_prompt_tokens"] for m in all_monitors)
-    total_ct = sum(m["total_completion_tokens"] for m in all_monitors)
-    arbitrated = sum(1 for m in all_monitors if m["arbitrated"])
-
-    distributions = {}
-    for dim in ["intent", "language", "domain", "concept", "task", "agentic", "constraint", "context", "difficulty"]:
-        dist = {}
-        for labels in all_labels:
-            if labels is None:
-                continue
+# Monitor fields summed over a file's samples
+MONITOR_SUMS = (
+    "llm_calls", "total_prompt_tokens", "total_completion_tokens",
+    "arbitration_calls", "arbitration_prompt_tokens", "arbitration_completion_tokens",
+    "arbitration_seconds", "hedged_calls", "hedge_wins", "hedge_extra_tokens",
+    "speculation_saved_seconds", "speculation_wasted_tokens", "packed_calls",
+    "pack_saved_requests", "pack_saved_prompt_tokens", "pack_fallbacks",
+    "concept_saved_prompt_tokens",
+)
+DISTRIBUTION_DIMS = ["intent", "language", "domain", "concept", "task", "agentic", "constraint", "context", "difficulty"]
+CONFIDENCE_DIMS = ["intent", "language", "domain", "task", "difficulty", "concept", "agentic", "constraint", "context"]
+
+
+class FileStats:
+    """Aggregate statistics of one file, added up as its samples are written.
+
+    add() takes each sample's monitor (None for inherited and copied samples)
+    and labels; neither is kept, so a file's stats cost the same memory at any
+    size. result() is the stats dict.
+    """
+
+    def __init__(self):
+        self.total = 0          # samples with a monitor
+        self.success = 0
+        self.sums = dict.fromkeys(MONITOR_SUMS, 0)
+        self.arbitrated = 0
+        self.spec_hits = 0
+        self.spec_misses = 0
+        self.rule_dims = 0
+        self.local_dims = 0
+        self.concept_narrowed = 0
+        self.concept_checked = 0
+        self.validation_issues = 0
+        self.consistency_warnings = 0
+        self.low_confidence = {}
+        self.distributions = {dim: {} for dim in DISTRIBUTION_DIMS}
+        self.unmapped = {}
+        self.confidence = {}    # dim → [sum, min, max, below threshold, count]
+        self.cross = {}
+
+    def add(self, monitor, labels):
+        if monitor is not None:
+            self.add_monitor(monitor)
+        if labels is not None:
+            self.add_labels(labels)
+
+    def add_monitor(self, m):
+        self.total += 1
+        self.success += m["status"] == "success"
+        sums = self.sums
+        for key in MONITOR_SUMS:
+            sums[key] += m.get(key, 0)
+        self.arbitrated += bool(m["arbitrated"])
+        self.spec_hits += m.get("speculation") == "hit"
+        self.spec_misses += m.get("speculation") in ("miss", "failed")
+        self.rule_dims += len(m.get("rule_dims", {}))
+        self.local_dims += len(m.get("local_model_dims", {}))
+        if "concept_narrowing" in m:
+            self.concept_checked += 1
+            self.concept_narrowed += m["concept_narrowing"] == "narrowed"
+        self.validation_issues += bool(m["validation_issues"])
+        self.consistency_warnings += bool(m["consistency_warnings"])
+        for lc in m.get("low_confidence_dims", []):
+            self.low_confidence[lc["dim"]] = self.low_confidence.get(lc["dim"], 0) + 1
+
+    def add_labels(self, labels):
+        for dim, dist in self.distributions.items():
             val = labels.get(dim, [])
             if isinstance(val, list):
                 for v in val:
                     dist[v] = dist.get(v, 0) + 1
             elif val:
                 dist[val] = dist.get(val, 0) + 1
-        distributions[dim] = dict(sorted(dist.items(), key=lambda x: -x[1]))
 
-    all_unmapped = {}
-    for labels in all_labels:
-        if labels is None:
-            continue
         for item in labels.get("unmapped", []):
             key = f"{item.get('dimension', '?')}:{item.get('value', '?')}" if isinstance(item, dict) else str(item)
-            all_unmapped[key] = all_unmapped.get(key, 0) + 1
-
-    conf_stats = {}
-    for dim in ["intent", "language", "domain", "task", "difficulty", "concept", "agentic", "constraint", "context"]:
-        scores = [l["confidence"][dim] for l in all_labels if l and "confidence" in l and isinstance(l["confidence"].get(dim), (int, float))]
-        if scores:
-            conf_stats[dim] = {
-                "mean": round(sum(scores) / len(scores), 3),
-                "min": round(min(scores), 3),
-                "max": round(max(scores), 3),
-                "below_threshold": sum(1 for s in scores if s < CONFIDENCE_THRESHOLD),
-                "count": len(scores),
-            }
+            self.unmapped[key] = self.unmapped.get(key, 0) + 1
 
-    # Intent × Difficulty cross matrix
-    cross = {}
-    for labels in all_labels:
-        if labels is None:
-            continue
-        intent = labels.get("intent", "?")
-        diff = labels.get("difficulty", "?")
-        key = f"{intent}|{diff}"
-        cross[key] = cross.get(key, 0) + 1
-
-    return {
-        "total_samples": total,
-        "success": success,
-        "failed": total - success,
-        "success_rate": round(success / max(total, 1), 4),
-        "total_llm_calls": total_calls,
-        "avg_calls_per_sample": round(total_calls / max(total, 1), 2),
-        "total_prompt_tokens": total_pt,
-        "total_completion_tokens": total_ct,
-        "total_tokens": total_pt + total_ct,
-        "arbitrated_count": arbitrated,
-        "arbitrated_rate": round(arbitrated / max(total, 1), 4),
-        "validation_issue_count": sum(1 for m in all_monitors if m["validation_issues"]),
-        "consistency_warning_count": sum(1 for m in all_monitors if m["consistency_warnings"]),
-        "unmapped_tags": dict(sorted(all_unmapped.items(), key=lambda x: -x[1])),
-        "unmapped_unique_count": len(all_unmapped),
-        "confidence_stats": conf_stats,
-        "low_confidence_frequency": dict(sorted(
-            {d: sum(1 for m in all_monitors for lc in m.get("low_confidence_dims", []) if lc["dim"] == d)
-             for d in set(lc["dim"] for m in all_monitors for lc in m.get("low_confidence_dims", []))}.items(),
-            key=lambda x: -x[1])),
-        "tag_distributions": distributions,
-        "cross_matrix": cross,
-    }
+        confidence = labels.get("confidence")
+        if confidence:
+            for dim in CONFIDENCE_DIMS:
+                score = confidence.get(dim)
+                if not isinstance(score, (int, float)):
+                    continue
+                entry = self.confidence.get(dim)
+                if entry is None:
+                    self.confidence[dim] = [score, score, score, int(score < CONFIDENCE_THRESHOLD), 1]
+                else:
+                    entry[0] += score
+                    entry[1] = min(entry[1], score)
+                    entry[2] = max(entry[2], score)
+                    entry[3] += score < CONFIDENCE_THRESHOLD
+                    entry[4] += 1
+
+        # Intent × Difficulty cross matrix
+        key = f"{labels.get('intent', '?')}|{labels.get('difficulty', '?')}"
+        self.cross[key] = self.cross.get(key, 0) + 1
+
+    def result(self):
+        total, success, sums = self.total, self.success, self.sums
+        total_calls = round(sums["llm_calls"])     # packed samples count a share of their request
+        total_pt, total_ct = sums["total_prompt_tokens"], sums["total_completion_tokens"]
+        arb_pt, arb_ct = sums["arbitration_prompt_tokens"], sums["arbitration_completion_tokens"]
+        pack_saved_pt = sums["pack_saved_prompt_tokens"]
+        spec_hits, spec_misses = self.spec_hits, self.spec_misses
+        all_dims = max(total * len(CALL1_DIMS + CALL2_DIMS), 1)
+        conf_stats = {}
+        for dim in CONFIDENCE_DIMS:
+            if dim in self.confidence:
+                score_sum, low, high, below, count = self.confidence[dim]
+                conf_stats[dim] = {
+                    "mean": round(score_sum / count, 3),
+                    "min": round(low, 3),
+                    "max": round(high, 3),
+                    "below_threshold": below,
+                    "count": count,
+                }
+        return {
+            "total_samples": total,
+            "success": success,
+            "failed": total - success,
+            "success_rate": round(success / max(total, 1), 4),
+            "total_llm_calls": total_calls,
+            "avg_calls_per_sample": round(total_calls / max(total, 1), 2),
+            "total_prompt_tokens": total_pt,
+            "total_completion_tokens": total_ct,
+            "total_tokens": total_pt + total_ct,
+            "arbitrated_count": self.arbitrated,
+            "arbitrated_rate": round(self.arbitrated / max(total, 1), 4),
+            "arbitration_calls": sums["arbitration_calls"],
+            "arbitration_prompt_tokens": arb_pt,
+            "arbitration_completion_tokens": arb_ct,
+            "arbitration_tokens_per_sample": round((arb_pt + arb_ct) / max(self.arbitrated, 1)),
+            "arbitration_seconds": round(sums["arbitration_seconds"], 1),
+            "hedged_calls": sums["hedged_calls"],
+            "hedge_rate": round(sums["hedged_calls"] / max(total_calls, 1), 4),
+            "hedge_wins": sums["hedge_wins"],
+            "hedge_extra_tokens": sums["hedge_extra_tokens"],
+            "speculation_hits": spec_hits,
+            "speculation_misses": spec_misses,
+            "speculation_hit_rate": round(spec_hits / max(spec_hits + spec_misses, 1), 4),
+            "speculation_saved_seconds": round(sums["speculation_saved_seconds"], 1),
+            "speculation_wasted_tokens": sums["speculation_wasted_tokens"],
+            "packed_calls": sums["packed_calls"],
+            "pack_saved_requests": round(sums["pack_saved_requests"]),
+            "pack_saved_prompt_tokens": pack_saved_pt,
+            "pack_fallbacks": sums["pack_fallbacks"],
+            "pack_token_savings_rate": round(pack_saved_pt / max(total_pt + pack_saved_pt, 1), 4),
+            "rule_resolved_dims": self.rule_dims,
+            "rule_resolved_rate": round(self.rule_dims / all_dims, 4),
+            "local_model_dims": self.local_dims,
+            "local_model_rate": round(self.local_dims / all_dims, 4),
+            "concept_narrowed": self.concept_narrowed,
+            "concept_full_pool": self.concept_checked - self.concept_narrowed,
+            "concept_narrowed_rate": round(self.concept_narrowed / max(self.concept_checked, 1), 4),
+            "concept_saved_prompt_tokens": sums["concept_saved_prompt_tokens"],
+            "validation_issue_count": self.validation_issues,
+            "consistency_warning_count": self.consistency_warnings,
+            "unmapped_tags": dict(sorted(self.unmapped.items(), key=lambda x: -x[1])),
+            "unmapped_unique_count": len(self.unmapped),
+            "confidence_stats": conf_stats,
+            "low_confidence_frequency": dict(sorted(self.low_confidence.items(), key=lambda x: -x[1])),
+            "tag_distributions": {dim: dict(sorted(dist.items(), key=lambda x: -x[1]))
+                                  for dim, dist in self.distributions.items()},
+            "cross_matrix": self.cross,
+        }
 
 
 # ─────────────────────────────────────────────────────────
 # Streaming I/O + cross-file helpers
 # ─────────────────────────────────────────────────────────
 
+def iter_raw_samples(input_path):
+    """Yield the raw samples of a file one at a time.
+
+    JSONL: line by line. JSON: element by element (json_stream.iter_json_values),
+    a top-level object being a single sample. Memory = 1 raw sample at a time.
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        if str(input_path).endswith(".jsonl"):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from iter_json_values(f)
+
+
 def iter_samples_from_file(input_path, limit=0, shuffle=False):
     """Load and normalize samples from a file with minimal memory overhead.
 
-    JSONL: line-by-line read + normalize_and_slice (memory = 1 raw line at a time).
-    JSON:  json.load then del raw (can't avoid full load, but releases raw ASAP).
+    Raw samples are streamed (iter_raw_samples) and released as soon as
+    normalize_and_slice has run, so only the normalized samples are held.
 
     Returns: (samples_list, n_raw)
     """
@@ -669,25 +1299,10 @@ def iter_samples_from_file(input_path, limit=0, shuffle=False):
     samples = []
     n_raw = 0
 
-    if str(input_path).endswith(".jsonl"):
-        with open(input_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                n_raw += 1
-                raw = json.loads(line)
-                samples.extend(normalize_and_slice(raw))
-                del raw
-    else:
-        with open(input_path, "r", encoding="utf-8") as f:
-            raw_samples = json.load(f)
-        if not isinstance(raw_samples, list):
-            raw_samples = [raw_samples]
-        n_raw = len(raw_samples)
-        for s in raw_samples:
-            samples.extend(normalize_and_slice(s))
-        del raw_samples
+    for raw in iter_raw_samples(input_path):
+        n_raw += 1
+        samples.extend(normalize_and_slice(raw))
+        del raw
 
     for i, s in enumerate(samples):
         if not s.get("id"):
@@ -713,97 +1328,149 @@ class FileCollector:
     samples: list
     label_count: int = 0    # actual LLM labels (sparse)
     inherit_map: dict = field(default_factory=dict)
+    duplicate_map: dict = field(default_factory=dict)   # idx → label markers of a copy, see collapse_duplicates
+    rep_keys: dict = field(default_factory=dict)        # idx → conversation key of a representative
+    pending_duplicates: int = 0                          # duplicates waiting on a representative in flight
     sparse_info: str = ""   # progress bar context string
     done: int = 0
     ok: int = 0
     fail: int = 0
-    labels: list = field(default_factory=list)
-    monitors: list = field(default_factory=list)
+    labels: dict = field(default_factory=dict)          # idx → labels of a sample not written yet
+    monitors: dict = field(default_factory=dict)        # idx → monitor of a sample not written yet
     completed: bool = False
+    stream: bool = False    # write samples as they finish (write_finished), not all at flush
+    labeled_json: bool = True                            # rebuild the pretty labeled.json at flush
+    writer: ResultWriter = None                          # opened on the first written sample
+    inheritors: dict = field(default_factory=dict)      # source idx → sparse slices inheriting its labels
+    failed: dict = field(default_factory=dict)          # idx → (sample id, monitor) of a written failure
+    stats: FileStats = field(default_factory=FileStats) # of the written samples
+    copied_ok: int = 0      # written inherited / duplicate samples with labels
+    timeouts: int = 0       # written samples to label without a monitor
+    restored: int = 0       # samples kept from a previous run (--resume)
 
     def __post_init__(self):
-        # Pre-allocate result slots
-        self.labels = [None] * self.total
-        self.monitors = [None] * self.total
+        for unlabeled_idx, source_idx in self.inherit_map.items():
+            self.inheritors.setdefault(source_idx, []).append(unlabeled_idx)
+
+    @property
+    def ready(self):
+        """All submitted samples are back and every duplicate has its labels."""
+        return (not self.completed and self.done + len(self.duplicate_map) >= self.label_count
+                and self.pending_duplicates == 0)
 
 
-def flush_file_output(collector, run_dir, checkpoint_path, pprint=print):
-    """Write all outputs for a completed file and release memory.
+def write_finished(collector, idx):
+    """Write a sample whose labels are final, then the sparse slices inheriting them.
 
-    Writes labeled.json/jsonl, monitor.jsonl, stats.json, dashboard.
-    Updates checkpoint. Deletes heavy data from collector to free memory.
-    Returns the stats dict.
+    Failed samples also go to failed_samples.jsonl. Written samples are added to
+    collector.stats and released, with their labels and monitor.
+    """
+    if collector.writer is None:
+        collector.writer = ResultWriter(collector.output_dir, collector.prefix)
+    writer = collector.writer
+    sample = collector.samples[idx]
+    labels, monitor = collector.labels.pop(idx, None), collector.monitors.pop(idx, None)
+    writer.write(idx, sample, labels, monitor)
+    account_written(collector, idx, labels, monitor)
+    if labels is None:
+        collector.failed[idx] = (sample.get("id", f"sample-{idx}"), monitor)
+        writer.write_failed(sample)
+    write_inherited(collector, idx, sample.get("id"), labels)
+    collector.samples[idx] = None
+
+
+def write_inherited(collector, source_idx, source_id, labels):
+    """Write the sparse slices inheriting source_idx's labels that are not written yet."""
+    for unlabeled_idx in collector.inheritors.get(source_idx, ()):
+        if unlabeled_idx in collector.writer:
+            continue
+        inherited = None
+        if labels is not None:
+            inherited = dict(labels)
+            for marker in COPY_MARKERS:
+                inherited.pop(marker, None)
+            inherited["inherited"] = True
+            inherited["inherited_from"] = source_id
+        collector.writer.write(unlabeled_idx, collector.samples[unlabeled_idx], inherited, None)
+        account_written(collector, unlabeled_idx, inherited, None)
+        collector.samples[unlabeled_idx] = None
+
+
+def account_written(collector, idx, labels, monitor):
+    """Add a written (or restored) sample to its file's stats."""
+    collector.stats.add(monitor, labels)
+    copied = idx in collector.inherit_map or idx in collector.duplicate_map
+    if copied and labels is not None:
+        collector.copied_ok += 1
+    elif monitor is None and not copied:
+        collector.timeouts += 1
+
+
+def resume_finished(collector, label_indices):
+    """--resume: reopen a file's outputs, keeping the samples its completion log covers.
+
+    Restored samples count in the file's stats as written and are released;
+    duplicates get their duplicate_map entry back from the label markers.
+    Returns the label indices still to label.
+    """
+    ids = [s.get("id") for s in collector.samples]
+    collector.writer = ResultWriter(collector.output_dir, collector.prefix, resume_ids=ids)
+    restored = collector.writer.restored
+    collector.writer.restored = {}
+    collector.restored = len(restored)
+    for idx, (labels, monitor) in restored.items():
+        markers = {m: labels[m] for m in COPY_MARKERS if m in labels}
+        if markers:
+            collector.duplicate_map[idx] = markers
+        account_written(collector, idx, labels, monitor)
+        collector.samples[idx] = None
+    for idx, (labels, _) in restored.items():
+        # Interrupted between a sample and the slices inheriting from it
+        write_inherited(collector, idx, ids[idx], labels)
+    labeled = [i for i in label_indices if i in restored and i not in collector.duplicate_map]
+    collector.done = collector.ok = len(labeled)
+    return [i for i in label_indices if i not in restored]
+
+
+def flush_file_output(collector, run_dir, checkpoint, pprint=print, elapsed=None):
+    """Finish the outputs of a completed file and release memory.
+
+    Writes the samples not written as they finished (all of them in batch mode)
+    to labeled.jsonl/monitor.jsonl, then labeled.json (unless collector.labeled_json
+    is off), stats.json (from collector.stats), dashboard. Updates checkpoint.
+    Deletes heavy data from collector to free memory. Returns the stats dict.
     """
-    samples = collector.samples
-    all_labels = collector.labels
-    all_monitors = collector.monitors
     output_dir = collector.output_dir
     prefix = collector.prefix
     total = collector.total
 
-    # Inherit labels for sparse-sampled slices
-    for unlabeled_idx, source_idx in collector.inherit_map.items():
-        if all_labels[source_idx] is not None:
-            inherited = dict(all_labels[source_idx])
-            inherited["inherited"] = True
-            inherited["inherited_from"] = samples[source_idx].get("id")
-            all_labels[unlabeled_idx] = inherited
-
-    # Attach labels to samples
-    for idx, sample in enumerate(samples):
-        sample["labels"] = all_labels[idx]
-        if all_monitors[idx]:
-            sample["labeling_monitor"] = {
-                "llm_calls": all_monitors[idx]["llm_calls"],
-                "arbitrated": all_monitors[idx]["arbitrated"],
-                "validation_issues": all_monitors[idx]["validation_issues"],
-                "consistency_warnings": all_monitors[idx]["consistency_warnings"],
-            }
+    # Write what is left; sparse slices are written with their source
+    for idx in range(total):
+        if idx not in collector.inherit_map and (collector.writer is None or idx not in collector.writer):
+            write_finished(collector, idx)
+    if collector.writer is None:
+        collector.writer = ResultWriter(output_dir, prefix)
+    writer = collector.writer
+    writer.close()
 
-    # Write outputs
-    output_dir.mkdir(parents=True, exist_ok=True)
     suffix = f"_{prefix}" if prefix else ""
-
-    labeled_json = f"labeled{suffix}.json"
-    labeled_jsonl = f"labeled{suffix}.jsonl"
-    monitor_file = f"monitor{suffix}.jsonl"
     stats_file = f"stats{suffix}.json"
     dashboard_file = f"dashboard{suffix}.html"
-    failed_samples_file = f"failed_samples{suffix}.jsonl"
-
-    with open(output_dir / labeled_json, "w", encoding="utf-8") as f:
-        json.dump(samples, f, ensure_ascii=False, indent=2)
-
-    with open(output_dir / labeled_jsonl, "w", encoding="utf-8") as f:
-        for sample in samples:
-            f.write(json.dumps(sample, ensure_ascii=False) + "\n")
-
-    with open(output_dir / monitor_file, "w", encoding="utf-8") as f:
-        for m in all_monitors:
-            if m:
-                f.write(json.dumps(m, ensure_ascii=False) + "\n")
-
-    # Write failed samples (original, without labels) for easy retry
-    # Inherited samples have no monitor — they are not failures
-    inherited_indices = set(collector.inherit_map.keys())
-    failed_indices = [i for i, l in enumerate(all_labels) if l is None and i not in inherited_indices]
-    if failed_indices:
-        with open(output_dir / failed_samples_file, "w", encoding="utf-8") as f:
-            for i in failed_indices:
-                s = dict(samples[i])
-                s.pop("labels", None)
-                s.pop("labeling_monitor", None)
-                f.write(json.dumps(s, ensure_ascii=False) + "\n")
+    if collector.labeled_json:
+        writer.write_pretty_json()
 
     # Append to global failure log at run_dir root
+    # Inherited samples have no monitor — they are not failures
+    failed_indices = sorted(collector.failed)
     failure_records = []
     for i in failed_indices:
-        m = all_monitors[i]
+        sample_id, m = collector.failed[i]
+        missing = missing_monitor_failure(collector.duplicate_map.get(i))
         record = {
-            "sample_id": samples[i].get("id", f"sample-{i}"),
+            "sample_id": sample_id,
             "source_file": str(collector.abs_path),
-            "status": m["status"] if m else "timeout",
-            "error": (m.get("error", "") if m else f"exceeded {SAMPLE_TIMEOUT}s"),
+            "status": m["status"] if m else missing[0],
+            "error": (m.get("error", "") if m else missing[1]),
             "error_response": (m.get("error_response", "")[:200] if m else ""),
             "attempts": (m.get("sample_attempt", 0) + 1 if m else 0),
         }
@@ -813,18 +1480,25 @@ def flush_file_output(collector, run_dir, checkpoint_path, pprint=print):
             for r in failure_records:
                 f.write(json.dumps(r, ensure_ascii=False) + "\n")
 
-    # Compute and write stats
-    valid_monitors = [m for m in all_monitors if m is not None]
-    stats = compute_stats(valid_monitors, all_labels)
+    # Write stats
+    stats = collector.stats.result()
+    if elapsed is not None:
+        stats["total_elapsed_seconds"] = round(elapsed, 1)
     stats["input_file"] = str(collector.abs_path)
     sparse_inherited = len(collector.inherit_map)
+    propagated = sum(1 for m in collector.duplicate_map.values() if "propagated_from" in m)
+    duplicates = len(collector.duplicate_map) - propagated
     if sparse_inherited > 0:
         stats["sparse_labeled"] = collector.label_count
         stats["sparse_inherited"] = sparse_inherited
-        # Adjust totals: inherited samples count as success
+    if duplicates > 0:
+        stats["duplicate_collapsed"] = duplicates
+    if propagated > 0:
+        stats["near_dup_propagated"] = propagated
+    if sparse_inherited > 0 or collector.duplicate_map:
+        # Adjust totals: inherited and duplicate samples count as success
         stats["total_samples"] = total
-        inherited_ok = sum(1 for i in inherited_indices if all_labels[i] is not None)
-        stats["success"] += inherited_ok
+        stats["success"] += collector.copied_ok
         stats["failed"] = stats["total_samples"] - stats["success"]
         stats["success_rate"] = round(stats["success"] / max(total, 1), 4)
 
@@ -834,20 +1508,22 @@ def flush_file_output(collector, run_dir, checkpoint_path, pprint=print):
     # Per-file dashboard
     try:
         from tools.visualize_labels import generate_dashboard
-        generate_dashboard(output_dir, labeled_file=labeled_json,
+        generate_dashboard(output_dir, labeled_file=writer.labeled_json if collector.labeled_json else writer.labeled_jsonl,
                            stats_file=stats_file, output_file=dashboard_file)
     except Exception:
         pass
 
     success = stats["success"]
     total_tokens = stats["total_tokens"]
-    pprint(f"  ✓ {success}/{total} success, {total_tokens:,} tokens")
+    took = f", {elapsed:.1f}s" if elapsed is not None else ""
+    pprint(f"  ✓ {success}/{total} success{took}, {total_tokens:,} tokens")
 
     # Print failure details — batch into single print to avoid progress bar flicker
     failed_count = len(failed_indices)
     if failed_count > 0:
         lines = []
-        failed_monitors = [all_monitors[i] for i in failed_indices if all_monitors[i] and all_monitors[i]["status"] != "success"]
+        failed_monitors = [collector.failed[i][1] for i in failed_indices]
+        failed_monitors = [m for m in failed_monitors if m and m["status"] != "success"]
         error_groups = {}
         for m in failed_monitors:
             err_type = m["status"]
@@ -866,20 +1542,23 @@ def flush_file_output(collector, run_dir, checkpoint_path, pprint=print):
                 lines.append(f"      {sid} (attempt {attempts}): {detail}")
             if len(monitors) > 3:
                 lines.append(f"      ... and {len(monitors) - 3} more")
-        timeout_count = sum(1 for i, m in enumerate(all_monitors) if m is None and i not in inherited_indices)
-        if timeout_count > 0:
-            lines.append(f"    [timeout] ×{timeout_count} (exceeded {SAMPLE_TIMEOUT}s)")
+        if collector.timeouts > 0:
+            lines.append(f"    [timeout] ×{collector.timeouts} (exceeded {SAMPLE_TIMEOUT}s)")
+        duplicate_failed = sum(1 for i in failed_indices if i in collector.duplicate_map)
+        if duplicate_failed > 0:
+            lines.append(f"    [duplicate_failed] ×{duplicate_failed} (representative failed)")
         pprint("\n".join(lines))
 
-    # Update checkpoint
-    if checkpoint_path:
-        rel_str = str(collector.rel_path)
-        update_checkpoint(checkpoint_path, rel_str, success=True)
+    # Update checkpoint; the completion log is only needed until then
+    if checkpoint is not None:
+        checkpoint.mark(str(collector.rel_path), success=True)
+    writer.remove_log()
 
     # Release memory
     collector.samples = None
     collector.labels = None
     collector.monitors = None
+    collector.failed = None
     collector.completed = True
 
     return stats
@@ -887,11 +1566,20 @@ def flush_file_output(collector, run_dir, checkpoint_path, pprint=print):
 
 async def run_one_file(input_path, output_dir, http_client, sem, model,
                        enable_arbitration=True, limit=0, shuffle=False,
-                       file_prefix=None, progress=None, sample_task=None):
+                       file_prefix=None, progress=None, sample_task=None, cache=None,
+                       rate_limiter=None, hedger=None, call_mode="two-call", speculative_call2=False,
+                       packer=None, arbitration_scope=ARBITRATION_SCOPE, rules=False, concept_narrowing=False,
+                       triage=None, dedup=None, near=None, labeled_json=True, checkpoint=None, resume=False):
     """Label a single file. Writes outputs to output_dir. Returns stats dict.
 
     file_prefix: if set, output files are named e.g. labeled_<prefix>.json
                  instead of labeled.json (avoids name collisions in batch mode).
+    dedup: optional DedupStore — only one sample per conversation key is labeled.
+    near: optional NearDupIndex (needs dedup) — near duplicates of a labeled sample take its labels.
+    labeled_json: also write the pretty labeled.json once the file is done
+                  (labeled.jsonl is written as samples finish either way).
+    checkpoint: Checkpoint marking the file complete once written.
+    resume: keep the samples the completion log of a previous run in output_dir covers.
     """
     # Load input — streaming for JSONL
     samples, n_raw = iter_samples_from_file(input_path, limit=limit, shuffle=shuffle)
@@ -903,28 +1591,41 @@ async def run_one_file(input_path, output_dir, http_client, sem, model,
     label_indices, inherit_map = apply_sparse_sampling(samples)
     label_count = len(label_indices)
     sparse_inherited = len(inherit_map)
+
+    # Duplicate collapse: one representative per conversation key (pre-allocates result slots)
+    collector = FileCollector(file_idx=0, abs_path=Path(input_path), rel_path=Path(Path(input_path).name),
+                              output_dir=output_dir, prefix=file_prefix, total=total, samples=samples,
+                              label_count=label_count, inherit_map=inherit_map,
+                              stream=True, labeled_json=labeled_json)
+    if resume:
+        label_indices = resume_finished(collector, label_indices)
+        pprint(f"  (resumed: {collector.restored} samples already labeled)")
+    waiting = {}
+    submit_order = collapse_duplicates(dedup, collector, label_indices, waiting, near)
+    dup_info = duplicate_info(collector)
     if sparse_inherited > 0:
-        pprint(f"  ({n_raw} conversations → {total} samples, sparse: {label_count} labeled + {sparse_inherited} inherited)")
+        pprint(f"  ({n_raw} conversations → {total} samples, sparse: {label_count} labeled + {sparse_inherited} inherited{dup_info})")
     else:
-        pprint(f"  ({n_raw} conversations → {total} samples)")
+        pprint(f"  ({n_raw} conversations → {total} samples{dup_info})")
 
     # Set up progress bar task — reset timer for this file (track actual labels, not total)
     sparse_info = f" ({total} total, {round(sparse_inherited/total*100)}% sparse)" if sparse_inherited > 0 else ""
     if progress and sample_task is not None:
-        progress.reset(sample_task, total=label_count, completed=0, visible=True, info="starting..." + sparse_info)
+        progress.reset(sample_task, total=len(submit_order), completed=0, visible=True, info="starting..." + sparse_info)
 
-    # Pre-allocate result slots
-    all_labels = [None] * total
-    all_monitors = [None] * total
+    all_labels = collector.labels
+    all_monitors = collector.monitors
 
     # Submit tasks in shuffled order — only for indices that need labeling
-    submit_order = list(label_indices)
     random.shuffle(submit_order)
     tasks = []
     for idx in submit_order:
         tasks.append(label_one(
             http_client, samples[idx], model, idx, total, sem,
-            enable_arbitration=enable_arbitration
+            enable_arbitration=enable_arbitration, cache=cache, rate_limiter=rate_limiter,
+            hedger=hedger, call_mode=call_mode, speculative_call2=speculative_call2, packer=packer,
+            arbitration_scope=arbitration_scope, rules=rules, concept_narrowing=concept_narrowing,
+            triage=triage,
         ))
 
     done_count = 0
@@ -936,6 +1637,8 @@ async def run_one_file(input_path, output_dir, http_client, sem, model,
 
         all_labels[sample_idx] = labels
         all_monitors[sample_idx] = monitor
+        fan_out(dedup, collector, sample_idx, labels, waiting, near)
+        write_finished(collector, sample_idx)
         done_count += 1
 
         if labels:
@@ -944,7 +1647,7 @@ async def run_one_file(input_path, output_dir, http_client, sem, model,
             fail_count += 1
 
         if progress and sample_task is not None:
-            info = f"✓{ok_count}" + (f" ✗{fail_count}" if fail_count else "") + sparse_info
+            info = f"✓{ok_count}" + (f" ✗{fail_count}" if fail_count else "") + sparse_info + limit_info(sem)
             progress.update(sample_task, advance=1, info=info)
         else:
             # Fallback: per-sample print (no progress bar)
@@ -962,158 +1665,38 @@ async def run_one_file(input_path, output_dir, http_client, sem, model,
                     for d in ["intent", "language", "domain", "concept", "task", "constraint", "agentic", "context", "difficulty"]
                 )
                 arb = " [ARB]" if monitor["arbitrated"] else ""
-                print(f"  [{done_count:4d}/{total}] {sid:20s} | {calls} calls {elapsed:5.1f}s | {intent:6s} {diff:12s} | {langs:20s} | {n_tags:2d} tags{arb}")
+                print(f"  [{done_count:4d}/{total}] {sid:20s} | {calls:g} calls {elapsed:5.1f}s | {intent:6s} {diff:12s} | {langs:20s} | {n_tags:2d} tags{arb}")
             else:
-                print(f"  [{done_count:4d}/{total}] {sid:20s} | {calls} calls {elapsed:5.1f}s | FAILED: {status}")
+                print(f"  [{done_count:4d}/{total}] {sid:20s} | {calls:g} calls {elapsed:5.1f}s | FAILED: {status}")
 
-    file_elapsed = time.time() - file_start
-
-    # Inherit labels for sparse-sampled slices
-    for unlabeled_idx, source_idx in inherit_map.items():
-        if all_labels[source_idx] is not None:
-            inherited = dict(all_labels[source_idx])
-            inherited["inherited"] = True
-            inherited["inherited_from"] = samples[source_idx].get("id")
-            all_labels[unlabeled_idx] = inherited
-
-    # Attach labels to samples
-    for idx, sample in enumerate(samples):
-        sample["labels"] = all_labels[idx]
-        if all_monitors[idx]:
-            sample["labeling_monitor"] = {
-                "llm_calls": all_monitors[idx]["llm_calls"],
-                "arbitrated": all_monitors[idx]["arbitrated"],
-                "validation_issues": all_monitors[idx]["validation_issues"],
-                "consistency_warnings": all_monitors[idx]["consistency_warnings"],
-            }
-
-    # Write outputs
-    output_dir.mkdir(parents=True, exist_ok=True)
-    suffix = f"_{file_prefix}" if file_prefix else ""
-
-    labeled_json = f"labeled{suffix}.json"
-    labeled_jsonl = f"labeled{suffix}.jsonl"
-    monitor_file = f"monitor{suffix}.jsonl"
-    stats_file = f"stats{suffix}.json"
-    dashboard_file = f"dashboard{suffix}.html"
-    failed_samples_file = f"failed_samples{suffix}.jsonl"
-
-    with open(output_dir / labeled_json, "w", encoding="utf-8") as f:
-        json.dump(samples, f, ensure_ascii=False, indent=2)
-
-    with open(output_dir / labeled_jsonl, "w", encoding="utf-8") as f:
-        for sample in samples:
-            f.write(json.dumps(sample, ensure_ascii=False) + "\n")
-
-    with open(output_dir / monitor_file, "w", encoding="utf-8") as f:
-        for m in all_monitors:
-            if m:
-                f.write(json.dumps(m, ensure_ascii=False) + "\n")
-
-    # Write failed samples (original, without labels) for easy retry
-    # Inherited samples have no monitor — they are not failures
-    inherited_indices = set(inherit_map.keys())
-    failed_indices = [i for i, l in enumerate(all_labels) if l is None and i not in inherited_indices]
-    if failed_indices:
-        with open(output_dir / failed_samples_file, "w", encoding="utf-8") as f:
-            for i in failed_indices:
-                s = dict(samples[i])
-                s.pop("labels", None)
-                s.pop("labeling_monitor", None)
-                f.write(json.dumps(s, ensure_ascii=False) + "\n")
-
-    # Write failure log
-    if failed_indices:
-        with open(output_dir / "failures.jsonl", "w", encoding="utf-8") as f:
-            for i in failed_indices:
-                m = all_monitors[i]
-                record = {
-                    "sample_id": samples[i].get("id", f"sample-{i}"),
-                    "source_file": str(input_path),
-                    "status": m["status"] if m else "timeout",
-                    "error": (m.get("error", "") if m else f"exceeded {SAMPLE_TIMEOUT}s"),
-                    "error_response": (m.get("error_response", "")[:200] if m else ""),
-                    "attempts": (m.get("sample_attempt", 0) + 1 if m else 0),
-                }
-                f.write(json.dumps(record, ensure_ascii=False) + "\n")
-
-    # Compute and write stats
-    valid_monitors = [m for m in all_monitors if m is not None]
-    stats = compute_stats(valid_monitors, all_labels)
-    stats["total_elapsed_seconds"] = round(file_elapsed, 1)
-    stats["input_file"] = str(input_path)
-    if sparse_inherited > 0:
-        stats["sparse_labeled"] = label_count
-        stats["sparse_inherited"] = sparse_inherited
-        # Adjust totals: inherited samples count as success
-        stats["total_samples"] = total
-        inherited_ok = sum(1 for i in inherited_indices if all_labels[i] is not None)
-        stats["success"] += inherited_ok
-        stats["failed"] = stats["total_samples"] - stats["success"]
-        stats["success_rate"] = round(stats["success"] / max(total, 1), 4)
-
-    with open(output_dir / stats_file, "w", encoding="utf-8") as f:
-        json.dump(stats, f, ensure_ascii=False, indent=2)
-
-    # Per-file dashboard
-    try:
-        from tools.visualize_labels import generate_dashboard
-        generate_dashboard(output_dir, labeled_file=labeled_json,
-                           stats_file=stats_file, output_file=dashboard_file)
-    except Exception:
-        pass
-
-    success = stats["success"]
-    total_tokens = stats["total_tokens"]
-    pprint(f"  ✓ {success}/{total} success, {file_elapsed:.1f}s, {total_tokens:,} tokens")
-
-    # Print failure details for debugging — batch into single print to avoid progress bar flicker
-    failed_count = len(failed_indices)
-    if failed_count > 0:
-        lines = []
-        failed_monitors = [all_monitors[i] for i in failed_indices if all_monitors[i] and all_monitors[i]["status"] != "success"]
-        # Group by error type
-        error_groups = {}
-        for m in failed_monitors:
-            err_type = m["status"]
-            error_groups.setdefault(err_type, []).append(m)
-        lines.append(f"  ✗ {failed_count} failed:")
-        for err_type, monitors in sorted(error_groups.items()):
-            lines.append(f"    [{err_type}] ×{len(monitors)}")
-            for m in monitors[:3]:  # show up to 3 per type
-                sid = m.get("sample_id", "?")
-                err = m.get("error", "")
-                resp = m.get("error_response", "")
-                attempts = m.get("sample_attempt", 0) + 1
-                detail = err[:120]
-                if resp and resp != err:
-                    detail += f" | response: {resp[:80]}"
-                lines.append(f"      {sid} (attempt {attempts}): {detail}")
-            if len(monitors) > 3:
-                lines.append(f"      ... and {len(monitors) - 3} more")
-        # Count timeouts (samples with no monitor entry)
-        timeout_count = sum(1 for i, m in enumerate(all_monitors) if m is None and i not in inherited_indices)
-        if timeout_count > 0:
-            lines.append(f"    [timeout] ×{timeout_count} (exceeded {SAMPLE_TIMEOUT}s)")
-        pprint("\n".join(lines))
-
-    return stats
+    return flush_file_output(collector, output_dir, checkpoint, pprint=pprint, elapsed=time.time() - file_start)
 
 
 async def run_directory_pipeline(dir_files, run_dir, args, model, concurrency,
-                                 checkpoint_path, completed_set=None,
+                                 checkpoint, completed_set=None,
                                  progress=None, file_task=None, sample_task=None,
-                                 http_client=None, sem=None, enable_arbitration=True):
+                                 http_client=None, sem=None, enable_arbitration=True, cache=None,
+                                 rate_limiter=None, hedger=None, call_mode="two-call",
+                                 speculative_call2=False, packer=None, arbitration_scope=ARBITRATION_SCOPE,
+                                 rules=False, concept_narrowing=False, triage=None, dedup=None, near=None):
     """Cross-file pipeline with watermark-based file loading.
 
     Instead of processing files serially, loads new files whenever in-flight
     task count drops below a watermark (concurrency * DIR_PIPELINE_WATERMARK).
     This keeps the semaphore saturated even when some files have long-tail
     samples in retry/backoff. Memory is bounded by DIR_PIPELINE_MAX_FILES.
+    With an AdaptiveConcurrency limiter the watermark follows its current limit.
+    With a DedupStore, a conversation seen in any earlier file (or earlier in the
+    same file) is not submitted again, nor is a near duplicate with a NearDupIndex;
+    a file holding duplicates of samples still in flight elsewhere is written once
+    those representatives are labeled.
 
     Returns list of per-file stats dicts.
     """
-    watermark = int(concurrency * DIR_PIPELINE_WATERMARK)
+    def watermark():
+        limit = sem.limit if isinstance(sem, AdaptiveConcurrency) else concurrency
+        return int(limit * DIR_PIPELINE_WATERMARK)
+
     max_active = DIR_PIPELINE_MAX_FILES
     completed_set = completed_set or set()
     pprint = progress.console.print if progress else print
@@ -1160,10 +1743,6 @@ async def run_directory_pipeline(dir_files, run_dir, args, model, concurrency,
         label_indices, inherit_map = apply_sparse_sampling(samples)
         label_count = len(label_indices)
         sparse_inherited = len(inherit_map)
-        if sparse_inherited > 0:
-            pprint(f"  ({n_raw} conversations → {len(samples)} samples, sparse: {label_count} labeled + {sparse_inherited} inherited)")
-        else:
-            pprint(f"  ({n_raw} conversations → {len(samples)} samples)")
 
         collector = FileCollector(
             file_idx=orig_idx,
@@ -1176,41 +1755,66 @@ async def run_directory_pipeline(dir_files, run_dir, args, model, concurrency,
             label_count=label_count,
             inherit_map=inherit_map,
             sparse_info=f" ({len(samples)} total, {round(sparse_inherited/len(samples)*100)}% sparse)" if sparse_inherited > 0 else "",
+            stream=True,
+            labeled_json=not args.no_labeled_json,
         )
+        if args.resume:
+            label_indices = resume_finished(collector, label_indices)
+            if collector.restored:
+                pprint(f"  (resumed: {collector.restored} samples already labeled)")
+        submit_order = collapse_duplicates(dedup, collector, label_indices, waiting, near)
+        dup_info = duplicate_info(collector)
+        if sparse_inherited > 0:
+            pprint(f"  ({n_raw} conversations → {len(samples)} samples, sparse: {label_count} labeled + {sparse_inherited} inherited{dup_info})")
+        else:
+            pprint(f"  ({n_raw} conversations → {len(samples)} samples{dup_info})")
 
-        # Update samples progress bar total (use label_count, not total samples)
+        # Update samples progress bar total (use submitted samples, not total samples)
         if progress and sample_task is not None:
             current_total = progress.tasks[sample_task].total or 0
-            progress.update(sample_task, total=current_total + label_count, visible=True)
+            progress.update(sample_task, total=current_total + len(submit_order), visible=True)
 
-        # Submit only label_indices (shuffled to avoid convoy effect)
-        submit_order = list(label_indices)
+        # Submit only representatives of label_indices (shuffled to avoid convoy effect)
         random.shuffle(submit_order)
         for idx in submit_order:
             coro = label_one(
                 http_client, samples[idx], model, idx, len(samples), sem,
-                enable_arbitration=enable_arbitration,
+                enable_arbitration=enable_arbitration, cache=cache, rate_limiter=rate_limiter,
+                hedger=hedger, call_mode=call_mode, speculative_call2=speculative_call2, packer=packer,
+                arbitration_scope=arbitration_scope, rules=rules, concept_narrowing=concept_narrowing,
+                triage=triage,
             )
             fut = asyncio.ensure_future(_tagged_label(coro, orig_idx, idx))
             pending_futures.add(fut)
 
         return collector
 
+    # --- Write a file whose samples are all labeled ---
+    def finish(c):
+        all_file_stats.append(flush_file_output(c, run_dir, checkpoint, pprint=pprint))
+        if progress and file_task is not None:
+            progress.update(file_task, advance=1)
+
     # --- Try to load more files if below watermark and within memory limit ---
     def maybe_load_more(pending_futures, collectors, file_queue, next_to_load):
         active_count = sum(1 for c in collectors.values() if not c.completed)
         while (next_to_load < len(file_queue)
-               and len(pending_futures) < watermark
+               and len(pending_futures) < watermark()
                and active_count < max_active):
             entry = file_queue[next_to_load]
             next_to_load += 1
             new_c = load_and_submit(entry, pending_futures)
             collectors[new_c.file_idx] = new_c
-            active_count += 1
+            if new_c.label_count > 0 and new_c.ready:
+                # Every sample to label duplicates an already written file
+                finish(new_c)
+            else:
+                active_count += 1
         return next_to_load
 
     # --- Main loop: watermark-driven ---
     collectors = {}  # file_idx -> FileCollector
+    waiting = {}     # conversation key -> [(collector, idx)] duplicates of a representative in flight
     pending_futures = set()
     all_file_stats = list(skipped_stats)
     file_queue = list(pending_files)
@@ -1235,9 +1839,12 @@ async def run_directory_pipeline(dir_files, run_dir, args, model, concurrency,
             file_idx, sample_idx, labels, monitor = fut.result()
             c = collectors[file_idx]
 
+            touched = []
             if 0 <= sample_idx < c.total:
                 c.labels[sample_idx] = labels
                 c.monitors[sample_idx] = monitor
+                touched = fan_out(dedup, c, sample_idx, labels, waiting, near)
+                write_finished(c, sample_idx)
 
             c.done += 1
             if labels:
@@ -1247,16 +1854,13 @@ async def run_directory_pipeline(dir_files, run_dir, args, model, concurrency,
 
             # Update samples progress bar
             if progress and sample_task is not None:
-                info = f"✓{c.ok}" + (f" ✗{c.fail}" if c.fail else "") + f" [{c.rel_path.name}]" + c.sparse_info
+                info = f"✓{c.ok}" + (f" ✗{c.fail}" if c.fail else "") + f" [{c.rel_path.name}]" + c.sparse_info + limit_info(sem)
                 progress.update(sample_task, advance=1, info=info)
 
-            # Check if this file is fully done (compare against label_count, not total)
-            if c.done >= c.label_count and not c.completed:
-                stats = flush_file_output(c, run_dir, checkpoint_path, pprint=pprint)
-                all_file_stats.append(stats)
-
-                if progress and file_task is not None:
-                    progress.update(file_task, advance=1)
+            # Check if this file (and files holding its duplicates) is fully done
+            for done_c in [c] + touched:
+                if done_c.ready:
+                    finish(done_c)
 
         # After processing batch of completions, check if we should load more files
         next_to_load = maybe_load_more(pending_futures, collectors, file_queue, next_to_load)
@@ -1269,14 +1873,341 @@ async def run_directory_pipeline(dir_files, run_dir, args, model, concurrency,
     # Handle any files with 0 labels to submit (edge case: 0 samples or all inherited)
     for c in collectors.values():
         if not c.completed and c.label_count == 0:
-            stats = flush_file_output(c, run_dir, checkpoint_path, pprint=pprint)
-            all_file_stats.append(stats)
-            if progress and file_task is not None:
-                progress.update(file_task, advance=1)
+            finish(c)
 
     return all_file_stats
 
 
+# ─────────────────────────────────────────────────────────
+# Batch transport (--transport batch, see batch_api.py)
+# ─────────────────────────────────────────────────────────
+
+def _batch_request_ids(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line)["custom_id"] for line in f if line.strip()]
+
+
+async def _submit_batch(client, state, batch_dir, key, requests, model, temperature, max_tokens, pprint=print):
+    """Write one batch input file, upload it and create the batch (each step checkpointed)."""
+    input_path = batch_dir / f"{key}.jsonl"
+    with open(input_path, "w", encoding="utf-8") as f:
+        for cid, messages in requests.items():
+            line = request_line(cid, model, messages, temperature, max_tokens)
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    state.update(key, input=str(input_path), requests=len(requests), status="written")
+    file_id = await client.upload(input_path)
+    state.update(key, file_id=file_id, status="uploaded")
+    batch = await client.create(file_id, metadata={"run": batch_dir.parent.name, "key": key})
+    state.update(key, batch_id=batch["id"], status=batch.get("status", "validating"))
+    pprint(f"  ⇪ batch {key}: {len(requests)} requests → {batch['id']}")
+
+
+async def _collect_batch(client, state, batch_dir, key, poll_interval, pprint=print):
+    """Wait for a submitted batch and download its results.
+
+    Re-attaches to whatever step an interrupted run reached (written / uploaded /
+    submitted / downloaded). Returns {custom_id: (content_or_None, usage, error, status_code)}.
+    """
+    entry = state.batches[key]
+    output_path = batch_dir / f"{key}.results.jsonl"
+    errors_path = batch_dir / f"{key}.errors.jsonl"
+
+    if entry.get("status") != "downloaded":
+        if not entry.get("batch_id"):
+            file_id = entry.get("file_id") or await client.upload(entry["input"])
+            batch = await client.create(file_id, metadata={"run": batch_dir.parent.name, "key": key})
+            entry = state.update(key, file_id=file_id, batch_id=batch["id"], status=batch.get("status"))
+
+        def on_poll(b):
+            if b.get("status") != state.batches[key].get("status"):
+                state.update(key, status=b.get("status"), counts=b.get("request_counts"))
+
+        batch = await client.wait(entry["batch_id"], poll_interval, on_poll=on_poll)
+        if batch.get("output_file_id"):
+            await client.download(batch["output_file_id"], output_path)
+        if batch.get("error_file_id"):
+            await client.download(batch["error_file_id"], errors_path)
+        state.update(key, status="downloaded", batch_status=batch.get("status"),
+                     counts=batch.get("request_counts"))
+        counts = batch.get("request_counts") or {}
+        pprint(f"  ⇩ batch {key}: {batch.get('status')} "
+               f"({counts.get('completed', '?')} ok, {counts.get('failed', '?')} failed)")
+
+    results = {}
+    for path in (errors_path, output_path):   # output entries win over error entries
+        if path.exists():
+            results.update(read_result_lines(path))
+    return results
+
+
+async def run_batch_phase(client, state, run_dir, name, requests, model, temperature=0.1, max_tokens=1000,
+                          cache=None, poll_interval=BATCH_POLL_INTERVAL, pprint=print):
+    """Run one dependency level of LLM calls as batch jobs.
+
+    requests: {custom_id: messages}. Cached responses are served locally; the rest go
+    out in batches of up to BATCH_MAX_REQUESTS. Failed requests are re-submitted in
+    later rounds (up to SAMPLE_MAX_RETRIES) unless the error is non-retryable (HTTP 400).
+    Batches are keyed "<name>-r<round>-<chunk>" in `state`, so a resumed run picks up
+    the batches an earlier run already submitted.
+
+    Returns {custom_id: (parsed_or_None, raw, usage)} with usage["batch_attempts"].
+    """
+    batch_dir = run_dir / "batches"
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    results, failures, attempts = {}, {}, {}
+    if cache is not None and not cache.cacheable(temperature):
+        cache = None
+    to_store = []   # (key, model, content, usage) of harvested responses, stored per harvest
+
+    def harvest(submitted, out):
+        for cid in submitted:
+            if cid in requests:
+                attempts[cid] = attempts.get(cid, 0) + 1
+        for cid, (content, usage, error, status) in out.items():
+            if cid not in requests or cid in results:
+                continue
+            if content is not None:
+                try:
+                    results[cid] = (parse_llm_json(content), content, usage)
+                    if cache is not None:
+                        to_store.append((TEMPLATES.cache_key(model, requests[cid], temperature, max_tokens),
+                                         model, content, usage))
+                    continue
+                except json.JSONDecodeError as e:
+                    error = f"ParseError: {e}"
+            failure = (None, content or error or "", {**usage, "error": error or "unknown"})
+            if status == 400:
+                failure[2]["non_retryable"] = True
+                results[cid] = failure
+            else:
+                failures[cid] = failure
+
+    async def store_harvested():
+        if to_store:
+            await cache.store_many(list(to_store))
+            to_store.clear()
+
+    if cache is not None:
+        cids = list(requests)
+        hits = await cache.lookup_many([TEMPLATES.cache_key(model, requests[cid], temperature, max_tokens)
+                                        for cid in cids])
+        for cid, hit in zip(cids, hits):
+            if hit is not None:
+                content, usage = hit
+                try:
+                    results[cid] = (parse_llm_json(content), content, {**usage, "cached": True})
+                except json.JSONDecodeError:
+                    pass
+
+    # Batches submitted by an earlier (interrupted) run of this phase
+    prior = sorted(k for k in state.batches if k.startswith(f"{name}-r"))
+    next_round = 0
+    if prior:
+        outs = await asyncio.gather(*(_collect_batch(client, state, batch_dir, k, poll_interval, pprint)
+                                      for k in prior))
+        for key, out in zip(prior, outs):
+            harvest(_batch_request_ids(state.batches[key]["input"]), out)
+        await store_harvested()
+        next_round = max(int(k.split("-")[1][1:]) for k in prior) + 1
+
+    for rnd in range(next_round, SAMPLE_MAX_RETRIES + 1):
+        pending = [cid for cid in requests if cid not in results]
+        if not pending:
+            break
+        chunks = [pending[i:i + BATCH_MAX_REQUESTS] for i in range(0, len(pending), BATCH_MAX_REQUESTS)]
+        keys = [f"{name}-r{rnd}-{ci}" for ci in range(len(chunks))]
+        for key, chunk in zip(keys, chunks):
+            await _submit_batch(client, state, batch_dir, key, {cid: requests[cid] for cid in chunk},
+                                model, temperature, max_tokens, pprint)
+        outs = await asyncio.gather(*(_collect_batch(client, state, batch_dir, k, poll_interval, pprint)
+                                      for k in keys))
+        for chunk, out in zip(chunks, outs):
+            harvest(chunk, out)
+        await store_harvested()
+
+    for cid in requests:
+        if cid not in results:
+            results[cid] = failures.get(cid, (None, "", {"prompt_tokens": 0, "completion_tokens": 0,
+                                                         "error": "missing from batch output"}))
+        results[cid][2]["batch_attempts"] = attempts.get(cid, 0)
+    return results
+
+
+async def run_batch_transport(file_entries, run_dir, http_client, model, cache=None, checkpoint=None,
+                              completed_set=None, limit=0, enable_arbitration=True, call_mode="two-call",
+                              arbitration_scope=ARBITRATION_SCOPE, poll_interval=BATCH_POLL_INTERVAL,
+                              rules=False, concept_narrowing=False, triage=None, dedup=None, near=None,
+                              labeled_json=True, pprint=print):
+    """Label files through the Batch API instead of per-sample HTTP calls.
+
+    All pending samples of all files move through the same dependency levels together:
+    Call 1 (or fused) → Call 2 (with the real Call 1 context) → arbitration reruns.
+    Each level is one run_batch_phase; labels are built with the same validation /
+    merge helpers as label_one and written with flush_file_output.
+
+    file_entries: [(abs_path, rel_path)] from discover_input_files; rel_path None =
+    single-file mode (outputs directly in run_dir). Returns list of per-file stats.
+    """
+    client = BatchClient(http_client)
+    state = BatchState(run_dir / "batch_state.json")
+    completed_set = completed_set or set()
+    fused = call_mode == "fused"
+
+    # Load files + per-sample context
+    collectors, work, waiting = [], {}, {}
+    for fi, (abs_path, rel_path) in enumerate(file_entries):
+        if rel_path is not None and str(rel_path) in completed_set:
+            pprint(f"[File {fi+1:3d}/{len(file_entries)}] {rel_path} — SKIPPED (completed)")
+            continue
+        samples, n_raw = iter_samples_from_file(abs_path, limit=limit)
+        label_indices, inherit_map = apply_sparse_sampling(samples)
+        if rel_path is None:
+            output_dir, prefix, rel = run_dir, None, Path(abs_path.name)
+        else:
+            output_dir, prefix, rel = run_dir / rel_path.with_suffix(""), rel_path.stem, rel_path
+        c = FileCollector(file_idx=fi, abs_path=abs_path, rel_path=rel, output_dir=output_dir, prefix=prefix,
+                          total=len(samples), samples=samples, label_count=len(label_indices),
+                          inherit_map=inherit_map, labeled_json=labeled_json)
+        collectors.append(c)
+        submit = collapse_duplicates(dedup, c, label_indices, waiting, near)
+        pprint(f"[File {fi+1:3d}/{len(file_entries)}] {rel}: {n_raw} raw → {len(samples)} samples, "
+               f"{len(submit)} to label{duplicate_info(c)}")
+        for idx in submit:
+            sample = samples[idx]
+            truncated_convs, was_truncated = truncate_conversations_for_labeling(
+                sample.get("conversations", []), max_total_chars=MAX_CONVERSATION_CHARS)
+            monitor = new_monitor(sample, idx)
+            monitor["transport"] = "batch"
+            if was_truncated:
+                monitor["truncated"] = True
+            if fused:
+                monitor["call_mode"] = "fused"
+            signals = preprocess(sample)
+            resolved = resolve_rules(signals) if rules else {}
+            if resolved:
+                monitor["rule_dims"] = {d: r["rule"] for d, r in resolved.items()}
+            local = triage_labels(triage, sample, signals, monitor, resolved)
+            work[f"{fi}:{idx}"] = {
+                "collector": c, "idx": idx, "monitor": monitor, "labels": None,
+                "conv": json.dumps(truncated_convs, ensure_ascii=False),
+                "signals": format_signals_for_prompt(signals), "rules": {**resolved, **local}, "local": local,
+            }
+
+    def account(w, usage):
+        m = w["monitor"]
+        m["llm_calls"] += 1
+        m["total_prompt_tokens"] += usage.get("prompt_tokens", 0)
+        m["total_completion_tokens"] += usage.get("completion_tokens", 0)
+        m["sample_attempt"] = max(m["sample_attempt"], usage.get("batch_attempts", 1) - 1)
+
+    def fail(w, status, raw, usage):
+        m = w["monitor"]
+        m["status"] = status
+        m["error"] = usage.get("error", "unknown")
+        m["error_response"] = raw[:500] if raw else ""
+
+    # Phase 1: Call 1 (or fused)
+    first = "fused" if fused else "call1"
+    build_first = build_fused_messages if fused else build_call1_messages
+    first_dims = CALL1_DIMS + CALL2_DIMS if fused else CALL1_DIMS
+    msgs1 = {cid: build_first(w["conv"], w["signals"], drop=[d for d in w["rules"] if d in first_dims])
+             for cid, w in work.items()}
+    pprint(f"── {first}: {len(msgs1)} requests")
+    res1 = await run_batch_phase(client, state, run_dir, first, msgs1, model, cache=cache,
+                                 poll_interval=poll_interval, pprint=pprint)
+    for cid, (parsed, raw, usage) in res1.items():
+        w = work[cid]
+        account(w, usage)
+        if parsed is None:
+            fail(w, f"{first}_failed", raw, usage)
+            continue
+        parsed = apply_rule_labels(parsed, w["rules"], first_dims)
+        cleaned, issues = validate_tags(parsed, first)
+        w["monitor"]["validation_issues"].extend(issues)
+        if fused:
+            w["labels"] = fused_labels(cleaned)
+            w["reruns"] = [(msgs1[cid], "fused", set(CALL1_DIMS + CALL2_DIMS))]
+        else:
+            w["call1"] = cleaned
+
+    # Phase 2: Call 2 on the real Call 1 context
+    if not fused:
+        msgs2 = {}
+        for cid, w in work.items():
+            if "call1" in w:
+                call1_context = {d: w["call1"][d] for d in CALL1_DIMS if d in w["call1"]}
+                drop2 = [d for d in w["rules"] if d in CALL2_DIMS]
+                concepts = narrow_concepts(w["monitor"], w["call1"], drop2) if concept_narrowing else None
+                msgs2[cid] = build_call2_messages(w["conv"], w["signals"], call1_context, drop=drop2,
+                                                  concepts=concepts)
+        pprint(f"── call2: {len(msgs2)} requests")
+        res2 = await run_batch_phase(client, state, run_dir, "call2", msgs2, model, cache=cache,
+                                     poll_interval=poll_interval, pprint=pprint)
+        for cid, (parsed, raw, usage) in res2.items():
+            w = work[cid]
+            account(w, usage)
+            if parsed is None:
+                fail(w, "call2_failed", raw, usage)
+                w["labels"] = call1_only_labels(w["call1"])   # partial, no arbitration
+                continue
+            parsed = apply_rule_labels(parsed, w["rules"], CALL2_DIMS)
+            cleaned, issues = validate_tags(parsed, "call2")
+            w["monitor"]["validation_issues"].extend(issues)
+            w["labels"] = merge_call_labels(w["call1"], cleaned)
+            w["reruns"] = [(msgs1[cid], "call1", set(CALL1_DIMS)), (msgs2[cid], "call2", set(CALL2_DIMS))]
+
+    # Phase 3: consistency + arbitration reruns
+    arb = {}
+    for cid, w in work.items():
+        if "reruns" not in w:
+            continue
+        m = w["monitor"]
+        m["consistency_warnings"] = check_consistency(w["labels"])
+        w["low_conf"] = find_low_confidence_dims(w["labels"])
+        m["low_confidence_dims"] = [{"dim": d, "conf": s} for d, s in w["low_conf"]]
+        if w["low_conf"] and enable_arbitration:
+            m["arbitrated"] = True
+            if arbitration_scope == "dimension":
+                for d, _ in w["low_conf"]:
+                    if d in ARBITRATION_SYSTEMS:
+                        arb[f"{cid}:{d}"] = build_arbitration_messages(d, w["conv"], w["signals"], w["labels"])
+            else:
+                for msgs, call_name, call_dims in w["reruns"]:
+                    if any(d in call_dims for d, _ in w["low_conf"]):
+                        arb[f"{cid}:{call_name}"] = msgs
+    if arb:
+        pprint(f"── arbitration: {len(arb)} requests")
+        # Narrow prompts and full re-runs never share a phase: scope is part of the phase name
+        res3 = await run_batch_phase(client, state, run_dir, f"arbitration_{arbitration_scope}", arb, model,
+                                     temperature=ARBITRATION_TEMPERATURE,
+                                     max_tokens=ARBITRATION_MAX_TOKENS if arbitration_scope == "dimension" else 1000,
+                                     cache=cache, poll_interval=poll_interval, pprint=pprint)
+        for acid, (parsed, raw, usage) in res3.items():
+            cid, name = acid.rsplit(":", 1)
+            w = work[cid]
+            account(w, usage)
+            record_arbitration(w["monitor"], usage)
+            if parsed:
+                dims = {name} if arbitration_scope == "dimension" else next(
+                    dims for _, call_name, dims in w["reruns"] if call_name == name)
+                rerun_clean, _ = validate_tags(parsed, name)
+                apply_rerun(w["labels"], w["low_conf"], rerun_clean, dims)
+
+    # Same output path as the HTTP transport
+    for w in work.values():
+        if "reruns" in w:
+            mark_local_labels(w["labels"], w["local"],
+                              [d for d, _ in w["low_conf"]] if w["monitor"]["arbitrated"] else ())
+        w["collector"].labels[w["idx"]] = w["labels"]
+        w["collector"].monitors[w["idx"]] = w["monitor"]
+        fan_out(dedup, w["collector"], w["idx"], w["labels"], waiting, near)
+    all_file_stats = []
+    for c in collectors:
+        pprint(f"[File {c.file_idx+1:3d}/{len(file_entries)}] {c.rel_path}")
+        all_file_stats.append(flush_file_output(c, run_dir, checkpoint, pprint=pprint))
+    return all_file_stats
+
+
 def print_summary(stats, run_dir, is_batch=False):
     """Print final summary to stdout."""
     print(f"\n{'='*80}")
@@ -1290,12 +2221,28 @@ def print_summary(stats, run_dir, is_batch=False):
     print(f"LLM calls:   {stats['total_llm_calls']} total, {stats.get('avg_calls_per_sample', 0):.1f} avg/sample")
     print(f"Tokens:      {stats['total_tokens']:,}")
     print(f"Arbitrated:  {stats['arbitrated_count']} ({stats.get('arbitrated_rate', 0)*100:.1f}%)")
+    if stats.get('rule_resolved_dims'):
+        print(f"Rules:       {stats['rule_resolved_dims']} dimensions labeled locally "
+              f"({stats.get('rule_resolved_rate', 0)*100:.1f}% of all)")
+    if stats.get('local_model_dims'):
+        print(f"Triage:      {stats['local_model_dims']} dimensions pre-labeled by the local model "
+              f"({stats.get('local_model_rate', 0)*100:.1f}% of all)")
+    if stats.get('concept_narrowed'):
+        print(f"Concepts:    {stats['concept_narrowed']} Call 2 prompts narrowed "
+              f"({stats.get('concept_narrowed_rate', 0)*100:.1f}%), "
+              f"~{stats.get('concept_saved_prompt_tokens', 0):,} prompt tokens saved")
     print(f"Unmapped:    {stats.get('unmapped_unique_count', 0)} unique out-of-pool tags")
     sparse_labeled = stats.get('sparse_labeled', 0)
     sparse_inherited = stats.get('sparse_inherited', 0)
     if sparse_inherited > 0:
         saving = round(sparse_inherited / (sparse_labeled + sparse_inherited) * 100)
         print(f"Sparse:      {sparse_labeled} labeled + {sparse_inherited} inherited ({saving}% saved)")
+    if stats.get('duplicate_collapsed'):
+        print(f"Duplicates:  {stats['duplicate_collapsed']} samples collapsed onto an identical conversation "
+              f"({stats['duplicate_collapsed'] / max(stats['total_samples'], 1) * 100:.1f}%)")
+    if stats.get('near_dup_propagated'):
+        print(f"Near-dup:    {stats['near_dup_propagated']} samples took the labels of a near-duplicate "
+              f"({stats['near_dup_propagated'] / max(stats['total_samples'], 1) * 100:.1f}%)")
     total_samples = stats.get('total_samples', 0)
     if elapsed > 0 and total_samples > 0:
         print(f"Throughput:  {total_samples / elapsed:.1f} samples/sec")
@@ -1320,7 +2267,9 @@ def print_summary(stats, run_dir, is_batch=False):
     print(f"\nRun dir: {run_dir}")
 
 
-def _write_global_summary(all_file_stats, run_dir, input_path, model, concurrency, batch_start):
+def _write_global_summary(all_file_stats, run_dir, input_path, model, concurrency, batch_start, cache=None,
+                          limiter=None, rate_limiter=None, hedger=None, call_mode="two-call", packer=None,
+                          transport="http", endpoint_pool=None):
     """Write global summary stats + dashboard for a batch run."""
     batch_elapsed = time.time() - batch_start
     summary = merge_stats(all_file_stats) if all_file_stats else {
@@ -1330,11 +2279,26 @@ def _write_global_summary(all_file_stats, run_dir, input_path, model, concurrenc
         "files_processed": 0,
     }
     summary["model"] = model
+    summary["call_mode"] = call_mode
+    summary["transport"] = transport
     summary["concurrency"] = concurrency
     summary["total_elapsed_seconds"] = round(batch_elapsed, 1)
     summary["timestamp"] = datetime.now().isoformat()
     summary["input_path"] = str(input_path)
     summary["run_dir"] = str(run_dir)
+    if cache is not None:
+        summary["cache"] = cache.stats()
+    if limiter is not None:
+        summary["concurrency_controller"] = limiter.stats()
+    if rate_limiter is not None:
+        summary["rate_limits"] = rate_limiter.stats()
+    if hedger is not None:
+        summary["hedging"] = hedger.stats()
+    if packer is not None:
+        summary["packing"] = packer.stats()
+    if endpoint_pool is not None:
+        summary["endpoint_pool"] = endpoint_pool.stats()
+        endpoint_pool.write(run_dir)
 
     with open(run_dir / "summary_stats.json", "w", encoding="utf-8") as f:
         json.dump(summary, f, ensure_ascii=False, indent=2)
@@ -1353,19 +2317,155 @@ def _write_global_summary(all_file_stats, run_dir, input_path, model, concurrenc
     print_summary(summary, run_dir, is_batch=True)
 
 
+def create_http_client(max_connections, endpoint_pool=None):
+    """Run-wide httpx client; with an EndpointPool, chat completions are routed through it."""
+    limits = httpx.Limits(max_connections=max_connections + 10, max_keepalive_connections=max_connections)
+    transport = endpoint_pool.transport(limits=limits) if endpoint_pool is not None else None
+    return httpx.AsyncClient(proxy=None, timeout=REQUEST_TIMEOUT, limits=limits, transport=transport)
+
+
+def create_endpoint_pool(args):
+    """EndpointPool from --endpoints or LITELLM_BASES; None means plain LITELLM_BASE."""
+    try:
+        return EndpointPool.from_spec(args.endpoints)
+    except ValueError as e:
+        print(f"Error: invalid endpoint list: {e}")
+        sys.exit(1)
+
+
+def create_limiter(args, concurrency):
+    """Build the in-flight sample limiter: AIMD by default, fixed with --fixed-concurrency.
+
+    AIMD cuts below --concurrency under congestion and recovers up to it; it only
+    grows past it up to an explicit --max-concurrency.
+    """
+    adaptive = ADAPTIVE_CONCURRENCY and not args.fixed_concurrency
+    max_limit = (args.max_concurrency or concurrency) if adaptive else concurrency
+    return AdaptiveConcurrency(concurrency, max_limit=max_limit, adaptive=adaptive)
+
+
+def create_rate_limiter(args, model):
+    """Per-model RPM/TPM limiter; --rpm/--tpm override config.MODELS for the run model."""
+    overrides = {k: v for k, v in (("rpm", args.rpm), ("tpm", args.tpm)) if v}
+    return RateLimiter(overrides={model: overrides} if overrides else None)
+
+
+def create_hedger(args):
+    """Hedger for --hedge runs; --hedge-model takes a model ID or a PIPELINE_DEFAULTS key."""
+    if not args.hedge:
+        return None
+    hedge_model = PIPELINE_DEFAULTS.get(args.hedge_model, args.hedge_model) if args.hedge_model else None
+    return Hedger(hedge_model=hedge_model, max_share=args.hedge_max_share)
+
+
+def create_packer(args, http_client, model, cache, sem, rate_limiter):
+    """--pack: RequestPacker sending through the run's client, cache and limiters."""
+    if not args.pack:
+        return None
+
+    def send(messages, max_tokens):
+        return async_llm_call(http_client, messages, model, max_tokens=max_tokens, cache=cache,
+                              limiter=sem if isinstance(sem, AdaptiveConcurrency) else None,
+                              rate_limiter=rate_limiter)
+    return RequestPacker(send, pack_size=args.pack_size)
+
+
+def create_dedup(run_dir, enabled=False):
+    """Run-scoped DedupStore in run_dir with --dedup, else None."""
+    return DedupStore(run_dir / DEDUP_STORE_NAME) if enabled else None
+
+
+def near_dup_threshold(args):
+    return args.near_dup_threshold if args.near_dup else None
+
+
+def create_near_dup(threshold):
+    """--near-dup: in-memory NearDupIndex for this run, or None (threshold None)."""
+    return NearDupIndex(threshold=threshold) if threshold is not None else None
+
+
+async def run_batch_mode(args, cache, run_dir, batch_config):
+    """--transport batch entry point for new and resumed runs (single file or directory)."""
+    state = BatchState(run_dir / "batch_state.json")
+    if not state.config:
+        state.config = batch_config
+        state.save()
+    config = state.config
+    input_path = Path(config["input_path"])
+    files = discover_input_files(input_path)
+    dir_files = [(a, r) for a, r in files if r is not None]
+    checkpoint, completed = None, set()
+    if dir_files:
+        checkpoint = Checkpoint.load(run_dir / "checkpoint.json")
+        if checkpoint is None:
+            checkpoint = Checkpoint.create(run_dir / "checkpoint.json", dir_files)
+        elif checkpoint.status == "done":
+            print(f"All files already completed in {run_dir}")
+            return
+        else:
+            completed = checkpoint.completed
+    entries = dir_files or [(input_path, None)]
+
+    batch_start = time.time()
+    dedup = create_dedup(run_dir, config.get("dedup", False))
+    async with httpx.AsyncClient(proxy=None, timeout=REQUEST_TIMEOUT) as http_client:
+        all_file_stats = await run_batch_transport(
+            entries, run_dir, http_client, config["model"], cache=cache,
+            checkpoint=checkpoint, completed_set=completed, limit=config["limit"],
+            enable_arbitration=config["arbitration"], call_mode=config["call_mode"],
+            arbitration_scope=config.get("arbitration_scope", "call"), rules=config.get("rules", False),
+            concept_narrowing=config.get("concept_narrowing", False), triage=load_triage(config.get("triage_model")),
+            dedup=dedup, near=create_near_dup(config.get("near_dup")), poll_interval=args.batch_poll_interval,
+            labeled_json=config.get("labeled_json", True),
+        )
+    if dedup is not None:
+        dedup.close()
+
+    if dir_files:
+        _write_global_summary(all_file_stats, run_dir, input_path, config["model"], None, batch_start,
+                              cache=cache, call_mode=config["call_mode"], transport="batch")
+        return
+    stats = all_file_stats[0]
+    stats["model"] = config["model"]
+    stats["call_mode"] = config["call_mode"]
+    stats["transport"] = "batch"
+    stats["total_elapsed_seconds"] = round(time.time() - batch_start, 1)
+    stats["timestamp"] = datetime.now().isoformat()
+    stats["run_dir"] = str(run_dir)
+    stats["cache"] = cache.stats()
+    with open(run_dir / "stats.json", "w", encoding="utf-8") as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+    print_summary(stats, run_dir)
+    print(f"Output:  {run_dir / ('labeled.json' if config.get('labeled_json', True) else 'labeled.jsonl')}")
+    print(f"Batches: {run_dir / 'batch_state.json'}")
+
+
 async def run_pipeline(args):
+    cache = ResponseCache(LLM_CACHE_PATH, mode=args.cache_mode)
+    try:
+        await _run_pipeline(args, cache)
+    finally:
+        cache.close()
+
+
+async def _run_pipeline(args, cache):
+    triage = load_triage(args.triage_model)
     # ── Resume mode ──────────────────────────────────────
     if args.resume:
         run_dir = Path(args.resume)
         if not run_dir.is_dir():
             print(f"Error: --resume path does not exist: {run_dir}")
             sys.exit(1)
-        checkpoint_path = run_dir / "checkpoint.json"
-        ckpt = load_checkpoint(checkpoint_path)
-        if ckpt is None:
+        if (run_dir / "batch_state.json").exists():
+            # Batch transport run: settings live in batch_state.json
+            print(f"Resuming batch transport run: {run_dir}")
+            await run_batch_mode(args, cache, run_dir, None)
+            return
+        checkpoint = Checkpoint.load(run_dir / "checkpoint.json")
+        if checkpoint is None:
             print(f"Error: no checkpoint.json in {run_dir}")
             sys.exit(1)
-        if ckpt.get("status") == "done":
+        if checkpoint.status == "done":
             print(f"All files already completed in {run_dir}")
             return
 
@@ -1376,54 +2476,70 @@ async def run_pipeline(args):
                 prev_summary = json.load(f)
             input_path = Path(prev_summary.get("input_path", args.input))
             model = prev_summary.get("model", args.model)
+            call_mode = prev_summary.get("call_mode", args.call_mode)
         else:
-            input_path = Path(args.input)
-            model = args.model
+            input_path = Path(checkpoint.settings.get("input_path", args.input))
+            model = checkpoint.settings.get("model", args.model)
+            call_mode = checkpoint.settings.get("call_mode", args.call_mode)
 
         files = discover_input_files(input_path)
         dir_files = [(a, r) for a, r in files if r is not None]
-        if not dir_files:
-            print("Error: --resume only works with directory-mode runs")
+        if not dir_files and not input_path.is_file():
+            print(f"Error: --resume input not found: {input_path}")
             sys.exit(1)
-
-        completed = set(ckpt.get("completed", []))
-        concurrency = args.concurrency
-
-        print(f"{'='*80}")
-        print(f"SFT Auto-Labeling Pipeline — RESUME")
-        print(f"{'='*80}")
-        print(f"Run dir:     {run_dir}")
-        print(f"Model:       {model}")
-        print(f"Completed:   {len(completed)}/{len(dir_files)} files")
-        print(f"Concurrency: {concurrency}")
-        print(f"{'='*80}\n")
-
-        batch_start = time.time()
-
-        async with httpx.AsyncClient(
-            proxy=None,
-            timeout=REQUEST_TIMEOUT,
-            limits=httpx.Limits(
-                max_connections=concurrency + 10,
-                max_keepalive_connections=concurrency,
-            ),
-        ) as http_client:
-            sem = asyncio.Semaphore(concurrency)
-            n = len(dir_files)
-            with create_progress() as progress:
-                file_task = progress.add_task("Files", total=n, info="")
-                sample_task = progress.add_task("Samples", total=0, visible=False, info="starting...")
-                all_file_stats = await run_directory_pipeline(
-                    dir_files, run_dir, args, model, concurrency,
-                    checkpoint_path, completed_set=completed,
-                    progress=progress, file_task=file_task, sample_task=sample_task,
-                    http_client=http_client, sem=sem,
-                    enable_arbitration=not args.no_arbitration,
-                )
-
-        # Write global summary
-        _write_global_summary(all_file_stats, run_dir, input_path, model, concurrency, batch_start)
-        return
+        if not dir_files:
+            # Single-file run: the normal path below labels it again in run_dir,
+            # keeping the samples its completion log covers
+            args.input, args.output, args.model, args.call_mode = str(input_path), str(run_dir), model, call_mode
+        else:
+            completed = checkpoint.completed
+            concurrency = args.concurrency
+            sem = create_limiter(args, concurrency)
+            rate_limiter = create_rate_limiter(args, model)
+            hedger = create_hedger(args)
+            endpoint_pool = create_endpoint_pool(args)
+            dedup = create_dedup(run_dir, args.dedup)
+
+            print(f"{'='*80}")
+            print(f"SFT Auto-Labeling Pipeline — RESUME")
+            print(f"{'='*80}")
+            print(f"Run dir:     {run_dir}")
+            print(f"Model:       {model}")
+            print(f"Call mode:   {call_mode}")
+            print(f"Completed:   {len(completed)}/{len(dir_files)} files")
+            print(f"Concurrency: {concurrency}" + (f" (adaptive, max {sem.max_limit})" if sem.adaptive else ""))
+            if endpoint_pool is not None:
+                print(f"Endpoints:   {len(endpoint_pool.endpoints)}")
+            print(f"{'='*80}\n")
+
+            batch_start = time.time()
+
+            async with create_http_client(sem.max_limit, endpoint_pool) as http_client:
+                packer = create_packer(args, http_client, model, cache, sem, rate_limiter)
+                n = len(dir_files)
+                with create_progress() as progress:
+                    file_task = progress.add_task("Files", total=n, info="")
+                    sample_task = progress.add_task("Samples", total=0, visible=False, info="starting...")
+                    all_file_stats = await run_directory_pipeline(
+                        dir_files, run_dir, args, model, concurrency,
+                        checkpoint, completed_set=completed,
+                        progress=progress, file_task=file_task, sample_task=sample_task,
+                        http_client=http_client, sem=sem,
+                        enable_arbitration=not args.no_arbitration, cache=cache,
+                        rate_limiter=rate_limiter, hedger=hedger, call_mode=call_mode,
+                        speculative_call2=args.speculative_call2, packer=packer,
+                        arbitration_scope=args.arbitration_scope, rules=args.rules,
+                        concept_narrowing=args.concept_narrowing, triage=triage, dedup=dedup,
+                        near=create_near_dup(near_dup_threshold(args)),
+                    )
+            if dedup is not None:
+                dedup.close()
+
+            # Write global summary
+            _write_global_summary(all_file_stats, run_dir, input_path, model, concurrency, batch_start, cache=cache, limiter=sem,
+                                  rate_limiter=rate_limiter, hedger=hedger, call_mode=call_mode, packer=packer,
+                                  endpoint_pool=endpoint_pool)
+            return
 
     # ── Normal mode ──────────────────────────────────────
     input_path = Path(args.input)
@@ -1435,18 +2551,48 @@ async def run_pipeline(args):
     run_dir.mkdir(parents=True, exist_ok=True)
 
     concurrency = args.concurrency
+    sem = create_limiter(args, concurrency)
+    rate_limiter = create_rate_limiter(args, args.model)
+    hedger = create_hedger(args)
+    endpoint_pool = create_endpoint_pool(args) if args.transport == "http" else None
 
     print(f"{'='*80}")
     print(f"SFT Auto-Labeling Pipeline (Concurrent)")
     print(f"{'='*80}")
     print(f"Input:       {input_path} ({'directory, ' + str(len(files)) + ' files' if is_directory else 'single file'})")
     print(f"Model:       {args.model}")
-    print(f"Run dir:     {run_dir}")
-    print(f"Concurrency: {concurrency}")
-    print(f"Arbitration: {'disabled' if args.no_arbitration else f'enabled (threshold={CONFIDENCE_THRESHOLD})'}")
+    print(f"Call mode:   {args.call_mode}" + (" (speculative Call 2)" if args.speculative_call2 and args.call_mode == "two-call" else ""))
+    print(f"Run dir:     {run_dir}" + (" (resumed)" if args.resume else ""))
+    print(f"Concurrency: {concurrency}" + (f" (adaptive, max {sem.max_limit})" if sem.adaptive else ""))
+    if endpoint_pool is not None:
+        print(f"Endpoints:   {len(endpoint_pool.endpoints)} (least-outstanding, breaker after {endpoint_pool.failures} failures)")
+    print(f"Arbitration: {'disabled' if args.no_arbitration else f'enabled (threshold={CONFIDENCE_THRESHOLD}, scope={args.arbitration_scope})'}")
+    print(f"Rules:       {f'{RULE_DIMENSIONS} (threshold={RULE_CONFIDENCE_THRESHOLD})' if args.rules else 'disabled'}")
+    print(f"Dedup:       {f'one label request per conversation ({DEDUP_STORE_NAME} in run dir)' if args.dedup else 'disabled'}"
+          + (f", near duplicates at Jaccard ≥ {args.near_dup_threshold}" if args.near_dup else ""))
+    if args.call_mode == "two-call":
+        print(f"Concepts:    " + (f"narrowed by (language, domain), {len(concept_candidates())} pairs mapped"
+                                  if args.concept_narrowing else "full pool"))
+    if triage is not None:
+        print(f"Triage:      {args.triage_model} (" + ", ".join(
+            f"{d} ≥ {t:.2f}" if t is not None else f"{d} off" for d, t in triage.threshold.items()) + ")")
+    print(f"Cache:       {args.cache_mode}" + (f" ({LLM_CACHE_PATH})" if args.cache_mode != "off" else ""))
+    if args.transport == "batch":
+        print(f"Transport:   batch (poll every {args.batch_poll_interval:g}s)")
     print(f"Started:     {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*80}\n")
 
+    if args.transport == "batch":
+        await run_batch_mode(args, cache, run_dir, {
+            "input_path": str(input_path), "model": args.model, "call_mode": args.call_mode,
+            "limit": args.limit, "arbitration": not args.no_arbitration,
+            "arbitration_scope": args.arbitration_scope, "rules": args.rules,
+            "concept_narrowing": args.concept_narrowing, "triage_model": args.triage_model,
+            "dedup": args.dedup, "near_dup": near_dup_threshold(args),
+            "labeled_json": not args.no_labeled_json,
+        })
+        return
+
     if is_directory:
         # ── Directory mode: cross-file pipeline ──
         dir_files = [(a, r) for a, r in files if r is not None]
@@ -1454,65 +2600,87 @@ async def run_pipeline(args):
             print("No .json/.jsonl files found in directory")
             sys.exit(1)
 
-        checkpoint_path = run_dir / "checkpoint.json"
-        create_checkpoint(checkpoint_path, dir_files)
+        checkpoint = Checkpoint.create(run_dir / "checkpoint.json", dir_files, settings={
+            "input_path": str(input_path.resolve()), "model": args.model, "call_mode": args.call_mode})
         batch_start = time.time()
+        dedup = create_dedup(run_dir, args.dedup)
 
-        async with httpx.AsyncClient(
-            proxy=None,
-            timeout=REQUEST_TIMEOUT,
-            limits=httpx.Limits(
-                max_connections=concurrency + 10,
-                max_keepalive_connections=concurrency,
-            ),
-        ) as http_client:
-            sem = asyncio.Semaphore(concurrency)
+        async with create_http_client(sem.max_limit, endpoint_pool) as http_client:
+            packer = create_packer(args, http_client, args.model, cache, sem, rate_limiter)
             n = len(dir_files)
             with create_progress() as progress:
                 file_task = progress.add_task("Files", total=n, info="")
                 sample_task = progress.add_task("Samples", total=0, visible=False, info="starting...")
                 all_file_stats = await run_directory_pipeline(
                     dir_files, run_dir, args, args.model, concurrency,
-                    checkpoint_path,
+                    checkpoint,
                     progress=progress, file_task=file_task, sample_task=sample_task,
                     http_client=http_client, sem=sem,
-                    enable_arbitration=not args.no_arbitration,
+                    enable_arbitration=not args.no_arbitration, cache=cache,
+                    rate_limiter=rate_limiter, hedger=hedger, call_mode=args.call_mode,
+                    speculative_call2=args.speculative_call2, packer=packer,
+                    arbitration_scope=args.arbitration_scope, rules=args.rules,
+                    concept_narrowing=args.concept_narrowing, triage=triage, dedup=dedup,
+                    near=create_near_dup(near_dup_threshold(args)),
                 )
+        if dedup is not None:
+            dedup.close()
 
-        _write_global_summary(all_file_stats, run_dir, input_path, args.model, concurrency, batch_start)
+        _write_global_summary(all_file_stats, run_dir, input_path, args.model, concurrency, batch_start, cache=cache, limiter=sem,
+                              rate_limiter=rate_limiter, hedger=hedger, call_mode=args.call_mode, packer=packer,
+                              endpoint_pool=endpoint_pool)
 
     else:
         # ── Single-file mode: backward compatible ────────
+        if args.resume:
+            checkpoint = Checkpoint.load(run_dir / "checkpoint.json")
+        else:
+            checkpoint = Checkpoint.create(run_dir / "checkpoint.json", files, settings={
+                "input_path": str(input_path.resolve()), "model": args.model, "call_mode": args.call_mode})
         batch_start = time.time()
-        async with httpx.AsyncClient(
-            proxy=None,
-            timeout=REQUEST_TIMEOUT,
-            limits=httpx.Limits(
-                max_connections=concurrency + 10,
-                max_keepalive_connections=concurrency,
-            ),
-        ) as http_client:
-            sem = asyncio.Semaphore(concurrency)
+        dedup = create_dedup(run_dir, args.dedup)
+        async with create_http_client(sem.max_limit, endpoint_pool) as http_client:
+            packer = create_packer(args, http_client, args.model, cache, sem, rate_limiter)
             with create_progress() as progress:
                 sample_task = progress.add_task("Labeling", total=None, info="starting...")
                 stats = await run_one_file(
                     input_path, run_dir, http_client, sem, args.model,
                     enable_arbitration=not args.no_arbitration,
                     limit=args.limit, shuffle=args.shuffle,
-                    progress=progress, sample_task=sample_task,
+                    progress=progress, sample_task=sample_task, cache=cache,
+                    rate_limiter=rate_limiter, hedger=hedger, call_mode=args.call_mode,
+                    speculative_call2=args.speculative_call2, packer=packer,
+                    arbitration_scope=args.arbitration_scope, rules=args.rules,
+                    concept_narrowing=args.concept_narrowing, triage=triage, dedup=dedup,
+                    near=create_near_dup(near_dup_threshold(args)), labeled_json=not args.no_labeled_json,
+                    checkpoint=checkpoint, resume=bool(args.resume),
                 )
+        if dedup is not None:
+            dedup.close()
 
         stats["model"] = args.model
+        stats["call_mode"] = args.call_mode
         stats["concurrency"] = concurrency
         stats["timestamp"] = datetime.now().isoformat()
         stats["run_dir"] = str(run_dir)
+        stats["cache"] = cache.stats()
+        stats["concurrency_controller"] = sem.stats()
+        stats["rate_limits"] = rate_limiter.stats()
+        if hedger is not None:
+            stats["hedging"] = hedger.stats()
+        if packer is not None:
+            stats["packing"] = packer.stats()
+        if endpoint_pool is not None:
+            stats["endpoint_pool"] = endpoint_pool.stats()
+            endpoint_pool.write(run_dir)
 
         # Overwrite stats with enriched version
         with open(run_dir / "stats.json", "w", encoding="utf-8") as f:
             json.dump(stats, f, ensure_ascii=False, indent=2)
 
         print_summary(stats, run_dir)
-        print(f"Output:  {run_dir / 'labeled.json'}")
+        if not args.no_labeled_json:
+            print(f"Output:  {run_dir / 'labeled.json'}")
         print(f"JSONL:   {run_dir / 'labeled.jsonl'}")
         print(f"Stats:   {run_dir / 'stats.json'}")
         print(f"Monitor: {run_dir / 'monitor.jsonl'}")
@@ -1526,12 +2694,76 @@ def main():
     parser.add_argument("--resume", type=str, default=None,
                         help="Resume from an existing run directory (reads checkpoint.json)")
     parser.add_argument("--model", type=str, default=DEFAULT_MODEL)
-    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Initial in-flight sample limit (fixed limit with --fixed-concurrency)")
+    parser.add_argument("--max-concurrency", "--concurrency-max", type=int, default=None,
+                        help="Let the adaptive (AIMD) controller grow past --concurrency up to this "
+                             "(default: --concurrency, so it only cuts and recovers)")
+    parser.add_argument("--fixed-concurrency", action="store_true",
+                        help="Disable AIMD adaptation and use a fixed semaphore of --concurrency")
+    parser.add_argument("--endpoints", type=str, default=None,
+                        help="LiteLLM proxies to balance over: 'url[|weight[|max_in_flight]],...' "
+                             "(overrides LITELLM_BASES)")
+    parser.add_argument("--rpm", type=int, default=None,
+                        help="Requests/minute quota for --model (overrides config.MODELS)")
+    parser.add_argument("--tpm", type=int, default=None,
+                        help="Tokens/minute quota for --model (overrides config.MODELS)")
     parser.add_argument("--limit", type=int, default=0,
                         help="Max samples per file (0 = all). In directory mode, applies to each file independently")
     parser.add_argument("--shuffle", action="store_true", help="Randomly shuffle samples before slicing")
     parser.add_argument("--no-arbitration", action="store_true")
+    parser.add_argument("--rules", action="store_true",
+                        help="Let the rule engine label the dimensions it is confident about instead of "
+                             "the LLM (see rules.py; check tools/evaluate_rules.py on your data first)")
+    parser.add_argument("--concept-narrowing", action="store_true",
+                        help="List only the candidate concepts of the sample's (language, domain) pairs in "
+                             "Call 2 (see concept_candidates.py; experimental, the map is not yet validated "
+                             "on held-out data)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Label one sample per distinct conversation and copy its labels to the duplicates "
+                             "(see dedup.py)")
+    parser.add_argument("--no-labeled-json", action="store_true",
+                        help="Skip the pretty labeled.json; labeled.jsonl is written as samples finish (see result_writer.py)")
+    parser.add_argument("--near-dup", action="store_true",
+                        help="Reuse the labels of a near-duplicate sample (MinHash-LSH, see near_dup.py; needs --dedup and numpy)")
+    parser.add_argument("--near-dup-threshold", type=float, default=NEAR_DUP_THRESHOLD,
+                        help="Estimated Jaccard similarity needed to reuse labels (--near-dup)")
+    parser.add_argument("--triage-model", nargs="?", const=str(TRIAGE_MODEL_PATH), default=None,
+                        help="Pre-label confident single-select dimensions with the local triage model "
+                             f"(see triage.py; default path {TRIAGE_MODEL_PATH.name}, needs numpy)")
+    parser.add_argument("--arbitration-scope", choices=ARBITRATION_SCOPES, default=ARBITRATION_SCOPE,
+                        help="dimension: narrow per-dimension re-label prompts (default); "
+                             "call: re-run the full call(s) behind low-confidence dimensions")
+    parser.add_argument("--call-mode", choices=CALL_MODES, default="two-call",
+                        help="two-call: Call 1 then Call 2 (default); fused: all 9 dimensions in one LLM call")
+    parser.add_argument("--transport", choices=("http", "batch"), default="http",
+                        help="http: concurrent per-sample calls (default); batch: Batch API jobs per call level "
+                             "(see batch_api.py)")
+    parser.add_argument("--batch-poll-interval", type=float, default=BATCH_POLL_INTERVAL,
+                        help="Seconds between batch status polls (--transport batch)")
+    parser.add_argument("--pack", action="store_true",
+                        help="Pack short single-turn samples into shared multi-sample requests")
+    parser.add_argument("--pack-size", type=int, default=PACK_SIZE,
+                        help="Max samples per packed request")
+    parser.add_argument("--speculative-call2", action="store_true",
+                        help="Start Call 2 together with Call 1 on a signal-derived provisional context "
+                             "(re-issued when Call 1 disagrees)")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Fire a duplicate request when a call exceeds the adaptive p95 latency")
+    parser.add_argument("--hedge-model", type=str, default=None,
+                        help="Model for hedge requests: model ID or PIPELINE_DEFAULTS key (e.g. production_labeling_alt)")
+    parser.add_argument("--hedge-max-share", type=float, default=HEDGE_MAX_SHARE,
+                        help="Max fraction of calls that may be hedged")
+    parser.add_argument("--cache-mode", choices=CACHE_MODES, default=DEFAULT_CACHE_MODE,
+                        help="LLM response cache: off (default), read (replay only), readwrite, refresh "
+                             "(ignore hits, overwrite); sampled arbitration reruns are never cached")
     args = parser.parse_args()
+    if args.triage_model and np is None:
+        parser.error("--triage-model needs numpy: pip install 'build-user-query[numpy]'")
+    if args.near_dup and not args.dedup:
+        parser.error("--near-dup fans labels out through duplicate collapse; add --dedup")
+    if args.near_dup and np is None:
+        parser.error("--near-dup needs numpy: pip install 'build-user-query[numpy]'")
     asyncio.run(run_pipeline(args))
 
 
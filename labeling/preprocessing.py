@@ -15,17 +15,25 @@ Signals extracted:
   - Code block count and content analysis
   - Turn count and conversation structure
   - Keyword-based hints
+  - Taxonomy alias mentions
   - Token estimation
   - Last turn extraction
+
+preprocess() reads each turn's text once (scan_turn) and combines the per-turn
+results; nothing is run over the joined conversation.
 """
 
 import re
 import json
+from collections import OrderedDict
+from collections.abc import Mapping
 
 from config import (
     MAX_CONVERSATION_CHARS, TRUNCATION_HEAD_RATIO,
     TRUNCATION_LAST_RESPONSE_RATIO, TRUNCATION_PER_TURN_RATIO,
+    TURN_SCAN_CACHE_CHARS,
 )
+from keyword_matcher import KeywordMatcher, load_taxonomy_aliases, word_bytes
 
 
 # ─────────────────────────────────────────────────────────
@@ -78,18 +86,74 @@ def slice_multiturn(conversations):
 
     Single-turn (1 human + 1 gpt) returns as-is in a list.
     """
-    # Find all assistant reply indices
-    reply_indices = [i for i, t in enumerate(conversations) if t["from"] == "gpt"]
-
-    if len(reply_indices) <= 1:
+    ends = slice_ends(conversations)
+    if len(ends) <= 1:
         return [conversations]
+    return [conversations[:end] for end in ends]
+
+
+def slice_ends(conversations):
+    """End (exclusive) of each pyramid slice: one past each assistant reply."""
+    return [i + 1 for i, t in enumerate(conversations) if t["from"] == "gpt"]
+
+
+class SliceView(Mapping):
+    """One pyramid slice of a multi-turn sample, read like its sample dict.
 
-    slices = []
-    for idx in reply_indices:
-        # Context = everything up to and including this assistant reply
-        slices.append(conversations[:idx + 1])
+    Slices used to be dicts, each with its own copy of the conversation up to
+    its reply and of the sample metadata: quadratic in the number of replies.
+    A view keeps the conversation and metadata shared by all slices of the
+    sample, and the end of its slice. "conversations" and "metadata" are built
+    on access (prompt building, writing the sample) and not kept. Keys set on
+    the view are kept as they are.
+    """
 
-    return slices
+    __slots__ = ("id", "_conversations", "_end", "_metadata", "_slice_meta", "_extra")
+
+    KEYS = ("id", "conversations", "metadata")
+
+    def __init__(self, sample_id, conversations, end, metadata, source_id, turn_index, total_turns):
+        self.id = sample_id
+        self._conversations = conversations
+        self._end = end
+        self._metadata = metadata
+        self._slice_meta = (source_id, turn_index, total_turns)
+        self._extra = None
+
+    def __getitem__(self, key):
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        if key == "id":
+            return self.id
+        if key == "conversations":
+            return self._conversations[:self._end]
+        if key == "metadata":
+            source_id, turn_index, total_turns = self._slice_meta
+            return {**self._metadata, "source_id": source_id,
+                    "turn_index": turn_index, "total_turns": total_turns}
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == "id":
+            self.id = value
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __contains__(self, key):
+        return key in self.KEYS or bool(self._extra and key in self._extra)
+
+    def __iter__(self):
+        yield from self.KEYS
+        if self._extra:
+            yield from (k for k in self._extra if k not in self.KEYS)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"SliceView({self.id!r}, turns 0..{self._end})"
 
 
 def normalize_pangu(sample):
@@ -141,7 +205,8 @@ def normalize_and_slice(sample):
     """Auto-detect format, normalize, and slice multi-turn into training samples.
 
     Returns a list of samples. Single-turn and pseudo multi-turn return [1 sample].
-    True multi-turn returns [N samples], one per assistant reply.
+    True multi-turn returns [N samples], one per assistant reply, as SliceViews
+    sharing the conversation and metadata (dict(s) is the slice as a dict).
     Each slice has id suffixed with turn number (e.g. "id_t1", "id_t2").
     """
     fmt = detect_format(sample)
@@ -162,28 +227,16 @@ def normalize_and_slice(sample):
     if is_pseudo:
         return [normalized]
 
-    slices = slice_multiturn(conversations)
+    ends = slice_ends(conversations)
 
-    if len(slices) == 1:
+    if len(ends) <= 1:
         return [normalized]
 
-    # Build one sample per slice
-    results = []
+    # One view per slice over the shared conversation and metadata
     base_id = normalized.get("id", "")
-    for i, conv_slice in enumerate(slices):
-        s = {
-            "id": f"{base_id}_t{i+1}",
-            "conversations": conv_slice,
-            "metadata": {
-                **normalized.get("metadata", {}),
-                "source_id": base_id,
-                "turn_index": i + 1,
-                "total_turns": len(slices),
-            },
-        }
-        results.append(s)
-
-    return results
+    metadata = normalized.get("metadata", {})
+    return [SliceView(f"{base_id}_t{i+1}", conversations, end, metadata, base_id, i + 1, len(ends))
+            for i, end in enumerate(ends)]
 
 
 # Keep backward-compatible alias
@@ -458,11 +511,57 @@ TOOL_NAME_MAP = {
     "npm": "dependency-installation", "yarn": "dependency-installation",
 }
 
+# Domain/topic keyword groups for context hints
+KEYWORD_GROUPS = {
+    "web": ["react", "vue", "angular", "next.js", "express", "django", "flask",
+            "html", "css", "api", "rest", "graphql", "frontend", "backend"],
+    "devops": ["docker", "kubernetes", "k8s", "terraform", "ansible", "ci/cd",
+               "github actions", "jenkins", "helm", "nginx", "prometheus", "grafana"],
+    "database": ["sql", "postgresql", "mysql", "mongodb", "redis", "sqlite",
+                 "database", "query", "index", "migration", "schema"],
+    "ml": ["pytorch", "tensorflow", "model", "training", "neural", "dataset",
+           "classification", "regression", "epoch", "loss", "optimizer"],
+    "security": ["auth", "oauth", "jwt", "xss", "csrf", "injection", "encryption",
+                 "password", "token", "vulnerability", "security"],
+    "mobile": ["ios", "android", "swift", "kotlin", "flutter", "react native"],
+    "systems": ["kernel", "memory", "allocator", "lock-free", "atomic", "assembly",
+                "embedded", "firmware", "rtos"],
+}
+
+PLAN_SIGNALS = ["let me", "first", "step 1", "plan", "i'll start by",
+                "先", "首先", "步骤", "计划", "我来"]
+REASONING_SIGNALS = ["because", "therefore", "this means", "so we need",
+                     "因为", "所以", "这意味着", "因此", "根本原因"]
+ERROR_MARKERS = ["error", "failed", "exception", "traceback", "panic", "报错"]
+
+_FENCE_RE = re.compile(r'```(\w[\w+#.-]*)')
+# (regex, substrings it cannot match without)
+_FILE_PATH_RES = [(re.compile(r'(?:cat|read|write|edit)\s+(\S+\.\w+)'), ("cat", "read", "write", "edit")),
+                  (re.compile(r'(?:>\s*)(\S+\.\w+)'), (">",))]
+
+_MATCHER = None
+
+
+def keyword_matcher():
+    """Shared matcher over FRAMEWORK_LANG_MAP, KEYWORD_GROUPS, TOOL_NAME_MAP and
+    the taxonomy aliases (built on first use, see keyword_matcher.py).
+
+    Groups: "framework", "keyword:<group>", "tool", "alias:<dimension>".
+    """
+    global _MATCHER
+    if _MATCHER is None:
+        groups = {"framework": FRAMEWORK_LANG_MAP, "tool": TOOL_NAME_MAP}
+        for group, keywords in KEYWORD_GROUPS.items():
+            groups[f"keyword:{group}"] = {kw: group for kw in keywords}
+        for dim, aliases in load_taxonomy_aliases().items():
+            groups[f"alias:{dim}"] = aliases
+        _MATCHER = KeywordMatcher(groups)
+    return _MATCHER
+
 
 def detect_code_fence_languages(text):
     """Extract language tags from markdown code fences."""
-    pattern = r'```(\w[\w+#.-]*)'
-    matches = re.findall(pattern, text)
+    matches = _FENCE_RE.findall(text)
     languages = set()
     for match in matches:
         lang = match.lower().strip()
@@ -471,14 +570,14 @@ def detect_code_fence_languages(text):
     return sorted(languages)
 
 
-def detect_framework_languages(text):
-    """Infer languages from framework/library mentions."""
-    text_lower = text.lower()
-    languages = set()
-    for framework, lang in FRAMEWORK_LANG_MAP.items():
-        if framework in text_lower:
-            languages.add(lang)
-    return sorted(languages)
+def detect_framework_languages(text, hits=None):
+    """Infer languages from framework/library mentions.
+
+    hits: keyword_matcher().scan(text), when the caller already has it.
+    """
+    if hits is None:
+        hits = keyword_matcher().scan(text)
+    return sorted(set(hits.get("framework", {}).values()))
 
 
 def count_code_blocks(text):
@@ -486,6 +585,61 @@ def count_code_blocks(text):
     return len(re.findall(r'```', text)) // 2
 
 
+def count_labeled_code_blocks(text):
+    """Count code blocks whose opening fence names a known language."""
+    return sum(1 for match in _FENCE_RE.findall(text)
+               if match.lower().strip() in FENCE_LANG_MAP)
+
+
+def _tool_turn_signals(value, patterns=None):
+    """Tool names and agentic tags of one tool message.
+
+    patterns: the keyword_matcher() patterns found in value, when the caller
+    already has them.
+    """
+    tool_names = []
+    agentic_tags = set()
+
+    # Try to detect tool name from common patterns
+    # Pattern: "$ command ..." (shell)
+    if value.strip().startswith("$") or value.strip().startswith("#"):
+        tool_names.append("bash")
+        agentic_tags.add("bash-execution")
+
+        # Check specific commands within bash
+        cmd = value.strip().lstrip("$ ").split(None, 1)[0] if value.strip().lstrip("$ ") else ""
+        if cmd in ("cat", "ls", "find", "head", "tail", "grep"):
+            agentic_tags.add("file-operations")
+        elif cmd in ("git",):
+            agentic_tags.add("git-operations")
+        elif cmd in ("npm", "pip", "yarn", "pnpm", "cargo", "go"):
+            subargs = value.strip().lstrip("$ ").split(None, 2)
+            if len(subargs) > 1 and subargs[1] in ("install", "add", "get"):
+                agentic_tags.add("dependency-installation")
+        elif cmd in ("pytest", "jest", "go test", "cargo test"):
+            agentic_tags.add("test-running")
+        elif cmd in ("docker", "make", "cargo build", "npm run build"):
+            agentic_tags.add("build-execution")
+        elif cmd in ("python", "node", "ruby", "go run"):
+            agentic_tags.add("code-execution")
+
+    # Pattern: structured tool call JSON-like
+    if '"name"' in value or '"tool"' in value:
+        matcher = keyword_matcher()
+        hits = matcher.scan(value) if patterns is None else matcher.hits(patterns)
+        for tool_key, tag in hits.get("tool", {}).items():
+            tool_names.append(tool_key)
+            agentic_tags.add(tag)
+
+    return tool_names, agentic_tags
+
+
+def _file_paths(value):
+    """File paths a tool message reads or writes."""
+    return [path for regex, needles in _FILE_PATH_RES if any(n in value for n in needles)
+            for path in regex.findall(value)]
+
+
 def extract_tool_signals(conversations):
     """Extract agentic signals from tool role messages."""
     tool_names = []
@@ -493,37 +647,9 @@ def extract_tool_signals(conversations):
 
     for turn in conversations:
         if turn.get("from") == "tool":
-            value = turn.get("value", "")
-
-            # Try to detect tool name from common patterns
-            # Pattern: "$ command ..." (shell)
-            if value.strip().startswith("$") or value.strip().startswith("#"):
-                tool_names.append("bash")
-                agentic_tags.add("bash-execution")
-
-                # Check specific commands within bash
-                cmd = value.strip().lstrip("$ ").split()[0] if value.strip().lstrip("$ ") else ""
-                if cmd in ("cat", "ls", "find", "head", "tail", "grep"):
-                    agentic_tags.add("file-operations")
-                elif cmd in ("git",):
-                    agentic_tags.add("git-operations")
-                elif cmd in ("npm", "pip", "yarn", "pnpm", "cargo", "go"):
-                    subargs = value.strip().lstrip("$ ").split()
-                    if len(subargs) > 1 and subargs[1] in ("install", "add", "get"):
-                        agentic_tags.add("dependency-installation")
-                elif cmd in ("pytest", "jest", "go test", "cargo test"):
-                    agentic_tags.add("test-running")
-                elif cmd in ("docker", "make", "cargo build", "npm run build"):
-                    agentic_tags.add("build-execution")
-                elif cmd in ("python", "node", "ruby", "go run"):
-                    agentic_tags.add("code-execution")
-
-            # Pattern: structured tool call JSON-like
-            if '"name"' in value or '"tool"' in value:
-                for tool_key, tag in TOOL_NAME_MAP.items():
-                    if tool_key in value.lower():
-                        tool_names.append(tool_key)
-                        agentic_tags.add(tag)
+            names, tags = _tool_turn_signals(turn.get("value", ""))
+            tool_names.extend(names)
+            agentic_tags |= tags
 
     return sorted(set(tool_names)), sorted(agentic_tags)
 
@@ -538,10 +664,7 @@ def detect_behavioral_patterns(conversations):
     # Multi-file coordination: multiple file operations on different paths
     file_paths = set()
     for t in tool_turns:
-        val = t.get("value", "")
-        paths = re.findall(r'(?:cat|read|write|edit)\s+(\S+\.\w+)', val)
-        paths += re.findall(r'(?:>\s*)(\S+\.\w+)', val)
-        file_paths.update(paths)
+        file_paths.update(_file_paths(t.get("value", "")))
     if len(file_paths) >= 2:
         patterns.add("multi-file-coordination")
 
@@ -552,25 +675,21 @@ def detect_behavioral_patterns(conversations):
     # Planning: first gpt turn contains plan-like language
     if gpt_turns:
         first_gpt = gpt_turns[0].get("value", "").lower()
-        plan_signals = ["let me", "first", "step 1", "plan", "i'll start by",
-                        "先", "首先", "步骤", "计划", "我来"]
-        if any(s in first_gpt for s in plan_signals):
+        if any(s in first_gpt for s in PLAN_SIGNALS):
             patterns.add("planning")
 
     # Multi-step reasoning: long gpt response with sequential logic
     for t in gpt_turns:
         val = t.get("value", "")
         if len(val) > 500:
-            reasoning_signals = ["because", "therefore", "this means", "so we need",
-                                 "因为", "所以", "这意味着", "因此", "根本原因"]
-            if sum(1 for s in reasoning_signals if s in val.lower()) >= 2:
+            if sum(1 for s in REASONING_SIGNALS if s in val.lower()) >= 2:
                 patterns.add("multi-step-reasoning")
                 break
 
     # Error recovery: error message followed by a fix attempt
     for i, t in enumerate(conversations):
         val = t.get("value", "").lower()
-        if any(w in val for w in ["error", "failed", "exception", "traceback", "panic", "报错"]):
+        if any(w in val for w in ERROR_MARKERS):
             if i + 1 < len(conversations):
                 patterns.add("error-recovery")
                 break
@@ -597,30 +716,28 @@ def extract_last_turn(conversations):
     return last_human, last_gpt
 
 
-def detect_keywords(text):
-    """Detect domain/topic keywords for context hints."""
-    text_lower = text.lower()
-    hits = []
-    keyword_groups = {
-        "web": ["react", "vue", "angular", "next.js", "express", "django", "flask",
-                "html", "css", "api", "rest", "graphql", "frontend", "backend"],
-        "devops": ["docker", "kubernetes", "k8s", "terraform", "ansible", "ci/cd",
-                   "github actions", "jenkins", "helm", "nginx", "prometheus", "grafana"],
-        "database": ["sql", "postgresql", "mysql", "mongodb", "redis", "sqlite",
-                     "database", "query", "index", "migration", "schema"],
-        "ml": ["pytorch", "tensorflow", "model", "training", "neural", "dataset",
-               "classification", "regression", "epoch", "loss", "optimizer"],
-        "security": ["auth", "oauth", "jwt", "xss", "csrf", "injection", "encryption",
-                     "password", "token", "vulnerability", "security"],
-        "mobile": ["ios", "android", "swift", "kotlin", "flutter", "react native"],
-        "systems": ["kernel", "memory", "allocator", "lock-free", "atomic", "assembly",
-                    "embedded", "firmware", "rtos"],
-    }
-    for group, keywords in keyword_groups.items():
-        matches = [kw for kw in keywords if kw in text_lower]
+def detect_keywords(text, hits=None):
+    """Detect domain/topic keywords for context hints.
+
+    hits: keyword_matcher().scan(text), when the caller already has it.
+    """
+    if hits is None:
+        hits = keyword_matcher().scan(text)
+    keyword_hits = []
+    for group, keywords in KEYWORD_GROUPS.items():
+        found = hits.get(f"keyword:{group}", {})
+        matches = [kw for kw in keywords if kw in found]
         if matches:
-            hits.append((group, matches))
-    return hits
+            keyword_hits.append((group, matches))
+    return keyword_hits
+
+
+def detect_taxonomy_aliases(text, hits=None):
+    """Taxonomy tags whose aliases are mentioned → {dimension: [tag ids]}."""
+    if hits is None:
+        hits = keyword_matcher().scan(text)
+    return {group.split(":", 1)[1]: sorted(set(found.values()))
+            for group, found in sorted(hits.items()) if group.startswith("alias:")}
 
 
 def generate_sparse_schedule(n):
@@ -716,6 +833,155 @@ def apply_sparse_sampling(samples):
     return label_indices, inherit_map
 
 
+# ─────────────────────────────────────────────────────────
+# Single-pass turn scanner
+# ─────────────────────────────────────────────────────────
+
+class TurnScan:
+    """What preprocess() needs from one turn's text, read in one pass: the
+    word split (keyword matcher input), code fences and, for tool turns, tool
+    names and file paths. The error / plan / reasoning phrase checks only
+    matter for some turns and run on first use.
+    """
+
+    __slots__ = ("role", "text", "n_words", "head", "tail", "patterns",
+                 "fence_langs", "fences", "labeled_fences", "tool_names",
+                 "tool_tags", "file_paths", "_error", "_plan", "_reasoning")
+
+    def __init__(self, role, value):
+        matcher = keyword_matcher()
+        span = matcher.max_words - 1   # words a pattern can reach into the next turn
+        self.role = role
+        self.text = value
+        self._error = self._plan = self._reasoning = None
+
+        words = word_bytes(value).split()
+        self.n_words = len(words)
+        self.head = tuple(words[:span])
+        self.tail = tuple(words[-span:]) if span else ()
+        self.patterns = matcher.match(words, value) if words else set()
+
+        self.fence_langs = ()
+        self.fences = self.labeled_fences = 0
+        if "```" in value:
+            self.fences = value.count("```")
+            langs = [FENCE_LANG_MAP.get(m.lower().strip()) for m in _FENCE_RE.findall(value)]
+            self.fence_langs = [lang for lang in langs if lang]
+            self.labeled_fences = len(self.fence_langs)
+
+        self.tool_names, self.tool_tags, self.file_paths = (), (), ()
+        if role == "tool":
+            self.tool_names, self.tool_tags = _tool_turn_signals(value, self.patterns)
+            self.file_paths = _file_paths(value)
+
+    def has_error(self):
+        """Any of ERROR_MARKERS in the lowercased text."""
+        if self._error is None:
+            lowered = self.text.lower()
+            self._error = any(m in lowered for m in ERROR_MARKERS)
+        return self._error
+
+    def has_plan(self):
+        """Any of PLAN_SIGNALS in the lowercased text."""
+        if self._plan is None:
+            lowered = self.text.lower()
+            self._plan = any(s in lowered for s in PLAN_SIGNALS)
+        return self._plan
+
+    def has_reasoning(self):
+        """Longer than 500 chars with at least two REASONING_SIGNALS."""
+        if self._reasoning is None:
+            lowered = self.text.lower() if len(self.text) > 500 else ""
+            self._reasoning = sum(1 for s in REASONING_SIGNALS if s in lowered) >= 2
+        return self._reasoning
+
+
+_TURN_SCANS = OrderedDict()   # (role, text) → TurnScan, least recently used first
+_turn_scan_chars = 0
+
+
+def scan_turn(role, value):
+    """TurnScan of one turn, cached by (role, text).
+
+    The pyramid slices of a trajectory share their turns, so each turn is
+    scanned once rather than once per slice.
+    """
+    global _turn_scan_chars
+    key = (role, value)
+    scan = _TURN_SCANS.get(key)
+    if scan is not None:
+        _TURN_SCANS.move_to_end(key)
+        return scan
+    scan = _TURN_SCANS[key] = TurnScan(role, value)
+    _turn_scan_chars += len(value)
+    while _turn_scan_chars > TURN_SCAN_CACHE_CHARS and len(_TURN_SCANS) > 1:
+        (_, old_value), _ = _TURN_SCANS.popitem(last=False)
+        _turn_scan_chars -= len(old_value)
+    return scan
+
+
+def clear_turn_scans():
+    """Drop the cached turn scans."""
+    global _turn_scan_chars
+    _TURN_SCANS.clear()
+    _turn_scan_chars = 0
+
+
+def combine_turn_scans(scans):
+    """Conversation-level keyword hits, fences, tool and behavioral signals
+    from its turn scans — what the same detectors find on the joined text.
+
+    Keyword patterns of several words can straddle two turns (joined with a
+    space), so the last words before each turn boundary are matched against the
+    first words after it.
+    """
+    matcher = keyword_matcher()
+    span = matcher.max_words - 1
+    patterns = set()
+    fence_langs = set()
+    fences = labeled_fences = 0
+    tool_names, tool_tags, file_paths = set(), set(), set()
+    carry = ()   # the last `span` words before the boundary
+    for scan in scans:
+        patterns |= scan.patterns
+        if carry and scan.head and matcher.may_join_phrase(carry, scan.head):
+            patterns.update(matcher.match_phrases(carry + scan.head))
+        carry = scan.tail if scan.n_words >= span else (carry + scan.head)[-span:]
+        if scan.fences:
+            fence_langs.update(scan.fence_langs)
+            fences += scan.fences
+            labeled_fences += scan.labeled_fences
+        if scan.role == "tool":
+            tool_names.update(scan.tool_names)
+            tool_tags.update(scan.tool_tags)
+            file_paths.update(scan.file_paths)
+
+    # Behavioral patterns (same rules as detect_behavioral_patterns)
+    gpt_scans = [s for s in scans if s.role == "gpt"]
+    behavioral = set()
+    if len(file_paths) >= 2:
+        behavioral.add("multi-file-coordination")
+    if sum(1 for s in scans if s.role == "tool") >= 3:
+        behavioral.add("iterative-refinement")
+    if gpt_scans and gpt_scans[0].has_plan():
+        behavioral.add("planning")
+    if any(s.has_reasoning() for s in gpt_scans):
+        behavioral.add("multi-step-reasoning")
+    if any(s.has_error() for s in scans[:-1]):
+        behavioral.add("error-recovery")
+
+    return {
+        "patterns": patterns,
+        "fence_languages": sorted(fence_langs),
+        "code_block_count": fences // 2,
+        "labeled_code_blocks": labeled_fences,
+        "tool_names": sorted(tool_names),
+        "tool_agentic_tags": sorted(tool_tags),
+        "behavioral_patterns": sorted(behavioral),
+        "chars": sum(len(s.text) for s in scans) + max(len(scans) - 1, 0),
+    }
+
+
 def preprocess(sample):
     """
     Full preprocessing pipeline for one SFT sample.
@@ -728,28 +994,39 @@ def preprocess(sample):
     """
     sample = normalize_sample(sample)
     conversations = sample.get("conversations", [])
-    full_text = " ".join(t.get("value", "") for t in conversations)
+    scans = [scan_turn(t.get("from"), t.get("value", "")) for t in conversations]
+    combined = combine_turn_scans(scans)
+
+    # Frameworks, keywords and taxonomy aliases
+    matcher = keyword_matcher()
+    patterns = combined["patterns"]
+    if matcher.spaced_literals:
+        full_text = " ".join(t.get("value", "") for t in conversations).lower()
+        patterns.update(matcher.find_literals(full_text, matcher.spaced_literals))
+    hits = matcher.hits(patterns)
 
     # Language detection
-    fence_langs = detect_code_fence_languages(full_text)
-    framework_langs = detect_framework_languages(full_text)
+    fence_langs = combined["fence_languages"]
+    framework_langs = detect_framework_languages(None, hits)
     all_detected_langs = sorted(set(fence_langs + framework_langs))
 
     # Tool / agentic detection
-    has_tool_roles = any(t.get("from") == "tool" for t in conversations)
-    tool_names, tool_agentic_tags = extract_tool_signals(conversations)
-    behavioral_patterns = detect_behavioral_patterns(conversations)
+    has_tool_roles = any(s.role == "tool" for s in scans)
+    tool_names, tool_agentic_tags = combined["tool_names"], combined["tool_agentic_tags"]
+    behavioral_patterns = combined["behavioral_patterns"]
 
     # Conversation structure
     total_turns = len(conversations)
-    code_block_count = count_code_blocks(full_text)
+    code_block_count = combined["code_block_count"]
+    labeled_code_blocks = combined["labeled_code_blocks"]
     last_query, last_response = extract_last_turn(conversations)
 
     # Keywords
-    keyword_hits = detect_keywords(full_text)
+    keyword_hits = detect_keywords(None, hits)
+    taxonomy_hits = detect_taxonomy_aliases(None, hits)
 
-    # Token estimation
-    est_tokens = estimate_tokens(full_text)
+    # Token estimation (of the turns joined with spaces)
+    est_tokens = combined["chars"] // 4
 
     signals = {
         "detected_languages": all_detected_langs,
@@ -761,8 +1038,10 @@ def preprocess(sample):
         "behavioral_patterns": behavioral_patterns,
         "total_turns": total_turns,
         "code_block_count": code_block_count,
+        "labeled_code_blocks": labeled_code_blocks,
         "est_tokens": est_tokens,
         "keyword_hits": keyword_hits,
+        "taxonomy_hits": taxonomy_hits,
         "last_query_preview": last_query[:200] if last_query else "",
         "last_response_length": len(last_response),
     }
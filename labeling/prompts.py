@@ -5,6 +5,12 @@ Defines the two-call labeling prompt architecture:
   Call 1 (定性): Intent, Language, Domain, Task, Difficulty
   Call 2 (定能力): Concept, Agentic, Constraint, Context
 
+plus a fused single-call variant (all 9 dimensions) generated from the two,
+packed variants of each that label several short samples per request,
+narrow single-dimension prompts used for arbitration, variants of each
+call without the dimensions the rule engine already labeled (rules.py), and
+Call 2 variants listing only a sample's candidate concepts (concept_candidates.py).
+
 Each prompt includes:
   - Role definition
   - Annotation principles (from guidelines)
@@ -13,6 +19,10 @@ Each prompt includes:
   - Structured JSON output format with confidence scores
 """
 
+import json
+import re
+from collections import OrderedDict
+
 # ─────────────────────────────────────────────────────────
 # Call 1: Intent + Language + Domain + Task + Difficulty
 # ─────────────────────────────────────────────────────────
@@ -475,6 +485,306 @@ total_turns: 6
 ]
 
 
+# ─────────────────────────────────────────────────────────
+# Fused: all 9 dimensions in one call (generated from Call 1 + Call 2)
+# ─────────────────────────────────────────────────────────
+
+def _section(text, start, end=None):
+    """Slice a prompt from the `start` heading up to (not including) the `end` heading."""
+    i = text.index(start)
+    j = text.index(end, i) if end else len(text)
+    return text[i:j].strip()
+
+
+def _merged_output_example():
+    """Merge the Call 1 and Call 2 JSON output examples into one 9-dimension dict."""
+    call1_example = _section(CALL1_SYSTEM, "{", "Rules for output:").rsplit("}", 1)[0]
+    call2_example = _section(CALL2_SYSTEM, "## Output Format")
+    ex1 = json.loads(call1_example[call1_example.index("{"):] + "}")
+    ex2 = json.loads(call2_example[call2_example.index("{"):])
+    ex = {**ex1, **ex2}
+    ex["confidence"] = {**ex1["confidence"], **ex2["confidence"]}
+    return ex
+
+
+def _build_fused_system():
+    # Call 2's principles are a superset of Call 1's (adds umbrella concepts + agentic rule)
+    principles = _section(CALL2_SYSTEM, "## Annotation Principles", "## Your Task")
+    call1_dims = _section(CALL1_SYSTEM, "### Intent", "## Output Format")
+    call2_dims = _section(CALL2_SYSTEM, "### Concept", "## Output Format")
+    output_example = json.dumps(_merged_output_example(), ensure_ascii=False, indent=2)
+    output_rules = _section(CALL1_SYSTEM, "Rules for output:")
+    header = re.sub(r"across \d+ dimensions[^.]*\.", "across 9 dimensions.", CALL1_SYSTEM.split("\n", 1)[0])
+    return f"""{header}
+
+{principles}
+
+## Your Task
+Label the conversation on all 9 dimensions below in ONE response.
+
+{call1_dims}
+
+{call2_dims}
+
+## Output Format
+Return ONLY valid JSON (no markdown, no explanation):
+{output_example}
+
+{output_rules}"""
+
+
+def _build_fused_fewshot():
+    """Reuse CALL2_FEWSHOT: its <call1_result> becomes part of the expected output."""
+    fewshot = []
+    for user_msg, assistant_msg in zip(CALL2_FEWSHOT[0::2], CALL2_FEWSHOT[1::2]):
+        content = user_msg["content"]
+        call1 = json.loads(re.search(r"<call1_result>\n(.*?)\n</call1_result>", content, re.S).group(1))
+        user_content = re.sub(r"<call1_result>.*?</call1_result>\n\n", "", content, flags=re.S)
+        call2 = json.loads(assistant_msg["content"])
+        merged = {**call1, **{k: v for k, v in call2.items() if k not in ("confidence", "unmapped")}}
+        # Call 1 confidences are not recorded in CALL2_FEWSHOT — use a neutral value
+        merged["confidence"] = {**{d: 0.90 for d in call1}, **call2["confidence"]}
+        merged["unmapped"] = call2.get("unmapped", [])
+        fewshot.append({"role": "user", "content": user_content})
+        fewshot.append({"role": "assistant", "content": json.dumps(merged, ensure_ascii=False, separators=(",", ":"))})
+    return fewshot
+
+
+FUSED_SYSTEM = _build_fused_system()
+FUSED_FEWSHOT = _build_fused_fewshot()
+
+
+# ─────────────────────────────────────────────────────────
+# Packed: several short samples per request (any of the calls above)
+# ─────────────────────────────────────────────────────────
+
+PACKED_INSTRUCTIONS = """
+
+## Packed Input
+The user message contains several INDEPENDENT samples, each wrapped in <sample id="..."> ... </sample>.
+Label every sample on its own using the rules above — never let one sample influence another.
+Return ONLY valid JSON of this form, with exactly one item per sample id:
+{"items": [{"id": "<sample id>", ...fields of the output format above...}, ...]}"""
+
+
+def pack_user_content(blocks):
+    """Wrap per-sample user contents as <samples><sample id=...>...</sample></samples>.
+
+    blocks: list of (sample_id, user_content)
+    """
+    parts = [f'<sample id="{sid}">\n{content}\n</sample>' for sid, content in blocks]
+    return "<samples>\n" + "\n".join(parts) + "\n</samples>"
+
+
+def _pack_fewshot(fewshot):
+    """Fold a single-sample few-shot list into one packed user/assistant example."""
+    blocks, items = [], []
+    for i, (user_msg, assistant_msg) in enumerate(zip(fewshot[0::2], fewshot[1::2]), 1):
+        blocks.append((f"example-{i}", user_msg["content"]))
+        items.append({"id": f"example-{i}", **json.loads(assistant_msg["content"])})
+    return [
+        {"role": "user", "content": pack_user_content(blocks)},
+        {"role": "assistant", "content": json.dumps({"items": items}, ensure_ascii=False, separators=(",", ":"))},
+    ]
+
+
+# call name → (system prompt, few-shot messages) for packed requests
+PACKED_PROMPTS = {
+    "call1": (CALL1_SYSTEM + PACKED_INSTRUCTIONS, _pack_fewshot(CALL1_FEWSHOT)),
+    "call2": (CALL2_SYSTEM + PACKED_INSTRUCTIONS, _pack_fewshot(CALL2_FEWSHOT)),
+    "fused": (FUSED_SYSTEM + PACKED_INSTRUCTIONS, _pack_fewshot(FUSED_FEWSHOT)),
+}
+
+
+# ─────────────────────────────────────────────────────────
+# Arbitration: one dimension per call (generated from Call 1 + Call 2)
+# ─────────────────────────────────────────────────────────
+
+def _dimension_sections():
+    """dim → its "### <Dim> (single|multi-select)" section from the Call 1 / Call 2 prompts."""
+    sections = {}
+    for system in (CALL1_SYSTEM, CALL2_SYSTEM):
+        body = _section(system, "## Your Task", "## Output Format")
+        for block in re.split(r"\n(?=### )", body)[1:]:
+            dim = block[len("### "):].split(" (", 1)[0].strip().lower()
+            sections[dim] = block.strip()
+    return sections
+
+
+# dim → its section of the Call 1 / Call 2 prompt, parsed once
+_DIMENSION_SECTIONS = _dimension_sections()
+
+
+def _build_arbitration_systems():
+    principles = _section(CALL2_SYSTEM, "## Annotation Principles", "## Your Task")
+    example = _merged_output_example()
+    systems = {}
+    for dim, section in _DIMENSION_SECTIONS.items():
+        output_example = json.dumps({dim: example[dim], "confidence": {dim: example["confidence"][dim]},
+                                     "unmapped": []}, ensure_ascii=False)
+        systems[dim] = f"""You are an expert SFT data annotator. A first labeling pass was uncertain about ONE dimension of this code-related conversation. Re-examine the conversation and label only that dimension.
+
+{principles}
+
+## Your Task
+Label ONLY this dimension. The other labels are given for context in <other_labels>.
+
+{section}
+
+## Output Format
+Return ONLY valid JSON (no markdown, no explanation):
+{output_example}
+
+Rules for output:
+- Tag values must be lowercase kebab-case IDs from the list above
+- confidence: 0.0-1.0 (how sure you are)
+- unmapped: any tags you wanted to assign but couldn't find in the pool (free text)"""
+    return systems
+
+
+# dim → narrow system prompt used to arbitrate that single dimension
+ARBITRATION_SYSTEMS = _build_arbitration_systems()
+
+
+# ─────────────────────────────────────────────────────────
+# Narrowed: calls without the dimensions the rule engine already labeled
+# ─────────────────────────────────────────────────────────
+
+_BASE_PROMPTS = {
+    "call1": (CALL1_SYSTEM, CALL1_FEWSHOT),
+    "call2": (CALL2_SYSTEM, CALL2_FEWSHOT),
+    "fused": (FUSED_SYSTEM, FUSED_FEWSHOT),
+}
+_OUTPUT_HEADER = "## Output Format\nReturn ONLY valid JSON (no markdown, no explanation):\n"
+
+
+def _drop_dims(output, drop):
+    output = {k: v for k, v in output.items() if k not in drop}
+    if isinstance(output.get("confidence"), dict):
+        output["confidence"] = {k: v for k, v in output["confidence"].items() if k not in drop}
+    return output
+
+
+def _narrow_system(system, drop):
+    for dim in drop:
+        system = system.replace("\n\n" + _DIMENSION_SECTIONS[dim], "")
+    kept = len(re.findall(r"\n### ", _section(system, "## Your Task", "## Output Format")))
+    system = re.sub(r"\b\d+ dimensions", f"{kept} dimensions", system)
+    names = ", ".join(drop)
+    system = system.replace(
+        "## Your Task\n",
+        f"## Your Task\nThese dimensions are already labeled by deterministic rules — do NOT output them: {names}\n", 1)
+    i = system.index(_OUTPUT_HEADER) + len(_OUTPUT_HEADER)
+    example, end = json.JSONDecoder().raw_decode(system, i)
+    return system[:i] + json.dumps(_drop_dims(example, drop), ensure_ascii=False, indent=2) + system[end:]
+
+
+def _narrow_fewshot(fewshot, drop):
+    narrowed = []
+    for msg in fewshot:
+        if msg["role"] == "assistant":
+            output = _drop_dims(json.loads(msg["content"]), drop)
+            msg = {"role": "assistant", "content": json.dumps(output, ensure_ascii=False, separators=(",", ":"))}
+        narrowed.append(msg)
+    return narrowed
+
+
+_CONCEPT_HEADING = "### Concept ("
+_POOL_ENTRY_RE = re.compile(r"- ([a-z-]+): ")
+_TAG_REF_RE = re.compile(r"`([a-z-]+)`")
+
+
+def _narrow_concepts(system, concepts):
+    """System prompt whose Concept section lists only `concepts`.
+
+    Drops the pool entries of the other concepts, the rules and examples that
+    only name them, and the headings left without entries.
+    """
+    start = system.index(_CONCEPT_HEADING)
+    end = system.index("\n### ", start)
+    pool = TAG_POOLS["concept"]
+    lines = []
+    for line in system[start:end].split("\n"):
+        entry = _POOL_ENTRY_RE.match(line)
+        if entry and entry.group(1) in pool:
+            if entry.group(1) in concepts:
+                lines.append(line)
+            continue
+        named = [t for t in _TAG_REF_RE.findall(line) if t in pool]
+        if named and not any(t in concepts for t in named):
+            continue
+        lines.append(line)
+    kept = []
+    for i, line in enumerate(lines):
+        following = lines[i + 1] if i + 1 < len(lines) else ""
+        if line.endswith(":") and not line.startswith(" "):
+            # "Advanced:" needs a pool entry after it, "- Examples of …:" an indented item
+            child = "  - " if line.startswith("- ") else "- "
+            if not following.startswith(child):
+                continue
+        if not line and kept and not kept[-1]:
+            continue
+        kept.append(line)
+    kept.insert(2, "Only the concepts that occur with this sample's language and domain are listed.")
+    return system[:start] + "\n".join(kept) + system[end:]
+
+
+# Built prompt variants, least recently used first. Keys are (call, dropped dims)
+# and (call, dropped dims, candidate concepts); the concept sets are what can
+# grow, so the cache keeps the MAX_NARROWED most recent variants. That stays
+# below request_body.MAX_TEMPLATES, so every live variant keeps its template.
+MAX_NARROWED = 128
+_NARROWED = OrderedDict()
+
+
+def _narrowed(key, build):
+    """_NARROWED[key], built on first use."""
+    value = _NARROWED.get(key)
+    if value is None:
+        value = _NARROWED[key] = build()
+        if len(_NARROWED) > MAX_NARROWED:
+            _NARROWED.popitem(last=False)
+    else:
+        _NARROWED.move_to_end(key)
+    return value
+
+
+def call_prompt(call_name, drop=(), concepts=None):
+    """(system, few-shot) for "call1" / "call2" / "fused" without the `drop` dimensions.
+
+    concepts: candidate concepts of the sample (concept_candidates.py); the
+    Concept section then lists only those. None = the full pool.
+
+    Variants are built once and reused, so their strings stay identical across
+    requests (see request_body.py).
+    """
+    base_system = _BASE_PROMPTS[call_name][0]
+    drop = tuple(sorted(d for d in drop if d in _DIMENSION_SECTIONS
+                        and f"### {d.capitalize()} (" in base_system))
+    if concepts is not None:
+        concepts = tuple(sorted(set(concepts) & TAG_POOLS["concept"]))
+        if len(concepts) == len(TAG_POOLS["concept"]) or "concept" in drop or _CONCEPT_HEADING not in base_system:
+            concepts = None
+    if concepts is not None:
+        def build():
+            system, fewshot = call_prompt(call_name, drop)
+            return _narrow_concepts(system, concepts), fewshot
+        return _narrowed((call_name, drop, concepts), build)
+    if not drop:
+        return _BASE_PROMPTS[call_name]
+    system, fewshot = _BASE_PROMPTS[call_name]
+    return _narrowed((call_name, drop), lambda: (_narrow_system(system, drop), _narrow_fewshot(fewshot, drop)))
+
+
+def packed_prompt(call_name, drop=()):
+    """PACKED_PROMPTS entry for a call, narrowed like call_prompt()."""
+    system, fewshot = call_prompt(call_name, drop)
+    if system is _BASE_PROMPTS[call_name][0]:
+        return PACKED_PROMPTS[call_name]
+    return _narrowed(("packed", call_name, tuple(sorted(drop))),
+                     lambda: (system + PACKED_INSTRUCTIONS, _pack_fewshot(fewshot)))
+
+
 def build_call1_messages(conversation_json, preprocessed_signals):
     """Build messages for Call 1 labeling."""
     user_content = f"""<conversation>
@@ -0,0 +1,183 @@
+"""
+Per-model Rate Limiter (RPM + TPM)
+
+Token buckets that keep each model under its proxy quota instead of
+discovering the quota through 429s and backoff.
+
+  - Each model has a request bucket (capacity = rpm) and a token bucket
+    (capacity = tpm), both refilled continuously over 60s.
+  - Before every HTTP attempt the caller reserves 1 request and an estimated
+    token count: prompt chars → tokens (same heuristic as preprocessing's
+    estimate_tokens, scaled by a learned correction ratio) + max_tokens.
+  - After the response, settle() replaces the estimate with the real usage and
+    updates the correction ratio. A 429 refunds the reservation and drains the
+    request bucket so all callers pause briefly and resync with the proxy.
+
+Budgets come from the per-model entries in config.MODELS; models without an
+rpm/tpm entry are not limited on that axis.
+"""
+
+import asyncio
+import time
+
+from config import MODELS
+from preprocessing import estimate_tokens
+
+
+def model_rate_limits(model):
+    """Look up {"rpm": ..., "tpm": ...} for a model across all tiers in config.MODELS."""
+    for tier in MODELS.values():
+        if model in tier:
+            return dict(tier[model] or {})
+    return {}
+
+
+def estimate_prompt_tokens(messages):
+    """Rough prompt size of a chat message list (before correction)."""
+    return sum(estimate_tokens(m.get("content", "")) + 4 for m in messages)
+
+
+class TokenBucket:
+    """Continuous-refill bucket holding up to `per_minute` units."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._last = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` units are available (0 if available now)."""
+        deficit = min(amount, self.capacity) - self.level
+        return max(0.0, deficit / self.rate)
+
+
+class _ModelBudget:
+    def __init__(self, rpm=None, tpm=None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.lock = asyncio.Lock()   # FIFO: waiters are served in arrival order
+        self.prompt_ratio = 1.0      # actual / estimated prompt tokens (EWMA)
+        # stats
+        self.reserved = 0
+        self.estimated_tokens = 0
+        self.actual_tokens = 0
+        self.wait_seconds = 0.0
+        self.throttled = 0
+
+
+class RateLimiter:
+    """Per-model RPM/TPM limiter shared by all in-flight samples of a run."""
+
+    def __init__(self, overrides=None):
+        """overrides: {model: {"rpm": int|None, "tpm": int|None}} merged over config.MODELS."""
+        self._overrides = overrides or {}
+        self._budgets = {}
+
+    def _budget(self, model):
+        budget = self._budgets.get(model)
+        if budget is None:
+            limits = {**model_rate_limits(model), **self._overrides.get(model, {})}
+            budget = _ModelBudget(limits.get("rpm"), limits.get("tpm"))
+            self._budgets[model] = budget
+        return budget
+
+    def _reservation(self, budget, model, messages, max_tokens):
+        prompt_est = estimate_prompt_tokens(messages)
+        est = int(prompt_est * budget.prompt_ratio) + max_tokens
+        return {"model": model, "tokens": est, "prompt_est": prompt_est}
+
+    @staticmethod
+    def _wait_time(budget, est):
+        wait = 0.0
+        if budget.requests is not None:
+            budget.requests.refill()
+            wait = max(wait, budget.requests.wait_time(1))
+        if budget.tokens is not None:
+            budget.tokens.refill()
+            wait = max(wait, budget.tokens.wait_time(est))
+        return wait
+
+    @staticmethod
+    def _take(budget, est):
+        if budget.requests is not None:
+            budget.requests.level -= 1
+        if budget.tokens is not None:
+            budget.tokens.level -= est
+        budget.reserved += 1
+        budget.estimated_tokens += est
+
+    async def acquire(self, model, messages, max_tokens):
+        """Wait until the model's budgets admit this request. Returns a reservation dict."""
+        budget = self._budget(model)
+        reservation = self._reservation(budget, model, messages, max_tokens)
+        if budget.requests is None and budget.tokens is None:
+            return reservation
+
+        async with budget.lock:
+            t0 = time.monotonic()
+            while True:
+                wait = self._wait_time(budget, reservation["tokens"])
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self._take(budget, reservation["tokens"])
+            budget.wait_seconds += time.monotonic() - t0
+        return reservation
+
+    def try_acquire(self, model, messages, max_tokens):
+        """Reserve like acquire() if the model's budgets admit the request right now, else None.
+
+        Never waits, and never goes ahead of callers queued in acquire().
+        """
+        budget = self._budget(model)
+        reservation = self._reservation(budget, model, messages, max_tokens)
+        if budget.requests is None and budget.tokens is None:
+            return reservation
+        if budget.lock.locked() or self._wait_time(budget, reservation["tokens"]) > 0:
+            return None
+        self._take(budget, reservation["tokens"])
+        return reservation
+
+    def settle(self, reservation, usage):
+        """Replace the estimate with real usage (prompt + completion tokens)."""
+        budget = self._budget(reservation["model"])
+        prompt = usage.get("prompt_tokens", 0)
+        actual = prompt + usage.get("completion_tokens", 0)
+        if budget.tokens is not None:
+            budget.tokens.level += reservation["tokens"] - actual
+        budget.actual_tokens += actual
+        if prompt and reservation["prompt_est"]:
+            observed = prompt / reservation["prompt_est"]
+            budget.prompt_ratio += 0.1 * (observed - budget.prompt_ratio)
+
+    def refund(self, reservation, throttled=False):
+        """Give back a reservation whose request was rejected before consuming quota."""
+        budget = self._budget(reservation["model"])
+        if budget.tokens is not None:
+            budget.tokens.level += reservation["tokens"]
+        if throttled:
+            budget.throttled += 1
+            if budget.requests is not None:
+                # The proxy's window is fuller than ours — drain so callers pause and resync
+                budget.requests.level = min(budget.requests.level, 0.0)
+
+    def stats(self):
+        out = {}
+        for model, b in self._budgets.items():
+            out[model] = {
+                "rpm": int(b.requests.capacity) if b.requests else None,
+                "tpm": int(b.tokens.capacity) if b.tokens else None,
+                "requests": b.reserved,
+                "estimated_tokens": b.estimated_tokens,
+                "actual_tokens": b.actual_tokens,
+                "prompt_estimate_ratio": round(b.prompt_ratio, 3),
+                "wait_seconds": round(b.wait_seconds, 1),
+                "throttled": b.throttled,
+            }
+        return out
@@ -0,0 +1,130 @@
+"""
+Pre-encoded Request Bodies
+
+Every chat request is [system, *few-shot, user]: the system prompt and few-shot
+messages are module constants (prompts.py) that are several KB long, and only
+the final user message differs per sample. Serializing the whole message list
+with json.dumps on every call, retry, hedge and arbitration spends event-loop
+CPU on bytes that never change.
+
+RequestTemplates keeps the encoded form of each constant prefix, keyed by the
+identity of its content strings, and splices in the per-sample user message and
+sampling parameters:
+
+  - body()       compact JSON request body (bytes) for http_client.post(content=...)
+  - cache_key()  same digest as llm_cache.cache_key (existing cache entries stay
+                 valid), resumed from a sha256 state that has already hashed
+                 the sorted-key prefix
+
+Message lists whose prefix is not plain {"role", "content"} string messages, or
+that have no prefix, are encoded in full as before.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+
+MAX_TEMPLATES = 256     # encoded prefixes kept; the least recently used one is dropped beyond this
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _message(role, content, sorted_keys=False):
+    if sorted_keys:
+        return '{"content":' + _dumps(content) + ',"role":' + _dumps(role) + '}'
+    return '{"role":' + _dumps(role) + ',"content":' + _dumps(content) + '}'
+
+
+class _Prefix:
+    __slots__ = ("contents", "body", "keyed", "_hashers")
+
+    def __init__(self, prefix):
+        self.contents = [m["content"] for m in prefix]   # pins the strings the id key refers to
+        self.body = ",".join(_message(m["role"], m["content"]) for m in prefix).encode("utf-8")
+        self.keyed = ",".join(_message(m["role"], m["content"], sorted_keys=True) for m in prefix).encode("utf-8")
+        self._hashers = {}
+
+    def hasher(self, max_tokens):
+        """sha256 that has already consumed the cache-key blob up to the user message.
+
+        max_tokens sorts before messages, so the prefix hash depends on it; there
+        are only a handful of distinct values per run.
+        """
+        h = self._hashers.get(max_tokens)
+        if h is None:
+            h = hashlib.sha256(b'{"max_tokens":' + _dumps(max_tokens).encode("utf-8")
+                               + b',"messages":[' + self.keyed + b",")
+            self._hashers[max_tokens] = h
+        return h.copy()
+
+
+class RequestTemplates:
+    """Process-wide LRU cache of encoded message prefixes.
+
+    A cached prefix pins its content strings, so the id() in its key cannot be
+    reused by another string while the entry exists.
+    """
+
+    def __init__(self, max_templates=MAX_TEMPLATES):
+        self.max_templates = max_templates
+        self._prefixes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _prefix(self, messages):
+        """Encoded prefix for messages[:-1], or None if the list can't be templated."""
+        if len(messages) < 2:
+            return None
+        key = []
+        for m in messages:
+            content = m.get("content")
+            if len(m) != 2 or not isinstance(content, str) or not isinstance(m.get("role"), str):
+                return None
+            key.append((m["role"], id(content)))
+        key = tuple(key[:-1])
+        prefix = self._prefixes.get(key)
+        if prefix is not None:
+            self.hits += 1
+            self._prefixes.move_to_end(key)
+            return prefix
+        self.misses += 1
+        prefix = self._prefixes[key] = _Prefix(messages[:-1])
+        if len(self._prefixes) > self.max_templates:
+            self._prefixes.popitem(last=False)
+        return prefix
+
+    def body(self, model, messages, temperature, max_tokens):
+        """JSON request body for /chat/completions."""
+        prefix = self._prefix(messages)
+        if prefix is None:
+            return _dumps({"model": model, "messages": messages,
+                           "temperature": temperature, "max_tokens": max_tokens}).encode("utf-8")
+        last = messages[-1]
+        return b"".join((
+            b'{"model":', _dumps(model).encode("utf-8"), b',"messages":[', prefix.body, b",",
+            (_message(last["role"], last["content"]) + '],"temperature":' + _dumps(temperature)
+             + ',"max_tokens":' + _dumps(max_tokens) + "}").encode("utf-8"),
+        ))
+
+    def cache_key(self, model, messages, temperature, max_tokens):
+        """Equal to llm_cache.cache_key(model, messages, temperature, max_tokens)."""
+        prefix = self._prefix(messages)
+        if prefix is None:
+            blob = json.dumps(
+                {"model": model, "temperature": temperature, "max_tokens": max_tokens, "messages": messages},
+                ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+            )
+            return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+        last = messages[-1]
+        h = prefix.hasher(max_tokens)
+        h.update((_message(last["role"], last["content"], sorted_keys=True)
+                  + '],"model":' + _dumps(model) + ',"temperature":' + _dumps(temperature) + "}").encode("utf-8"))
+        return h.hexdigest()
+
+    def stats(self):
+        return {"templates": len(self._prefixes), "hits": self.hits, "misses": self.misses}
+
+
+TEMPLATES = RequestTemplates()
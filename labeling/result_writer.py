@@ -0,0 +1,197 @@
+"""
+Incremental Result Writer
+
+A file's outputs used to be written in one go once its last sample was
+labeled, so every sample (and its labels) stayed in memory until then, and an
+interrupted file left nothing on disk. ResultWriter appends each sample as
+soon as its labels are final (see pipeline.write_finished):
+
+  - labeled.jsonl    the sample with "labels" and the "labeling_monitor" summary
+  - monitor.jsonl    the full monitor of each labeled sample
+  - failed_samples.jsonl  failed samples as read (opened on the first failure)
+  - completion.log   write-ahead completion log, one JSON array per written sample:
+                     [index, sample id, offset, length, monitor offset, monitor length]
+                     (byte ranges in labeled.jsonl / monitor.jsonl; monitor offset -1: none)
+
+Lines are in completion order. Log records are buffered and appended only
+after labeled.jsonl and monitor.jsonl are fsynced, every
+RESULT_LOG_SYNC_RECORDS samples or RESULT_LOG_SYNC_SECONDS, so every logged
+range is on disk. On --resume (resume_ids) the logged samples that were
+labeled, and still have the same id at the same index, are copied into fresh
+outputs and reported in `restored`; anything past the last log record, and
+failed samples, are dropped to be labeled again. The previous files are kept
+as *.prev until the copy is synced, so an interrupted resume can resume again.
+
+The pretty labeled.json, in input order, is rebuilt from labeled.jsonl
+afterwards one sample at a time (write_pretty_json) — or skipped with
+--no-labeled-json.
+"""
+
+import json
+import os
+import time
+
+from config import RESULT_LOG_SYNC_RECORDS, RESULT_LOG_SYNC_SECONDS
+
+
+def labeled_record(sample, labels, monitor):
+    """The sample as written to labeled.json/jsonl: its labels and a monitor summary attached."""
+    record = dict(sample)
+    record["labels"] = labels
+    if monitor:
+        record["labeling_monitor"] = {
+            "llm_calls": monitor["llm_calls"],
+            "arbitrated": monitor["arbitrated"],
+            "validation_issues": monitor["validation_issues"],
+            "consistency_warnings": monitor["consistency_warnings"],
+        }
+    return record
+
+
+class ResultWriter:
+    """Append-only labeled/monitor/failed JSONL outputs of one input file, with a completion log.
+
+    resume_ids: ids of the file's samples by index, to restore the samples a
+    previous run logged (--resume); None starts the outputs afresh.
+    """
+
+    def __init__(self, output_dir, prefix=None, resume_ids=None):
+        self.output_dir = output_dir
+        self.suffix = f"_{prefix}" if prefix else ""
+        self.labeled_jsonl = f"labeled{self.suffix}.jsonl"
+        self.labeled_json = f"labeled{self.suffix}.json"
+        self.monitor_jsonl = f"monitor{self.suffix}.jsonl"
+        self.completion_log = f"completion{self.suffix}.log"
+        output_dir.mkdir(parents=True, exist_ok=True)
+        previous = self._set_aside_previous() if resume_ids is not None else None
+        self._labeled = open(output_dir / self.labeled_jsonl, "wb")
+        self._monitor = open(output_dir / self.monitor_jsonl, "wb")
+        self._log = open(output_dir / self.completion_log, "w", encoding="utf-8")
+        self._failed = None
+        self.offsets = {}   # sample index → (offset, length) of its line in labeled.jsonl
+        self.restored = {}  # sample index → (labels, monitor) restored from a previous run
+        self._end = 0
+        self._monitor_end = 0
+        self._pending = []  # log records of samples not yet fsynced
+        self._synced_at = time.monotonic()
+        if previous is not None:
+            self._restore(*previous, resume_ids)
+
+    def __contains__(self, idx):
+        return idx in self.offsets
+
+    def write(self, idx, sample, labels, monitor):
+        """Append sample idx with its labels, and its monitor if it has one."""
+        line = (json.dumps(labeled_record(sample, labels, monitor), ensure_ascii=False) + "\n").encode("utf-8")
+        monitor_line = (json.dumps(monitor, ensure_ascii=False) + "\n").encode("utf-8") if monitor else b""
+        self._append(idx, sample.get("id"), line, monitor_line)
+
+    def _append(self, idx, sample_id, line, monitor_line):
+        self._labeled.write(line)
+        self.offsets[idx] = (self._end, len(line))
+        monitor_offset = -1
+        if monitor_line:
+            self._monitor.write(monitor_line)
+            monitor_offset = self._monitor_end
+            self._monitor_end += len(monitor_line)
+        self._pending.append([idx, sample_id, self._end, len(line), monitor_offset, len(monitor_line)])
+        self._end += len(line)
+        if (len(self._pending) >= RESULT_LOG_SYNC_RECORDS
+                or time.monotonic() - self._synced_at >= RESULT_LOG_SYNC_SECONDS):
+            self.sync()
+
+    def sync(self):
+        """fsync the outputs, then log the samples written since the last sync."""
+        self._synced_at = time.monotonic()
+        if not self._pending:
+            return
+        for f in (self._labeled, self._monitor):
+            f.flush()
+            os.fsync(f.fileno())
+        self._log.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in self._pending))
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._pending = []
+
+    def write_failed(self, sample):
+        """Append a failed sample, without labels, to failed_samples.jsonl for a retry."""
+        if self._failed is None:
+            self._failed = open(self.output_dir / f"failed_samples{self.suffix}.jsonl", "w", encoding="utf-8")
+        s = dict(sample)
+        s.pop("labels", None)
+        s.pop("labeling_monitor", None)
+        self._failed.write(json.dumps(s, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.sync()
+        for f in (self._labeled, self._monitor, self._log, self._failed):
+            if f is not None:
+                f.close()
+
+    def remove_log(self):
+        """Drop the completion log once the file is checkpointed as complete."""
+        (self.output_dir / self.completion_log).unlink(missing_ok=True)
+
+    def _set_aside_previous(self):
+        """Rename the previous log and outputs to *.prev and read the log; None without a log.
+
+        A *.prev log left by an interrupted restore is used as it is.
+        """
+        names = (self.completion_log, self.labeled_jsonl, self.monitor_jsonl)
+        log_prev, labeled_prev, monitor_prev = (self.output_dir / f"{name}.prev" for name in names)
+        if not log_prev.exists():
+            if not (self.output_dir / self.completion_log).exists():
+                return None
+            for name in names[::-1]:   # the log last: a set-aside log always has its outputs
+                path = self.output_dir / name
+                if path.exists():
+                    path.replace(self.output_dir / f"{name}.prev")
+        records = []
+        with open(log_prev, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break   # torn last record of an interrupted append
+        return records, log_prev, labeled_prev, monitor_prev
+
+    def _restore(self, records, log_prev, labeled_prev, monitor_prev, resume_ids):
+        """Copy the labeled samples of a previous run's log into the fresh outputs."""
+        if labeled_prev.exists() and monitor_prev.exists():
+            with open(labeled_prev, "rb") as lf, open(monitor_prev, "rb") as mf:
+                for idx, sample_id, offset, length, monitor_offset, monitor_length in records:
+                    if idx >= len(resume_ids) or resume_ids[idx] != sample_id or idx in self.offsets:
+                        continue
+                    lf.seek(offset)
+                    line = lf.read(length)
+                    monitor_line, monitor = b"", None
+                    try:
+                        labels = json.loads(line)["labels"]
+                        if monitor_offset >= 0:
+                            mf.seek(monitor_offset)
+                            monitor_line = mf.read(monitor_length)
+                            monitor = json.loads(monitor_line)
+                    except (ValueError, KeyError):
+                        continue
+                    if labels is None:
+                        continue    # failed: labeled again
+                    self._append(idx, sample_id, line, monitor_line)
+                    self.restored[idx] = (labels, monitor)
+        self.sync()
+        for path in (log_prev, labeled_prev, monitor_prev):
+            path.unlink(missing_ok=True)
+
+    def write_pretty_json(self):
+        """Rebuild labeled.json (json.dump indent=2, input order) from labeled.jsonl after close()."""
+        with open(self.output_dir / self.labeled_jsonl, "rb") as src, \
+                open(self.output_dir / self.labeled_json, "w", encoding="utf-8") as out:
+            if not self.offsets:
+                out.write("[]")
+                return
+            out.write("[")
+            for n, idx in enumerate(sorted(self.offsets)):
+                offset, length = self.offsets[idx]
+                src.seek(offset)
+                item = json.dumps(json.loads(src.read(length)), ensure_ascii=False, indent=2)
+                out.write(("\n  " if n == 0 else ",\n  ") + item.replace("\n", "\n  "))
+            out.write("\n]")
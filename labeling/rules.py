@@ -0,0 +1,98 @@
+"""
+Rule Engine
+
+Deterministic labels computed from preprocess() signals (the sample's feature
+vector: fence languages, framework mentions, tool roles / names, code block
+counts). Each rule labels one dimension and reports its own confidence.
+
+A dimension whose best rule reaches RULE_CONFIDENCE_THRESHOLD is resolved
+locally: the LLM prompt and output schema are narrowed to the remaining
+dimensions (prompts.call_prompt) and the rule value is spliced into the LLM
+result before validation, so the rest of the pipeline sees a normal label dict.
+
+Rules are opt-in (pipeline.py --rules). Their confidences are fixed, hand-set
+values, not a measurement: tools/evaluate_rules.py reports how often each rule
+agrees with stored LLM labels (by default labeling/data/baselines), and should
+be re-run on the target data before relying on them.
+
+Rules:
+  language  fence_language    every code block is fenced with the same known
+                              language and no framework points elsewhere
+  agentic   no_tool_activity  no tool role messages and no tool names → []
+
+Tool-using samples never resolve agentic locally: tool actions map cleanly from
+TOOL_NAME_MAP, but the behavioral patterns in the same dimension need the LLM.
+"""
+
+from config import RULE_DIMENSIONS, RULE_CONFIDENCE_THRESHOLD
+from prompts import TAG_POOLS
+
+
+EMBEDDING_LANGUAGES = {"html"}
+
+
+def fence_language(signals):
+    """Single fenced language → [language]."""
+    langs = signals["fence_languages"]
+    if len(langs) != 1 or signals["has_tool_roles"] or langs[0] not in TAG_POOLS["language"]:
+        return None
+    lang = langs[0]
+    # Framework hints for another language mean the LLM would likely add it
+    if not set(signals["framework_languages"]) <= {lang}:
+        return None
+    if signals.get("labeled_code_blocks", 0) < signals["code_block_count"]:
+        return [lang], 0.85   # an unlabeled block may hold another language
+    if lang in EMBEDDING_LANGUAGES:
+        return [lang], 0.85   # <script> / <style> content counts as its own language
+    return [lang], 0.97
+
+
+def no_tool_activity(signals):
+    """No tool roles and no tool names → agentic is empty."""
+    if signals["has_tool_roles"] or signals["tool_names"]:
+        return None
+    return [], 0.96
+
+
+# dim → rules, each (signals) → (value, confidence) or None
+RULES = {
+    "language": [fence_language],
+    "agentic": [no_tool_activity],
+}
+
+
+def apply_rules(signals, dims=RULE_DIMENSIONS):
+    """Best rule label per dimension → {dim: {"value", "confidence", "rule"}}."""
+    labels = {}
+    for dim in dims:
+        for rule in RULES.get(dim, []):
+            hit = rule(signals)
+            if hit is None:
+                continue
+            value, confidence = hit
+            if dim not in labels or confidence > labels[dim]["confidence"]:
+                labels[dim] = {"value": value, "confidence": confidence, "rule": rule.__name__}
+    return labels
+
+
+def resolve(signals, dims=RULE_DIMENSIONS, threshold=RULE_CONFIDENCE_THRESHOLD):
+    """Rule labels confident enough to replace the LLM for their dimension."""
+    return {dim: r for dim, r in apply_rules(signals, dims).items() if r["confidence"] >= threshold}
+
+
+def apply_rule_labels(result, resolved, dims=None):
+    """Splice resolved rule labels (of `dims`, default all) into a parsed LLM result.
+
+    Called before validate_tags, so rule values go through the same pool checks.
+    """
+    resolved = {d: r for d, r in resolved.items() if dims is None or d in dims}
+    if not resolved or not isinstance(result, dict):
+        return result
+    result = dict(result)
+    confidence = result.get("confidence")
+    confidence = dict(confidence) if isinstance(confidence, dict) else {}
+    for dim, r in resolved.items():
+        result[dim] = list(r["value"]) if isinstance(r["value"], list) else r["value"]
+        confidence[dim] = r["confidence"]
+    result["confidence"] = confidence
+    return result
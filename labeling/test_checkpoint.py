@@ -0,0 +1,85 @@
+"""
+Tests for checkpoint.py - snapshot + event log replay on --resume.
+"""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import checkpoint
+from checkpoint import Checkpoint
+
+FILES = ["a.jsonl", "b.jsonl", "c.jsonl", "d.jsonl"]
+
+
+def test_load_replays_the_log(tmp_path):
+    """Events appended after the snapshot are replayed on load"""
+    ckpt = Checkpoint.create(tmp_path / "checkpoint.json", FILES, settings={"model": "m"})
+    ckpt.mark("a.jsonl")
+    ckpt.mark("b.jsonl", success=False, error_msg="boom")
+    loaded = Checkpoint.load(tmp_path / "checkpoint.json")
+    assert loaded.completed == {"a.jsonl"}
+    assert loaded.failed == {"b.jsonl": "boom"}
+    assert loaded.settings == {"model": "m"}
+    assert loaded.status == "in_progress"
+
+
+def test_missing_checkpoint(tmp_path):
+    assert Checkpoint.load(tmp_path / "checkpoint.json") is None
+
+
+def test_torn_last_line_is_cut(tmp_path):
+    """A half-written last event is dropped and truncated away, so new events start clean"""
+    ckpt = Checkpoint.create(tmp_path / "checkpoint.json", FILES)
+    ckpt.mark("a.jsonl")
+    ckpt._log.write('{"file": "b.jsonl", "ev')
+    ckpt._log.close()
+    log = tmp_path / "checkpoint.log"
+    intact = log.read_bytes().split(b"\n")[0] + b"\n"
+
+    loaded = Checkpoint.load(tmp_path / "checkpoint.json")
+    assert loaded.completed == {"a.jsonl"}
+    assert log.read_bytes() == intact
+    loaded.mark("c.jsonl")
+    again = Checkpoint.load(tmp_path / "checkpoint.json")
+    assert again.completed == {"a.jsonl", "c.jsonl"}
+
+
+def test_replay_after_a_crash_between_snapshot_and_log_reset(tmp_path):
+    """Events already in the snapshot and still in the log are applied twice, harmlessly"""
+    ckpt = Checkpoint.create(tmp_path / "checkpoint.json", FILES)
+    ckpt.mark("a.jsonl", success=False, error_msg="first try")
+    ckpt.mark("a.jsonl")
+    ckpt.mark("b.jsonl")
+    events = (tmp_path / "checkpoint.log").read_text(encoding="utf-8")
+    ckpt.compact()
+    (tmp_path / "checkpoint.log").write_text(events, encoding="utf-8")
+    loaded = Checkpoint.load(tmp_path / "checkpoint.json")
+    assert loaded.completed == {"a.jsonl", "b.jsonl"}
+    assert loaded.failed == {}
+    loaded.compact()
+    with open(tmp_path / "checkpoint.json", "r", encoding="utf-8") as f:
+        assert json.load(f)["completed"] == ["a.jsonl", "b.jsonl"]
+
+
+def test_compaction_empties_the_log(tmp_path, monkeypatch):
+    """Every CHECKPOINT_COMPACT_EVERY events the state moves into the snapshot"""
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_COMPACT_EVERY", 2)
+    ckpt = Checkpoint.create(tmp_path / "checkpoint.json", FILES)
+    ckpt.mark("a.jsonl")
+    ckpt.mark("b.jsonl")
+    assert (tmp_path / "checkpoint.log").read_text(encoding="utf-8") == ""
+    ckpt.mark("c.jsonl")
+    loaded = Checkpoint.load(tmp_path / "checkpoint.json")
+    assert loaded.completed == {"a.jsonl", "b.jsonl", "c.jsonl"}
+
+
+def test_done_writes_the_final_snapshot(tmp_path):
+    ckpt = Checkpoint.create(tmp_path / "checkpoint.json", FILES[:2])
+    ckpt.mark("a.jsonl")
+    ckpt.mark("b.jsonl", success=False, error_msg="boom")
+    with open(tmp_path / "checkpoint.json", "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert snapshot["status"] == "done"
+    assert snapshot["completed"] == ["a.jsonl"]
+    assert snapshot["failed"] == {"b.jsonl": "boom"}
@@ -0,0 +1,64 @@
+"""
+Tests for json_stream.py - streaming the elements of a top-level JSON array.
+"""
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+from json_stream import iter_json_values
+
+SAMPLES = [
+    {"id": "a", "conversations": [{"from": "human", "value": "say \"hi\" \\ [not, an] {array}"}]},
+    {"id": "b", "score": 1234567, "ratio": -0.125e-3, "tags": ["x", "y"], "ok": True, "none": None},
+    {"id": "c", "value": "中文 → unicode, 😀 and an escaped \\u0041"},
+    [1, [2, [3]], {}],
+    "a bare string",
+    98765,
+    -4.5E+2,
+    False,
+    None,
+]
+
+
+def stream(text, chunk_chars):
+    return list(iter_json_values(io.StringIO(text), chunk_chars=chunk_chars))
+
+
+def test_elements_split_at_every_buffer_boundary():
+    """Every chunk size, so each element is cut by a buffer end at every position"""
+    for text in (json.dumps(SAMPLES, ensure_ascii=False), json.dumps(SAMPLES, indent=2)):
+        for chunk in range(1, len(text) + 2):
+            assert stream(text, chunk) == SAMPLES, f"chunk_chars={chunk}"
+
+
+def test_numbers_at_a_chunk_edge():
+    """A number cut by the buffer end is read on, not decoded as its prefix"""
+    text = "[12345,-67.89e2,0,1e5]"
+    for chunk in range(1, len(text) + 2):
+        assert stream(text, chunk) == [12345, -6789.0, 0, 100000.0], f"chunk_chars={chunk}"
+    for top in ("12345", "  -0.5e3  ", "true", "null"):
+        for chunk in range(1, len(top) + 2):
+            assert stream(top, chunk) == [json.loads(top)], f"{top!r} chunk_chars={chunk}"
+
+
+def test_element_larger_than_many_chunks():
+    big = {"id": "big", "value": "x" * 50_000}
+    assert stream(json.dumps([big, {"id": "next"}]), 7) == [big, {"id": "next"}]
+
+
+def test_top_level_object_is_one_element():
+    assert stream('{"id": "only"}', 3) == [{"id": "only"}]
+
+
+def test_empty_array():
+    assert stream(" [ ] ", 1) == []
+
+
+@pytest.mark.parametrize("text", ["", "[1, 2", "[1 2]", "[1,]", "[1] [2]", '[{"a": }]'])
+def test_malformed_input_raises(text):
+    with pytest.raises(ValueError):
+        stream(text, 2)
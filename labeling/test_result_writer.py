@@ -0,0 +1,152 @@
+"""
+Tests for result_writer.py - resuming a file from its completion log.
+"""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import result_writer
+from result_writer import ResultWriter
+
+IDS = ["s0", "s1", "s2", "s3"]
+
+
+def sample(idx):
+    return {"id": IDS[idx], "conversations": [{"from": "human", "value": f"question {idx}"}]}
+
+
+def labels(idx):
+    return {"intent": "build", "difficulty": f"level-{idx}"}
+
+
+def monitor(idx):
+    return {"sample_id": IDS[idx], "llm_calls": 2, "arbitrated": False,
+            "validation_issues": [], "consistency_warnings": [], "status": "success"}
+
+
+def first_run(out, indices):
+    """A run that wrote and logged `indices`, then stopped without finishing the file."""
+    writer = ResultWriter(out)
+    for idx in indices:
+        writer.write(idx, sample(idx), labels(idx), monitor(idx))
+    writer.close()
+
+
+def read_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resume_restores_logged_samples(tmp_path):
+    """Every logged sample comes back with its labels and monitor"""
+    first_run(tmp_path, [2, 0, 1])
+    writer = ResultWriter(tmp_path, resume_ids=IDS)
+    assert sorted(writer.restored) == [0, 1, 2]
+    assert writer.restored[2] == (labels(2), monitor(2))
+    writer.write(3, sample(3), labels(3), monitor(3))
+    writer.close()
+    assert [r["id"] for r in read_jsonl(tmp_path / "labeled.jsonl")] == ["s2", "s0", "s1", "s3"]
+    assert len(read_jsonl(tmp_path / "monitor.jsonl")) == 4
+    assert not list(tmp_path.glob("*.prev"))
+
+
+def test_torn_log_line(tmp_path):
+    """A half-written last log record is ignored; the records before it still restore"""
+    first_run(tmp_path, [0, 1])
+    with open(tmp_path / "completion.log", "a", encoding="utf-8") as f:
+        f.write('[2, "s2", 999, 4')
+    writer = ResultWriter(tmp_path, resume_ids=IDS)
+    writer.close()
+    assert sorted(writer.restored) == [0, 1]
+    assert [r["id"] for r in read_jsonl(tmp_path / "labeled.jsonl")] == ["s0", "s1"]
+    # The rewritten log is clean: a second resume reads the same samples
+    writer = ResultWriter(tmp_path, resume_ids=IDS)
+    writer.close()
+    assert sorted(writer.restored) == [0, 1]
+
+
+def test_unsynced_samples_are_dropped(tmp_path, monkeypatch):
+    """Samples written after the last sync have no log record and are labeled again"""
+    monkeypatch.setattr(result_writer, "RESULT_LOG_SYNC_RECORDS", 1000)
+    monkeypatch.setattr(result_writer, "RESULT_LOG_SYNC_SECONDS", 1e9)
+    writer = ResultWriter(tmp_path)
+    writer.write(0, sample(0), labels(0), monitor(0))
+    writer.sync()
+    writer.write(1, sample(1), labels(1), monitor(1))
+    for f in (writer._labeled, writer._monitor, writer._log):   # crash: no final sync
+        f.close()
+    writer = ResultWriter(tmp_path, resume_ids=IDS)
+    writer.close()
+    assert sorted(writer.restored) == [0]
+
+
+def test_id_mismatch_at_same_index(tmp_path):
+    """A logged sample whose index now holds another id (the input changed) is not restored"""
+    first_run(tmp_path, [0, 1, 2])
+    changed = ["s0", "other", "s2", "s3"]
+    writer = ResultWriter(tmp_path, resume_ids=changed)
+    writer.close()
+    assert sorted(writer.restored) == [0, 2]
+    assert 1 not in writer
+    assert [r["id"] for r in read_jsonl(tmp_path / "labeled.jsonl")] == ["s0", "s2"]
+
+
+def test_index_past_the_input_is_not_restored(tmp_path):
+    """A log record beyond the (now shorter) input is dropped"""
+    first_run(tmp_path, [0, 3])
+    writer = ResultWriter(tmp_path, resume_ids=IDS[:2])
+    writer.close()
+    assert sorted(writer.restored) == [0]
+
+
+def test_failed_sample_is_labeled_again(tmp_path):
+    """A logged sample without labels (failed) is not restored"""
+    writer = ResultWriter(tmp_path)
+    writer.write(0, sample(0), labels(0), monitor(0))
+    writer.write(1, sample(1), None, monitor(1))
+    writer.close()
+    writer = ResultWriter(tmp_path, resume_ids=IDS)
+    writer.close()
+    assert sorted(writer.restored) == [0]
+
+
+def test_interrupted_restore_resumes_from_prev(tmp_path, monkeypatch):
+    """A restore that dies midway leaves *.prev files; the next resume restores from them"""
+    first_run(tmp_path, [0, 1, 2])
+    original = ResultWriter._append
+    copied = []
+
+    def crash_after_first(self, idx, *args):
+        if copied:
+            raise RuntimeError("interrupted")
+        copied.append(idx)
+        return original(self, idx, *args)
+
+    monkeypatch.setattr(ResultWriter, "_append", crash_after_first)
+    try:
+        ResultWriter(tmp_path, resume_ids=IDS)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("the restore was not interrupted")
+    assert sorted(p.name for p in tmp_path.glob("*.prev")) == [
+        "completion.log.prev", "labeled.jsonl.prev", "monitor.jsonl.prev"]
+
+    monkeypatch.setattr(ResultWriter, "_append", original)
+    writer = ResultWriter(tmp_path, resume_ids=IDS)
+    writer.close()
+    assert sorted(writer.restored) == [0, 1, 2]
+    assert [r["id"] for r in read_jsonl(tmp_path / "labeled.jsonl")] == ["s0", "s1", "s2"]
+    assert not list(tmp_path.glob("*.prev"))
+
+
+def test_pretty_json_in_input_order(tmp_path):
+    """labeled.json is rebuilt in input order from the completion-ordered jsonl"""
+    first_run(tmp_path, [2, 0])
+    writer = ResultWriter(tmp_path, resume_ids=IDS)
+    writer.write(1, sample(1), labels(1), monitor(1))
+    writer.close()
+    writer.write_pretty_json()
+    with open(tmp_path / "labeled.json", "r", encoding="utf-8") as f:
+        assert [r["id"] for r in json.load(f)] == ["s0", "s1", "s2"]
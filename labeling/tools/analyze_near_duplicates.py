@@ -0,0 +1,172 @@
+"""
+Near-Duplicate Analysis
+
+Validates near-duplicate label propagation (near_dup.py) offline, before
+--near-dup is enabled in a run. Samples are replayed in file order the way the
+pipeline sees them: each sample queries the index of earlier representatives.
+On a match it would take that representative's labels; otherwise it becomes a
+representative. For every threshold it reports:
+
+  - propagated  share of samples that would skip the LLM
+  - agreement   per-dimension agreement of the propagated labels with the
+                sample's own labels in the same labeled file (mean over files),
+                and the share of samples whose 9 dimensions all agree
+  - ceiling     the same agreement between the labeled files on the same
+                sample: two labelers disagree this much without any propagation
+  - LSH recall  of the sample pairs whose exact shingle Jaccard reaches the
+                threshold, the share the MinHash estimate also accepts
+                (all pairs, up to --exact-limit samples)
+
+With --input, unlabeled samples (JSON/JSONL, normalized and sliced like the
+pipeline) are analyzed for the propagated share alone.
+
+Needs numpy.
+
+Usage:
+  python3 labeling/tools/analyze_near_duplicates.py                       # data/baselines
+  python3 labeling/tools/analyze_near_duplicates.py --thresholds 0.8 0.9 0.95 --show 5
+  python3 labeling/tools/analyze_near_duplicates.py --input /data/sft/part-000.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import DATA_DIR, NEAR_DUP_THRESHOLD
+from near_dup import NearDupIndex, group_of, jaccard, shingles, similarity
+from preprocessing import normalize_and_slice
+from prompts import SINGLE_SELECT
+
+BASELINES = sorted((DATA_DIR / "baselines").glob("labeled_*.json"))
+DIMS = ["intent", "language", "domain", "task", "difficulty", "concept", "agentic", "constraint", "context"]
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95]
+
+
+def same(dim, a, b):
+    if dim in SINGLE_SELECT:
+        return a == b
+    return set(a or []) == set(b or [])
+
+
+def load_input(path):
+    """Normalized, sliced samples of a raw JSON/JSONL file."""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = [json.loads(line) for line in f if line.strip()] if path.endswith(".jsonl") else json.load(f)
+    samples = []
+    for s in raw if isinstance(raw, list) else [raw]:
+        samples.extend(normalize_and_slice(s))
+    for i, s in enumerate(samples):
+        s.setdefault("id", f"sample-{i:04d}")
+    return samples
+
+
+def replay(sigs, groups, threshold):
+    """[(sample index, representative index, similarity)] of the samples that would be propagated."""
+    index = NearDupIndex(threshold=threshold, max_entries=len(sigs) + 1)
+    propagated = []
+    for i, (sig, group) in enumerate(zip(sigs, groups)):
+        match = index.query(sig, group)
+        if match is None:
+            index.add(i, sig, i, group)
+        else:
+            propagated.append((i, match[1], match[2]))
+    return propagated
+
+
+def agreement(label_pairs):
+    """Per-dimension and all-dimension agreement over (labels, labels) pairs."""
+    per_dim, full, n = {d: 0 for d in DIMS}, 0, 0
+    for la, lb in label_pairs:
+        if not la or not lb:
+            continue
+        n += 1
+        agree = [same(d, la.get(d), lb.get(d)) for d in DIMS]
+        for d, ok in zip(DIMS, agree):
+            per_dim[d] += ok
+        full += all(agree)
+    return {d: c / max(n, 1) for d, c in per_dim.items()}, full / max(n, 1), n
+
+
+def lsh_accepts(hasher, sig_a, sig_b, threshold):
+    """NearDupIndex.query's rule for one pair: a shared band and estimated Jaccard ≥ threshold."""
+    rows = hasher.rows
+    shared = any((sig_a[k * rows:(k + 1) * rows] == sig_b[k * rows:(k + 1) * rows]).all()
+                 for k in range(hasher.bands))
+    return shared and similarity(sig_a, sig_b) >= threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate near-duplicate label propagation thresholds")
+    parser.add_argument("--labeled", nargs="+", default=[str(p) for p in BASELINES],
+                        help="Labeled JSON files over the same samples (default: data/baselines)")
+    parser.add_argument("--input", type=str, default=None, help="Unlabeled JSON/JSONL: propagated share only")
+    parser.add_argument("--thresholds", nargs="+", type=float, default=THRESHOLDS)
+    parser.add_argument("--exact-limit", type=int, default=3000,
+                        help="Compare against exact Jaccard over all pairs up to this many samples")
+    parser.add_argument("--show", type=int, default=0, help="Print the N least similar propagated pairs")
+    args = parser.parse_args()
+
+    if args.input:
+        samples, label_sets, names = load_input(args.input), [], []
+    else:
+        runs = []
+        for path in args.labeled:
+            with open(path, "r", encoding="utf-8") as f:
+                runs.append((Path(path).stem.replace("labeled_", ""), json.load(f)))
+        samples = runs[0][1]
+        names = [name for name, _ in runs]
+        label_sets = [{s["id"]: s.get("labels") for s in run} for _, run in runs]
+    source = args.input or ", ".join(names)
+    print(f"{len(samples)} samples from {source}, configured threshold {NEAR_DUP_THRESHOLD}\n")
+
+    shingle_sets = [shingles(s) for s in samples]
+    hasher = NearDupIndex().hasher
+    sigs = [hasher.signature(sh) for sh in shingle_sets]
+    groups = [group_of(s) for s in samples]
+    exact_pairs = None
+    if len(samples) <= args.exact_limit:
+        exact_pairs = [(i, j, jaccard(shingle_sets[i], shingle_sets[j]))
+                       for i, j in itertools.combinations(range(len(samples)), 2) if groups[i] != groups[j]]
+
+    ids = [s["id"] for s in samples]
+    header = f"{'threshold':>9}{'propagated':>12}"
+    if label_sets:
+        header += f"{'all dims':>10}  " + " ".join(f"{d[:6]:>6}" for d in DIMS)
+    if exact_pairs is not None:
+        header += f"{'pairs≥t':>9}{'LSH recall':>11}"
+    print(header)
+    for t in args.thresholds:
+        propagated = replay(sigs, groups, t)
+        line = f"{t:>9.2f}{len(propagated):>6} {len(propagated) / max(len(samples), 1):>5.1%}"
+        if label_sets:
+            per_dim, full, n = agreement([(labels.get(ids[i]), labels.get(ids[r]))
+                                          for labels in label_sets for i, r, _ in propagated])
+            line += (f"{full:>10.1%}  " + " ".join(f"{per_dim[d]:>6.0%}" for d in DIMS)) if n else f"{'—':>10}"
+        if exact_pairs is not None:
+            above = [(i, j) for i, j, sim in exact_pairs if sim >= t]
+            found = sum(lsh_accepts(hasher, sigs[i], sigs[j], t) for i, j in above)
+            line += f"{len(above):>9}{found / len(above) if above else 1:>11.1%}"
+        print(line)
+
+    if len(label_sets) > 1:
+        per_dim, full, _ = agreement([(a.get(sid), b.get(sid))
+                                      for a, b in itertools.combinations(label_sets, 2) for sid in ids])
+        print(f"{'ceiling':>9}{'':>12}{full:>10.1%}  " + " ".join(f"{per_dim[d]:>6.0%}" for d in DIMS)
+              + f"   (same sample, {' vs '.join(names)})")
+
+    if args.show:
+        propagated = sorted(replay(sigs, groups, min(args.thresholds)), key=lambda p: p[2])[:args.show]
+        print(f"\nLeast similar propagated pairs at {min(args.thresholds)}:")
+        for i, r, sim in propagated:
+            print(f"  {sim:.2f}  {ids[i]} ← {ids[r]}")
+            for k in (i, r):
+                query = next((t.get("value", "") for t in samples[k].get("conversations", [])
+                              if t.get("from") == "human"), "")
+                print(f"        {query[:100]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Local Batch API Stand-in
+
+File-based stand-in for the OpenAI-style Batch API used by
+`pipeline.py --transport batch`, so the whole batch flow (upload → create →
+poll → download → dependent batch → resume) can be exercised without network
+access or provider cost.
+
+  POST /files                 multipart upload (purpose=batch)
+  GET  /files/{id}/content    download an input/output/error file
+  POST /batches               create a batch from an uploaded file
+  GET  /batches/{id}          status, request_counts, output/error file ids
+
+Everything lives under --root (files/, batches/), so the server can be
+restarted mid-run: unfinished batches are re-queued on startup. Requests are
+answered by a deterministic built-in responder (valid in-pool tags, language
+from fenced code, confidence varied per sample so arbitration is exercised)
+or forwarded to a real chat completions endpoint with --upstream.
+
+Usage:
+  python3 labeling/tools/batch_server.py --port 8990
+  BATCH_BASE=http://127.0.0.1:8990/v1 python3 labeling/pipeline.py --transport batch --batch-poll-interval 1
+  python3 labeling/tools/batch_server.py --port 8990 --upstream http://localhost:4000/v1 --delay 0
+"""
+
+import argparse
+import hashlib
+import json
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from itertools import combinations
+
+from config import DATA_DIR, LITELLM_KEY, CONFIDENCE_THRESHOLD, RULE_DIMENSIONS
+from prompts import ARBITRATION_SYSTEMS, TAG_POOLS, call_prompt
+from batch_api import TERMINAL_STATUSES
+
+FENCE_RE = re.compile(r"```([A-Za-z0-9_+#-]+)")
+SAMPLE_RE = re.compile(r'<sample id="([^"]+)">\n(.*?)\n</sample>', re.S)
+
+# (system prompt, call name, dims dropped by the rule engine); fused first, as
+# packed prompts are matched by prefix
+CALL_SYSTEMS = [
+    (call_prompt(call, drop)[0], call, set(drop))
+    for call in ("fused", "call1", "call2")
+    for n in range(len(RULE_DIMENSIONS) + 1)
+    for drop in combinations(RULE_DIMENSIONS, n)
+]
+
+
+# ─────────────────────────────────────────────────────────
+# Deterministic responder
+# ─────────────────────────────────────────────────────────
+
+def _confidence(text, dims):
+    """Stable per-sample confidences; roughly 1 in 8 samples gets one low dimension."""
+    h = hashlib.sha256(text.encode("utf-8")).digest()
+    conf = {d: round(0.75 + (h[i] % 20) / 100, 2) for i, d in enumerate(dims)}
+    if h[-1] % 8 == 0:
+        conf[dims[h[-2] % len(dims)]] = round(CONFIDENCE_THRESHOLD - 0.1, 2)
+    return conf
+
+
+def mock_labels(call, user_content, drop=()):
+    languages = sorted({m.lower() for m in FENCE_RE.findall(user_content)} & TAG_POOLS["language"])
+    call1 = {
+        "intent": "debug" if re.search(r"\b(error|bug|fix|traceback)\b", user_content, re.I) else "build",
+        "language": languages,
+        "domain": [],
+        "task": ["feature-implementation"],
+        "difficulty": "intermediate",
+        "unmapped": [],
+    }
+    call2 = {"concept": [], "agentic": [], "constraint": [], "context": "snippet", "unmapped": []}
+    if call == "call1":
+        out = call1
+    elif call == "call2":
+        out = call2
+    elif call in ARBITRATION_SYSTEMS:
+        out = {call: {**call1, **call2}[call], "unmapped": []}
+    else:
+        out = {**call1, **call2}
+    out = {k: v for k, v in out.items() if k not in drop}
+    dims = [d for d in out if d != "unmapped"]
+    out["confidence"] = _confidence(user_content, dims)
+    return out
+
+
+def mock_completion(body):
+    """OpenAI chat completion body for a labeling request (packed requests included)."""
+    messages = body["messages"]
+    system, user = messages[0]["content"], messages[-1]["content"]
+    call, drop = next(((c, d) for prompt, c, d in CALL_SYSTEMS if system.startswith(prompt)), (None, ()))
+    if call is None:
+        call = next((dim for dim, prompt in ARBITRATION_SYSTEMS.items() if system == prompt), "fused")
+    packed = SAMPLE_RE.findall(user)
+    if packed:
+        out = {"items": [{"id": sid, **mock_labels(call, content, drop)} for sid, content in packed]}
+    else:
+        out = mock_labels(call, user, drop)
+    content = json.dumps(out, ensure_ascii=False)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(json.dumps(messages, ensure_ascii=False)) // 4,
+                  "completion_tokens": len(content) // 4},
+    }
+
+
+def upstream_completion(upstream, body, timeout=300):
+    import httpx
+    resp = httpx.post(f"{upstream.rstrip('/')}/chat/completions", json=body, timeout=timeout,
+                      headers={"Authorization": f"Bearer {LITELLM_KEY}"})
+    return resp.status_code, (resp.json() if resp.headers.get("content-type", "").startswith("application/json")
+                              else {"error": {"message": resp.text[:300]}})
+
+
+# ─────────────────────────────────────────────────────────
+# Storage + worker
+# ─────────────────────────────────────────────────────────
+
+class BatchStore:
+    def __init__(self, root, delay=2.0, fail_rate=0.0, upstream=None):
+        self.root = Path(root)
+        self.files_dir = self.root / "files"
+        self.batches_dir = self.root / "batches"
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        self.batches_dir.mkdir(parents=True, exist_ok=True)
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.upstream = upstream
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        for path in sorted(self.batches_dir.glob("*.json")):
+            batch = json.loads(path.read_text())
+            if batch["status"] not in TERMINAL_STATUSES:
+                self.queue.put(batch["id"])
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    # files
+    def add_file(self, data, filename, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:16]}"
+        (self.files_dir / f"{file_id}.jsonl").write_bytes(data)
+        meta = {"id": file_id, "object": "file", "bytes": len(data), "filename": filename,
+                "purpose": purpose, "created_at": int(time.time())}
+        (self.files_dir / f"{file_id}.json").write_text(json.dumps(meta))
+        return meta
+
+    def file_content(self, file_id):
+        path = self.files_dir / f"{file_id}.jsonl"
+        return path.read_bytes() if path.exists() else None
+
+    # batches
+    def _save(self, batch):
+        path = self.batches_dir / f"{batch['id']}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(batch, indent=2))
+        tmp.replace(path)
+
+    def get_batch(self, batch_id):
+        path = self.batches_dir / f"{batch_id}.json"
+        with self.lock:
+            return json.loads(path.read_text()) if path.exists() else None
+
+    def create_batch(self, payload):
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex[:16]}",
+            "object": "batch",
+            "endpoint": payload.get("endpoint"),
+            "input_file_id": payload["input_file_id"],
+            "completion_window": payload.get("completion_window", "24h"),
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": payload.get("metadata") or {},
+        }
+        with self.lock:
+            self._save(batch)
+        self.queue.put(batch["id"])
+        return batch
+
+    def _update(self, batch_id, **fields):
+        with self.lock:
+            path = self.batches_dir / f"{batch_id}.json"
+            batch = json.loads(path.read_text())
+            batch.update(fields)
+            self._save(batch)
+            return batch
+
+    def _answer(self, body):
+        if self.fail_rate and random.random() < self.fail_rate:
+            return 500, {"error": {"message": "simulated server error", "type": "server_error"}}
+        if self.upstream:
+            return upstream_completion(self.upstream, body)
+        return 200, mock_completion(body)
+
+    def _worker(self):
+        while True:
+            batch_id = self.queue.get()
+            batch = self.get_batch(batch_id)
+            content = self.file_content(batch["input_file_id"])
+            if content is None:
+                self._update(batch_id, status="failed",
+                             errors={"data": [{"message": f"input file {batch['input_file_id']} not found"}]})
+                continue
+            lines = [json.loads(l) for l in content.decode("utf-8").splitlines() if l.strip()]
+            self._update(batch_id, status="in_progress", in_progress_at=int(time.time()),
+                         request_counts={"total": len(lines), "completed": 0, "failed": 0})
+            time.sleep(self.delay)
+
+            outputs, errors = [], []
+            for line in lines:
+                try:
+                    status, body = self._answer(line["body"])
+                except Exception as e:
+                    status, body = 500, {"error": {"message": f"{type(e).__name__}: {e}"}}
+                record = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": line["custom_id"],
+                          "response": {"status_code": status, "request_id": uuid.uuid4().hex, "body": body},
+                          "error": None}
+                if status == 200:
+                    outputs.append(record)
+                else:
+                    record["error"] = body.get("error") if isinstance(body, dict) else {"message": str(body)}
+                    errors.append(record)
+
+            fields = {"status": "completed", "completed_at": int(time.time()),
+                      "request_counts": {"total": len(lines), "completed": len(outputs), "failed": len(errors)}}
+            for key, records in (("output_file_id", outputs), ("error_file_id", errors)):
+                if records:
+                    data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+                    fields[key] = self.add_file(data, f"{batch_id}_{key}.jsonl", "batch_output")["id"]
+            self._update(batch_id, **fields)
+
+
+# ─────────────────────────────────────────────────────────
+# HTTP
+# ─────────────────────────────────────────────────────────
+
+def parse_multipart(content_type, data):
+    """Minimal multipart/form-data parser → {field: (filename_or_None, bytes)}."""
+    boundary = content_type.split("boundary=", 1)[1].strip('"').encode()
+    fields = {}
+    for part in data.split(b"--" + boundary):
+        if b"\r\n\r\n" not in part:
+            continue
+        head, _, body = part.partition(b"\r\n\r\n")
+        disposition = head.decode("utf-8", "replace")
+        name = re.search(r'name="([^"]*)"', disposition)
+        if not name:
+            continue
+        filename = re.search(r'filename="([^"]*)"', disposition)
+        fields[name.group(1)] = (filename.group(1) if filename else None, body.removesuffix(b"\r\n"))
+    return fields
+
+
+def make_handler(store):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, content_type="application/json"):
+            data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _path(self):
+            return self.path.split("?", 1)[0].removeprefix("/v1")
+
+        def do_POST(self):
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            path = self._path()
+            if path == "/files":
+                fields = parse_multipart(self.headers.get("Content-Type", ""), data)
+                if "file" not in fields:
+                    return self._send(400, {"error": {"message": "missing file"}})
+                filename, content = fields["file"]
+                purpose = fields.get("purpose", (None, b"batch"))[1].decode()
+                return self._send(200, store.add_file(content, filename or "upload.jsonl", purpose))
+            if path == "/batches":
+                payload = json.loads(data)
+                if store.file_content(payload.get("input_file_id", "")) is None:
+                    return self._send(404, {"error": {"message": "input file not found"}})
+                return self._send(200, store.create_batch(payload))
+            self._send(404, {"error": {"message": f"unknown endpoint {path}"}})
+
+        def do_GET(self):
+            path = self._path()
+            m = re.fullmatch(r"/files/([\w-]+)/content", path)
+            if m:
+                content = store.file_content(m.group(1))
+                if content is None:
+                    return self._send(404, {"error": {"message": "file not found"}})
+                return self._send(200, content, "application/jsonl")
+            m = re.fullmatch(r"/batches/([\w-]+)", path)
+            if m:
+                batch = store.get_batch(m.group(1))
+                if batch is None:
+                    return self._send(404, {"error": {"message": "batch not found"}})
+                return self._send(200, batch)
+            self._send(404, {"error": {"message": f"unknown endpoint {path}"}})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local file-based stand-in for the Batch API")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8990)
+    parser.add_argument("--root", type=str, default=str(DATA_DIR / "cache" / "batch_server"),
+                        help="Storage directory for uploaded files and batch records")
+    parser.add_argument("--delay", type=float, default=2.0,
+                        help="Seconds each batch stays in_progress before it is processed")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with a simulated HTTP 500")
+    parser.add_argument("--upstream", type=str, default=None,
+                        help="Forward requests to this chat completions base URL instead of the mock responder")
+    args = parser.parse_args()
+
+    store = BatchStore(args.root, delay=args.delay, fail_rate=args.fail_rate, upstream=args.upstream)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(store))
+    print(f"Batch server on http://{args.host}:{args.port}/v1  (root: {args.root}, "
+          f"{'upstream ' + args.upstream if args.upstream else 'mock responder'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Call-Mode Benchmark (two-call vs fused)
+
+Labels the same input with both call modes and reports how closely the fused
+single-call output agrees with the two-call output, plus calls, tokens and
+per-sample latency for each mode.
+
+  - Per-dimension exact / partial agreement and Jaccard (multi-select)
+  - LLM calls, prompt + completion tokens, p50/p95 sample latency
+  - Markdown report + JSON metrics written to the output dir
+
+The two-call side can be an existing run (--reference-run) so only the fused
+mode is re-labeled.
+
+Usage:
+  python3 labeling/tools/benchmark_call_modes.py
+  python3 labeling/tools/benchmark_call_modes.py --limit 50 --model deepseek-v3.2
+  python3 labeling/tools/benchmark_call_modes.py --reference-run labeling/data/runs/<two_call_run>/
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+from config import DATA_DIR, DEFAULT_MODEL, DEFAULT_CONCURRENCY, REQUEST_TIMEOUT, LLM_CACHE_PATH
+from prompts import SINGLE_SELECT
+from llm_cache import ResponseCache, CACHE_MODES
+from concurrency import AdaptiveConcurrency, percentile
+from pipeline import run_one_file, CALL1_DIMS, CALL2_DIMS
+from compare_models import compute_agreement, compute_jaccard
+
+DIMENSIONS = CALL1_DIMS + CALL2_DIMS
+
+
+async def label_with_mode(input_path, out_dir, mode, args, cache):
+    sem = AdaptiveConcurrency(args.concurrency, adaptive=False)
+    async with httpx.AsyncClient(
+        proxy=None,
+        timeout=REQUEST_TIMEOUT,
+        limits=httpx.Limits(max_connections=args.concurrency + 10, max_keepalive_connections=args.concurrency),
+    ) as http_client:
+        await run_one_file(
+            input_path, out_dir, http_client, sem, args.model,
+            enable_arbitration=not args.no_arbitration, limit=args.limit,
+            cache=cache, call_mode=mode,
+        )
+
+
+def load_run(run_dir):
+    run_dir = Path(run_dir)
+    with open(run_dir / "labeled.json", "r", encoding="utf-8") as f:
+        samples = json.load(f)
+    monitors = []
+    monitor_path = run_dir / "monitor.jsonl"
+    if monitor_path.exists():
+        with open(monitor_path, "r", encoding="utf-8") as f:
+            monitors = [json.loads(line) for line in f if line.strip()]
+    return samples, monitors
+
+
+def align(samples_a, samples_b):
+    """Pair samples by id (falls back to position for samples without an id)."""
+    by_id = {s.get("id"): s for s in samples_b if s.get("id")}
+    pairs_a, pairs_b = [], []
+    for i, sa in enumerate(samples_a):
+        sb = by_id.get(sa.get("id")) if sa.get("id") else (samples_b[i] if i < len(samples_b) else None)
+        if sb is not None:
+            pairs_a.append(sa)
+            pairs_b.append(sb)
+    return pairs_a, pairs_b
+
+
+def mode_metrics(samples, monitors):
+    latencies = [m["elapsed_seconds"] for m in monitors if "elapsed_seconds" in m]
+    n = max(len(monitors), 1)
+    return {
+        "samples": len(samples),
+        "labeled": sum(1 for s in samples if s.get("labels")),
+        "llm_calls": sum(m["llm_calls"] for m in monitors),
+        "calls_per_sample": round(sum(m["llm_calls"] for m in monitors) / n, 2),
+        "prompt_tokens": sum(m["total_prompt_tokens"] for m in monitors),
+        "completion_tokens": sum(m["total_completion_tokens"] for m in monitors),
+        "tokens_per_sample": round(sum(m["total_prompt_tokens"] + m["total_completion_tokens"] for m in monitors) / n),
+        "latency_p50": round(percentile(latencies, 50), 2) if latencies else None,
+        "latency_p95": round(percentile(latencies, 95), 2) if latencies else None,
+        "validation_issue_count": sum(1 for m in monitors if m["validation_issues"]),
+        "arbitrated": sum(1 for m in monitors if m["arbitrated"]),
+    }
+
+
+def compare(two_call, fused):
+    samples_a, samples_b = align(two_call, fused)
+    agreement = {}
+    for dim in DIMENSIONS:
+        is_single = dim in SINGLE_SELECT
+        agreement[dim] = compute_agreement(samples_a, samples_b, dim, is_single=is_single)
+        if not is_single:
+            agreement[dim]["jaccard"] = compute_jaccard(samples_a, samples_b, dim)
+    compared = [d["exact_rate"] for d in agreement.values() if d["total"]]
+    return {
+        "paired_samples": len(samples_a),
+        "mean_exact_rate": round(sum(compared) / len(compared), 4) if compared else 0,
+        "dimensions": agreement,
+    }
+
+
+def format_report(results, input_path, model):
+    a, b = results["two-call"], results["fused"]
+    agreement = results["agreement"]
+
+    def delta(key):
+        if not a[key]:
+            return "-"
+        return f"{(b[key] - a[key]) / a[key] * 100:+.1f}%"
+
+    lines = [
+        "# Call-Mode Benchmark: two-call vs fused",
+        "",
+        f"- Input: `{input_path}`",
+        f"- Model: `{model}`",
+        f"- Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        f"- Paired samples: {agreement['paired_samples']}",
+        "",
+        "## Cost & Latency",
+        "",
+        "| Metric | two-call | fused | Δ |",
+        "|--------|---------:|------:|--:|",
+    ]
+    for key in ["labeled", "llm_calls", "calls_per_sample", "prompt_tokens", "completion_tokens",
+                "tokens_per_sample", "latency_p50", "latency_p95", "validation_issue_count", "arbitrated"]:
+        va, vb = a[key], b[key]
+        d = delta(key) if isinstance(va, (int, float)) and isinstance(vb, (int, float)) else "-"
+        lines.append(f"| {key} | {va} | {vb} | {d} |")
+
+    lines += [
+        "",
+        f"## Agreement with two-call (mean exact: {agreement['mean_exact_rate']*100:.1f}%)",
+        "",
+        "| Dimension | Type | Exact | Partial | Jaccard |",
+        "|-----------|------|------:|--------:|--------:|",
+    ]
+    for dim, r in agreement["dimensions"].items():
+        kind = "single" if dim in SINGLE_SELECT else "multi"
+        jac = f"{r['jaccard']:.3f}" if "jaccard" in r else "-"
+        lines.append(f"| {dim} | {kind} | {r['exact_rate']*100:.1f}% | {r['partial_rate']*100:.1f}% | {jac} |")
+    return "\n".join(lines) + "\n"
+
+
+async def run_benchmark(args):
+    input_path = Path(args.input)
+    out_root = Path(args.output) if args.output else (
+        DATA_DIR / "runs" / f"benchmark_call_modes_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    out_root.mkdir(parents=True, exist_ok=True)
+
+    cache = ResponseCache(LLM_CACHE_PATH, mode=args.cache_mode)
+    try:
+        if args.reference_run:
+            two_call_dir = Path(args.reference_run)
+        else:
+            two_call_dir = out_root / "two-call"
+            print(f"── two-call → {two_call_dir}")
+            await label_with_mode(input_path, two_call_dir, "two-call", args, cache)
+        fused_dir = out_root / "fused"
+        print(f"── fused → {fused_dir}")
+        await label_with_mode(input_path, fused_dir, "fused", args, cache)
+    finally:
+        cache.close()
+
+    two_call_samples, two_call_monitors = load_run(two_call_dir)
+    fused_samples, fused_monitors = load_run(fused_dir)
+    results = {
+        "two-call": mode_metrics(two_call_samples, two_call_monitors),
+        "fused": mode_metrics(fused_samples, fused_monitors),
+        "agreement": compare(two_call_samples, fused_samples),
+    }
+
+    with open(out_root / "benchmark_call_modes.json", "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    report = format_report(results, input_path, args.model)
+    with open(out_root / "benchmark_call_modes.md", "w", encoding="utf-8") as f:
+        f.write(report)
+
+    print()
+    print(report)
+    print(f"Report: {out_root / 'benchmark_call_modes.md'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fused single-call labeling against two-call")
+    parser.add_argument("--input", type=str, default=str(DATA_DIR / "raw_samples.json"))
+    parser.add_argument("--output", type=str, default=None,
+                        help="Output directory (default: labeling/data/runs/benchmark_call_modes_<ts>/)")
+    parser.add_argument("--reference-run", type=str, default=None,
+                        help="Existing two-call run dir (labeled.json + monitor.jsonl) to compare against")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--no-arbitration", action="store_true",
+                        help="Compare raw first-pass labels (recommended for a like-for-like comparison)")
+    parser.add_argument("--cache-mode", choices=CACHE_MODES, default="readwrite")
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
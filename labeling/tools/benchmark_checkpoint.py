@@ -0,0 +1,101 @@
+"""
+Checkpoint Benchmark
+
+Times recording N finished files in the previous checkpoint.json
+(update_checkpoint: reload, list membership, full indent=2 rewrite per file)
+against checkpoint.Checkpoint (one appended event per file, compacted every
+CHECKPOINT_COMPACT_EVERY events), plus loading the result as --resume does.
+
+Usage:
+  python3 labeling/tools/benchmark_checkpoint.py
+  python3 labeling/tools/benchmark_checkpoint.py --files 1000 5000 20000
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from checkpoint import Checkpoint
+
+
+# ─── Previous implementation ───────────────────────────
+
+def legacy_load_checkpoint(checkpoint_path):
+    if checkpoint_path.exists():
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+
+def legacy_create_checkpoint(checkpoint_path, files):
+    ckpt = {"status": "in_progress", "completed": [], "failed": {}, "total_files": len(files)}
+    legacy_write_checkpoint(checkpoint_path, ckpt)
+    return ckpt
+
+
+def legacy_update_checkpoint(checkpoint_path, rel_path_str, success=True, error_msg=None):
+    ckpt = legacy_load_checkpoint(checkpoint_path) or {}
+    if success:
+        if rel_path_str not in ckpt.get("completed", []):
+            ckpt.setdefault("completed", []).append(rel_path_str)
+        ckpt.get("failed", {}).pop(rel_path_str, None)
+    else:
+        ckpt.setdefault("failed", {})[rel_path_str] = error_msg or "unknown"
+    done = len(ckpt.get("completed", [])) + len(ckpt.get("failed", {}))
+    if done >= ckpt.get("total_files", 0):
+        ckpt["status"] = "done"
+    legacy_write_checkpoint(checkpoint_path, ckpt)
+    return ckpt
+
+
+def legacy_write_checkpoint(checkpoint_path, ckpt):
+    with open(checkpoint_path, "w", encoding="utf-8") as f:
+        json.dump(ckpt, f, ensure_ascii=False, indent=2)
+
+
+# ─── Benchmark ─────────────────────────────────────────
+
+def run_legacy(path, files):
+    legacy_create_checkpoint(path, files)
+    t0 = time.perf_counter()
+    for rel in files:
+        legacy_update_checkpoint(path, rel)
+    mark_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    completed = set(legacy_load_checkpoint(path)["completed"])
+    return mark_s, time.perf_counter() - t0, completed
+
+
+def run_log(path, files):
+    ckpt = Checkpoint.create(path, files)
+    t0 = time.perf_counter()
+    for rel in files:
+        ckpt.mark(rel)
+    mark_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    completed = Checkpoint.load(path).completed
+    return mark_s, time.perf_counter() - t0, completed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark checkpoint.json rewrites vs the checkpoint event log")
+    parser.add_argument("--files", nargs="+", type=int, default=[1000, 5000, 20000],
+                        help="Numbers of finished files to record")
+    args = parser.parse_args()
+
+    print(f"{'files':>7}  {'rewrite mark s':>15}{'load s':>9}  {'log mark s':>11}{'load s':>9}  {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.files:
+            files = [f"shard_{i // 100:04d}/part_{i:06d}.jsonl" for i in range(n)]
+            old = run_legacy(Path(tmp) / f"legacy_{n}.json", files)
+            new = run_log(Path(tmp) / f"log_{n}.json", files)
+            assert old[2] == new[2]
+            print(f"{n:>7}  {old[0]:>15.2f}{old[1]:>9.3f}  {new[0]:>11.2f}{new[1]:>9.3f}  {old[0] / new[0]:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
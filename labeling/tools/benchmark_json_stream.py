@@ -0,0 +1,108 @@
+"""
+JSON Streaming Memory Benchmark
+
+Compares the peak RSS of reading a .json sample array with json.load (the
+previous iter_samples_from_file) and with the streaming element parser
+(json_stream.iter_json_values), on synthetic ShareGPT arrays of growing size
+built by repeating the given samples with fresh ids.
+
+Each measurement runs in a fresh process and reports its peak RSS over the
+interpreter baseline, and the time taken:
+
+  - raw        iterate the raw samples, holding none of them (the reader alone:
+               json.load must hold the whole array, the stream parser one sample)
+  - normalize  iter_samples_from_file's job: normalize_and_slice every sample and
+               keep the normalized samples (json.load + normalize, as before, vs
+               the streaming reader + normalize)
+
+Usage:
+  python3 labeling/tools/benchmark_json_stream.py
+  python3 labeling/tools/benchmark_json_stream.py --sizes 50 100 200 400 --input labeling/data/raw_samples.json
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import DATA_DIR
+from json_stream import iter_json_values
+from preprocessing import normalize_and_slice
+
+READERS = ["json.load", "stream"]
+
+
+def write_array(path, samples, target_mb):
+    """Write a JSON array of the samples, repeated with fresh ids, of about target_mb MB."""
+    encoded = [json.dumps(s, ensure_ascii=False) for s in samples]
+    unit = sum(len(e.encode("utf-8")) + 2 for e in encoded)
+    copies = max(1, round(target_mb * 1024 * 1024 / unit))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        first = True
+        for k in range(copies):
+            for s in samples:
+                f.write("" if first else ",\n")
+                first = False
+                json.dump({**s, "id": f"{s.get('id', 'sample')}-{k}"}, f, ensure_ascii=False)
+        f.write("\n]\n")
+    return copies * len(samples)
+
+
+def measure(reader, mode, path):
+    """Child process: run one reader and print {peak_kb, seconds, samples}."""
+    base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    kept, n = [], 0
+    with open(path, "r", encoding="utf-8") as f:
+        raws = json.load(f) if reader == "json.load" else iter_json_values(f)
+        for raw in raws:
+            n += 1
+            if mode == "normalize":
+                kept.extend(normalize_and_slice(raw))
+    seconds = time.perf_counter() - t0
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"peak_kb": peak_kb - base_kb, "seconds": seconds, "samples": n}))
+
+
+def run_child(reader, mode, path):
+    out = subprocess.run([sys.executable, __file__, "--measure", reader, mode, str(path)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark peak memory: json.load vs streaming JSON arrays")
+    parser.add_argument("--input", type=str, default=str(DATA_DIR / "raw_samples.json"),
+                        help="Samples to repeat into the synthetic arrays")
+    parser.add_argument("--sizes", nargs="+", type=float, default=[25, 50, 100, 200],
+                        help="Synthetic file sizes in MB")
+    parser.add_argument("--measure", nargs=3, metavar=("READER", "MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        samples = json.load(f)
+    print(f"{len(samples)} samples from {args.input}, repeated to the target sizes\n")
+    print(f"{'file MB':>8}{'samples':>9}  {'mode':<10}" + "".join(f"{r + ' MB':>14}{'s':>7}" for r in READERS))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = Path(tmp) / f"samples_{size:g}mb.json"
+            write_array(path, samples, size)
+            file_mb = path.stat().st_size / 1024 / 1024
+            for mode in ("raw", "normalize"):
+                results = [run_child(r, mode, path) for r in READERS]
+                print(f"{file_mb:>8.0f}{results[0]['samples']:>9}  {mode:<10}"
+                      + "".join(f"{r['peak_kb'] / 1024:>14.0f}{r['seconds']:>7.1f}" for r in results))
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
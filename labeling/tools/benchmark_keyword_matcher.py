@@ -0,0 +1,148 @@
+"""
+Keyword Matcher Benchmark
+
+Compares the old per-entry substring scans (one `in` test of the lowercased
+text per framework, keyword and tool name) with the shared keyword matcher
+(preprocessing.keyword_matcher), which also matches every taxonomy alias.
+
+Reports µs/sample for the three scans (detect_framework_languages,
+detect_keywords, extract_tool_signals) on the given files, the same on one
+long synthetic trajectory (all samples concatenated, --scale times), the cost
+substring scans would have over the matcher's full pattern set, and the
+samples whose signals changed, with the patterns responsible — word
+boundaries drop substring false positives such as "gin" in "engine".
+
+Usage:
+  python3 labeling/tools/benchmark_keyword_matcher.py
+  python3 labeling/tools/benchmark_keyword_matcher.py --input labeling/data/raw_samples.json --repeat 20 --scale 20
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import DATA_DIR
+from preprocessing import (
+    FRAMEWORK_LANG_MAP, KEYWORD_GROUPS, TOOL_NAME_MAP, normalize_sample,
+    detect_framework_languages, detect_keywords, detect_taxonomy_aliases, keyword_matcher,
+)
+
+DEFAULT_INPUTS = [DATA_DIR / "baselines" / "labeled_sonnet_v4.json", DATA_DIR / "pangu_test_samples.jsonl"]
+
+
+# ─── Previous implementation (substring scans) ───
+
+def legacy_framework_languages(text):
+    text_lower = text.lower()
+    return sorted({lang for framework, lang in FRAMEWORK_LANG_MAP.items() if framework in text_lower})
+
+
+def legacy_keywords(text):
+    text_lower = text.lower()
+    hits = []
+    for group, keywords in KEYWORD_GROUPS.items():
+        matches = [kw for kw in keywords if kw in text_lower]
+        if matches:
+            hits.append((group, matches))
+    return hits
+
+
+def legacy_tool_names(conversations):
+    names = set()
+    for turn in conversations:
+        value = turn.get("value", "")
+        if turn.get("from") == "tool" and ('"name"' in value or '"tool"' in value):
+            names.update(key for key in TOOL_NAME_MAP if key in value.lower())
+    return sorted(names)
+
+
+def legacy(conversations, text):
+    return legacy_framework_languages(text), legacy_keywords(text), legacy_tool_names(conversations)
+
+
+def legacy_all_patterns(conversations, text):
+    text_lower = text.lower()
+    return [p for p in keyword_matcher()._targets if p in text_lower]
+
+
+def matcher_tool_names(conversations):
+    """Structured-call part of extract_tool_signals (its shell heuristics are unchanged)."""
+    names = set()
+    for turn in conversations:
+        value = turn.get("value", "")
+        if turn.get("from") == "tool" and ('"name"' in value or '"tool"' in value):
+            names.update(keyword_matcher().scan(value).get("tool", {}))
+    return sorted(names)
+
+
+def matcher(conversations, text):
+    hits = keyword_matcher().scan(text)
+    return detect_framework_languages(text, hits), detect_keywords(text, hits), matcher_tool_names(conversations)
+
+
+def load(paths):
+    items = []
+    for path in paths:
+        path = Path(path)
+        with open(path, "r", encoding="utf-8") as f:
+            raw = [json.loads(line) for line in f if line.strip()] if path.suffix == ".jsonl" else json.load(f)
+        for sample in raw:
+            convs = normalize_sample(sample).get("conversations", [])
+            items.append((sample.get("id", "?"), convs, " ".join(t.get("value", "") for t in convs)))
+    return items
+
+
+def time_path(fn, items, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _, convs, text in items:
+            fn(convs, text)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the keyword matcher vs substring scans")
+    parser.add_argument("--input", nargs="+", default=[str(p) for p in DEFAULT_INPUTS])
+    parser.add_argument("--repeat", type=int, default=10, help="Timing passes per path (best is reported)")
+    parser.add_argument("--scale", type=int, default=10, help="Copies of all samples in the long trajectory")
+    parser.add_argument("--show", type=int, default=10, help="Changed samples to print")
+    args = parser.parse_args()
+
+    items = load(args.input)
+    keyword_matcher()   # build outside the timings
+    mean_kb = sum(len(t) for _, _, t in items) / len(items) / 1024
+    long_convs = [t for _, convs, _ in items for t in convs] * args.scale
+    long_item = [("long", long_convs, " ".join(t.get("value", "") for t in long_convs))]
+    n_patterns = len(FRAMEWORK_LANG_MAP) + sum(len(v) for v in KEYWORD_GROUPS.values()) + len(TOOL_NAME_MAP)
+
+    print(f"{len(items)} samples (mean {mean_kb:.1f} KB); substring scans: {n_patterns} patterns, "
+          f"matcher: {len(keyword_matcher())} patterns incl. taxonomy aliases")
+    print(f"{'':<28}{'substring (µs)':>16}{'matcher (µs)':>16}{'×':>8}{'substring, all patterns':>26}")
+    for name, group, repeat in (("per sample", items, args.repeat),
+                                (f"long ({len(long_item[0][2]) / 1024:.0f} KB)", long_item, max(args.repeat // 5, 1))):
+        old = time_path(legacy, group, repeat)
+        new = time_path(matcher, group, repeat)
+        full = time_path(legacy_all_patterns, group, repeat)
+        print(f"{name:<28}{old:>16.0f}{new:>16.0f}{old / new:>7.1f}x{full:>26.0f}")
+
+    changed = []
+    for sid, convs, text in items:
+        old, new = legacy(convs, text), matcher(convs, text)
+        if old != new:
+            changed.append((sid, old, new))
+    print(f"\nSignals changed on {len(changed)}/{len(items)} samples")
+    for sid, old, new in changed[:args.show]:
+        for label, o, n in zip(("framework_languages", "keyword_hits", "tool_names"), old, new):
+            if o != n:
+                print(f"  {sid:<24} {label}: {o} → {n}")
+    with_aliases = sum(1 for _, _, text in items if detect_taxonomy_aliases(text))
+    print(f"Taxonomy alias hits on {with_aliases}/{len(items)} samples")
+
+
+if __name__ == "__main__":
+    main()
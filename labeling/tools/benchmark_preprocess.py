@@ -0,0 +1,155 @@
+"""
+Preprocess Benchmark
+
+Compares preprocess() (one scan per turn, cached, see preprocessing.TurnScan)
+with the previous implementation, which joined the conversation into one
+string and ran every detector over it (code fences, fence counts, keyword
+matcher) plus separate passes over the turns for tool and behavioral signals.
+
+Reports µs per sample, with the turn-scan cache cleared before every pass, for:
+
+  - per sample   every sample of the given files
+  - agentic      the samples with tool turns
+  - long         one synthetic trajectory: the distinct turns of all samples,
+                 --scale copies (each copy's turns tagged so none repeats)
+  - pyramid      the long trajectory's pyramid slices that the sparse schedule
+                 labels, in order, as the pipeline preprocesses them (slices
+                 share turns, so each turn is scanned once)
+
+and checks that both implementations return identical signals everywhere.
+The target is the pyramid row: at least PYRAMID_TARGET times less preprocess
+CPU per labeled slice. Cold passes (every turn scanned for the first time)
+only have to be no slower.
+
+Usage:
+  python3 labeling/tools/benchmark_preprocess.py
+  python3 labeling/tools/benchmark_preprocess.py --input labeling/data/raw_samples.json --repeat 20 --scale 4
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import DATA_DIR
+from preprocessing import (
+    apply_sparse_sampling, clear_turn_scans, count_code_blocks, count_labeled_code_blocks,
+    detect_behavioral_patterns, detect_code_fence_languages, detect_framework_languages,
+    detect_keywords, detect_taxonomy_aliases, estimate_tokens, extract_last_turn,
+    extract_tool_signals, keyword_matcher, normalize_and_slice, normalize_sample, preprocess,
+)
+
+DEFAULT_INPUTS = [DATA_DIR / "raw_samples.json", DATA_DIR / "pangu_test_samples.jsonl"]
+PYRAMID_TARGET = 5.0   # × less CPU per labeled pyramid slice
+
+
+# ─── Previous implementation (detectors over the joined text) ───
+
+def legacy_preprocess(sample):
+    sample = normalize_sample(sample)
+    conversations = sample.get("conversations", [])
+    full_text = " ".join(t.get("value", "") for t in conversations)
+    hits = keyword_matcher().scan(full_text)
+    fence_langs = detect_code_fence_languages(full_text)
+    framework_langs = detect_framework_languages(full_text, hits)
+    tool_names, tool_agentic_tags = extract_tool_signals(conversations)
+    last_query, last_response = extract_last_turn(conversations)
+    return {
+        "detected_languages": sorted(set(fence_langs + framework_langs)),
+        "fence_languages": fence_langs,
+        "framework_languages": framework_langs,
+        "has_tool_roles": any(t.get("from") == "tool" for t in conversations),
+        "tool_names": tool_names,
+        "tool_agentic_tags": tool_agentic_tags,
+        "behavioral_patterns": detect_behavioral_patterns(conversations),
+        "total_turns": len(conversations),
+        "code_block_count": count_code_blocks(full_text),
+        "labeled_code_blocks": count_labeled_code_blocks(full_text),
+        "est_tokens": estimate_tokens(full_text),
+        "keyword_hits": detect_keywords(full_text, hits),
+        "taxonomy_hits": detect_taxonomy_aliases(full_text, hits),
+        "last_query_preview": last_query[:200] if last_query else "",
+        "last_response_length": len(last_response),
+    }
+
+
+def load(paths):
+    samples = []
+    for path in paths:
+        path = Path(path)
+        with open(path, "r", encoding="utf-8") as f:
+            raw = [json.loads(line) for line in f if line.strip()] if path.suffix == ".jsonl" else json.load(f)
+        samples.extend(normalize_sample(s) for s in raw)
+    return samples
+
+
+def long_trajectory(samples, scale):
+    turns, seen = [], set()
+    for sample in samples:
+        for turn in sample.get("conversations", []):
+            if turn.get("value") and turn["value"] not in seen:
+                seen.add(turn["value"])
+                turns.append(turn)
+    copies = [[{**t, "value": f"{t['value']}\n[copy {k}]"} for t in turns] for k in range(scale)]
+    return {"id": "long", "conversations": [t for copy in copies for t in copy]}
+
+
+def time_path(fn, samples, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        clear_turn_scans()
+        t0 = time.perf_counter()
+        for sample in samples:
+            fn(sample)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark preprocess() vs the joined-text implementation")
+    parser.add_argument("--input", nargs="+", default=[str(p) for p in DEFAULT_INPUTS])
+    parser.add_argument("--repeat", type=int, default=10, help="Timing passes per path (best is reported)")
+    parser.add_argument("--scale", type=int, default=2, help="Copies of the distinct turns in the long trajectory")
+    args = parser.parse_args()
+
+    samples = load(args.input)
+    keyword_matcher()   # build outside the timings
+    agentic = [s for s in samples if any(t.get("from") == "tool" for t in s.get("conversations", []))]
+    long = long_trajectory(samples, args.scale)
+    slices = normalize_and_slice(long)
+    labeled = [slices[i] for i in sorted(apply_sparse_sampling(slices)[0])]
+    long_kb = sum(len(t["value"]) for t in long["conversations"]) / 1024
+
+    print(f"{len(samples)} samples, {len(agentic)} agentic; long trajectory: "
+          f"{len(long['conversations'])} turns, {long_kb:.0f} KB, {len(labeled)}/{len(slices)} slices labeled")
+    print(f"{'':<28}{'joined text (µs)':>18}{'turn scan (µs)':>18}{'×':>8}")
+    few = max(args.repeat // 5, 1)
+    speedup = {}
+    for name, group, repeat in (("per sample", samples, args.repeat),
+                                ("agentic", agentic, args.repeat),
+                                ("long", [long], few),
+                                ("pyramid (per slice)", labeled, 1)):
+        if not group:
+            continue
+        old = time_path(legacy_preprocess, group, repeat)
+        new = time_path(preprocess, group, repeat)
+        speedup[name] = old / new
+        print(f"{name:<28}{old:>18.0f}{new:>18.0f}{old / new:>7.1f}x")
+    pyramid = speedup["pyramid (per slice)"]
+    print(f"\nTarget ≥{PYRAMID_TARGET:.0f}x per labeled pyramid slice: "
+          f"{pyramid:.1f}x ({'met' if pyramid >= PYRAMID_TARGET else 'missed'})")
+
+    clear_turn_scans()
+    checked = samples + [long] + labeled
+    differ = [s.get("id", "?") for s in checked if preprocess(s) != legacy_preprocess(s)]
+    print(f"\nSignals identical on {len(checked) - len(differ)}/{len(checked)} samples")
+    for sid in differ[:10]:
+        print(f"  differs: {sid}")
+    if differ:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Request Body Encoding Microbenchmark
+
+Compares the per-call CPU cost of building a chat completion request the old way
+(httpx json= payload + llm_cache.cache_key over the full message list) with
+request_body.TEMPLATES (pre-encoded system + few-shot prefix, only the user
+message and sampling parameters encoded per call).
+
+Messages are built from real samples for every prompt the pipeline sends:
+Call 1, Call 2, fused and the narrow arbitration prompts. Each path is checked
+for equivalence first (same decoded body, same cache key), then timed.
+
+No network access; httpx.Request is built but never sent.
+
+Usage:
+  python3 labeling/tools/benchmark_request_body.py
+  python3 labeling/tools/benchmark_request_body.py --input labeling/data/raw_samples.json --limit 100 --repeat 20
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import DEFAULT_INPUT, DEFAULT_MODEL, LITELLM_BASE, MAX_CONVERSATION_CHARS
+from llm_cache import cache_key
+from preprocessing import preprocess, format_signals_for_prompt, truncate_conversations_for_labeling
+from prompts import ARBITRATION_SYSTEMS
+from request_body import RequestTemplates
+from pipeline import (
+    build_call1_messages, build_call2_messages, build_fused_messages, build_arbitration_messages,
+    iter_samples_from_file,
+)
+
+CALL1_EXAMPLE = {"intent": "build", "language": ["python"], "domain": ["web-backend"],
+                 "task": ["feature-implementation"], "difficulty": "intermediate"}
+URL = f"{LITELLM_BASE}/chat/completions"
+HEADERS = {"Authorization": "Bearer bench", "Content-Type": "application/json"}
+
+
+def build_requests(samples):
+    """(call name, messages) for every prompt the pipeline would send for these samples."""
+    requests = []
+    for sample in samples:
+        convs, _ = truncate_conversations_for_labeling(sample.get("conversations", []),
+                                                       max_total_chars=MAX_CONVERSATION_CHARS)
+        conv = json.dumps(convs, ensure_ascii=False)
+        signals = format_signals_for_prompt(preprocess(sample))
+        requests.append(("call1", build_call1_messages(conv, signals)))
+        requests.append(("call2", build_call2_messages(conv, signals, CALL1_EXAMPLE)))
+        requests.append(("fused", build_fused_messages(conv, signals)))
+        for dim in ARBITRATION_SYSTEMS:
+            requests.append(("arbitration", build_arbitration_messages(dim, conv, signals, CALL1_EXAMPLE)))
+    return requests
+
+
+def legacy(model, messages, key):
+    payload = {"model": model, "messages": messages, "temperature": 0.1, "max_tokens": 1000}
+    request = httpx.Request("POST", URL, json=payload, headers=HEADERS)
+    return request.content, cache_key(model, messages, 0.1, 1000) if key else None
+
+
+def templated(templates, model, messages, key):
+    body = templates.body(model, messages, 0.1, 1000)
+    request = httpx.Request("POST", URL, content=body, headers=HEADERS)
+    return request.content, templates.cache_key(model, messages, 0.1, 1000) if key else None
+
+
+def check(templates, model, requests):
+    for name, messages in requests:
+        old_body, old_key = legacy(model, messages, True)
+        new_body, new_key = templated(templates, model, messages, True)
+        if json.loads(old_body) != json.loads(new_body):
+            raise SystemExit(f"body mismatch for {name}")
+        if old_key != new_key:
+            raise SystemExit(f"cache key mismatch for {name}")
+
+
+def time_path(fn, requests, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _, messages in requests:
+            fn(messages)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(requests) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pre-encoded request bodies vs json= payloads")
+    parser.add_argument("--input", type=str, default=str(DEFAULT_INPUT))
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10, help="Timing passes per path (best is reported)")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL)
+    args = parser.parse_args()
+
+    samples, _ = iter_samples_from_file(Path(args.input), limit=args.limit)
+    requests = build_requests(samples)
+    templates = RequestTemplates()
+    check(templates, args.model, requests)
+
+    by_name = {}
+    for name, messages in requests:
+        by_name.setdefault(name, []).append(messages)
+    mean_bytes = sum(len(legacy(args.model, m, False)[0]) for _, m in requests) / len(requests)
+
+    print(f"{len(samples)} samples → {len(requests)} requests, "
+          f"mean body {mean_bytes / 1024:.1f} KB, {args.repeat} passes (best)")
+    print(f"{'call':<13}{'body only (µs/call)':>26}{'body + cache key (µs/call)':>34}")
+    print(f"{'':<13}{'json=':>9}{'template':>10}{'×':>7}{'json=':>13}{'template':>10}{'×':>11}")
+    for name, group in list(by_name.items()) + [("all", [m for _, m in requests])]:
+        items = [(name, m) for m in group]
+        row = []
+        for key in (False, True):
+            old = time_path(lambda m: legacy(args.model, m, key), items, args.repeat)
+            new = time_path(lambda m: templated(templates, args.model, m, key), items, args.repeat)
+            row.append((old, new))
+        (o1, n1), (o2, n2) = row
+        print(f"{name:<13}{o1:>9.1f}{n1:>10.1f}{o1 / n1:>6.1f}x{o2:>13.1f}{n2:>10.1f}{o2 / n2:>10.1f}x")
+    print(f"templates: {templates.stats()}")
+
+
+if __name__ == "__main__":
+    main()
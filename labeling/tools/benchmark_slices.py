@@ -0,0 +1,136 @@
+"""
+Pyramid Slice Memory Benchmark
+
+Compares the memory held by the pyramid slices of multi-turn samples as the
+previous normalize_and_slice built them (a dict per slice with its own copy of
+conversations[:idx + 1] and of the metadata) and as preprocessing.SliceView
+views over the shared conversation and metadata, for:
+
+  - agentic   the samples of the input with tool turns
+  - long N    one synthetic trajectory of N turns: the agentic conversations
+              back to back, repeated until N turns (each copy's turns tagged
+              so none repeats)
+
+Memory is what tracemalloc sees allocated by normalize_and_slice while the
+slices are kept (the raw samples, and so the turns, are allocated before).
+Also reports the time to slice, the time to read every slice back as a dict
+(json.dumps(dict(s)), what writing labeled.jsonl does) and checks that both
+serialize identically.
+
+Usage:
+  python3 labeling/tools/benchmark_slices.py
+  python3 labeling/tools/benchmark_slices.py --input labeling/data/raw_samples.json --turns 200 800
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import DATA_DIR
+from preprocessing import detect_format, normalize_and_slice, normalize_pangu, strip_cot
+
+
+# ─── Previous implementation ───────────────────────────
+
+def legacy_slice_multiturn(conversations):
+    reply_indices = [i for i, t in enumerate(conversations) if t["from"] == "gpt"]
+    if len(reply_indices) <= 1:
+        return [conversations]
+    return [conversations[:idx + 1] for idx in reply_indices]
+
+
+def legacy_normalize_and_slice(sample):
+    if detect_format(sample) == "pangu":
+        normalized = normalize_pangu(sample)
+    else:
+        normalized = dict(sample)
+        if "conversations" in normalized:
+            for turn in normalized["conversations"]:
+                if turn.get("from") == "gpt" and turn.get("value"):
+                    turn["value"] = strip_cot(turn["value"])
+    conversations = normalized.get("conversations", [])
+    if normalized.get("metadata", {}).get("is_pseudo_multiturn", False):
+        return [normalized]
+    slices = legacy_slice_multiturn(conversations)
+    if len(slices) == 1:
+        return [normalized]
+    base_id = normalized.get("id", "")
+    return [{
+        "id": f"{base_id}_t{i+1}",
+        "conversations": conv_slice,
+        "metadata": {
+            **normalized.get("metadata", {}),
+            "source_id": base_id,
+            "turn_index": i + 1,
+            "total_turns": len(slices),
+        },
+    } for i, conv_slice in enumerate(slices)]
+
+
+# ─── Benchmark ─────────────────────────────────────────
+
+def long_trajectory(agentic, n_turns):
+    turns = []
+    while len(turns) < n_turns:
+        k = len(turns)
+        for sample in agentic:
+            turns.extend({**t, "value": f"{t['value']} [{k}]"} for t in sample["conversations"])
+    return {"id": f"long-{n_turns}", "conversations": turns[:n_turns],
+            "metadata": {"source": "benchmark"}}
+
+
+def measure(fn, raws):
+    """(slices, KB allocated by fn while the slices are kept, seconds)."""
+    raws = copy.deepcopy(raws)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    slices = [s for raw in raws for s in fn(raw)]
+    seconds = time.perf_counter() - t0
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return slices, held / 1024, seconds
+
+
+def dump_all(slices):
+    t0 = time.perf_counter()
+    out = [json.dumps(dict(s), ensure_ascii=False) for s in slices]
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pyramid slice memory: copied slices vs SliceView")
+    parser.add_argument("--input", type=str, default=str(DATA_DIR / "raw_samples.json"),
+                        help="Samples whose agentic (tool-turn) samples are sliced")
+    parser.add_argument("--turns", nargs="+", type=int, default=[200, 400, 800],
+                        help="Turn counts of the synthetic long trajectories")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        samples = json.load(f)
+    agentic = [s for s in samples if any(t.get("from") == "tool" for t in s.get("conversations", []))]
+    groups = [("agentic", agentic)] + [(f"long {n}", [long_trajectory(agentic, n)]) for n in args.turns]
+
+    print(f"{len(agentic)} agentic samples from {args.input}\n")
+    print(f"{'':<12}{'turns':>7}{'slices':>8}{'output MB':>11}  {'copied KB':>10}{'views KB':>10}{'×':>6}"
+          f"  {'slice ms (copied/views)':>24}  {'dump ms (copied/views)':>23}")
+    for name, raws in groups:
+        old, old_kb, old_s = measure(legacy_normalize_and_slice, raws)
+        new, new_kb, new_s = measure(normalize_and_slice, raws)
+        old_out, old_dump = dump_all(old)
+        new_out, new_dump = dump_all(new)
+        assert old_out == new_out, f"{name}: slices differ"
+        turns = sum(len(r["conversations"]) for r in raws)
+        out_mb = sum(len(line.encode("utf-8")) for line in new_out) / 1024 / 1024
+        print(f"{name:<12}{turns:>7}{len(new):>8}{out_mb:>11.1f}  {old_kb:>10.0f}{new_kb:>10.0f}{old_kb / new_kb:>5.0f}x"
+              f"  {old_s * 1000:>16.1f} / {new_s * 1000:<5.1f}  {old_dump * 1000:>15.0f} / {new_dump * 1000:<5.0f}")
+    print("\nSlices serialize identically")
+
+
+if __name__ == "__main__":
+    main()
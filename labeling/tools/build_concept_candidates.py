@@ -0,0 +1,65 @@
+"""
+Build Concept Candidates
+
+Derives the (language, domain) → candidate concept map used to narrow the
+Call 2 concept pool (see concept_candidates.py) from labeled runs, by default
+the baseline runs in labeling/data/baselines, and writes it to
+CONCEPT_CANDIDATES_PATH.
+
+Every labeled file counts: a sample labeled by two models contributes both
+label sets, so the map covers the concepts either model chose.
+
+Usage:
+  python3 labeling/tools/build_concept_candidates.py
+  python3 labeling/tools/build_concept_candidates.py --labeled run/labeled.json --min-support 5 --output map.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import DATA_DIR, CONCEPT_CANDIDATES_PATH, CONCEPT_CANDIDATE_MIN_SUPPORT
+from concept_candidates import build_candidates
+from prompts import TAG_POOLS
+
+BASELINES = sorted((DATA_DIR / "baselines").glob("labeled_*.json"))
+
+
+def load_label_sets(paths):
+    label_sets = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            label_sets.extend(s["labels"] for s in json.load(f) if s.get("labels"))
+    return label_sets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the (language, domain) → concept candidate map")
+    parser.add_argument("--labeled", nargs="+", default=[str(p) for p in BASELINES],
+                        help="Labeled JSON files (default: data/baselines)")
+    parser.add_argument("--min-support", type=int, default=CONCEPT_CANDIDATE_MIN_SUPPORT,
+                        help="Labeled samples a (language, domain) pair needs to enter the map")
+    parser.add_argument("--output", type=str, default=str(CONCEPT_CANDIDATES_PATH))
+    args = parser.parse_args()
+
+    label_sets = load_label_sets(args.labeled)
+    mapping = build_candidates(label_sets, min_support=args.min_support)
+    sizes = [len(c) for c in mapping.values()]
+    print(f"{len(label_sets)} labeled samples → {len(mapping)} (language, domain) pairs "
+          f"with ≥{args.min_support} samples")
+    if sizes:
+        print(f"Candidates per pair: {min(sizes)}–{max(sizes)}, mean {sum(sizes) / len(sizes):.1f} "
+              f"of {len(TAG_POOLS['concept'])} concepts")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(mapping, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"Concept candidates → {output}")
+
+
+if __name__ == "__main__":
+    main()
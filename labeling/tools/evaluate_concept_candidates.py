@@ -0,0 +1,139 @@
+"""
+Concept Candidate Evaluation
+
+Replays Call 2 concept-pool narrowing (concept_candidates.py) over labeled
+samples, by default the baseline runs in labeling/data/baselines, with each
+file's own Call 1 dimensions (and their confidences) as the Call 1 result.
+Reports:
+
+  - narrowed   share of Call 2 requests that get a reduced concept pool, and
+               why the others keep the full pool
+  - tokens     estimated Call 2 prompt tokens (system + few-shot + sample)
+               with the full pool and with narrowing, and the saving
+  - recall     share of the reference concepts that are still listed in the
+               prompt; a concept outside the narrowed pool is one the LLM can
+               no longer choose
+
+By default the map is rebuilt without the evaluated sample (leave-one-out),
+so the figures estimate samples the map has not seen; --in-sample uses the
+map built from everything.
+
+Usage:
+  python3 labeling/tools/evaluate_concept_candidates.py
+  python3 labeling/tools/evaluate_concept_candidates.py --min-support 5 --min-confidence 0.9 --in-sample
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import (
+    DATA_DIR, MAX_CONVERSATION_CHARS, CONCEPT_CANDIDATE_MIN_SUPPORT,
+    CONCEPT_NARROW_MIN_CONFIDENCE, CONCEPT_NARROW_MAX_SHARE,
+)
+from concept_candidates import build_candidates, candidate_pool
+from preprocessing import preprocess, format_signals_for_prompt, truncate_conversations_for_labeling, estimate_tokens
+from prompts import call_prompt
+from rate_limit import estimate_prompt_tokens
+from rules import resolve as resolve_rules
+
+BASELINES = sorted((DATA_DIR / "baselines").glob("labeled_*.json"))
+CALL1_DIMS = ["intent", "language", "domain", "task", "difficulty"]
+CALL2_DIMS = ["concept", "agentic", "constraint", "context"]
+
+
+def frozen(mapping):
+    return {key: frozenset(concepts) for key, concepts in mapping.items()}
+
+
+def prompt_tokens(drop, concepts, user_tokens):
+    system, fewshot = call_prompt("call2", drop, concepts)
+    return estimate_prompt_tokens([{"content": system}] + fewshot) + user_tokens + 4
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate Call 2 concept-pool narrowing on labeled samples")
+    parser.add_argument("--labeled", nargs="+", default=[str(p) for p in BASELINES],
+                        help="Labeled JSON files (default: data/baselines)")
+    parser.add_argument("--min-support", type=int, default=CONCEPT_CANDIDATE_MIN_SUPPORT)
+    parser.add_argument("--min-confidence", type=float, default=CONCEPT_NARROW_MIN_CONFIDENCE)
+    parser.add_argument("--max-share", type=float, default=CONCEPT_NARROW_MAX_SHARE)
+    parser.add_argument("--in-sample", action="store_true",
+                        help="Use the map built from all samples instead of leave-one-out")
+    args = parser.parse_args()
+
+    runs = []
+    for path in args.labeled:
+        with open(path, "r", encoding="utf-8") as f:
+            runs.append((Path(path).stem.replace("labeled_", ""), [s for s in json.load(f) if s.get("labels")]))
+    all_labels = [(s["id"], s["labels"]) for _, samples in runs for s in samples]
+    full_map = frozen(build_candidates([l for _, l in all_labels], min_support=args.min_support))
+    mode = "in-sample" if args.in_sample else "leave-one-out"
+    print(f"{len(all_labels)} labeled samples in {len(runs)} files, {len(full_map)} pairs in the full map "
+          f"(min_support={args.min_support}, min_confidence={args.min_confidence}, "
+          f"max_share={args.max_share}, {mode})\n")
+
+    maps, contexts = {}, {}
+    print(f"{'file':<16}{'narrowed':>10}{'pool':>7}{'tokens full':>13}{'narrowed':>10}{'saved':>8}"
+          f"{'recall':>9}{'lost':>6}")
+    totals = Counter()
+    for name, samples in runs:
+        st, reasons = Counter(), Counter()
+        for sample in samples:
+            sid, labels = sample["id"], sample["labels"]
+            if sid not in contexts:
+                signals = preprocess(sample)
+                convs, _ = truncate_conversations_for_labeling(
+                    sample.get("conversations", []), max_total_chars=MAX_CONVERSATION_CHARS)
+                user_tokens = (estimate_tokens(json.dumps(convs, ensure_ascii=False))
+                               + estimate_tokens(format_signals_for_prompt(signals)) + 40)
+                drop = [d for d in resolve_rules(signals) if d in CALL2_DIMS]
+                contexts[sid] = (drop, user_tokens)
+            drop, user_tokens = contexts[sid]
+            if args.in_sample:
+                mapping = full_map
+            else:
+                if sid not in maps:
+                    maps[sid] = frozen(build_candidates([l for i, l in all_labels if i != sid],
+                                                        min_support=args.min_support))
+                mapping = maps[sid]
+
+            call1 = {d: labels.get(d) for d in CALL1_DIMS}
+            call1["confidence"] = labels.get("confidence", {})
+            user = user_tokens + estimate_tokens(json.dumps({d: call1[d] for d in CALL1_DIMS}, ensure_ascii=False))
+            pool, reason = candidate_pool(call1, mapping, args.min_confidence, args.max_share)
+            reasons[reason] += 1
+            full = prompt_tokens(drop, None, user)
+            st["requests"] += 1
+            st["full"] += full
+            st["narrowed_tokens"] += prompt_tokens(drop, pool, user) if pool is not None else full
+            refs = labels.get("concept") or []
+            st["refs"] += len(refs)
+            if pool is not None:
+                st["narrowed"] += 1
+                st["pool"] += len(pool)
+                lost = [c for c in refs if c not in pool]
+                st["lost"] += len(lost)
+                st["lost_samples"] += bool(lost)
+        n = max(st["requests"], 1)
+        print(f"{name[:15]:<16}{st['narrowed'] / n:>10.0%}{st['pool'] / max(st['narrowed'], 1):>7.1f}"
+              f"{st['full'] / n:>13.0f}{st['narrowed_tokens'] / n:>10.0f}"
+              f"{1 - st['narrowed_tokens'] / max(st['full'], 1):>8.1%}"
+              f"{1 - st['lost'] / max(st['refs'], 1):>9.1%}{st['lost']:>6}")
+        print(f"{'':<16}full pool: " + ", ".join(f"{r} {c}" for r, c in reasons.most_common() if r != "narrowed"))
+        totals.update(st)
+
+    n = max(totals["requests"], 1)
+    print(f"\nAll files: {totals['narrowed'] / n:.0%} of Call 2 requests narrowed, "
+          f"Call 2 prompt tokens −{1 - totals['narrowed_tokens'] / max(totals['full'], 1):.1%} "
+          f"({(totals['full'] - totals['narrowed_tokens']) / max(totals['narrowed'], 1):.0f} per narrowed request), "
+          f"concept recall {1 - totals['lost'] / max(totals['refs'], 1):.1%} "
+          f"({totals['lost']} of {totals['refs']} reference concepts outside the pool, "
+          f"{totals['lost_samples']} samples)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Rule Engine Evaluation
+
+Runs every rule in rules.py over labeled samples and compares the rule labels
+with the LLM labels already stored there (by default the two baseline runs in
+labeling/data/baselines). Reports, per rule and dimension:
+
+  - coverage   share of samples the rule fires on / resolves (≥ threshold)
+  - precision  exact agreement of the resolved labels with each labeled file,
+               and with their consensus (samples where all files agree on
+               that dimension)
+
+and the share of all dimension slots (samples × 9) the rule engine would take
+away from the LLM. Use it to set RULE_CONFIDENCE_THRESHOLD and the rule
+confidences.
+
+Usage:
+  python3 labeling/tools/evaluate_rules.py
+  python3 labeling/tools/evaluate_rules.py --labeled a.json b.json --threshold 0.9 --output rules_eval.jsonl
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import DATA_DIR, RULE_CONFIDENCE_THRESHOLD
+from preprocessing import preprocess
+from prompts import SINGLE_SELECT
+from rules import RULES
+
+BASELINES = sorted((DATA_DIR / "baselines").glob("labeled_*.json"))
+TOTAL_DIMS = 9
+
+
+def load_labeled(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def same(dim, a, b):
+    if dim in SINGLE_SELECT:
+        return a == b
+    return set(a or []) == set(b or [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate rules.py against existing LLM labels")
+    parser.add_argument("--labeled", nargs="+", default=[str(p) for p in BASELINES],
+                        help="Labeled JSON files over the same samples (default: data/baselines)")
+    parser.add_argument("--threshold", type=float, default=RULE_CONFIDENCE_THRESHOLD)
+    parser.add_argument("--output", type=str, default=None,
+                        help="Write one JSONL row per (sample, rule hit) with the reference labels")
+    args = parser.parse_args()
+
+    runs = [(Path(p).stem.replace("labeled_", ""), load_labeled(p)) for p in args.labeled]
+    by_id = [{s["id"]: s.get("labels") for s in samples} for _, samples in runs]
+    samples = [s for s in runs[0][1] if all(ids.get(s["id"]) for ids in by_id)]
+    names = [name for name, _ in runs]
+    print(f"{len(samples)} samples labeled in all of: {', '.join(names)}  (threshold={args.threshold})\n")
+
+    rows = []
+    stats = {}   # (dim, rule) → counters
+    resolved_slots = 0
+    for sample in samples:
+        signals = preprocess(sample)
+        refs = [ids[sample["id"]] for ids in by_id]
+        resolved_dims = set()
+        for dim, rules in RULES.items():
+            for rule in rules:
+                hit = rule(signals)
+                if hit is None:
+                    continue
+                value, confidence = hit
+                resolved = confidence >= args.threshold
+                if resolved:
+                    resolved_dims.add(dim)
+                st = stats.setdefault((dim, rule.__name__), {
+                    "fired": 0, "resolved": 0, "agree": [0] * len(refs), "consensus": 0, "consensus_agree": 0})
+                st["fired"] += 1
+                ref_values = [r.get(dim) for r in refs]
+                rows.append({"id": sample["id"], "dim": dim, "rule": rule.__name__, "value": value,
+                             "confidence": confidence, "resolved": resolved,
+                             "reference": dict(zip(names, ref_values))})
+                if not resolved:
+                    continue
+                st["resolved"] += 1
+                for i, ref in enumerate(ref_values):
+                    st["agree"][i] += same(dim, value, ref)
+                if all(same(dim, ref_values[0], ref) for ref in ref_values[1:]):
+                    st["consensus"] += 1
+                    st["consensus_agree"] += same(dim, value, ref_values[0])
+        resolved_slots += len(resolved_dims)
+
+    n = max(len(samples), 1)
+    header = f"{'dim':<10}{'rule':<18}{'fired':>8}{'resolved':>10}"
+    header += "".join(f"{name[:12]:>14}" for name in names) + f"{'consensus':>12}"
+    print(header)
+    print(f"{'':<36}{'precision of resolved labels vs':^{14 * len(names) + 12}}")
+    for (dim, rule), st in stats.items():
+        line = f"{dim:<10}{rule:<18}{st['fired'] / n:>8.0%}{st['resolved'] / n:>10.0%}"
+        line += "".join(f"{a / max(st['resolved'], 1):>14.1%}" for a in st["agree"])
+        line += f"{st['consensus_agree'] / max(st['consensus'], 1):>12.1%}"
+        print(line)
+    print(f"\nResolved locally: {resolved_slots}/{len(samples) * TOTAL_DIMS} dimension slots "
+          f"({resolved_slots / max(len(samples) * TOTAL_DIMS, 1):.1%})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        print(f"Rule hits → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Triage Model Evaluation
+
+Per-dimension precision and coverage of the local triage model (triage.py)
+against reference labels:
+
+  - coverage   share of samples whose dimension the model pre-labels (calibrated
+               probability ≥ the dimension's threshold)
+  - precision  agreement of those pre-labels with the reference
+  - accuracy   agreement of the top prediction on all samples, for reference
+
+Either evaluate a saved model on labeled files it was not trained on, or, with
+--folds K, train and calibrate on K-1 folds of the labeled samples (split by
+sample id) and evaluate on the remaining fold, K times.
+
+Needs numpy.
+
+Usage:
+  python3 labeling/tools/evaluate_triage.py --model labeling/data/triage_model.npz --labeled run/labeled.jsonl
+  python3 labeling/tools/evaluate_triage.py --folds 5                  # cross-validated on data/baselines
+"""
+
+import argparse
+import sys
+import zlib
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import (
+    DATA_DIR, TRIAGE_MODEL_PATH, TRIAGE_DIMENSIONS, TRIAGE_HASH_BITS, TRIAGE_TARGET_PRECISION,
+    TRIAGE_MIN_CALIBRATION,
+)
+from triage import FeatureMatrix, TriageModel, train, training_label
+from train_triage import load_examples
+
+BASELINES = sorted((DATA_DIR / "baselines").glob("labeled_*.json"))
+
+
+def evaluate(model, examples, totals):
+    """Accumulate per-dimension counters of `model` on `examples` into totals[dim]."""
+    if not examples:
+        return
+    predictions = model.predict(FeatureMatrix([x for _, x, _ in examples]))
+    for dim, (values, confidences) in predictions.items():
+        st = totals.setdefault(dim, Counter())
+        threshold = model.threshold[dim]
+        for (_, _, labels), value, conf in zip(examples, values, confidences):
+            ref = training_label(labels, dim)
+            if ref is None:
+                continue
+            st["samples"] += 1
+            st["correct"] += value == ref
+            if threshold is not None and conf >= threshold:
+                st["covered"] += 1
+                st["precise"] += value == ref
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the triage model: per-dimension precision and coverage")
+    parser.add_argument("--labeled", nargs="+", default=[str(p) for p in BASELINES],
+                        help="Run directories or labeled .json/.jsonl files (default: data/baselines)")
+    parser.add_argument("--model", type=str, default=None,
+                        help=f"Saved model to evaluate (e.g. {TRIAGE_MODEL_PATH.name}); omit with --folds")
+    parser.add_argument("--folds", type=int, default=0, help="Cross-validate: train on K-1 folds, test on 1")
+    parser.add_argument("--dims", nargs="+", default=TRIAGE_DIMENSIONS)
+    parser.add_argument("--target-precision", type=float, default=TRIAGE_TARGET_PRECISION)
+    parser.add_argument("--min-calibration", type=int, default=TRIAGE_MIN_CALIBRATION)
+    args = parser.parse_args()
+    if not args.model and args.folds < 2:
+        parser.error("give --model, or --folds K (K ≥ 2)")
+
+    totals, thresholds = {}, {}
+    if args.model:
+        model = TriageModel.load(args.model)
+        examples = load_examples(args.labeled, model.hash_bits)
+        print(f"{len(examples)} labeled samples, model {args.model}\n")
+        evaluate(model, examples, totals)
+        thresholds = {d: [model.threshold[d]] for d in model.dims}
+    else:
+        examples = load_examples(args.labeled, TRIAGE_HASH_BITS)
+        print(f"{len(examples)} labeled samples, {args.folds}-fold cross-validation "
+              f"(target precision {args.target_precision:.0%})\n")
+        fold_of = {sid: zlib.crc32(str(sid).encode("utf-8")) % args.folds for sid, _, _ in examples}
+        for k in range(args.folds):
+            print(f"Fold {k + 1}/{args.folds}")
+            model = train([e for e in examples if fold_of[e[0]] != k], dims=args.dims,
+                          target_precision=args.target_precision, min_count=args.min_calibration,
+                          log=print)
+            evaluate(model, [e for e in examples if fold_of[e[0]] == k], totals)
+            for d in model.dims:
+                thresholds.setdefault(d, []).append(model.threshold[d])
+        print()
+
+    print(f"{'dim':<12}{'samples':>9}{'accuracy':>10}{'coverage':>10}{'precision':>11}  threshold")
+    for dim, st in totals.items():
+        found = [f"{t:.3f}" if t is not None else "none" for t in thresholds.get(dim, [])]
+        print(f"{dim:<12}{st['samples']:>9}{st['correct'] / max(st['samples'], 1):>10.1%}"
+              f"{st['covered'] / max(st['samples'], 1):>10.1%}"
+              f"{st['precise'] / max(st['covered'], 1):>11.1%}  {', '.join(found)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Mock LiteLLM Server
+
+OpenAI-compatible /chat/completions stand-in for exercising the endpoint pool
+(and the rest of the HTTP path) locally. Answers come from the same
+deterministic responder as tools/batch_server.py; each instance can be made
+slow, flaky or temporarily down.
+
+  --delay / --jitter     base latency and ± jitter fraction
+  --error-rate           fraction answered with HTTP 500
+  --throttle-rate        fraction answered with HTTP 429
+  --hang-rate            fraction that stall for --hang seconds (client timeouts)
+  --outage START:LEN     HTTP 503 for LEN seconds, START seconds after launch
+                         (repeatable)
+
+GET /stats returns the instance's request/outcome counters.
+
+Usage:
+  python3 labeling/tools/mock_llm_server.py --port 8901
+  python3 labeling/tools/mock_llm_server.py --port 8902 --delay 0.3 --error-rate 0.05
+  python3 labeling/tools/mock_llm_server.py --port 8903 --outage 5:20
+  python3 labeling/pipeline.py --endpoints "http://127.0.0.1:8901|2,http://127.0.0.1:8902,http://127.0.0.1:8903"
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+from batch_server import mock_completion
+
+
+class MockState:
+    def __init__(self, args):
+        self.args = args
+        self.started = time.monotonic()
+        self.outages = []
+        for spec in args.outage:
+            start, length = spec.split(":")
+            self.outages.append((float(start), float(start) + float(length)))
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "ok": 0, "error": 0, "throttled": 0, "hung": 0, "outage": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+    def in_outage(self):
+        t = time.monotonic() - self.started
+        return any(start <= t < end for start, end in self.outages)
+
+
+def make_handler(state):
+    args = state.args
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *a):
+            pass
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass   # client gave up (timeout / cancelled hedge)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            state.count("requests")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": f"unknown endpoint {self.path}"}})
+            if state.in_outage():
+                state.count("outage")
+                return self._send(503, {"error": {"message": "mock outage"}})
+            time.sleep(max(0.0, args.delay * random.uniform(1 - args.jitter, 1 + args.jitter)))
+            r = random.random()
+            if r < args.hang_rate:
+                state.count("hung")
+                time.sleep(args.hang)
+            elif r < args.hang_rate + args.error_rate:
+                state.count("error")
+                return self._send(500, {"error": {"message": "mock server error"}})
+            elif r < args.hang_rate + args.error_rate + args.throttle_rate:
+                state.count("throttled")
+                return self._send(429, {"error": {"message": "mock rate limit"}})
+            state.count("ok")
+            self._send(200, mock_completion(body))
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                with state.lock:
+                    return self._send(200, dict(state.counters))
+            self._send(404, {"error": {"message": f"unknown endpoint {self.path}"}})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--delay", type=float, default=0.1, help="Base response latency (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Latency jitter as a fraction of --delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction answered with HTTP 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction answered with HTTP 429")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fraction that stall for --hang seconds")
+    parser.add_argument("--hang", type=float, default=120.0)
+    parser.add_argument("--outage", action="append", default=[], metavar="START:LEN",
+                        help="Answer HTTP 503 for LEN seconds starting START seconds after launch")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(MockState(args)))
+    server.daemon_threads = True
+    print(f"Mock LLM server on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Train Triage Model
+
+Fits the local triage model (see triage.py) on labeled samples of past runs
+and saves it for `pipeline.py --triage-model`. Run directories are searched
+recursively for labeled*.jsonl; .json / .jsonl files are read as given.
+
+Needs numpy.
+
+Usage:
+  python3 labeling/tools/train_triage.py --runs labeling/data/runs/
+  python3 labeling/tools/train_triage.py --runs run_a/ run_b/labeled.jsonl --dims intent difficulty context \\
+      --target-precision 0.97 --output labeling/data/triage_model.npz
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import (
+    TRIAGE_MODEL_PATH, TRIAGE_DIMENSIONS, TRIAGE_HASH_BITS, TRIAGE_TARGET_PRECISION,
+    TRIAGE_CALIBRATION_SHARE, TRIAGE_MIN_CALIBRATION, TRIAGE_EPOCHS,
+)
+from preprocessing import normalize_sample, preprocess
+from triage import featurize, iter_labeled, train
+
+
+def load_examples(paths, hash_bits):
+    """[(sample id, feature indices, labels)] of every sample with labels."""
+    examples = []
+    for sample in iter_labeled(paths):
+        labels = sample.get("labels")
+        if not labels or labels.get("inherited") or labels.get("duplicate_of") or labels.get("propagated_from"):
+            continue
+        sample = normalize_sample(sample)
+        examples.append((sample.get("id"), featurize(sample, preprocess(sample), hash_bits), labels))
+    return examples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local triage model on labeled runs")
+    parser.add_argument("--runs", nargs="+", required=True,
+                        help="Run directories (searched for labeled*.jsonl) or labeled .json/.jsonl files")
+    parser.add_argument("--dims", nargs="+", default=TRIAGE_DIMENSIONS,
+                        help="Single-select dimensions to model")
+    parser.add_argument("--hash-bits", type=int, default=TRIAGE_HASH_BITS)
+    parser.add_argument("--epochs", type=int, default=TRIAGE_EPOCHS)
+    parser.add_argument("--target-precision", type=float, default=TRIAGE_TARGET_PRECISION)
+    parser.add_argument("--calibration-share", type=float, default=TRIAGE_CALIBRATION_SHARE)
+    parser.add_argument("--min-calibration", type=int, default=TRIAGE_MIN_CALIBRATION)
+    parser.add_argument("--output", type=str, default=str(TRIAGE_MODEL_PATH))
+    args = parser.parse_args()
+
+    t0 = time.time()
+    examples = load_examples(args.runs, args.hash_bits)
+    print(f"{len(examples)} labeled samples featurized in {time.time() - t0:.1f}s")
+    t0 = time.time()
+    model = train(examples, dims=args.dims, hash_bits=args.hash_bits, calibration_share=args.calibration_share,
+                  target_precision=args.target_precision, min_count=args.min_calibration, epochs=args.epochs)
+    print(f"Trained in {time.time() - t0:.1f}s")
+    model.save(args.output)
+    size_kb = Path(args.output).stat().st_size / 1024
+    print(f"Triage model → {args.output} ({size_kb:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
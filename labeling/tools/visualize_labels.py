@@ -26,6 +26,7 @@ DIMENSIONS = ["intent", "difficulty", "language", "domain", "concept",
 def load_run(run_dir: Path, labeled_file="labeled.json", stats_file="stats.json"):
     """Load samples and stats from a run directory.
 
+    labeled_file may be labeled.json or labeled.jsonl (runs with --no-labeled-json).
     If labeled_file is None or doesn't exist, returns empty samples list
     (stats-only mode for global dashboards).
     """
@@ -34,7 +35,10 @@ def load_run(run_dir: Path, labeled_file="labeled.json", stats_file="stats.json"
         labeled_path = run_dir / labeled_file
         if labeled_path.exists():
             with open(labeled_path, encoding="utf-8") as f:
-                samples = json.load(f)
+                if labeled_path.suffix == ".jsonl":
+                    samples = [json.loads(line) for line in f if line.strip()]
+                else:
+                    samples = json.load(f)
 
     stats = {}
     stats_path = run_dir / stats_file
@@ -302,11 +306,12 @@ def main():
     args = parser.parse_args()
 
     run_dir = Path(args.run_dir)
-    if not (run_dir / "labeled.json").exists():
+    labeled_file = next((n for n in ("labeled.json", "labeled.jsonl") if (run_dir / n).exists()), None)
+    if labeled_file is None:
         print(f"Error: {run_dir}/labeled.json not found")
         sys.exit(1)
 
-    out = generate_dashboard(run_dir)
+    out = generate_dashboard(run_dir, labeled_file=labeled_file)
     print(f"Dashboard: {out}")
     if args.open:
         webbrowser.open(f"file://{out.resolve()}")
@@ -0,0 +1,308 @@
+"""
+Triage Model
+
+Local pre-labeler for the dimensions that cheap features predict well (intent
+and difficulty by default, TRIAGE_DIMENSIONS). One multinomial logistic
+regression per dimension over hashed n-gram features, trained in pure NumPy on
+past runs' labeled*.jsonl (tools/train_triage.py).
+
+Features, hashed (crc32) into 2^TRIAGE_HASH_BITS buckets and L2-normalized:
+  - word and CJK character unigrams + bigrams of the last user query, the
+    first user turn and the head of the last response
+  - preprocess() signals as tokens: fence / framework languages, tool names and
+    tags, behavioral patterns, keyword groups, taxonomy alias hits, and log2
+    buckets of turns, code blocks, estimated tokens and response length
+
+Calibration: TRIAGE_CALIBRATION_SHARE of the samples (split by sample id, so
+one sample labeled by several runs stays on one side) is held out. It fits one
+softmax temperature per dimension, then the lowest probability threshold at
+which the held-out predictions at or above it reach TRIAGE_TARGET_PRECISION.
+A dimension that never does, with at least TRIAGE_MIN_CALIBRATION held-out
+predictions, is never pre-labeled.
+
+In the pipeline (--triage-model), a dimension whose calibrated probability
+reaches its threshold is labeled locally, the same way as a rule label
+(rules.py): dropped from the prompt, spliced into the LLM result, and recorded
+in the output labels as "source": {dim: "local_model"}.
+
+NumPy is optional: only the triage tools and --triage-model need it.
+"""
+
+import json
+import re
+import zlib
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:   # only needed for the triage model
+    np = None
+
+from config import (
+    TRIAGE_DIMENSIONS, TRIAGE_HASH_BITS, TRIAGE_TARGET_PRECISION, TRIAGE_CALIBRATION_SHARE,
+    TRIAGE_MIN_CALIBRATION, TRIAGE_EPOCHS, TRIAGE_BATCH_SIZE, TRIAGE_LEARNING_RATE, TRIAGE_L2,
+)
+from preprocessing import extract_last_turn
+from json_stream import iter_json_values
+
+# ASCII words (identifiers included) and single non-ASCII letters (CJK characters)
+_TOKEN_RE = re.compile(r"[a-z0-9_]+|[^\x00-\x7f\W]")
+_TEXT_FIELDS = (("q", 2000), ("f", 1000), ("r", 600))   # field → chars used
+_LIST_SIGNALS = ("fence_languages", "framework_languages", "tool_names", "tool_agentic_tags",
+                 "behavioral_patterns")
+_COUNT_SIGNALS = ("total_turns", "code_block_count", "est_tokens", "last_response_length")
+_TEMPERATURES = (0.25, 0.35, 0.5, 0.7, 1.0, 1.4, 2.0, 2.8, 4.0)
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("the triage model needs numpy: pip install 'build-user-query[numpy]'")
+
+
+# ─── Features ───
+
+def feature_tokens(sample, signals):
+    """String features of a sample: text n-grams + preprocess() signal tokens."""
+    conversations = sample.get("conversations", [])
+    first_query = next((t.get("value", "") for t in conversations if t.get("from") == "human"), "")
+    last_query, last_response = extract_last_turn(conversations)
+    tokens = []
+    for (field, limit), text in zip(_TEXT_FIELDS, (last_query, first_query, last_response)):
+        words = _TOKEN_RE.findall(text[:limit].lower())
+        tokens.extend(f"{field}:{w}" for w in words)
+        tokens.extend(f"{field}:{a} {b}" for a, b in zip(words, words[1:]))
+    for key in _LIST_SIGNALS:
+        tokens.extend(f"{key}:{v}" for v in signals.get(key, []))
+    tokens.extend(f"kw:{group}" for group, _ in signals.get("keyword_hits", []))
+    for dim, tags in signals.get("taxonomy_hits", {}).items():
+        tokens.extend(f"alias:{dim}:{tag}" for tag in tags)
+    for key in _COUNT_SIGNALS:
+        tokens.append(f"{key}:{int(signals.get(key, 0)).bit_length()}")
+    tokens.append(f"has_tool_roles:{signals.get('has_tool_roles', False)}")
+    return tokens
+
+
+def featurize(sample, signals, hash_bits=TRIAGE_HASH_BITS):
+    """Sorted unique hashed feature indices of a sample (int32 array)."""
+    _require_numpy()
+    mask = (1 << hash_bits) - 1
+    return np.unique(np.fromiter((zlib.crc32(t.encode("utf-8")) & mask for t in feature_tokens(sample, signals)),
+                                 dtype=np.int64)).astype(np.int32)
+
+
+class FeatureMatrix:
+    """Sparse rows of hashed feature indices, each row L2-normalized (binary features)."""
+
+    def __init__(self, rows):
+        _require_numpy()
+        lengths = np.array([len(r) for r in rows], dtype=np.int64)
+        self.n = len(rows)
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)])
+        self.indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+        self.values = np.repeat(1 / np.sqrt(np.maximum(lengths, 1)), lengths).astype(np.float32)
+        self.row_of = np.repeat(np.arange(self.n), lengths)
+
+    def take(self, idx):
+        start, end = self.indptr[:-1], self.indptr[1:]
+        return FeatureMatrix([self.indices[start[i]:end[i]] for i in idx])
+
+    def dot(self, weights):
+        """Rows · weights → (n, classes). Every row has features (the count buckets)."""
+        return np.add.reduceat(weights[self.indices] * self.values[:, None], self.indptr[:-1], axis=0)
+
+    def grad(self, errors, n_features):
+        """Rowsᵀ · errors → (n_features, classes)."""
+        per_entry = np.ascontiguousarray((errors[self.row_of] * self.values[:, None]).T)
+        return np.stack([np.bincount(self.indices, weights=e, minlength=n_features) for e in per_entry],
+                        axis=1).astype(np.float32)
+
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    e = np.exp(scores)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+# ─── Model ───
+
+class TriageModel:
+    """Per-dimension softmax regressions with calibrated confidence thresholds."""
+
+    def __init__(self, hash_bits=TRIAGE_HASH_BITS):
+        _require_numpy()
+        self.hash_bits = hash_bits
+        self.classes = {}       # dim → [label]
+        self.weights = {}       # dim → (2^hash_bits, classes) float32
+        self.bias = {}          # dim → (classes,) float32
+        self.temperature = {}   # dim → softmax temperature
+        self.threshold = {}     # dim → min calibrated probability, None = never pre-label
+
+    @property
+    def dims(self):
+        return list(self.classes)
+
+    def fit_dimension(self, dim, X, y, classes, epochs=TRIAGE_EPOCHS, batch_size=TRIAGE_BATCH_SIZE,
+                      lr=TRIAGE_LEARNING_RATE, l2=TRIAGE_L2, seed=0):
+        """Fit one dimension on FeatureMatrix X and class indices y (mini-batch Adam)."""
+        n_features = 1 << self.hash_bits
+        k = len(classes)
+        W = np.zeros((n_features, k), dtype=np.float32)
+        b = np.zeros(k, dtype=np.float32)
+        mW, vW = np.zeros_like(W), np.zeros_like(W)
+        mb, vb = np.zeros_like(b), np.zeros_like(b)
+        rng = np.random.default_rng(seed)
+        step = 0
+        for _ in range(epochs):
+            order = rng.permutation(X.n)
+            for start in range(0, X.n, batch_size):
+                batch = X.take(order[start:start + batch_size])
+                target = np.zeros((batch.n, k), dtype=np.float32)
+                target[np.arange(batch.n), y[order[start:start + batch_size]]] = 1
+                errors = (_softmax(batch.dot(W) + b) - target) / batch.n
+                gW = batch.grad(errors, n_features) + l2 * W
+                gb = errors.sum(axis=0)
+                step += 1
+                for p, g, m, v in ((W, gW, mW, vW), (b, gb, mb, vb)):
+                    m *= 0.9
+                    m += 0.1 * g
+                    v *= 0.999
+                    v += 0.001 * g * g
+                    p -= lr * (m / (1 - 0.9 ** step)) / (np.sqrt(v / (1 - 0.999 ** step)) + 1e-8)
+        self.classes[dim] = list(classes)
+        self.weights[dim] = W
+        self.bias[dim] = b
+        self.temperature[dim] = 1.0
+        self.threshold[dim] = None
+
+    def proba(self, dim, X):
+        """Calibrated class probabilities of dimension `dim` for FeatureMatrix X → (n, classes)."""
+        return _softmax((X.dot(self.weights[dim]) + self.bias[dim]) / self.temperature[dim])
+
+    def calibrate(self, dim, X, y, target_precision=TRIAGE_TARGET_PRECISION, min_count=TRIAGE_MIN_CALIBRATION):
+        """Fit the temperature and the pre-label threshold of `dim` on held-out (X, y)."""
+        scores = X.dot(self.weights[dim]) + self.bias[dim]
+        rows = np.arange(X.n)
+
+        def nll(t):
+            return -np.log(_softmax(scores / t)[rows, y] + 1e-9).mean()
+
+        self.temperature[dim] = min(_TEMPERATURES, key=nll)
+        p = self.proba(dim, X)
+        conf, correct = p.max(axis=1), p.argmax(axis=1) == y
+        order = np.argsort(-conf, kind="stable")
+        precision = np.cumsum(correct[order]) / np.arange(1, X.n + 1)
+        ok = np.nonzero(precision >= target_precision)[0]
+        # Largest prefix (= lowest threshold) that still meets the target
+        self.threshold[dim] = float(conf[order[ok[-1]]]) if len(ok) and ok[-1] + 1 >= min_count else None
+
+    def predict(self, X):
+        """{dim: (labels, confidences)} for every row of FeatureMatrix X."""
+        out = {}
+        for dim in self.dims:
+            p = self.proba(dim, X)
+            out[dim] = ([self.classes[dim][i] for i in p.argmax(axis=1)], p.max(axis=1))
+        return out
+
+    def resolve(self, sample, signals, skip=()):
+        """Dimensions confident enough to pre-label → {dim: {"value", "confidence"}}."""
+        dims = [d for d in self.dims if self.threshold[d] is not None and d not in skip]
+        if not dims:
+            return {}
+        X = FeatureMatrix([featurize(sample, signals, self.hash_bits)])
+        resolved = {}
+        for dim in dims:
+            p = self.proba(dim, X)[0]
+            best = int(p.argmax())
+            if p[best] >= self.threshold[dim]:
+                resolved[dim] = {"value": self.classes[dim][best], "confidence": round(float(p[best]), 3)}
+        return resolved
+
+    def save(self, path):
+        """Compact .npz: float16 weights + JSON metadata."""
+        meta = {"hash_bits": self.hash_bits, "classes": self.classes,
+                "temperature": self.temperature, "threshold": self.threshold}
+        arrays = {f"w:{d}": self.weights[d].astype(np.float16) for d in self.dims}
+        arrays.update({f"b:{d}": self.bias[d] for d in self.dims})
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        _require_numpy()
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            model = cls(meta["hash_bits"])
+            for dim, classes in meta["classes"].items():
+                model.classes[dim] = classes
+                model.weights[dim] = data[f"w:{dim}"].astype(np.float32)
+                model.bias[dim] = data[f"b:{dim}"]
+                model.temperature[dim] = meta["temperature"][dim]
+                model.threshold[dim] = meta["threshold"][dim]
+        return model
+
+
+# ─── Training data ───
+
+def iter_labeled(paths):
+    """Labeled samples from files and run directories (searched for labeled*.jsonl)."""
+    for path in map(Path, paths):
+        files = sorted(path.rglob("labeled*.jsonl")) if path.is_dir() else [path]
+        for file in files:
+            with open(file, "r", encoding="utf-8") as f:
+                if file.suffix == ".jsonl":
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+                else:
+                    yield from iter_json_values(f)
+
+
+def training_label(labels, dim):
+    """Reference value of `dim`, or None when it cannot serve as a training label.
+
+    Skips inherited (sparse-slice), duplicate (dedup.py) and propagated (near_dup.py)
+    copies, and values the triage model itself produced.
+    """
+    if (not labels or labels.get("inherited") or labels.get("duplicate_of") or labels.get("propagated_from")
+            or (labels.get("source") or {}).get(dim) == "local_model"):
+        return None
+    value = labels.get(dim)
+    return value if isinstance(value, str) and value else None
+
+
+def split_ids(ids, share=TRIAGE_CALIBRATION_SHARE):
+    """Deterministic held-out membership by sample id (crc32 buckets)."""
+    return {sid: zlib.crc32(str(sid).encode("utf-8")) % 1000 < share * 1000 for sid in ids}
+
+
+def train(examples, dims=TRIAGE_DIMENSIONS, hash_bits=TRIAGE_HASH_BITS, calibration_share=TRIAGE_CALIBRATION_SHARE,
+          target_precision=TRIAGE_TARGET_PRECISION, min_count=TRIAGE_MIN_CALIBRATION, epochs=TRIAGE_EPOCHS,
+          log=print):
+    """Train + calibrate a TriageModel.
+
+    examples: [(sample id, feature indices, labels dict)] (see featurize, training_label).
+    """
+    _require_numpy()
+    model = TriageModel(hash_bits)
+    held_out = split_ids({sid for sid, _, _ in examples}, calibration_share)
+    for dim in dims:
+        rows = [(sid, x, training_label(labels, dim)) for sid, x, labels in examples]
+        rows = [r for r in rows if r[2] is not None]
+        classes = sorted({value for _, _, value in rows})
+        if len(classes) < 2:
+            log(f"  {dim}: {len(rows)} labeled samples, {len(classes)} class(es) — skipped")
+            continue
+        index = {c: i for i, c in enumerate(classes)}
+        fit_rows = [r for r in rows if not held_out[r[0]]]
+        cal_rows = [r for r in rows if held_out[r[0]]]
+        X = FeatureMatrix([x for _, x, _ in fit_rows])
+        model.fit_dimension(dim, X, np.array([index[v] for _, _, v in fit_rows]), classes, epochs=epochs)
+        if cal_rows:
+            model.calibrate(dim, FeatureMatrix([x for _, x, _ in cal_rows]),
+                            np.array([index[v] for _, _, v in cal_rows]), target_precision, min_count)
+        threshold = model.threshold[dim]
+        log(f"  {dim}: {len(fit_rows)} fit + {len(cal_rows)} held out, {len(classes)} classes, "
+            f"T={model.temperature[dim]:g}, threshold="
+            + (f"{threshold:.3f}" if threshold is not None else f"none (precision {target_precision:.0%} not reached)"))
+    return model
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Library Extraction Benchmark
+
+Compares the previous extract_libraries path (every turn scanned twice, as
+fenced blocks and as a whole; one uncompiled re.finditer per import form and
+language; comments stripped line by line) with the compiled engine
+(extract_libraries.scan_imports) on trajectory records.
+
+Reports records/sec of extract_from_trajectory for both paths (best of
+--repeat passes), the share of text the import-keyword prefilter lets through,
+and the records whose output differs between the two paths.
+
+Usage:
+    python3 scripts/benchmark_extract_libraries.py                    # labeling/data/baselines
+    python3 scripts/benchmark_extract_libraries.py --input data.jsonl --repeat 3
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from extract_libraries import (
+    PYTHON_STDLIB, _get_line, _may_import, extract_from_trajectory, normalize_library,
+)
+
+BASELINES = sorted((Path(__file__).parent.parent / "labeling" / "data" / "baselines").glob("labeled_*.json"))
+
+
+# ──────────────────────────────────────────────────────────
+# Previous implementation
+# ──────────────────────────────────────────────────────────
+
+# (language, pattern, flags) in the order the old extract_<language> functions ran them
+LEGACY_FORMS = [
+    ("python", r'^[ \t]*from\s+([\w.]+)\s+import\b', re.MULTILINE),
+    ("python", r'^(?!.*\bfrom\s+[\'"])[ \t]*import\s+([\w.]+(?:\s+as\s+\w+)?(?:\s*,\s*[\w.]+(?:\s+as\s+\w+)?)*)',
+     re.MULTILINE),
+    ("javascript", r'''^\s*import\s+(?:(?:[\w{},\s*]+)\s+from\s+)?['"]([^'"]+)['"]''', re.MULTILINE),
+    ("javascript", r'''\brequire\s*\(\s*['"]([^'"]+)['"]\s*\)''', 0),
+    ("javascript", r'''\bimport\s*\(\s*['"]([^'"]+)['"]\s*\)''', 0),
+    ("go", r'^\s*import\s+"([^"]+)"', re.MULTILINE),
+    ("go_group", r'^\s*import\s*\((.*?)\)', re.MULTILINE | re.DOTALL),
+    ("rust", r'^\s*use\s+([\w]+)(?:::|;)', re.MULTILINE),
+    ("rust", r'^\s*extern\s+crate\s+(\w+)', re.MULTILINE),
+    ("java", r'^\s*import\s+(?:static\s+)?([\w.]+(?:\.\*)?)\s*;', re.MULTILINE),
+    ("ruby", r'''^\s*(?:require|require_relative)\s+['"]([^'"]+)['"]''', re.MULTILINE),
+    ("ruby", r'''^\s*gem\s+['"]([^'"]+)['"]''', re.MULTILINE),
+    ("csharp", r'^\s*using\s+(?:static\s+)?(?:\w+\s*=\s*)?([\w.]+)\s*;', re.MULTILINE),
+]
+
+
+def legacy_strip_comments(text):
+    lines = []
+    for line in text.splitlines():
+        if "#" in line and not re.match(r'^\s*(require|gem|from|import)\b', line):
+            line = line[:line.index("#")]
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def legacy_entries(text):
+    for language, pattern, flags in LEGACY_FORMS:
+        for match in re.finditer(pattern, text, flags):
+            if language == "go_group":
+                for imp in re.finditer(r'"([^"]+)"', match.group(1)):
+                    yield {"raw": imp.group(1), "language": "go", "line": f'import "{imp.group(1)}"'}
+                continue
+            line = _get_line(text, match)
+            if language != "python":
+                yield {"raw": match.group(1), "language": language, "line": line}
+            elif not line.endswith(";"):
+                for part in match.group(1).split(","):
+                    yield {"raw": part.split()[0].split(".")[0], "language": "python", "line": line}
+
+
+def legacy_extract_libraries(text):
+    seen, results = set(), []
+    for entry in legacy_entries(legacy_strip_comments(text)):
+        name = normalize_library(entry)
+        if entry["language"] == "python" and entry["raw"] in PYTHON_STDLIB:
+            continue
+        if name in ("go-stdlib", "java-stdlib", "rust-stdlib", "dotnet-stdlib"):
+            continue
+        if (name, entry["language"]) in seen:
+            continue
+        seen.add((name, entry["language"]))
+        results.append({"name": name, "raw": entry["raw"], "language": entry["language"], "line": entry["line"]})
+    results.sort(key=lambda r: (r["language"], r["name"]))
+    return results
+
+
+def legacy_extract_from_trajectory(trajectory):
+    code_blocks = []
+    for turn in trajectory.get("conversations", []):
+        content = turn.get("value", "") or turn.get("content", "")
+        if content:
+            code_blocks.extend(m.group(1) for m in re.finditer(r'```(?:\w+)?\s*\n(.*?)```', content, re.DOTALL))
+            code_blocks.append(content)
+        tool_calls = turn.get("tool_calls", [])
+        if isinstance(tool_calls, list):
+            for tc in tool_calls:
+                args = tc.get("arguments", tc.get("args", ""))
+                if isinstance(args, str):
+                    code_blocks.append(args)
+                elif isinstance(args, dict):
+                    code_blocks.extend(v for v in args.values() if isinstance(v, str))
+    libraries = legacy_extract_libraries("\n".join(code_blocks))
+    return {
+        "id": trajectory.get("id", trajectory.get("conversation_id", "unknown")),
+        "libraries": libraries,
+        "library_count": len(libraries),
+        "library_names": sorted(set(lib["name"] for lib in libraries)),
+    }
+
+
+# ──────────────────────────────────────────────────────────
+# Benchmark
+# ──────────────────────────────────────────────────────────
+
+def load(paths):
+    records = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            if str(path).endswith(".jsonl"):
+                records.extend(json.loads(line) for line in f if line.strip())
+            else:
+                data = json.load(f)
+                records.extend(data if isinstance(data, list) else [data])
+    return records
+
+
+def records_per_sec(fn, records, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for record in records:
+            fn(record)
+        best = min(best, time.perf_counter() - t0)
+    return len(records) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark library extraction: previous path vs compiled engine")
+    parser.add_argument("--input", nargs="+", default=[str(p) for p in BASELINES],
+                        help="Trajectory JSON/JSONL files (default: labeling/data/baselines)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing passes per path (best is reported)")
+    parser.add_argument("--show", type=int, default=5, help="Differing records to print")
+    args = parser.parse_args()
+
+    records = load(args.input)
+    texts = [turn.get("value", "") or turn.get("content", "")
+             for record in records for turn in record.get("conversations", [])]
+    total = sum(len(t) for t in texts)
+    passed = sum(len(t) for t in texts if t and _may_import(t))
+    print(f"{len(records)} records, {len(texts)} turns, {total / 1024:.0f} KB of text; "
+          f"prefilter passes {passed / max(total, 1):.1%} of it")
+
+    old = records_per_sec(legacy_extract_from_trajectory, records, args.repeat)
+    new = records_per_sec(extract_from_trajectory, records, args.repeat)
+    print(f"{'previous':<10}{old:>10.0f} records/sec")
+    print(f"{'compiled':<10}{new:>10.0f} records/sec  ({new / old:.1f}x)")
+
+    differing = [(a, b) for a, b in ((legacy_extract_from_trajectory(r), extract_from_trajectory(r)) for r in records)
+                 if a != b]
+    with_libraries = sum(1 for r in records if extract_from_trajectory(r)["libraries"])
+    print(f"\nOutput differs on {len(differing)}/{len(records)} records "
+          f"({with_libraries} records have libraries)")
+    for a, b in differing[:args.show]:
+        print(f"  {a['id']}: {a['library_names']} → {b['library_names']}")
+        for x, y in zip(a["libraries"], b["libraries"]):
+            if x != y:
+                print(f"      {x} → {y}")
+
+
+if __name__ == "__main__":
+    main()
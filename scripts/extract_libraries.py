@@ -17,6 +17,18 @@ Approach:
     3. Regex is fast enough for the ~3M records at annotation scale.
     4. Import statements have highly regular syntax within each language.
 
+Performance:
+    The import forms of each language are compiled once, at import time, into
+    one alternation per language (IMPORT_FORMS), so a block is scanned once per
+    language instead of once per form. Blocks without an import keyword at the
+    start of a line (or a require()/import() call) are skipped before comment
+    stripping, and a language is only scanned in blocks containing one of its
+    keywords. A trajectory's messages are scanned once each: fenced code blocks
+    are part of the message text and are not extracted separately. Canonical
+    names are memoized. Output is unchanged;
+    scripts/benchmark_extract_libraries.py measures records/sec against the
+    previous per-form extractors.
+
 Supported Languages:
     - Python:      import X, from X import Y, from X.Y import Z
     - JavaScript/TypeScript: import ... from 'X', require('X'), import('X')
@@ -34,7 +46,8 @@ Normalization:
     4. Java package root extraction (e.g., "org.springframework.boot" -> "spring-boot").
 
 Output:
-    JSON or YAML with per-snippet library detections:
+    JSON or YAML with per-snippet library detections (with --stream, one such
+    result per trajectory as JSONL, plus an optional library frequency table):
     {
         "file": "<source>",
         "libraries": [
@@ -63,10 +76,15 @@ Integration:
 
 import argparse
 import json
+import os
 import re
 import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 try:
     import yaml
@@ -351,26 +369,101 @@ PYTHON_STDLIB = frozenset({
 # Language-specific import parsers
 # ---------------------------------------------------------------------------
 
+# Import forms per language, in the order their entries are reported (the first
+# occurrence of a library wins deduplication). Each form has exactly one named
+# capture group, so `match.lastgroup` tells the forms of the combined
+# per-language alternation apart.
+IMPORT_FORMS: Dict[str, List[Tuple[str, str]]] = {
+    "python": [
+        # from X import ... (captures the root module)
+        ("py_from", r'^[ \t]*from\s+(?P<py_from>[\w.]+)\s+import\b'),
+        # import X [as Y] [, Z [as W]] ...
+        # Uses a negative lookahead at start-of-match to skip JS-style
+        # "import X from 'Y'" or "import { X } from 'Y'" lines entirely
+        ("py_import", r'''^(?!.*\bfrom\s+['"])[ \t]*import\s+'''
+                      r'(?P<py_import>[\w.]+(?:\s+as\s+\w+)?(?:\s*,\s*[\w.]+(?:\s+as\s+\w+)?)*)'),
+    ],
+    "javascript": [
+        # Static imports: import ... from 'module' or import 'module'
+        ("js_static", r'''^\s*import\s+(?:(?:[\w{},\s*]+)\s+from\s+)?['"](?P<js_static>[^'"]+)['"]'''),
+        # require('module') or require("module")
+        ("js_require", r'''\brequire\s*\(\s*['"](?P<js_require>[^'"]+)['"]\s*\)'''),
+        # Dynamic import: import('module')
+        ("js_dynamic", r'''\bimport\s*\(\s*['"](?P<js_dynamic>[^'"]+)['"]\s*\)'''),
+    ],
+    "go": [
+        ("go_single", r'^\s*import\s+"(?P<go_single>[^"]+)"'),
+        ("go_group", r'^\s*import\s*\((?P<go_group>(?s:.*?))\)'),
+    ],
+    "rust": [
+        ("rs_use", r'^\s*use\s+(?P<rs_use>[\w]+)(?:::|;)'),
+        ("rs_extern", r'^\s*extern\s+crate\s+(?P<rs_extern>\w+)'),
+    ],
+    "java": [
+        ("java_import", r'^\s*import\s+(?:static\s+)?(?P<java_import>[\w.]+(?:\.\*)?)\s*;'),
+    ],
+    "ruby": [
+        ("rb_require", r'''^\s*(?:require|require_relative)\s+['"](?P<rb_require>[^'"]+)['"]'''),
+        ("rb_gem", r'''^\s*gem\s+['"](?P<rb_gem>[^'"]+)['"]'''),
+    ],
+    "csharp": [
+        ("cs_using", r'^\s*using\s+(?:static\s+)?(?:\w+\s*=\s*)?(?P<cs_using>[\w.]+)\s*;'),
+    ],
+}
+
+# Substrings all import forms of a language contain: a block without any of
+# them skips that language's scan
+LANGUAGE_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "python": ("import",),
+    "javascript": ("import", "require"),
+    "go": ("import",),
+    "rust": ("use", "extern"),
+    "java": ("import",),
+    "ruby": ("require", "gem"),
+    "csharp": ("using",),
+}
+
+# Import-keyword prefilter: every import form starts with one of these keywords
+# at the start of a line, or is a require()/import() call. Text with neither
+# (prose, logs, most tool output) is skipped without running the extractors.
+_IMPORT_LINE = re.compile(
+    r'^\s*(?:from|import|use|extern|using|require(?:_relative)?|gem)\b', re.MULTILINE,
+)
+_IMPORT_CALL = re.compile(r'\b(?:require|import)\s*\(')
+_LANGUAGE_PATTERNS: Dict[str, "re.Pattern"] = {
+    lang: re.compile("|".join(pattern for _, pattern in forms), re.MULTILINE)
+    for lang, forms in IMPORT_FORMS.items()
+}
+_FORM_LANGUAGE = {form: lang for lang, forms in IMPORT_FORMS.items() for form, _ in forms}
+# Everything from the first # of a line that does not start with require/gem/from/import
+_HASH_COMMENT = re.compile(r'^(?![^\S\n]*(?:require|gem|from|import)\b)([^#\n]*)#.*', re.MULTILINE)
+# Line boundaries of str.splitlines() other than \n
+_OTHER_LINE_BREAKS = re.compile(r'[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+_GO_QUOTED = re.compile(r'"([^"]+)"')
+
+
 def _strip_comments(text: str) -> str:
     """Remove single-line comments to avoid matching commented-out imports.
 
-    Handles //, #, and -- style comments. Does not handle multi-line
-    block comments (/* ... */) to keep the regex simple and fast.
+    Handles # comments, except on require/gem/from/import lines. Does not
+    handle // or multi-line block comments (/* ... */) to keep the regex
+    simple and fast.
     """
-    lines = []
-    for line in text.splitlines():
-        # Preserve the line but strip trailing comments
-        # Be careful not to strip inside strings - but for import lines,
-        # strings rarely contain // or #, so this heuristic is acceptable
-        stripped = line
-        # For Python-style # comments (but not #! shebang, #include)
-        if "#" in stripped:
-            # Don't strip if it looks like a require statement with #
-            if not re.match(r'^\s*(require|gem|from|import)\b', stripped):
-                idx = stripped.index("#")
-                stripped = stripped[:idx]
-        lines.append(stripped)
-    return "\n".join(lines)
+    if "#" not in text:
+        return text
+    if _OTHER_LINE_BREAKS.search(text):
+        text = "\n".join(text.splitlines())
+    # Import lines rarely contain # inside strings, so cutting at the first
+    # # is an acceptable heuristic
+    return _HASH_COMMENT.sub(r"\1", text)
+
+
+def _may_import(text: str) -> bool:
+    """Cheap import-keyword prefilter: False when no import form can match."""
+    if _IMPORT_LINE.search(text):
+        return True
+    # Calls may sit anywhere in a line; only search for them when the word occurs
+    return ("require" in text or "import" in text) and _IMPORT_CALL.search(text) is not None
 
 
 def _get_line(text: str, match: "re.Match") -> str:
@@ -386,6 +479,65 @@ def _get_line(text: str, match: "re.Match") -> str:
     return text[start:end].strip()
 
 
+def _form_entries(form: str, text: str, match: "re.Match") -> List[Dict[str, str]]:
+    """Raw entries of one import-form match (a Go import group yields several)."""
+    value = match.group(form)
+    if form in ("py_from", "py_import"):
+        line = _get_line(text, match)
+        # Skip lines ending with semicolons (Java/C#/JS, not Python)
+        if line.endswith(";"):
+            return []
+        if form == "py_from":
+            # "from X.Y.Z import ..." -> root module is X
+            return [{"raw": value.split(".")[0], "full_path": value, "language": "python", "line": line}]
+        # "import X, Y as Z, W" -> extract each module
+        entries = []
+        for part in value.split(","):
+            mod = part.split()[0]  # remove "as alias"
+            entries.append({"raw": mod.split(".")[0], "full_path": mod, "language": "python", "line": line})
+        return entries
+    if form == "go_group":
+        return [{"raw": module, "language": "go", "line": f'import "{module}"'}
+                for module in _GO_QUOTED.findall(value)]
+    return [{"raw": value, "language": _FORM_LANGUAGE[form], "line": _get_line(text, match)}]
+
+
+def scan_imports(
+    blocks: Iterable[str],
+    languages: Optional[Iterable[str]] = None,
+    *,
+    strip_comments: bool = True,
+) -> Iterator[Dict[str, str]]:
+    """Yield raw import entries of text blocks, scanning each block once per language.
+
+    Blocks failing the import-keyword prefilter are skipped before comment
+    stripping, and a language is only scanned in blocks containing one of its
+    keywords. Entries are grouped by language, then by import form, then in
+    block and text order, the order in which the extract_<language> functions
+    report them.
+    """
+    langs = [lang for lang in IMPORT_FORMS if languages is None or lang in languages]
+    found: Dict[str, List[Tuple[str, "re.Match"]]] = {}
+    for block in blocks:
+        if not block:
+            continue
+        if strip_comments and _OTHER_LINE_BREAKS.search(block):
+            # The prefilter's ^ must see the lines comment stripping produces
+            block = "\n".join(block.splitlines())
+        if not _may_import(block):
+            continue
+        text = _strip_comments(block) if strip_comments else block
+        for lang in langs:
+            if not any(keyword in text for keyword in LANGUAGE_KEYWORDS[lang]):
+                continue
+            for match in _LANGUAGE_PATTERNS[lang].finditer(text):
+                found.setdefault(match.lastgroup, []).append((text, match))
+    for lang in langs:
+        for form, _ in IMPORT_FORMS[lang]:
+            for text, match in found.get(form, ()):
+                yield from _form_entries(form, text, match)
+
+
 def extract_python(text: str) -> List[Dict[str, str]]:
     """Extract library names from Python import statements.
 
@@ -397,51 +549,7 @@ def extract_python(text: str) -> List[Dict[str, str]]:
         from foo.bar import baz
         from foo import (bar, baz)
     """
-    results = []
-    patterns = [
-        # from X import ... (captures the root module)
-        r'^[ \t]*from\s+([\w.]+)\s+import\b',
-        # import X [as Y] [, Z [as W]] ...
-        # Uses a negative lookahead at start-of-match to skip JS-style
-        # "import X from 'Y'" or "import { X } from 'Y'" lines entirely
-        r'^(?!.*\bfrom\s+[\'"])[ \t]*import\s+([\w.]+(?:\s+as\s+\w+)?(?:\s*,\s*[\w.]+(?:\s+as\s+\w+)?)*)',
-    ]
-
-    is_from_pattern = [True, False]
-
-    for pattern, is_from in zip(patterns, is_from_pattern):
-        for match in re.finditer(pattern, text, re.MULTILINE):
-            line_stripped = _get_line(text, match)
-
-            # Skip lines ending with semicolons (Java/C#/JS, not Python)
-            if line_stripped.endswith(";"):
-                continue
-
-            if is_from:
-                # "from X.Y.Z import ..." -> root module is X
-                full_module = match.group(1)
-                root = full_module.split(".")[0]
-                results.append({
-                    "raw": root,
-                    "full_path": full_module,
-                    "language": "python",
-                    "line": line_stripped,
-                })
-            else:
-                # "import X, Y as Z, W" -> extract each module
-                imports_str = match.group(1)
-                for part in imports_str.split(","):
-                    part = part.strip()
-                    mod = part.split()[0]  # remove "as alias"
-                    root = mod.split(".")[0]
-                    results.append({
-                        "raw": root,
-                        "full_path": mod,
-                        "language": "python",
-                        "line": line_stripped,
-                    })
-
-    return results
+    return list(scan_imports([text], ["python"], strip_comments=False))
 
 
 def extract_javascript(text: str) -> List[Dict[str, str]]:
@@ -456,52 +564,7 @@ def extract_javascript(text: str) -> List[Dict[str, str]]:
         require('Y')
         import('Y')  (dynamic import)
     """
-    results = []
-
-    # Static imports: import ... from 'module' or import 'module'
-    # Handles single and double quotes
-    import_from = re.finditer(
-        r'''^\s*import\s+(?:(?:[\w{},\s*]+)\s+from\s+)?['"]([^'"]+)['"]''',
-        text, re.MULTILINE,
-    )
-    for match in import_from:
-        module = match.group(1)
-        line = _get_line(text, match)
-        results.append({
-            "raw": module,
-            "language": "javascript",
-            "line": line,
-        })
-
-    # require('module') or require("module")
-    require_calls = re.finditer(
-        r'''\brequire\s*\(\s*['"]([^'"]+)['"]\s*\)''',
-        text,
-    )
-    for match in require_calls:
-        module = match.group(1)
-        line = _get_line(text, match)
-        results.append({
-            "raw": module,
-            "language": "javascript",
-            "line": line,
-        })
-
-    # Dynamic import: import('module')
-    dynamic_imports = re.finditer(
-        r'''\bimport\s*\(\s*['"]([^'"]+)['"]\s*\)''',
-        text,
-    )
-    for match in dynamic_imports:
-        module = match.group(1)
-        line = _get_line(text, match)
-        results.append({
-            "raw": module,
-            "language": "javascript",
-            "line": line,
-        })
-
-    return results
+    return list(scan_imports([text], ["javascript"], strip_comments=False))
 
 
 def extract_go(text: str) -> List[Dict[str, str]]:
@@ -515,38 +578,7 @@ def extract_go(text: str) -> List[Dict[str, str]]:
             "github.com/gin-gonic/gin"
         )
     """
-    results = []
-
-    # Single import
-    single = re.finditer(
-        r'^\s*import\s+"([^"]+)"',
-        text, re.MULTILINE,
-    )
-    for match in single:
-        module = match.group(1)
-        line = _get_line(text, match)
-        results.append({
-            "raw": module,
-            "language": "go",
-            "line": line,
-        })
-
-    # Grouped imports
-    grouped = re.finditer(
-        r'^\s*import\s*\((.*?)\)',
-        text, re.MULTILINE | re.DOTALL,
-    )
-    for match in grouped:
-        block = match.group(1)
-        for imp in re.finditer(r'"([^"]+)"', block):
-            module = imp.group(1)
-            results.append({
-                "raw": module,
-                "language": "go",
-                "line": f'import "{module}"',
-            })
-
-    return results
+    return list(scan_imports([text], ["go"], strip_comments=False))
 
 
 def extract_rust(text: str) -> List[Dict[str, str]]:
@@ -558,37 +590,7 @@ def extract_rust(text: str) -> List[Dict[str, str]]:
         extern crate serde;
         use tokio::{task, time};
     """
-    results = []
-
-    # use X::Y
-    use_stmts = re.finditer(
-        r'^\s*use\s+([\w]+)(?:::|;)',
-        text, re.MULTILINE,
-    )
-    for match in use_stmts:
-        crate = match.group(1)
-        line = _get_line(text, match)
-        results.append({
-            "raw": crate,
-            "language": "rust",
-            "line": line,
-        })
-
-    # extern crate X
-    extern_crates = re.finditer(
-        r'^\s*extern\s+crate\s+(\w+)',
-        text, re.MULTILINE,
-    )
-    for match in extern_crates:
-        crate = match.group(1)
-        line = _get_line(text, match)
-        results.append({
-            "raw": crate,
-            "language": "rust",
-            "line": line,
-        })
-
-    return results
+    return list(scan_imports([text], ["rust"], strip_comments=False))
 
 
 def extract_java(text: str) -> List[Dict[str, str]]:
@@ -599,22 +601,7 @@ def extract_java(text: str) -> List[Dict[str, str]]:
         import static org.junit.Assert.*;
         import java.util.List;
     """
-    results = []
-
-    imports = re.finditer(
-        r'^\s*import\s+(?:static\s+)?([\w.]+(?:\.\*)?)\s*;',
-        text, re.MULTILINE,
-    )
-    for match in imports:
-        package = match.group(1)
-        line = _get_line(text, match)
-        results.append({
-            "raw": package,
-            "language": "java",
-            "line": line,
-        })
-
-    return results
+    return list(scan_imports([text], ["java"], strip_comments=False))
 
 
 def extract_ruby(text: str) -> List[Dict[str, str]]:
@@ -626,37 +613,7 @@ def extract_ruby(text: str) -> List[Dict[str, str]]:
         require_relative 'lib/foo'
         gem 'rails', '~> 7.0'
     """
-    results = []
-
-    # require / require_relative
-    requires = re.finditer(
-        r'''^\s*(?:require|require_relative)\s+['"]([^'"]+)['"]''',
-        text, re.MULTILINE,
-    )
-    for match in requires:
-        module = match.group(1)
-        line = _get_line(text, match)
-        results.append({
-            "raw": module,
-            "language": "ruby",
-            "line": line,
-        })
-
-    # gem 'X'
-    gems = re.finditer(
-        r'''^\s*gem\s+['"]([^'"]+)['"]''',
-        text, re.MULTILINE,
-    )
-    for match in gems:
-        module = match.group(1)
-        line = _get_line(text, match)
-        results.append({
-            "raw": module,
-            "language": "ruby",
-            "line": line,
-        })
-
-    return results
+    return list(scan_imports([text], ["ruby"], strip_comments=False))
 
 
 def extract_csharp(text: str) -> List[Dict[str, str]]:
@@ -668,22 +625,7 @@ def extract_csharp(text: str) -> List[Dict[str, str]]:
         using static System.Math;
         using X = Some.Namespace;
     """
-    results = []
-
-    usings = re.finditer(
-        r'^\s*using\s+(?:static\s+)?(?:\w+\s*=\s*)?([\w.]+)\s*;',
-        text, re.MULTILINE,
-    )
-    for match in usings:
-        namespace = match.group(1)
-        line = _get_line(text, match)
-        results.append({
-            "raw": namespace,
-            "language": "csharp",
-            "line": line,
-        })
-
-    return results
+    return list(scan_imports([text], ["csharp"], strip_comments=False))
 
 
 # ---------------------------------------------------------------------------
@@ -897,6 +839,12 @@ def normalize_library(entry: Dict[str, str]) -> str:
     return raw.lower()
 
 
+@lru_cache(maxsize=65536)
+def _canonical_name(raw: str, language: str) -> str:
+    """normalize_library() memoized on (raw, language): imports repeat across records."""
+    return normalize_library({"raw": raw, "language": language})
+
+
 # ---------------------------------------------------------------------------
 # Top-level extraction
 # ---------------------------------------------------------------------------
@@ -920,30 +868,21 @@ def extract_libraries(
         List of dicts with keys: name, raw, language, line.
         Deduplicated by (name, language).
     """
-    cleaned = _strip_comments(text)
-
-    extractors = {
-        "python": extract_python,
-        "javascript": extract_javascript,
-        "go": extract_go,
-        "rust": extract_rust,
-        "java": extract_java,
-        "ruby": extract_ruby,
-        "csharp": extract_csharp,
-    }
-
-    if languages:
-        extractors = {k: v for k, v in extractors.items() if k in languages}
+    return _collect_libraries(
+        scan_imports([text], languages or None), include_stdlib=include_stdlib,
+    )
 
-    raw_results = []
-    for extractor in extractors.values():
-        raw_results.extend(extractor(cleaned))
 
-    # Normalize and deduplicate
+def _collect_libraries(
+    entries: Iterable[Dict[str, str]],
+    *,
+    include_stdlib: bool,
+) -> List[Dict[str, str]]:
+    """Normalize, filter and deduplicate raw import entries (first occurrence wins)."""
     seen = set()
     results = []
-    for entry in raw_results:
-        name = normalize_library(entry)
+    for entry in entries:
+        name = _canonical_name(entry["raw"], entry["language"])
 
         # Filter stdlib if requested
         if not include_stdlib:
@@ -981,6 +920,9 @@ def extract_from_trajectory(
     - tool_call arguments
     - tool outputs
 
+    Each message and argument is scanned once as a whole: fenced code blocks
+    start on a line of their own, so their imports are found in place.
+
     Returns a dict with the trajectory ID and detected libraries.
     """
     code_blocks = []
@@ -989,15 +931,6 @@ def extract_from_trajectory(
     for turn in conversations:
         content = turn.get("value", "") or turn.get("content", "")
         if content:
-            # Extract fenced code blocks
-            fenced = re.finditer(
-                r'```(?:\w+)?\s*\n(.*?)```',
-                content, re.DOTALL,
-            )
-            for block in fenced:
-                code_blocks.append(block.group(1))
-
-            # Also try the raw content (might be plain code)
             code_blocks.append(content)
 
         # Check tool_calls
@@ -1012,8 +945,7 @@ def extract_from_trajectory(
                         if isinstance(v, str):
                             code_blocks.append(v)
 
-    combined_text = "\n".join(code_blocks)
-    libraries = extract_libraries(combined_text, include_stdlib=include_stdlib)
+    libraries = _collect_libraries(scan_imports(code_blocks), include_stdlib=include_stdlib)
 
     result = {
         "id": trajectory.get("id", trajectory.get("conversation_id", "unknown")),
@@ -1027,10 +959,174 @@ def extract_from_trajectory(
     return result
 
 
+# ---------------------------------------------------------------------------
+# Streaming (sharded JSONL)
+# ---------------------------------------------------------------------------
+
+def iter_jsonl_lines(paths: List[Path]) -> Iterator[Tuple[str, int, str]]:
+    """Yield (source, line number, line) of JSONL files, or of stdin for no paths."""
+    if not paths:
+        for line_num, line in enumerate(sys.stdin, 1):
+            yield "<stdin>", line_num, line
+        return
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_num, line in enumerate(f, 1):
+                yield str(path), line_num, line
+
+
+def shard_paths(path: Path) -> List[Path]:
+    """The JSONL shards of a directory (sorted), or the file itself."""
+    if path.is_dir():
+        return sorted(p for p in path.glob("*.jsonl") if p.is_file())
+    return [path]
+
+
+def _chunks(lines: Iterator[Tuple[str, int, str]], size: int) -> Iterator[List[Tuple[str, int, str]]]:
+    chunk = []
+    for item in lines:
+        if item[2].strip():
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def extract_chunk(
+    chunk: List[Tuple[str, int, str]],
+    include_stdlib: bool = False,
+    compact: bool = False,
+) -> Tuple[List[str], Counter, List[str]]:
+    """Extract a chunk of JSONL lines (runs in a worker process).
+
+    Returns the per-record output lines, a Counter of records per
+    (language, library) and warnings for lines that are not valid JSON.
+    """
+    out, counts, warnings = [], Counter(), []
+    for source, line_num, line in chunk:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            warnings.append(f"Warning: skipping invalid JSON at {source}:{line_num}")
+            continue
+        result = extract_from_trajectory(record, include_stdlib=include_stdlib)
+        counts.update((lib["language"], lib["name"]) for lib in result["libraries"])
+        if compact:
+            result = {"id": result["id"], "library_names": result["library_names"]}
+        out.append(json.dumps(result, ensure_ascii=False))
+    return out, counts, warnings
+
+
+def frequency_table(counts: Counter, record_count: int) -> Dict:
+    """Records per library, by language, most frequent first."""
+    by_language: Dict[str, Dict[str, int]] = {}
+    for (language, name), count in sorted(counts.items(), key=lambda kv: (kv[0][0], -kv[1], kv[0][1])):
+        by_language.setdefault(language, {})[name] = count
+    return {
+        "record_count": record_count,
+        "library_count": len(counts),
+        "libraries": by_language,
+    }
+
+
+def stream_trajectories(
+    paths: List[Path],
+    out,
+    *,
+    workers: int = 1,
+    chunk_size: int = 500,
+    include_stdlib: bool = False,
+    compact: bool = False,
+) -> Tuple[Counter, int]:
+    """Extract JSONL trajectory records to `out` as JSONL, in input order.
+
+    Chunks of lines are spread over `workers` processes, with at most two
+    chunks per worker in flight, so memory stays bounded by chunk size rather
+    than input size. Returns the merged (language, library) → record Counter
+    and the number of records written.
+    """
+    chunks = _chunks(iter_jsonl_lines(paths), chunk_size)
+    counts: Counter = Counter()
+    written = 0
+
+    def consume(result):
+        nonlocal written
+        lines, chunk_counts, warnings = result
+        for warning in warnings:
+            print(warning, file=sys.stderr)
+        for line in lines:
+            out.write(line)
+            out.write("\n")
+        counts.update(chunk_counts)
+        written += len(lines)
+
+    if workers <= 1:
+        for chunk in chunks:
+            consume(extract_chunk(chunk, include_stdlib, compact))
+        return counts, written
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(extract_chunk, chunk, include_stdlib, compact))
+            if len(pending) >= 2 * workers:
+                consume(pending.popleft().result())
+        while pending:
+            consume(pending.popleft().result())
+    return counts, written
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
 
+def stream_main(args, parser):
+    """--stream: sharded JSONL in, per-record JSONL and a frequency table out."""
+    if args.format != "json":
+        parser.error("--stream writes JSONL; --format yaml is not supported")
+    if args.languages:
+        parser.error("--languages applies to plain code input, not --stream")
+    paths = []
+    if args.file:
+        input_path = Path(args.file)
+        if not input_path.exists():
+            print(f"Error: file not found: {args.file}", file=sys.stderr)
+            sys.exit(1)
+        paths = shard_paths(input_path)
+        if not paths:
+            print(f"Error: no *.jsonl shards in {args.file}", file=sys.stderr)
+            sys.exit(1)
+
+    start = time.time()
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        counts, written = stream_trajectories(
+            paths, out,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            include_stdlib=args.include_stdlib,
+            compact=args.compact,
+        )
+    finally:
+        if args.output:
+            out.close()
+    elapsed = time.time() - start
+
+    if args.frequencies:
+        with open(args.frequencies, "w", encoding="utf-8") as f:
+            json.dump(frequency_table(counts, written), f, indent=2, ensure_ascii=False)
+            f.write("\n")
+    source = f"{len(paths)} file(s)" if paths else "stdin"
+    print(
+        f"{written} records from {source} in {elapsed:.1f}s "
+        f"({written / max(elapsed, 1e-9):.0f} records/sec, {args.workers} workers), "
+        f"{len(counts)} distinct libraries",
+        file=sys.stderr,
+    )
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Extract library/framework references from code snippets.",
@@ -1040,6 +1136,8 @@ def main():
             "  python extract_libraries.py -f snippet.py\n"
             "  python extract_libraries.py -f trajectory.json --trajectory\n"
             "  python extract_libraries.py -f data.jsonl --trajectory --format yaml\n"
+            "  python extract_libraries.py -f shards/ --stream --output libs.jsonl "
+            "--frequencies freq.json --workers 16\n"
         ),
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
@@ -1076,9 +1174,41 @@ def main():
         action="store_true",
         help="Output only unique library names (no metadata).",
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream JSONL trajectories (a file, a directory of *.jsonl shards, or "
+             "stdin) to per-record JSONL results in input order.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="With --stream: JSONL output path (default: stdout).",
+    )
+    parser.add_argument(
+        "--frequencies",
+        type=str,
+        help="With --stream: write records per library, by language, as JSON.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="With --stream: worker processes (default: CPU count).",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=500,
+        help="With --stream: records per worker task (default: 500).",
+    )
 
     args = parser.parse_args()
 
+    if args.stream:
+        stream_main(args, parser)
+        return
+
     # Read input
     if args.file:
         input_path = Path(args.file)